@@ -1,16 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Header, Request, Body
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from starlette.concurrency import run_in_threadpool
 from app.core.config import OAUTH2_SCHEME
+from app.core.calendar_sync import calendar_sync
+from app.core.join_scheduler import join_scheduler, JOIN_SCHEDULER_HORIZON_SECONDS
 import datetime
 import requests
 from app.helper.generate_presigned_url import generate_presigned_url, extract_file_url
 from app.helper.save_transaction import save_transcription
 from app.log_config import logger
-import redis
-from uuid import uuid4
 import json
 from app.core import config
 import os
@@ -20,19 +19,11 @@ CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 TOKEN_URI = os.getenv("TOKEN_URI")
 REDIRECT_URIS = os.getenv("REDIRECT_URIS")
-REDIS_HOST = os.getenv("REDIS_HOST", "redis")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
-BOT_ADDED_IN_MEETING_KEY = "bot_added_in_meeting"
-MEETING_DETAILS_KEY = "meeting_details"
 
 router = APIRouter(prefix="/meetings", tags=["Meetings"])
 
 LINGO_API_URL = os.getenv("LINGO_API_URL")
-GET_MEETING_URL=os.getenv("GET_MEETING_URL")
-SCHEDULE_JOIN_BOT_URL=os.getenv("SCHEDULE_JOIN_BOT_URL")
-JOIN_METTING_BEFORE_IN_MINUTES = int(os.getenv("JOIN_METTING_BEFORE_IN_MINUTES", 2))  # default to 2 minutes
 
 class LingoRequest(BaseModel):
     key: str
@@ -48,103 +39,23 @@ class ScheduleMeeting(BaseModel):
 @router.get("/")
 def get_meetings(body: ScheduleMeeting, token: str = Depends(OAUTH2_SCHEME)):
     logger.info("Received request to fetch and schedule meetings")
-    creds = Credentials(
-        token=token,
-        refresh_token=body.refresh_token,
-        token_uri=TOKEN_URI,
-        client_id=CLIENT_ID,
-        client_secret=CLIENT_SECRET
-    )
+    user = calendar_sync.register_user(body.user_id, token, body.refresh_token, body.bot_name)
 
-    service = build('calendar', 'v3', credentials=creds)
+    # The calendar is kept up to date by its watch channel's notifications, so Google is only asked when those might have been missed
+    if calendar_sync.needs_sync(user):
+        calendar_sync.sync(user)
+    calendar_sync.ensure_watch(user)
 
-    now = datetime.datetime.utcnow().isoformat() + 'Z'
-    one_week_later = (datetime.datetime.utcnow() + datetime.timedelta(days=1)).isoformat() + 'Z'
-
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=now,
-        timeMax=one_week_later,
-        maxResults=10,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    events = events_result.get('items', [])
-    scheduled_meetings = []
-    meetings_map = {}
-    for event in events:
-        meeting_url = event.get('hangoutLink')
-
-        # check is bot request is aleady sent for the meeting
-        json_str = redis_client.get(BOT_ADDED_IN_MEETING_KEY)
-        if json_str:
-            meetings_map = json.loads(json_str)
-
-        if meetings_map and meeting_url in meetings_map.get(body.bot_name):
-            logger.info(f" {meeting_url} is requested to be added by bot {body.bot_name} already scheduled. Skipping... ")
-            continue
-
-        if meeting_url:
-            title = event.get('summary', 'Unnamed Meeting')
-            start_time = event['start'].get('dateTime')
-            end_time = event['end'].get('dateTime')
-            if not start_time or not end_time:
-                continue  # Skip all-day events
-
-            # Convert time to the expected format
-            meeting_time = datetime.datetime.fromisoformat(start_time).strftime('%Y-%m-%dT%H:%M:%S')
-            meeting_end_time = datetime.datetime.fromisoformat(end_time).strftime('%Y-%m-%dT%H:%M:%S')
-
-
-            current_time = datetime.datetime.now()
-            meeting_datetime = datetime.datetime.fromisoformat(meeting_time.replace('Z', '+00:00'))
-            time_difference = abs((meeting_datetime - current_time).total_seconds() / 60)
-
-            # skipp the meeting if not within 2 minutes
-            if abs(time_difference) > JOIN_METTING_BEFORE_IN_MINUTES:
-                if meeting_datetime < current_time:
-                    logger.info(f"{title} at {meeting_datetime} is already past. Meeting skipped.")
-                else:
-                    logger.info(f"{title} at {meeting_datetime} is not within 2 minutes of current time. Skipping...")
-                continue
-
-            # set to map for bot has sent request to attendee api
-            bot_map = {body.bot_name: []}
-            bot_map[body.bot_name].append(meeting_url)
-            redis_client.set(BOT_ADDED_IN_MEETING_KEY, json.dumps(bot_map))
-
-
-            meeting_details = {body.bot_name: []}
-            meeting_details[body.bot_name].append({"title": title,"meeting_time": meeting_time, "user_id": body.user_id})
-            redis_client.set(MEETING_DETAILS_KEY, json.dumps(meeting_details))
-            logger.info(f"Scheduling bot for upcoming meeting '{title}' at {meeting_time}")
-            # Schedule the bot by calling the existing API
-            try:
-                    response = requests.post(
-                        SCHEDULE_JOIN_BOT_URL,
-                        headers={"Content-Type": "application/json"},
-                        json={
-                            "meeting_url": meeting_url,
-                            "bot_name": body.bot_name,
-                            "meeting_time": meeting_time,
-                            "meeting_end_time": meeting_end_time
-                        }
-                    )
-                    message = response.json().get("message", "Failed")
-            except Exception as e:
-                    logger.error(f"Failed to schedule bot for '{title}': {e}")
-                    message = "Failed due to exception"
-
-            scheduled_meetings.append({
-                "title": title,
-                "meeting_url": meeting_url,
-                "status": message
-            })
-
-    logger.info("Completed scheduling of all meetings")
-    return {"scheduled_meetings": scheduled_meetings}
+    return {"scheduled_meetings": reconcile_joins(body.user_id, body.bot_name)}
 
 
+def reconcile_joins(user_id, bot_name):
+    # The joins are scheduled as the calendar changes, so this only catches the changes whose notifications were lost
+    now = datetime.datetime.now().timestamp()
+    events = calendar_sync.get_events_starting_between(user_id, now - join_scheduler.lead_seconds, now + JOIN_SCHEDULER_HORIZON_SECONDS)
+    join_scheduler.reconcile(user_id, bot_name, events)
+    logger.info(f"Reconciled {len(events)} upcoming meetings for bot {bot_name}")
+    return [{"title": event["title"], "meeting_url": event["meeting_url"], "start_time": event["start_time"]} for event in events]
 
 
 @router.post("/call-to-lingo")
@@ -189,35 +100,19 @@ def call_to_lingo(request: LingoRequest):
     
 
 @router.post("/watch-calendar")
-def watch_calendar(token: str = Depends(OAUTH2_SCHEME), refresh_token: str = Body(..., embed=True)):
-    creds = Credentials(
-    token=token,
-    refresh_token=refresh_token,
-    token_uri=TOKEN_URI,
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET
-)
-    service = build('calendar', 'v3', credentials=creds)
-    # Unique channel ID for this watch session
-    channel_id = str(uuid4())
-    # Expire after 7 days (Google's max for watch)
-    expiration_time = int((datetime.datetime.utcnow() + datetime.timedelta(days=7)).timestamp() * 1000)
-
-    body = {
-        "id": channel_id,
-        "type": "web_hook",
-        "address": config.WEBHOOK_ADDR,  # your webhook receiver
-        "params": {
-            "ttl": "604800"
-        },
-        "expiration": expiration_time
-    }
-    response = service.events().watch(calendarId='primary', body=body).execute()
-    try: 
-        redis_client.set(channel_id, token)
-
-    except Exception as e:
-        logger.info(e)
+def watch_calendar(
+    token: str = Depends(OAUTH2_SCHEME),
+    refresh_token: str = Body(..., embed=True),
+    user_id: str = Body(None, embed=True),
+    bot_name: str = Body(None, embed=True),
+):
+    user = calendar_sync.register_user(user_id or config.get_user_id(), token, refresh_token, bot_name)
+    response = calendar_sync.watch(user)
+    # Notifications only say that something changed, so the sync token has to be there before the first one arrives
+    if not user.get("sync_token"):
+        calendar_sync.sync(user)
+    if user.get("bot_name"):
+        reconcile_joins(user["user_id"], user["bot_name"])
     return {
         "message": "Calendar watch started",
         "channel_id": response.get("id"),
@@ -234,39 +129,26 @@ async def calendar_webhook(
     x_goog_resource_id: str = Header(None),
     x_goog_message_number: str = Header(None),
 ):
-    body = await request.body()
-
-    # Log or process headers and body
     logger.info(f"Received Calendar Notification")
     logger.info(f"Channel ID: {x_goog_channel_id}")
-    logger.info(f"Resource ID: {x_goog_resource_id}")    
-    ttl = redis_client.ttl(x_goog_channel_id)
-    logger.info(f"Redis DB info: {redis_client.info('keyspace')}")
-
-    
-    for i in range(20):
-        token = redis_client.get(str(x_goog_channel_id))
-        if token: break
-
-    if token:
-        logger.info("Calling /meetings/ endpoint via requests")
-        try:
-            response = requests.get(
-                GET_MEETING_URL,
-                headers={"Authorization": f"Bearer {token}"}
-            )
-
-            if response.status_code == 200:
-                scheduled = response.json().get("scheduled_meetings", [])
-                logger.info(f"Meetings scheduled: {len(scheduled)}")
-                return {"message": "Webhook received and meetings processed", "scheduled": scheduled}
-            else:
-                logger.error(f"Failed to fetch meetings. Status: {response.status_code}, Details: {response.text}")
-                return JSONResponse(status_code=response.status_code, content=response.json())
-        except Exception as e:
-            logger.error(f"Error while calling meetings API: {e}")
-            return JSONResponse(status_code=500, content={"message": "Internal error", "details": str(e)})
-    else:
-        logger.warning("Token not found for channel_id.")
-        return JSONResponse(status_code=404, content={"message": "Token not found"})
-
+    logger.info(f"Resource ID: {x_goog_resource_id}")
+
+    # Google sends a "sync" message when a channel is created, before anything has changed
+    if x_goog_resource_state == "sync":
+        return {"message": "Watch channel confirmed"}
+
+    user = calendar_sync.get_user_for_channel(x_goog_channel_id)
+    if not user:
+        logger.warning("User not found for channel_id.")
+        return JSONResponse(status_code=404, content={"message": "Channel not found"})
+
+    try:
+        # The Google client blocks, so it runs off the event loop
+        changed_events, removed_event_ids = await run_in_threadpool(calendar_sync.sync, user)
+        if user.get("bot_name"):
+            # Moved meetings are rescheduled and cancelled ones are dropped, without waiting for the next poll
+            await run_in_threadpool(join_scheduler.apply_changes, user["user_id"], user["bot_name"], changed_events, removed_event_ids)
+        return {"message": "Webhook received and meetings processed", "changed": len(changed_events), "removed": len(removed_event_ids)}
+    except Exception as e:
+        logger.error(f"Error while syncing calendar: {e}")
+        return JSONResponse(status_code=500, content={"message": "Internal error", "details": str(e)})
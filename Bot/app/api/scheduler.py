@@ -1,13 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from app.core.scheduler import scheduler
-from app.core.join import join_meeting_with_retry
+from app.core.meeting_poller import meeting_poller
+from app.core.join_worker import join_worker
+from app.core.join_scheduler import join_scheduler, parse_timestamp
 
 from app.models.schemas import ScheduleBotRequest
 from app.log_config import logger
+import base64
+import hashlib
+import hmac
+import json
 import os
 
 router = APIRouter(prefix="/scheduler", tags=["Scheduler"])
 JOIN_MEETING_URL = os.getenv("JOIN_MEETING_URL")
+# The project's webhook secret from attendee's settings page, as shown there (base64)
+ATTENDEE_WEBHOOK_SECRET = os.getenv("ATTENDEE_WEBHOOK_SECRET", "")
 
 
 
@@ -18,16 +28,66 @@ def schedule_join_bot(request: ScheduleBotRequest):
     meeting_time = request.meeting_time
     meeting_end_time = request.meeting_end_time
 
-    join_meeting_with_retry(meeting_url, bot_name)
+    try:
+        # The meeting's state is kept until a while after it ends
+        meeting_end_timestamp = parse_timestamp(meeting_end_time)
+    except ValueError:
+        meeting_end_timestamp = None
+
+    # The bot is created and tracked by the join worker, so this doesn't wait for it to join
+    join_worker.enqueue(meeting_url, bot_name, meeting_end_timestamp)
     return {"message": "Job scheduled", "meeting_url": meeting_url, "meeting_time": meeting_time, "meeting_end_time": meeting_end_time}
 
 
+@router.post("/bot-state-webhook")
+async def bot_state_webhook(request: Request, x_webhook_signature: str = Header(None)):
+    payload = await request.json()
+    if ATTENDEE_WEBHOOK_SECRET and not is_valid_webhook_signature(payload, x_webhook_signature):
+        logger.warning("Received bot state webhook with an invalid signature")
+        return JSONResponse(status_code=401, content={"message": "Invalid signature"})
+
+    # Attendee can send several webhooks in one request
+    webhooks = payload if isinstance(payload, list) else [payload]
+    updated = 0
+    for webhook in webhooks:
+        if webhook.get("trigger") != "bot.state_change":
+            continue
+        bot_id = webhook.get("bot_id")
+        new_state = webhook.get("data", {}).get("new_state")
+        if await run_in_threadpool(join_worker.handle_state_change, bot_id, new_state):
+            join_worker.wake_tracking(bot_id)
+            updated += 1
+    return {"message": "Webhook received", "updated": updated}
+
+
+def is_valid_webhook_signature(payload, signature):
+    # Attendee signs the canonical JSON of the body, see sign_payload in attendee's webhook_utils.py
+    payload_json = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    expected_signature = base64.b64encode(hmac.new(base64.b64decode(ATTENDEE_WEBHOOK_SECRET), payload_json.encode("utf-8"), hashlib.sha256).digest()).decode("utf-8")
+    return bool(signature) and hmac.compare_digest(signature, expected_signature)
+
+
 @router.get("/scheduled-jobs")
 def get_scheduled_jobs():
     jobs = scheduler.get_jobs()
     return [job.id for job in jobs]
 
 
+@router.get("/scheduled-joins")
+def get_scheduled_joins():
+    return join_scheduler.get_scheduled_joins()
+
+
+@router.get("/join-worker-metrics")
+def get_join_worker_metrics():
+    return join_worker.get_metrics()
+
+
+@router.get("/meeting-poller-metrics")
+def get_meeting_poller_metrics():
+    return meeting_poller.get_metrics()
+
+
 @router.delete("/stop-all-jobs")
 def stop_all_jobs():
     jobs = scheduler.get_jobs()
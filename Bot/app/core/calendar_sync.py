@@ -0,0 +1,256 @@
+import datetime
+import json
+import os
+import time
+from uuid import uuid4
+
+import redis
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+import app.core.config as config
+from app.core.join_scheduler import JOIN_SCHEDULER_HORIZON_SECONDS
+from app.log_config import logger
+
+CLIENT_ID = os.getenv("CLIENT_ID")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+TOKEN_URI = os.getenv("TOKEN_URI")
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+# Watch channels last at most 7 days. They are renewed when they have less than this left.
+CALENDAR_WATCH_RENEW_BEFORE_SECONDS = int(os.getenv("CALENDAR_WATCH_RENEW_BEFORE_SECONDS", 24 * 3600))
+# Even with a watch channel, a calendar is synced this often, in case a notification was lost
+CALENDAR_SYNC_MAX_STALENESS_SECONDS = int(os.getenv("CALENDAR_SYNC_MAX_STALENESS_SECONDS", 30 * 60))
+# How far back the first sync of a calendar goes
+CALENDAR_SYNC_LOOKBACK_SECONDS = int(os.getenv("CALENDAR_SYNC_LOOKBACK_SECONDS", 24 * 3600))
+# How far ahead the index goes. Once less than the join scheduler's horizon is left, the calendar is synced from scratch to move it on.
+CALENDAR_SYNC_WINDOW_SECONDS = int(os.getenv("CALENDAR_SYNC_WINDOW_SECONDS", 2 * JOIN_SCHEDULER_HORIZON_SECONDS))
+
+WATCH_CHANNEL_TTL_SECONDS = 7 * 24 * 3600
+KEY_PREFIX = "calendar_sync"
+
+
+class CalendarSync:
+    """Keeps a local index of each user's upcoming Google Meet events in Redis.
+
+    The first sync of a calendar lists its events from the last day up to the end of
+    the sync window, page by page, and keeps Google's nextSyncToken. After that only
+    the events that changed since the last sync are fetched, and the ones that start
+    after the window are left out, so a recurring meeting with no end doesn't fill
+    the index. The calendar is synced from scratch whenever the window runs low.
+    Syncs are triggered by the calendar's watch channel notifications, so looking up
+    a user's meetings doesn't call Google.
+    Calendars without a watch channel are synced incrementally when they are read.
+
+    Per user, Redis holds:
+      calendar_sync:user:<user_id>    hash of tokens, bot name, sync token, sync window end and watch channel
+      calendar_sync:events:<user_id>  sorted set of event ids, scored by start time
+      calendar_sync:event:<user_id>   hash of event id to the event's details as JSON
+      calendar_sync:channel:<id>      the user id a watch channel belongs to
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    # Keys
+
+    def user_key(self, user_id):
+        return f"{KEY_PREFIX}:user:{user_id}"
+
+    def events_key(self, user_id):
+        return f"{KEY_PREFIX}:events:{user_id}"
+
+    def event_details_key(self, user_id):
+        return f"{KEY_PREFIX}:event:{user_id}"
+
+    def channel_key(self, channel_id):
+        return f"{KEY_PREFIX}:channel:{channel_id}"
+
+    # Users
+
+    def register_user(self, user_id, access_token, refresh_token, bot_name=None):
+        mapping = {"access_token": access_token, "refresh_token": refresh_token}
+        if bot_name:
+            mapping["bot_name"] = bot_name
+        self.redis_client.hset(self.user_key(user_id), mapping=mapping)
+        return self.get_user(user_id)
+
+    def get_user(self, user_id):
+        user = self.redis_client.hgetall(self.user_key(user_id))
+        if not user:
+            return None
+        return {**user, "user_id": user_id}
+
+    def get_user_for_channel(self, channel_id):
+        user_id = self.redis_client.get(self.channel_key(channel_id))
+        return self.get_user(user_id) if user_id else None
+
+    def build_service(self, user):
+        creds = Credentials(
+            token=user["access_token"],
+            refresh_token=user["refresh_token"],
+            token_uri=TOKEN_URI,
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+        )
+        return build("calendar", "v3", credentials=creds, cache_discovery=False), creds
+
+    def save_refreshed_token(self, user, creds):
+        if creds.token and creds.token != user["access_token"]:
+            self.redis_client.hset(self.user_key(user["user_id"]), "access_token", creds.token)
+
+    # Syncing
+
+    def needs_sync(self, user):
+        if not user.get("sync_token") or not user.get("channel_id"):
+            return True
+        return time.time() - float(user.get("synced_at", 0)) > CALENDAR_SYNC_MAX_STALENESS_SECONDS
+
+    def sync(self, user):
+        """Fetches the events that changed since the last sync, and updates the index.
+
+        Returns the events that were added or changed, and the ids of the events that were removed.
+        """
+        service, creds = self.build_service(user)
+        user_id = user["user_id"]
+        sync_token = user.get("sync_token")
+        window_end = float(user.get("window_end", 0))
+        if sync_token and window_end - time.time() < JOIN_SCHEDULER_HORIZON_SECONDS:
+            logger.info(f"Calendar index for user {user_id} no longer covers the join horizon, doing a full sync")
+            sync_token = None
+        try:
+            if not sync_token:
+                window_end = time.time() + CALENDAR_SYNC_WINDOW_SECONDS
+            try:
+                changed_events, removed_event_ids, next_sync_token = self.list_changed_events(service, sync_token, window_end)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                # The sync token expired, so the calendar has to be synced from scratch
+                logger.info(f"Sync token for user {user_id} is no longer valid, doing a full sync")
+                sync_token = None
+                window_end = time.time() + CALENDAR_SYNC_WINDOW_SECONDS
+                changed_events, removed_event_ids, next_sync_token = self.list_changed_events(service, None, window_end)
+        finally:
+            self.save_refreshed_token(user, creds)
+
+        # Incremental syncs return changes to any event, including ones that have moved past the window
+        removed_event_ids += [event["id"] for event in changed_events if event["start_timestamp"] > window_end]
+        changed_events = [event for event in changed_events if event["start_timestamp"] <= window_end]
+
+        pipeline = self.redis_client.pipeline()
+        if not sync_token:
+            # A full sync only lists the events that exist, so anything that was deleted in the meantime is dropped with the old index
+            pipeline.delete(self.events_key(user_id), self.event_details_key(user_id))
+        for event in changed_events:
+            pipeline.zadd(self.events_key(user_id), {event["id"]: event["start_timestamp"]})
+            pipeline.hset(self.event_details_key(user_id), event["id"], json.dumps(event))
+        for event_id in removed_event_ids:
+            pipeline.zrem(self.events_key(user_id), event_id)
+            pipeline.hdel(self.event_details_key(user_id), event_id)
+        pipeline.hset(self.user_key(user_id), mapping={"sync_token": next_sync_token, "synced_at": time.time(), "window_end": window_end})
+        pipeline.execute()
+        self.prune_past_events(user_id)
+
+        logger.info(f"Synced calendar for user {user_id}: {len(changed_events)} changed, {len(removed_event_ids)} removed")
+        return changed_events, removed_event_ids
+
+    def list_changed_events(self, service, sync_token, window_end):
+        if sync_token:
+            # Google doesn't allow a time range with a sync token
+            params = {"syncToken": sync_token}
+        else:
+            time_min = datetime.datetime.utcnow() - datetime.timedelta(seconds=CALENDAR_SYNC_LOOKBACK_SECONDS)
+            time_max = datetime.datetime.utcfromtimestamp(window_end)
+            params = {"timeMin": time_min.isoformat() + "Z", "timeMax": time_max.isoformat() + "Z"}
+
+        changed_events = []
+        removed_event_ids = []
+        while True:
+            events_result = service.events().list(calendarId="primary", singleEvents=True, **params).execute()
+            for event in events_result.get("items", []):
+                indexed_event = self.to_indexed_event(event)
+                if indexed_event:
+                    changed_events.append(indexed_event)
+                else:
+                    # Cancelled, or no longer something a bot can join
+                    removed_event_ids.append(event["id"])
+            if not events_result.get("nextPageToken"):
+                return changed_events, removed_event_ids, events_result.get("nextSyncToken")
+            params["pageToken"] = events_result["nextPageToken"]
+
+    def to_indexed_event(self, event):
+        if event.get("status") == "cancelled":
+            return None
+        meeting_url = event.get("hangoutLink")
+        start_time = event.get("start", {}).get("dateTime")
+        end_time = event.get("end", {}).get("dateTime")
+        # All-day events and events without a meeting link have nothing to join
+        if not meeting_url or not start_time or not end_time:
+            return None
+        return {
+            "id": event["id"],
+            "title": event.get("summary", "Unnamed Meeting"),
+            "meeting_url": meeting_url,
+            "start_time": start_time,
+            "end_time": end_time,
+            "start_timestamp": datetime.datetime.fromisoformat(start_time.replace("Z", "+00:00")).timestamp(),
+        }
+
+    def prune_past_events(self, user_id):
+        ended_before = time.time() - CALENDAR_SYNC_LOOKBACK_SECONDS
+        event_ids = self.redis_client.zrangebyscore(self.events_key(user_id), "-inf", ended_before)
+        if event_ids:
+            self.redis_client.zrem(self.events_key(user_id), *event_ids)
+            self.redis_client.hdel(self.event_details_key(user_id), *event_ids)
+
+    def get_events_starting_between(self, user_id, start, end):
+        event_ids = self.redis_client.zrangebyscore(self.events_key(user_id), start, end)
+        if not event_ids:
+            return []
+        return [json.loads(event) for event in self.redis_client.hmget(self.event_details_key(user_id), event_ids) if event]
+
+    # Watch channels
+
+    def ensure_watch(self, user):
+        """Starts a watch channel for the user's calendar, or renews it if it's about to expire."""
+        if not config.WEBHOOK_ADDR:
+            return
+        expires_at = float(user.get("channel_expiration", 0)) / 1000
+        if expires_at - time.time() > CALENDAR_WATCH_RENEW_BEFORE_SECONDS:
+            return
+        return self.watch(user)
+
+    def watch(self, user):
+        service, creds = self.build_service(user)
+        user_id = user["user_id"]
+        channel_id = str(uuid4())
+        body = {
+            "id": channel_id,
+            "type": "web_hook",
+            "address": config.WEBHOOK_ADDR,
+            "params": {"ttl": str(WATCH_CHANNEL_TTL_SECONDS)},
+        }
+        response = service.events().watch(calendarId="primary", body=body).execute()
+        self.redis_client.set(self.channel_key(channel_id), user_id, ex=WATCH_CHANNEL_TTL_SECONDS)
+
+        # Notifications from the old channel would be duplicates from now on
+        if user.get("channel_id"):
+            try:
+                service.channels().stop(body={"id": user["channel_id"], "resourceId": user["resource_id"]}).execute()
+            except Exception as e:
+                logger.warning(f"Failed to stop watch channel {user['channel_id']} for user {user_id}: {e}")
+            self.redis_client.delete(self.channel_key(user["channel_id"]))
+
+        self.redis_client.hset(
+            self.user_key(user_id),
+            mapping={"channel_id": channel_id, "resource_id": response.get("resourceId", ""), "channel_expiration": response.get("expiration", 0)},
+        )
+        self.save_refreshed_token(user, creds)
+        logger.info(f"Started watch channel {channel_id} for user {user_id}, expiring at {response.get('expiration')}")
+        return response
+
+
+calendar_sync = CalendarSync(redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True))
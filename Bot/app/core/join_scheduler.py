@@ -0,0 +1,173 @@
+import datetime
+import json
+import os
+import time
+
+import redis
+from apscheduler.jobstores.base import JobLookupError
+
+from app.core.join_worker import join_worker
+from app.core.meeting_state import meeting_state_store
+from app.core.scheduler import scheduler
+from app.log_config import logger
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+JOIN_METTING_BEFORE_IN_MINUTES = int(os.getenv("JOIN_METTING_BEFORE_IN_MINUTES", 2))  # default to 2 minutes
+# How far ahead the polls schedule the meetings they find in the calendar index
+JOIN_SCHEDULER_HORIZON_SECONDS = int(os.getenv("JOIN_SCHEDULER_HORIZON_SECONDS", 24 * 3600))
+KEY_PREFIX = "join_scheduler"
+
+
+class JoinScheduler:
+    """Joins each meeting's bot exactly JOIN_METTING_BEFORE_IN_MINUTES before the meeting starts.
+
+    The upcoming joins are kept in a Redis sorted set scored by join time, so they
+    survive a restart, and each one has an APScheduler date job that fires it.
+    Calendar changes reschedule or cancel the joins as they come in, and the polls
+    reconcile the joins with the calendar index in case a change was missed.
+
+    Redis holds:
+      join_scheduler:joins           sorted set of joins, scored by join time
+      join_scheduler:join            hash of join to the meeting's details as JSON
+      join_scheduler:user:<user_id>  set of the user's joins
+      join_scheduler:fired:<join>    the start time of the meeting a join was fired for
+    """
+
+    def __init__(self, redis_client, lead_seconds=JOIN_METTING_BEFORE_IN_MINUTES * 60):
+        self.redis_client = redis_client
+        self.lead_seconds = lead_seconds
+
+    # Keys
+
+    def joins_key(self):
+        return f"{KEY_PREFIX}:joins"
+
+    def join_details_key(self):
+        return f"{KEY_PREFIX}:join"
+
+    def user_joins_key(self, user_id):
+        return f"{KEY_PREFIX}:user:{user_id}"
+
+    def fired_key(self, join):
+        return f"{KEY_PREFIX}:fired:{join}"
+
+    @staticmethod
+    def join_name(user_id, event_id):
+        return f"{user_id}:{event_id}"
+
+    @staticmethod
+    def job_id(join):
+        return f"join:{join}"
+
+    # Scheduling
+
+    def schedule(self, user_id, bot_name, event):
+        join = self.join_name(user_id, event["id"])
+        end_timestamp = parse_timestamp(event["end_time"])
+        if end_timestamp <= time.time():
+            self.cancel(user_id, event["id"])
+            return
+
+        # A meeting is only joined once, unless it's moved to a different time
+        fired_for_start = self.redis_client.get(self.fired_key(join))
+        if fired_for_start is not None and float(fired_for_start) == event["start_timestamp"]:
+            return
+
+        join_at = event["start_timestamp"] - self.lead_seconds
+        details = {**event, "user_id": user_id, "bot_name": bot_name}
+        pipeline = self.redis_client.pipeline()
+        pipeline.zadd(self.joins_key(), {join: join_at})
+        pipeline.hset(self.join_details_key(), join, json.dumps(details))
+        pipeline.sadd(self.user_joins_key(user_id), join)
+        pipeline.execute()
+        self.add_job(join, join_at)
+
+    def add_job(self, join, join_at):
+        # A join that's due already, e.g. because the meeting was just added, fires straight away
+        run_date = datetime.datetime.fromtimestamp(max(join_at, time.time()), tz=datetime.timezone.utc)
+        # Without misfire_grace_time=None, a join that fires late because the app was busy would be skipped
+        scheduler.add_job(self.fire, "date", run_date=run_date, args=[join], id=self.job_id(join), replace_existing=True, misfire_grace_time=None)
+
+    def cancel(self, user_id, event_id):
+        join = self.join_name(user_id, event_id)
+        self.remove(join, user_id)
+        try:
+            scheduler.remove_job(self.job_id(join))
+        except JobLookupError:
+            pass
+
+    def remove(self, join, user_id):
+        pipeline = self.redis_client.pipeline()
+        pipeline.zrem(self.joins_key(), join)
+        pipeline.hdel(self.join_details_key(), join)
+        pipeline.srem(self.user_joins_key(user_id), join)
+        result = pipeline.execute()
+        return bool(result[0])
+
+    def apply_changes(self, user_id, bot_name, changed_events, removed_event_ids):
+        """Reschedules the changed meetings, and cancels the removed ones."""
+        horizon = time.time() + JOIN_SCHEDULER_HORIZON_SECONDS
+        for event in changed_events:
+            if event["start_timestamp"] <= horizon:
+                self.schedule(user_id, bot_name, event)
+            else:
+                # It may have been moved out of the horizon
+                self.cancel(user_id, event["id"])
+        for event_id in removed_event_ids:
+            self.cancel(user_id, event_id)
+
+    def reconcile(self, user_id, bot_name, events):
+        """Makes the user's scheduled joins match their upcoming meetings in the calendar index."""
+        event_ids = {event["id"] for event in events}
+        for join in self.redis_client.smembers(self.user_joins_key(user_id)):
+            event_id = join[len(user_id) + 1 :]
+            if event_id not in event_ids:
+                self.cancel(user_id, event_id)
+        for event in events:
+            self.schedule(user_id, bot_name, event)
+
+    def restore(self):
+        """Adds the jobs for the joins that were scheduled before the app was restarted."""
+        joins = self.redis_client.zrange(self.joins_key(), 0, -1, withscores=True)
+        for join, join_at in joins:
+            self.add_job(join, join_at)
+        logger.info(f"Restored {len(joins)} scheduled joins")
+
+    # Firing
+
+    def fire(self, join):
+        details_json = self.redis_client.hget(self.join_details_key(), join)
+        # Whoever removes the join fires it, so it's never fired twice
+        if not details_json or not self.remove(join, json.loads(details_json)["user_id"]):
+            return
+        details = json.loads(details_json)
+
+        end_timestamp = parse_timestamp(details["end_time"])
+        ends_in_seconds = end_timestamp - time.time()
+        if ends_in_seconds <= 0:
+            logger.info(f"Meeting '{details['title']}' has already ended, not joining")
+            return
+        self.redis_client.set(self.fired_key(join), details["start_timestamp"], ex=int(ends_in_seconds) + 3600)
+
+        meeting_time = to_local_time(details["start_time"])
+        lag_seconds = time.time() - (details["start_timestamp"] - self.lead_seconds)
+        logger.info(f"Joining bot {details['bot_name']} to meeting '{details['title']}' at {meeting_time}, {lag_seconds:.1f}s after its join time")
+
+        meeting_state_store.save_meeting_details(details["bot_name"], details["meeting_url"], details["title"], meeting_time, details["user_id"], end_timestamp)
+        join_worker.enqueue(details["meeting_url"], details["bot_name"], end_timestamp)
+
+    def get_scheduled_joins(self):
+        return [{"join": join, "join_at": datetime.datetime.fromtimestamp(join_at, tz=datetime.timezone.utc).isoformat()} for join, join_at in self.redis_client.zrange(self.joins_key(), 0, -1, withscores=True)]
+
+
+def parse_timestamp(date_time):
+    return datetime.datetime.fromisoformat(date_time.replace("Z", "+00:00")).timestamp()
+
+
+def to_local_time(date_time):
+    # The meeting's own wall clock time, which is how it's shown alongside the transcription
+    return datetime.datetime.fromisoformat(date_time.replace("Z", "+00:00")).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+join_scheduler = JoinScheduler(redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True))
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+import redis
+import redis.asyncio as aioredis
+
+from app.core.join import JOIN_MEETING_URL, get_api_key_for_bot
+from app.core.meeting_state import MEETING_STATE_DEFAULT_DURATION_SECONDS, meeting_state_store
+from app.log_config import logger
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+# How many bots are created at once. Tracking the bots once they're created doesn't count towards this.
+JOIN_WORKER_CONCURRENCY = int(os.getenv("JOIN_WORKER_CONCURRENCY", 20))
+# Where attendee sends the bots' bot.state_change webhooks, i.e. this app's /scheduler/bot-state-webhook
+BOT_STATE_WEBHOOK_URL = os.getenv("BOT_STATE_WEBHOOK_URL", "")
+# When the webhooks don't arrive, the bot's state is polled, backing off between these
+JOIN_POLL_MIN_BACKOFF_SECONDS = float(os.getenv("JOIN_POLL_MIN_BACKOFF_SECONDS", 5))
+JOIN_POLL_MAX_BACKOFF_SECONDS = float(os.getenv("JOIN_POLL_MAX_BACKOFF_SECONDS", 60))
+# Bots are tracked until they end. A bot that is still going this long after the meeting should have ended is no longer tracked.
+BOT_TRACKING_AFTER_END_SECONDS = int(os.getenv("BOT_TRACKING_AFTER_END_SECONDS", 2 * 3600))
+
+QUEUE_KEY = "join_worker:queue"
+JOINED_STATES = ["joined", "joined_recording", "joined_not_recording"]
+FINISHED_STATES = ["fatal_error", "ended", "data_deleted"]
+
+
+class JoinWorker:
+    """Creates the bots for the queued joins, and tracks them until they've left the meeting.
+
+    Joins are queued in a Redis list, so queueing one returns straight away and
+    survives a restart. The worker runs as tasks in the FastAPI event loop: one
+    takes the joins off the queue, and each join gets a task that creates its bot
+    and then follows the bot's state until it ends, when the meeting is released so
+    it can be joined again. The bot's state arrives through attendee's
+    bot.state_change webhooks. If a webhook doesn't arrive in time, the state is
+    polled, backing off between polls. Waiting costs nothing but a task, so one
+    process can track hundreds of bots at once.
+    """
+
+    def __init__(self, redis_client, concurrency=JOIN_WORKER_CONCURRENCY):
+        self.redis_client = redis_client
+        self.concurrency = concurrency
+        self.async_redis_client = None
+        self.session = None
+        self.task = None
+        # asyncio only keeps weak references to tasks, so the running joins are kept here
+        self.join_tasks = set()
+        self.create_semaphore = None
+        # Set when a webhook updates the bot's state, keyed by bot id
+        self.state_changed_events = {}
+        self.metrics = {
+            "joins_started": 0,
+            "bots_created": 0,
+            "bots_failed_to_create": 0,
+            "bots_joined": 0,
+            "bots_finished_without_joining": 0,
+            "bots_ended": 0,
+            "bots_timed_out": 0,
+            "webhook_updates": 0,
+            "polls": 0,
+        }
+
+    # Queueing
+
+    def enqueue(self, meeting_url, bot_name, meeting_end_timestamp=None):
+        """Queues a join. Safe to call from any thread."""
+        join = {"meeting_url": meeting_url, "bot_name": bot_name, "meeting_end_timestamp": meeting_end_timestamp, "queued_at": time.time()}
+        self.redis_client.rpush(QUEUE_KEY, json.dumps(join))
+        logger.info(f"Queued join of bot {bot_name} to meeting {meeting_url}")
+
+    # Running
+
+    async def start(self):
+        self.async_redis_client = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        self.create_semaphore = asyncio.Semaphore(self.concurrency)
+        self.task = asyncio.create_task(self.run())
+        if not BOT_STATE_WEBHOOK_URL:
+            logger.warning("BOT_STATE_WEBHOOK_URL is not set, so the bots' states will only be polled")
+        logger.info(f"Join worker started, creating up to {self.concurrency} bots at once")
+
+    async def stop(self):
+        tasks = [task for task in [self.task, *self.join_tasks] if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.session:
+            await self.session.close()
+        if self.async_redis_client:
+            await self.async_redis_client.close()
+        logger.info(f"Join worker stopped. Metrics: {self.get_metrics()}")
+
+    async def run(self):
+        while True:
+            # Don't take joins off the queue that can't be started yet, so they aren't lost if the app stops
+            async with self.create_semaphore:
+                pass
+            try:
+                item = await self.async_redis_client.blpop([QUEUE_KEY], timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to read the join queue: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not item:
+                continue
+            join_task = asyncio.create_task(self.join(json.loads(item[1])))
+            self.join_tasks.add(join_task)
+            join_task.add_done_callback(self.join_tasks.discard)
+
+    async def join(self, join):
+        meeting_url = join["meeting_url"]
+        bot_name = join["bot_name"]
+        meeting_end_timestamp = join.get("meeting_end_timestamp")
+        self.metrics["joins_started"] += 1
+        try:
+            # Claiming the meeting is atomic, so only one of any concurrent joins creates a bot
+            if not await asyncio.to_thread(meeting_state_store.claim_join, meeting_url, bot_name, meeting_end_timestamp):
+                state = await asyncio.to_thread(meeting_state_store.get_state, meeting_url)
+                logger.info(f"Meeting {meeting_url} already in progress with state: {state}")
+                return
+
+            async with self.create_semaphore:
+                bot_id, headers = await self.create_bot(meeting_url, bot_name, meeting_end_timestamp)
+            if not bot_id:
+                self.metrics["bots_failed_to_create"] += 1
+                await asyncio.to_thread(meeting_state_store.release_join, meeting_url, bot_name)
+                return
+            self.metrics["bots_created"] += 1
+            await self.track_bot(bot_id, meeting_url, bot_name, headers, meeting_end_timestamp)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to join bot {bot_name} to meeting {meeting_url}: {e}", exc_info=True)
+            await asyncio.to_thread(meeting_state_store.release_join, meeting_url, bot_name)
+
+    async def create_bot(self, meeting_url, bot_name, meeting_end_timestamp=None):
+        """Asks attendee to create a bot for the meeting. Returns the bot's id and the headers for calling attendee about it."""
+        attendee_api_key = await asyncio.to_thread(get_api_key_for_bot, bot_name)
+        if not attendee_api_key:
+            logger.error(f"Failed to retrieve API key for bot '{bot_name}'. No key in database or environment.")
+            return None, None
+
+        headers = {"Authorization": f"Token {attendee_api_key}", "Content-Type": "application/json"}
+        body = {"meeting_url": meeting_url, "bot_name": bot_name}
+        if BOT_STATE_WEBHOOK_URL:
+            body["webhooks"] = [{"url": BOT_STATE_WEBHOOK_URL, "triggers": ["bot.state_change"]}]
+
+        logger.info(f"Joining meeting: {meeting_url} with bot: {bot_name}")
+        async with self.session.post(JOIN_MEETING_URL, headers=headers, json=body) as response:
+            response_text = await response.text()
+            logger.info(f"Join bot response: {response.status}, {response_text}")
+            if response.status != 201:
+                logger.info(f"Failed to create bot for joining meeting: {meeting_url}")
+                return None, headers
+            response_data = json.loads(response_text)
+
+        bot_id = response_data.get("id")
+        if not bot_id:
+            logger.info("Joining meeting failed")
+            return None, headers
+
+        logger.info(f"Bot created with ID: {bot_id}")
+        # Register the bot before its first webhook can arrive
+        self.state_changed_events[bot_id] = asyncio.Event()
+        await asyncio.to_thread(meeting_state_store.save_bot_meeting, bot_id, meeting_url, meeting_end_timestamp)
+        await asyncio.to_thread(meeting_state_store.set_state, meeting_url, bot_id, response_data.get("state"), meeting_end_timestamp)
+        return bot_id, headers
+
+    async def track_bot(self, bot_id, meeting_url, bot_name, headers, meeting_end_timestamp=None):
+        """Follows the bot's state until it ends, then releases the meeting."""
+        state_changed = self.state_changed_events.setdefault(bot_id, asyncio.Event())
+        backoff_seconds = JOIN_POLL_MIN_BACKOFF_SECONDS
+        if meeting_end_timestamp is None:
+            seconds_until_end = MEETING_STATE_DEFAULT_DURATION_SECONDS
+        else:
+            seconds_until_end = max(meeting_end_timestamp - time.time(), 0)
+        give_up_at = time.monotonic() + seconds_until_end + BOT_TRACKING_AFTER_END_SECONDS
+        joined = False
+        try:
+            while time.monotonic() < give_up_at:
+                try:
+                    await asyncio.wait_for(state_changed.wait(), timeout=min(backoff_seconds, max(give_up_at - time.monotonic(), 0)))
+                    # The webhook has stored the state already
+                    state_changed.clear()
+                    state = ((await asyncio.to_thread(meeting_state_store.get_state, meeting_url)) or {}).get("state")
+                    # The webhooks are arriving, so polling can wait
+                    backoff_seconds = JOIN_POLL_MAX_BACKOFF_SECONDS
+                except asyncio.TimeoutError:
+                    state = await self.poll_state(bot_id, meeting_url, headers, meeting_end_timestamp)
+                    if state is None:
+                        return
+                    backoff_seconds = min(backoff_seconds * 2, JOIN_POLL_MAX_BACKOFF_SECONDS)
+
+                if state in JOINED_STATES and not joined:
+                    joined = True
+                    self.metrics["bots_joined"] += 1
+                    logger.info(f"{bot_name} Bot joined successfully into {meeting_url} ")
+                if state in FINISHED_STATES:
+                    if joined:
+                        self.metrics["bots_ended"] += 1
+                        logger.info(f"{bot_name} Bot left {meeting_url}, state: {state}")
+                    else:
+                        self.metrics["bots_finished_without_joining"] += 1
+                        logger.info(f"{bot_name} Bot finished without joining {meeting_url}, state: {state}")
+                    await asyncio.to_thread(meeting_state_store.release_meeting, meeting_url, bot_id)
+                    return
+
+            self.metrics["bots_timed_out"] += 1
+            logger.info(f"{bot_name} Bot is still in {meeting_url} {BOT_TRACKING_AFTER_END_SECONDS}s after the meeting should have ended, no longer tracking it")
+        finally:
+            self.state_changed_events.pop(bot_id, None)
+
+    async def poll_state(self, bot_id, meeting_url, headers, meeting_end_timestamp=None):
+        """Fetches the bot's state from attendee and stores it. Returns None if the meeting has been taken over by a different bot."""
+        self.metrics["polls"] += 1
+        try:
+            async with self.session.get(f"{JOIN_MEETING_URL}/{bot_id}", headers=headers) as response:
+                status_data = await response.json()
+        except Exception as e:
+            # Try again after the backoff
+            logger.warning(f"Failed to poll the state of bot {bot_id}: {e}")
+            return "unknown"
+        state = status_data.get("state")
+        if not await asyncio.to_thread(meeting_state_store.set_state, meeting_url, bot_id, state, meeting_end_timestamp):
+            logger.info(f"Meeting {meeting_url} was taken over by another bot, no longer tracking bot {bot_id}")
+            return None
+        return state
+
+    # Webhooks
+
+    def handle_state_change(self, bot_id, new_state):
+        """Stores a state from attendee's bot.state_change webhook, and wakes the bot's tracking. Returns whether the bot is known."""
+        meeting_url = meeting_state_store.get_meeting_url_for_bot(bot_id)
+        if not meeting_url:
+            return False
+        meeting_state_store.set_state(meeting_url, bot_id, new_state)
+        # A bot tracked here releases the meeting itself, once it has seen the state
+        if new_state in FINISHED_STATES and bot_id not in self.state_changed_events:
+            meeting_state_store.release_meeting(meeting_url, bot_id)
+        self.metrics["webhook_updates"] += 1
+        return True
+
+    def wake_tracking(self, bot_id):
+        # Must be called from the event loop
+        state_changed = self.state_changed_events.get(bot_id)
+        if state_changed:
+            state_changed.set()
+
+    def get_metrics(self):
+        try:
+            queued = self.redis_client.llen(QUEUE_KEY)
+        except redis.exceptions.RedisError:
+            queued = None
+        return {**self.metrics, "queued": queued, "joins_in_progress": len(self.join_tasks), "bots_tracked": len(self.state_changed_events)}
+
+
+join_worker = JoinWorker(redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True))
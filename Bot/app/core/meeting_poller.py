@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+import time
+
+import aiohttp
+import asyncpg
+
+import app.core.config as config
+from app.log_config import logger
+
+API_URL = os.getenv("API_URL")
+BOT_SCHEDULER_INTERVAL_SECONDS = int(os.getenv("BOT_SCHEDULER_INTERVAL_SECONDS", "60"))
+# Each bot's poll is started at a random point within this window, so the calendar requests don't all land at once
+BOT_SCHEDULER_JITTER_SECONDS = float(os.getenv("BOT_SCHEDULER_JITTER_SECONDS", "10"))
+BOT_SCHEDULER_MAX_CONCURRENT_POLLS = int(os.getenv("BOT_SCHEDULER_MAX_CONCURRENT_POLLS", "20"))
+BOT_SCHEDULER_DB_POOL_SIZE = int(os.getenv("BOT_SCHEDULER_DB_POOL_SIZE", "2"))
+
+SQL_QUERY = 'SELECT "accessToken", "refreshToken", "botName", "user_id" FROM bot;'
+
+
+class MeetingPoller:
+    """Polls every bot's calendar for meetings to join, once per interval.
+
+    Runs as a task in the FastAPI event loop for the life of the app, and keeps
+    its Postgres pool and HTTP session between cycles. Cycles never overlap:
+    if one is still running when the next is due, the next one is skipped.
+    The pool is created by the first cycle that needs it, so if Postgres isn't
+    reachable yet the cycle fails and the next one tries again.
+    """
+
+    def __init__(self, interval_seconds=BOT_SCHEDULER_INTERVAL_SECONDS, jitter_seconds=BOT_SCHEDULER_JITTER_SECONDS):
+        self.interval_seconds = interval_seconds
+        # The jitter has to leave time for the polls to finish before the next cycle
+        self.jitter_seconds = min(jitter_seconds, interval_seconds / 2)
+        self.db_pool = None
+        self.session = None
+        self.task = None
+        # asyncio only keeps weak references to tasks, so the running cycles are kept here
+        self.cycle_tasks = set()
+        self.cycle_lock = asyncio.Lock()
+        self.poll_semaphore = asyncio.Semaphore(BOT_SCHEDULER_MAX_CONCURRENT_POLLS)
+        self.metrics = {
+            "cycles_run": 0,
+            "cycles_skipped": 0,
+            "cycles_failed": 0,
+            "polls_succeeded": 0,
+            "polls_failed": 0,
+            "last_cycle_started_at": None,
+            "last_cycle_duration_seconds": None,
+            "max_cycle_duration_seconds": 0.0,
+            "last_cycle_lag_seconds": None,
+            "max_cycle_lag_seconds": 0.0,
+        }
+
+    async def connect_db_pool(self):
+        if self.db_pool is None:
+            db_url = config.DATABASE_URL or config._build_db_url_from_env()
+            self.db_pool = await asyncpg.create_pool(dsn=db_url, min_size=1, max_size=BOT_SCHEDULER_DB_POOL_SIZE)
+            logger.info("Meeting poller connected to the database")
+        return self.db_pool
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        self.task = asyncio.create_task(self.run())
+        logger.info(f"Meeting poller started, polling every {self.interval_seconds} seconds")
+
+    async def run_once(self):
+        """Runs a single cycle outside of the app, e.g. from a script, and closes the connections afterwards."""
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        try:
+            await self.run_cycle()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        for task in [self.task, *self.cycle_tasks]:
+            if task:
+                task.cancel()
+        await asyncio.gather(*[task for task in [self.task, *self.cycle_tasks] if task], return_exceptions=True)
+        if self.session:
+            await self.session.close()
+        if self.db_pool:
+            await self.db_pool.close()
+        logger.info(f"Meeting poller stopped. Metrics: {self.get_metrics()}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        next_cycle_at = loop.time()
+        while True:
+            # The lag is how late the cycle starts, e.g. because the event loop was busy
+            self.record_lag(loop.time() - next_cycle_at)
+            cycle_task = asyncio.create_task(self.run_cycle())
+            self.cycle_tasks.add(cycle_task)
+            cycle_task.add_done_callback(self.cycle_tasks.discard)
+
+            next_cycle_at += self.interval_seconds
+            # If we fell more than a whole interval behind, start again from now rather than running the missed cycles back to back
+            if next_cycle_at < loop.time():
+                next_cycle_at = loop.time()
+            await asyncio.sleep(next_cycle_at - loop.time())
+
+    async def run_cycle(self):
+        if self.cycle_lock.locked():
+            self.metrics["cycles_skipped"] += 1
+            logger.warning("Previous meeting poller cycle is still running, skipping this one")
+            return
+
+        async with self.cycle_lock:
+            started_at = time.monotonic()
+            self.metrics["last_cycle_started_at"] = time.time()
+            try:
+                bots = await self.fetch_bots()
+                await asyncio.gather(*[self.poll_bot(bot, delay_seconds=random.uniform(0, self.jitter_seconds)) for bot in bots])
+                self.metrics["cycles_run"] += 1
+            except Exception as e:
+                self.metrics["cycles_failed"] += 1
+                logger.error(f"Meeting poller cycle failed: {e}", exc_info=True)
+            finally:
+                duration_seconds = time.monotonic() - started_at
+                self.metrics["last_cycle_duration_seconds"] = round(duration_seconds, 3)
+                self.metrics["max_cycle_duration_seconds"] = round(max(self.metrics["max_cycle_duration_seconds"], duration_seconds), 3)
+            logger.info(f"Meeting poller cycle finished in {duration_seconds:.2f}s")
+
+    async def fetch_bots(self):
+        db_pool = await self.connect_db_pool()
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch(SQL_QUERY)
+        return [
+            {
+                "access_token": row["accessToken"],
+                "refresh_token": row["refreshToken"],
+                "bot_name": row["botName"],
+                "user_id": row["user_id"],
+            }
+            for row in rows
+        ]
+
+    async def poll_bot(self, data, delay_seconds=0):
+        await asyncio.sleep(delay_seconds)
+        headers = {
+            "Authorization": f"Bearer {data['access_token']}",
+            "Content-Type": "application/json",
+        }
+        body = {"refresh_token": data["refresh_token"], "bot_name": data["bot_name"], "user_id": data["user_id"]}
+        async with self.poll_semaphore:
+            try:
+                async with self.session.get(API_URL, headers=headers, json=body) as response:
+                    logger.info(f"Bot Name: {data['bot_name']} -> Status: {response.status}")
+                self.metrics["polls_succeeded"] += 1
+            except Exception as e:
+                self.metrics["polls_failed"] += 1
+                logger.error(f"Bot Name: {data['bot_name']}: failed: {e}")
+
+    def record_lag(self, lag_seconds):
+        lag_seconds = max(lag_seconds, 0.0)
+        self.metrics["last_cycle_lag_seconds"] = round(lag_seconds, 3)
+        self.metrics["max_cycle_lag_seconds"] = round(max(self.metrics["max_cycle_lag_seconds"], lag_seconds), 3)
+
+    def get_metrics(self):
+        return {**self.metrics, "cycle_running": self.cycle_lock.locked()}
+
+
+meeting_poller = MeetingPoller()
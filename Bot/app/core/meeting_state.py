@@ -0,0 +1,243 @@
+import json
+import os
+import time
+
+import redis
+
+from app.log_config import logger
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+# The recording is uploaded and sent to Lingo after the meeting ends, so the details have to outlive the meeting
+MEETING_STATE_TTL_AFTER_END_SECONDS = int(os.getenv("MEETING_STATE_TTL_AFTER_END_SECONDS", 24 * 3600))
+# Used when the end of the meeting isn't known
+MEETING_STATE_DEFAULT_DURATION_SECONDS = int(os.getenv("MEETING_STATE_DEFAULT_DURATION_SECONDS", 4 * 3600))
+# A join that was claimed but never got as far as creating a bot, e.g. because the app was restarted, can be claimed again after this long
+JOIN_CLAIM_STALE_AFTER_SECONDS = int(os.getenv("JOIN_CLAIM_STALE_AFTER_SECONDS", 5 * 60))
+
+MEETING_DETAILS_KEY = "meeting_details"
+MEETING_STATE_KEY = "meeting_state"
+BOT_MEETING_KEY = "meeting_state_bot"
+LEGACY_MEETING_DETAILS_KEY = "meeting_details"
+LEGACY_MEETING_STATES_KEY = "meeting_states"
+LEGACY_BOT_ADDED_IN_MEETING_KEY = "bot_added_in_meeting"
+
+REQUESTED = "requested"
+# A meeting in one of these states already has a bot, so it isn't joined again
+IN_PROGRESS_STATES = [
+    REQUESTED,
+    "ready",
+    "staged",
+    "joining",
+    "waiting_room",
+    "joined",
+    "joined_recording",
+    "joined_not_recording",
+    "joined_recording_paused",
+    "joined_recording_permission_denied",
+]
+
+# ARGV: bot name, ttl, now, stale after, meeting end, in progress states...
+CLAIM_JOIN_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+local meeting_end = tonumber(redis.call('HGET', KEYS[1], 'meeting_end') or '')
+-- A recurring meeting has the same url every time, so once a meeting is over the next one can be joined
+if state and not (meeting_end and meeting_end < tonumber(ARGV[3])) then
+    for i = 6, #ARGV do
+        if state == ARGV[i] then
+            local updated_at = tonumber(redis.call('HGET', KEYS[1], 'updated_at') or '0')
+            if state ~= 'requested' or updated_at > tonumber(ARGV[3]) - tonumber(ARGV[4]) then
+                return 0
+            end
+        end
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'state', 'requested', 'bot_name', ARGV[1], 'updated_at', ARGV[3], 'meeting_end', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# ARGV: bot id, state, now, ttl
+SET_STATE_SCRIPT = """
+local bot_id = redis.call('HGET', KEYS[1], 'bot_id')
+if bot_id and bot_id ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'bot_id', ARGV[1], 'state', ARGV[2], 'updated_at', ARGV[3])
+if redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+return 1
+"""
+
+# ARGV: bot name
+RELEASE_JOIN_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'state') == 'requested' and redis.call('HGET', KEYS[1], 'bot_name') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# ARGV: bot id
+RELEASE_MEETING_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'bot_id') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# ARGV: ttl, field, value, field, value...
+SET_IF_MISSING_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class MeetingStateStore:
+    """Keeps the state of each meeting's bot, and the details the bot needs once the meeting is over.
+
+    Each meeting has its own keys, which expire a while after the meeting ends, so
+    updating one meeting never reads or rewrites another's. The check-and-set updates
+    are Lua scripts, so concurrent joins of the same meeting can't both create a bot.
+    A meeting can be joined again once its end has passed, as recurring meetings
+    reuse the same url.
+
+    Redis holds:
+      meeting_state:<meeting_url>                   hash of state, bot_name, bot_id, updated_at and meeting_end
+      meeting_details:<bot_name>:<meeting_url>      hash of title, meeting_time and user_id, read by the attendee bot
+      meeting_state_bot:<bot_id>                    the meeting url of an attendee bot, for its webhooks
+    """
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.claim_join_script = redis_client.register_script(CLAIM_JOIN_SCRIPT)
+        self.set_state_script = redis_client.register_script(SET_STATE_SCRIPT)
+        self.release_join_script = redis_client.register_script(RELEASE_JOIN_SCRIPT)
+        self.release_meeting_script = redis_client.register_script(RELEASE_MEETING_SCRIPT)
+        self.set_if_missing_script = redis_client.register_script(SET_IF_MISSING_SCRIPT)
+
+    # Keys
+
+    def meeting_state_key(self, meeting_url):
+        return f"{MEETING_STATE_KEY}:{meeting_url}"
+
+    def bot_meeting_key(self, bot_id):
+        return f"{BOT_MEETING_KEY}:{bot_id}"
+
+    def meeting_details_key(self, bot_name, meeting_url=None):
+        # Details migrated from the old format don't have a meeting url
+        if meeting_url is None:
+            return f"{MEETING_DETAILS_KEY}:{bot_name}"
+        return f"{MEETING_DETAILS_KEY}:{bot_name}:{meeting_url}"
+
+    @staticmethod
+    def ttl_seconds(meeting_end_timestamp=None):
+        if meeting_end_timestamp is None:
+            seconds_until_end = MEETING_STATE_DEFAULT_DURATION_SECONDS
+        else:
+            seconds_until_end = max(meeting_end_timestamp - time.time(), 0)
+        return int(seconds_until_end) + MEETING_STATE_TTL_AFTER_END_SECONDS
+
+    # Meeting state
+
+    def claim_join(self, meeting_url, bot_name, meeting_end_timestamp=None):
+        """Marks the meeting as being joined by the bot, unless it's being joined already. Returns whether it was claimed."""
+        now = time.time()
+        if meeting_end_timestamp is None:
+            meeting_end_timestamp = now + MEETING_STATE_DEFAULT_DURATION_SECONDS
+        args = [bot_name, self.ttl_seconds(meeting_end_timestamp), now, JOIN_CLAIM_STALE_AFTER_SECONDS, meeting_end_timestamp, *IN_PROGRESS_STATES]
+        return bool(self.claim_join_script(keys=[self.meeting_state_key(meeting_url)], args=args))
+
+    def release_join(self, meeting_url, bot_name):
+        """Gives up a claimed join that didn't create a bot, so it can be tried again."""
+        return bool(self.release_join_script(keys=[self.meeting_state_key(meeting_url)], args=[bot_name]))
+
+    def release_meeting(self, meeting_url, bot_id):
+        """Frees the meeting once its bot has ended, unless it has been taken over by a different bot. The details are kept."""
+        self.redis_client.delete(self.bot_meeting_key(bot_id))
+        return bool(self.release_meeting_script(keys=[self.meeting_state_key(meeting_url)], args=[bot_id]))
+
+    def set_state(self, meeting_url, bot_id, state, meeting_end_timestamp=None):
+        """Records the state of the meeting's bot. Returns False if the meeting has been taken over by a different bot."""
+        # The state is missing from attendee's error responses
+        args = [bot_id, state or "unknown", time.time(), self.ttl_seconds(meeting_end_timestamp)]
+        return bool(self.set_state_script(keys=[self.meeting_state_key(meeting_url)], args=args))
+
+    def get_state(self, meeting_url):
+        return self.redis_client.hgetall(self.meeting_state_key(meeting_url)) or None
+
+    def save_bot_meeting(self, bot_id, meeting_url, meeting_end_timestamp=None):
+        self.redis_client.set(self.bot_meeting_key(bot_id), meeting_url, ex=self.ttl_seconds(meeting_end_timestamp))
+
+    def get_meeting_url_for_bot(self, bot_id):
+        return self.redis_client.get(self.bot_meeting_key(bot_id))
+
+    # Meeting details
+
+    def save_meeting_details(self, bot_name, meeting_url, title, meeting_time, user_id, meeting_end_timestamp=None):
+        key = self.meeting_details_key(bot_name, meeting_url)
+        pipeline = self.redis_client.pipeline()
+        pipeline.hset(key, mapping={"title": title, "meeting_time": meeting_time, "user_id": user_id, "meeting_url": meeting_url})
+        pipeline.expire(key, self.ttl_seconds(meeting_end_timestamp))
+        pipeline.execute()
+
+    def get_meeting_details(self, bot_name, meeting_url):
+        return self.redis_client.hgetall(self.meeting_details_key(bot_name, meeting_url)) or self.redis_client.hgetall(self.meeting_details_key(bot_name)) or None
+
+    # Migration
+
+    def migrate_legacy_keys(self):
+        """Moves the meetings out of the old single JSON document keys, and deletes those keys.
+
+        Anything already in the new keys is newer, so it's kept. Safe to run more than once.
+        """
+        migrated = {"meeting_states": 0, "meeting_details": 0}
+        ttl = self.ttl_seconds()
+
+        # Only the old format is a string, so this doesn't touch the new keys if it's run again
+        if self.redis_client.type(LEGACY_MEETING_STATES_KEY) == "string":
+            for meeting_url, state in json.loads(self.redis_client.get(LEGACY_MEETING_STATES_KEY) or "{}").items():
+                migrated["meeting_states"] += self.set_if_missing(self.meeting_state_key(meeting_url), ttl, {"state": state or "unknown", "updated_at": time.time()})
+            self.redis_client.delete(LEGACY_MEETING_STATES_KEY)
+
+        if self.redis_client.type(LEGACY_MEETING_DETAILS_KEY) == "string":
+            for bot_name, meetings in json.loads(self.redis_client.get(LEGACY_MEETING_DETAILS_KEY) or "{}").items():
+                if meetings:
+                    # The old format kept just the bot's last meeting, without its url
+                    migrated["meeting_details"] += self.set_if_missing(self.meeting_details_key(bot_name), ttl, meetings[0])
+            self.redis_client.delete(LEGACY_MEETING_DETAILS_KEY)
+
+        # Joins are deduplicated by the join scheduler and the meeting state now
+        self.redis_client.delete(LEGACY_BOT_ADDED_IN_MEETING_KEY)
+        return migrated
+
+    def set_if_missing(self, key, ttl, mapping):
+        args = [ttl]
+        for field, value in mapping.items():
+            args.extend([field, value])
+        return self.set_if_missing_script(keys=[key], args=args)
+
+
+meeting_state_store = MeetingStateStore(redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True))
+
+
+def migrate_legacy_keys_on_startup():
+    # Retry a few times in case Redis isn't ready yet
+    max_attempts = 10
+    for attempt in range(1, max_attempts + 1):
+        try:
+            migrated = meeting_state_store.migrate_legacy_keys()
+            logger.info(f"Migrated legacy meeting keys on startup: {migrated}")
+            return migrated
+        except redis.exceptions.ConnectionError as e:
+            if attempt == max_attempts:
+                logger.error(f"Failed to connect to Redis to migrate legacy meeting keys: {e}")
+                return None
+            sleep_seconds = 1 * attempt
+            logger.info(f"Redis not ready (attempt {attempt}/{max_attempts}). Retrying in {sleep_seconds}s...")
+            time.sleep(sleep_seconds)
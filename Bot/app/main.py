@@ -1,9 +1,10 @@
-import os
-import time
-import redis
 from fastapi import FastAPI
 from app.api import auth, meetings, scheduler, internal
 from app.core.scheduler import scheduler as apscheduler
+from app.core.meeting_poller import meeting_poller
+from app.core.join_worker import join_worker
+from app.core.join_scheduler import join_scheduler
+from app.core.meeting_state import migrate_legacy_keys_on_startup
 from starlette.middleware.cors import CORSMiddleware
 from app.log_config import logger
 import app.core.config as config
@@ -17,28 +18,6 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-def cleanup_redis_on_startup(redis_key):
-    REDIS_HOST = os.getenv("REDIS_HOST", "redis")
-    REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-    r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
-    # Retry a few times in case Redis isn't ready yet
-    max_attempts = 10
-    for attempt in range(1, max_attempts + 1):
-        try:
-            # ping ensures connection is established
-            r.ping()
-            r.delete(redis_key)
-            logger.info(f"Cleaned up Redis key: {redis_key} on startup.")
-            break
-        except Exception as e:
-            if attempt == max_attempts:
-                logger.error(f"Failed to connect to Redis to cleanup key '{redis_key}': {e}")
-                break
-            sleep_seconds = 1 * attempt
-            logger.info(f"Redis not ready (attempt {attempt}/{max_attempts}). Retrying in {sleep_seconds}s...")
-            time.sleep(sleep_seconds)
-
-
 @app.on_event("startup")
 def startup_event():
     if not apscheduler.running:
@@ -46,6 +25,11 @@ def startup_event():
         apscheduler.start()
     else:
         logger.info("Scheduler already running.")
+    # The scheduler's jobs only live in memory, so the joins scheduled before a restart are added back from Redis
+    try:
+        join_scheduler.restore()
+    except Exception:
+        logger.exception("Error while restoring scheduled joins on startup")
     # Fetch and cache the bot USER_ID from the session table so it's available
     # to other modules and so we log any DB connection issues at startup.
     try:
@@ -57,13 +41,35 @@ def startup_event():
     except Exception:
         logger.exception("Error while fetching USER_ID on startup")
 
+@app.on_event("startup")
+async def start_meeting_poller():
+    # The poller connects to the database in its own loop, so it keeps retrying if the database isn't up yet
+    try:
+        await meeting_poller.start()
+    except Exception:
+        logger.exception("Error while starting the meeting poller")
+
+@app.on_event("startup")
+async def start_join_worker():
+    try:
+        await join_worker.start()
+    except Exception:
+        logger.exception("Error while starting the join worker")
+
 @app.on_event("shutdown")
 def shutdown_event():
     logger.info("Shutting down scheduler...")
     apscheduler.shutdown()
 
-cleanup_redis_on_startup("meeting_states")
-cleanup_redis_on_startup("bot_added_in_meeting")
+@app.on_event("shutdown")
+async def stop_meeting_poller():
+    await meeting_poller.stop()
+
+@app.on_event("shutdown")
+async def stop_join_worker():
+    await join_worker.stop()
+
+migrate_legacy_keys_on_startup()
 
 app.include_router(auth.router)
 app.include_router(meetings.router)
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# Moves the meetings out of the old meeting_states and meeting_details JSON keys, into their own keys.
+# The app does this on startup, see app/core/meeting_state.py.
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from app.core.meeting_state import meeting_state_store  # noqa: E402
+
+
+# Entry point
+if __name__ == "__main__":
+    print(meeting_state_store.migrate_legacy_keys())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Races many threads through the meeting state updates against the Redis in REDIS_HOST,
+# and checks that none of the updates were lost. The keys it makes are deleted afterwards.
+#
+#   python stress_meeting_state.py [threads] [meetings]
+
+import sys
+import threading
+from uuid import uuid4
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from app.core.meeting_state import meeting_state_store  # noqa: E402
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        barrier.wait()
+        results[index] = target(index)
+
+    threads = [threading.Thread(target=run, args=[index]) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main(thread_count=50, meeting_count=20):
+    run_id = uuid4().hex[:8]
+    meeting_urls = [f"https://meet.google.com/stress-{run_id}-{index}" for index in range(meeting_count)]
+    bot_name = f"stress-bot-{run_id}"
+    failures = []
+
+    try:
+        # Every thread tries to join every meeting, and only one may win each
+        for meeting_url in meeting_urls:
+            claims = run_threads(thread_count, lambda index: meeting_state_store.claim_join(meeting_url, f"{bot_name}-{index}"))
+            if claims.count(True) != 1:
+                failures.append(f"{meeting_url} was claimed {claims.count(True)} times")
+
+        # Once a bot has been recorded for a meeting, other bots can't overwrite its state
+        for meeting_url in meeting_urls:
+            updates = run_threads(thread_count, lambda index: meeting_state_store.set_state(meeting_url, f"bot_{index}", "joining"))
+            winner = meeting_state_store.get_state(meeting_url)["bot_id"]
+            if updates.count(True) != 1 or not updates[int(winner.split("_")[1])]:
+                failures.append(f"{meeting_url} state was set by {updates.count(True)} bots")
+
+        # The same bot's meetings are saved at once, and none of them are lost
+        run_threads(
+            meeting_count,
+            lambda index: meeting_state_store.save_meeting_details(bot_name, meeting_urls[index], f"Meeting {index}", "2025-01-01T10:00:00", "user"),
+        )
+        for index, meeting_url in enumerate(meeting_urls):
+            details = meeting_state_store.get_meeting_details(bot_name, meeting_url)
+            if not details or details["title"] != f"Meeting {index}":
+                failures.append(f"Details of {meeting_url} were lost")
+    finally:
+        keys = [meeting_state_store.meeting_state_key(meeting_url) for meeting_url in meeting_urls]
+        keys += [meeting_state_store.meeting_details_key(bot_name, meeting_url) for meeting_url in meeting_urls]
+        meeting_state_store.redis_client.delete(*keys)
+
+    for failure in failures:
+        print(failure)
+    print(f"{thread_count} threads, {meeting_count} meetings: {'FAILED' if failures else 'OK'}")
+    return 1 if failures else 0
+
+
+# Entry point
+if __name__ == "__main__":
+    sys.exit(main(*[int(argument) for argument in sys.argv[1:3]]))
@@ -228,10 +228,30 @@ else:
     RECORDING_STORAGE_BACKEND = copy.deepcopy(DEFAULT_STORAGE_BACKEND)
     RECORDING_STORAGE_BACKEND["OPTIONS"]["bucket_name"] = AWS_RECORDING_STORAGE_BUCKET_NAME
 
+# Where the raw per participant audio chunks are stored. "database" keeps them in the audio_chunk table,
+# "object_storage" uses the s3 / azure storage selected by STORAGE_PROTOCOL and "local" uses the filesystem
+AUDIO_CHUNK_STORAGE = os.getenv("AUDIO_CHUNK_STORAGE", "database")
+# Codec the audio chunks are compressed with before they are written to storage. One of "flac", "opus" or "pcm"
+AUDIO_CHUNK_STORAGE_CODEC = os.getenv("AUDIO_CHUNK_STORAGE_CODEC", "flac")
+
+if AUDIO_CHUNK_STORAGE == "local":
+    AUDIO_CHUNK_STORAGE_BACKEND = {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {
+            "location": os.getenv("AUDIO_CHUNK_STORAGE_LOCAL_PATH", os.path.join(BASE_DIR, "audio_chunks")),
+        },
+    }
+elif STORAGE_PROTOCOL == "azure":
+    AUDIO_CHUNK_STORAGE_BACKEND = copy.deepcopy(DEFAULT_STORAGE_BACKEND)
+    AUDIO_CHUNK_STORAGE_BACKEND["OPTIONS"]["azure_container"] = os.getenv("AZURE_AUDIO_CHUNK_STORAGE_CONTAINER_NAME", AZURE_RECORDING_STORAGE_CONTAINER_NAME)
+else:
+    AUDIO_CHUNK_STORAGE_BACKEND = copy.deepcopy(DEFAULT_STORAGE_BACKEND)
+    AUDIO_CHUNK_STORAGE_BACKEND["OPTIONS"]["bucket_name"] = os.getenv("AWS_AUDIO_CHUNK_STORAGE_BUCKET_NAME", AWS_RECORDING_STORAGE_BUCKET_NAME)
 
 STORAGES = {
     "default": DEFAULT_STORAGE_BACKEND,
     "recordings": RECORDING_STORAGE_BACKEND,
+    "audio_chunks": AUDIO_CHUNK_STORAGE_BACKEND,
     "bot_debug_screenshots": RECORDING_STORAGE_BACKEND,
     "staticfiles": {
         "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
@@ -0,0 +1,136 @@
+import logging
+import os
+
+from django.db import transaction
+
+from bots.models import AsyncTranscription, PendingUtteranceManager, TranscriptionProviders, Utterance
+from bots.transcription_dispatcher import get_transcription_dispatcher, transcription_dispatcher_enabled
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTranscriptionPlanner:
+    """
+    Plans the transcription of a recording's utterances for an async transcription, and sends them to be transcribed
+    a window at a time. At most max_in_flight utterances are being transcribed at once; each time one of them finishes,
+    the next ones in the plan are sent, so the transcription neither floods the workers nor waits on fixed delays.
+
+    The plan is the transcription's utterances in id order. They're created in timestamp order, so the plan follows
+    the recording. The transcription's utterance_count, dispatched_utterance_count and last_dispatched_utterance_id
+    track how far through the plan it has got, and are only changed here, with the transcription locked.
+
+    For providers that can transcribe joined audio (see process_utterance_batch), consecutive utterances from the same
+    participant are sent together as one request.
+    """
+
+    DEFAULT_MAX_IN_FLIGHT = 10
+    # Merged requests are kept short, so one failure doesn't cost much and the words split back out cleanly
+    MAX_MERGED_UTTERANCES = 8
+    MAX_MERGED_DURATION_MS = 30000
+    # Longer utterances aren't worth merging, see TranscriptionMicroBatcher
+    MAX_MERGED_UTTERANCE_DURATION_MS = 5000
+    MERGEABLE_TRANSCRIPTION_PROVIDERS = [TranscriptionProviders.DEEPGRAM]
+
+    def __init__(self, async_transcription):
+        self.async_transcription = async_transcription
+
+    # Limits. These can be set for every provider, or for a single provider, e.g. ASYNC_TRANSCRIPTION_DEEPGRAM_MAX_IN_FLIGHT
+
+    def get_max_in_flight(self, transcription_provider):
+        provider_name = TranscriptionProviders(transcription_provider).name if transcription_provider else None
+        value = (provider_name and os.getenv(f"ASYNC_TRANSCRIPTION_{provider_name}_MAX_IN_FLIGHT")) or os.getenv("ASYNC_TRANSCRIPTION_MAX_IN_FLIGHT")
+        return max(1, int(value)) if value else self.DEFAULT_MAX_IN_FLIGHT
+
+    # Planning
+
+    def create_utterances(self):
+        recording = self.async_transcription.recording
+
+        # They're all counted as pending before any are transcribed, so the transcription can't look finished part way through.
+        utterances = Utterance.objects.bulk_create(
+            [
+                Utterance(
+                    source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
+                    recording=recording,
+                    async_transcription=self.async_transcription,
+                    participant_id=audio_chunk.participant_id,
+                    audio_chunk=audio_chunk,
+                    timestamp_ms=audio_chunk.timestamp_ms,
+                    duration_ms=audio_chunk.duration_ms,
+                )
+                for audio_chunk in recording.audio_chunks.order_by("timestamp_ms", "id").defer("audio_blob")
+            ]
+        )
+        PendingUtteranceManager.add_pending_utterances(utterances)
+        AsyncTranscription.objects.filter(id=self.async_transcription.id).update(utterance_count=len(utterances))
+        logger.info(f"Planned {len(utterances)} utterances for async transcription {self.async_transcription.id}")
+        return utterances
+
+    # Dispatching
+
+    def dispatch_next(self):
+        """Sends the next utterances in the plan, as many as there's room for in the window. Returns how many were sent."""
+        max_in_flight = self.get_max_in_flight(self.async_transcription.transcription_provider)
+
+        with transaction.atomic():
+            # Lock the transcription, so that utterances finishing at the same time don't send the same ones twice
+            async_transcription = AsyncTranscription.objects.select_for_update().get(id=self.async_transcription.id)
+            finished_utterance_count = async_transcription.utterance_count - async_transcription.pending_utterance_count
+            in_flight_utterance_count = async_transcription.dispatched_utterance_count - finished_utterance_count
+            available_slots = max_in_flight - in_flight_utterance_count
+            if available_slots <= 0:
+                return 0
+
+            utterances = async_transcription.utterances.order_by("id").only("id", "participant_id", "duration_ms")
+            if async_transcription.last_dispatched_utterance_id is not None:
+                utterances = utterances.filter(id__gt=async_transcription.last_dispatched_utterance_id)
+            utterances = list(utterances[:available_slots])
+            if not utterances:
+                return 0
+
+            AsyncTranscription.objects.filter(id=async_transcription.id).update(
+                dispatched_utterance_count=async_transcription.dispatched_utterance_count + len(utterances),
+                last_dispatched_utterance_id=utterances[-1].id,
+            )
+
+        # Only send them once the transaction has committed, so the planner's position is saved before any of them can finish
+        for utterance_group in self.group_utterances(utterances, async_transcription.transcription_provider):
+            self.dispatch_utterance_group(utterance_group)
+        return len(utterances)
+
+    def group_utterances(self, utterances, transcription_provider):
+        if transcription_provider not in self.MERGEABLE_TRANSCRIPTION_PROVIDERS:
+            return [[utterance] for utterance in utterances]
+
+        groups = []
+        for utterance in utterances:
+            current_group = groups[-1] if groups else None
+            if current_group and self.can_merge(current_group, utterance):
+                current_group.append(utterance)
+            else:
+                groups.append([utterance])
+        return groups
+
+    def can_merge(self, group, utterance):
+        if utterance.duration_ms > self.MAX_MERGED_UTTERANCE_DURATION_MS or group[-1].duration_ms > self.MAX_MERGED_UTTERANCE_DURATION_MS:
+            return False
+        if utterance.participant_id != group[-1].participant_id:
+            return False
+        if len(group) >= self.MAX_MERGED_UTTERANCES:
+            return False
+        return sum(grouped_utterance.duration_ms for grouped_utterance in group) + utterance.duration_ms <= self.MAX_MERGED_DURATION_MS
+
+    def dispatch_utterance_group(self, utterances):
+        from bots.tasks.process_utterance_batch_task import process_utterance_batch
+        from bots.tasks.process_utterance_task import process_utterance
+
+        if len(utterances) > 1:
+            process_utterance_batch.delay([utterance.id for utterance in utterances])
+            return
+
+        # With the transcription dispatcher, the utterance waits in its queue behind any live meetings' utterances
+        if transcription_dispatcher_enabled():
+            get_transcription_dispatcher().enqueue_utterance(Utterance.objects.select_related("recording__bot", "async_transcription").get(id=utterances[0].id))
+            return
+
+        process_utterance.delay(utterances[0].id)
@@ -14,6 +14,7 @@ class AudioOutputManager:
         currently_playing_audio_media_request_finished_callback,
         play_raw_audio_callback,
         sleep_time_between_chunks_seconds,
+        get_credentials_callback=None,
     ):
         self.currently_playing_audio_media_request = None
         self.currently_playing_audio_media_request_started_at = None
@@ -24,6 +25,7 @@ class AudioOutputManager:
         self.audio_thread = None
         self.stop_audio_thread = False
         self.sleep_time_between_chunks_seconds = sleep_time_between_chunks_seconds
+        self.get_credentials_callback = get_credentials_callback
 
     def _play_audio_chunks(self, audio_data, chunk_size):
         for i in range(0, len(audio_data), chunk_size):
@@ -55,6 +57,7 @@ class AudioOutputManager:
                 settings=audio_media_request.text_to_speech_settings,
                 sample_rate=self.SAMPLE_RATE,
                 bot=audio_media_request.bot,
+                get_credentials_callback=self.get_credentials_callback,
             )
             self.currently_playing_audio_media_request_raw_audio_pcm_bytes = audio_blob
             self.currently_playing_audio_media_request_duration_ms = duration_ms
@@ -0,0 +1,109 @@
+import threading
+
+from bots.models import Participant, RecordingManager
+
+
+class BotCache:
+    """
+    Keeps the rows a bot keeps looking up during a meeting, so the main loop doesn't query the database for them on every
+    caption, audio chunk or chat message.
+
+    - Participants are kept for the whole meeting, because they're only ever created.
+    - The recording in progress only changes when the bot changes state, so it's reloaded whenever the bot's state is different from when it was cached.
+    - Credentials and the default recording are kept until invalidate() is called, which the bot controller does whenever it reloads the bot.
+
+    It's used from the main loop and from the utterance batch writer's thread.
+    """
+
+    NOT_CACHED = object()
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.lock = threading.Lock()
+
+        self.participants = {}
+        self.credentials_records = {}
+        self.credentials = {}
+        self.default_recording = None
+        self.recording_in_progress = self.NOT_CACHED
+        self.recording_in_progress_bot_state = None
+
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+        }
+
+    def record_lookup(self, hit):
+        with self.lock:
+            self.metrics["hits" if hit else "misses"] += 1
+
+    def get_metrics(self):
+        with self.lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            return {**self.metrics, "hit_rate": round(self.metrics["hits"] / lookups, 3) if lookups else None}
+
+    def invalidate(self):
+        with self.lock:
+            self.credentials_records = {}
+            self.credentials = {}
+            self.default_recording = None
+            self.recording_in_progress = self.NOT_CACHED
+            self.metrics["invalidations"] += 1
+
+    def get_participant(self, uuid, defaults):
+        with self.lock:
+            participant = self.participants.get(uuid)
+        self.record_lookup(participant is not None)
+        if participant is None:
+            participant, _ = Participant.objects.get_or_create(bot=self.bot, uuid=uuid, defaults=defaults)
+            with self.lock:
+                # Another thread may have cached the participant in the meantime, everyone should get the same object
+                participant = self.participants.setdefault(uuid, participant)
+        return participant
+
+    def get_recording_in_progress(self):
+        with self.lock:
+            bot_state = self.bot.state
+            recording_in_progress = self.recording_in_progress if self.recording_in_progress_bot_state == bot_state else self.NOT_CACHED
+        self.record_lookup(recording_in_progress is not self.NOT_CACHED)
+        if recording_in_progress is self.NOT_CACHED:
+            recording_in_progress = RecordingManager.get_recording_in_progress(self.bot)
+            with self.lock:
+                self.recording_in_progress = recording_in_progress
+                self.recording_in_progress_bot_state = bot_state
+        return recording_in_progress
+
+    def get_default_recording(self):
+        with self.lock:
+            default_recording = self.default_recording
+        self.record_lookup(default_recording is not None)
+        if default_recording is None:
+            default_recording = self.bot.recordings.get(is_default_recording=True)
+            with self.lock:
+                self.default_recording = default_recording
+        return default_recording
+
+    def get_credentials_record(self, credential_type):
+        with self.lock:
+            credentials_record = self.credentials_records.get(credential_type, self.NOT_CACHED)
+        self.record_lookup(credentials_record is not self.NOT_CACHED)
+        if credentials_record is self.NOT_CACHED:
+            credentials_record = self.bot.project.credentials.filter(credential_type=credential_type).first()
+            with self.lock:
+                self.credentials_records[credential_type] = credentials_record
+        return credentials_record
+
+    def get_credentials(self, credential_type):
+        """Returns the decrypted credentials of the given type, or None if the project doesn't have any. Decrypting them is the slow part, so that's cached too."""
+        with self.lock:
+            credentials = self.credentials.get(credential_type, self.NOT_CACHED)
+        if credentials is not self.NOT_CACHED:
+            self.record_lookup(True)
+            return credentials
+
+        credentials_record = self.get_credentials_record(credential_type)
+        credentials = credentials_record.get_credentials() if credentials_record else None
+        with self.lock:
+            self.credentials[credential_type] = credentials
+        return credentials
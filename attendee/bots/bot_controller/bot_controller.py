@@ -21,7 +21,6 @@ from bots.bots_api_utils import BotCreationSource
 from bots.external_callback_utils import get_zoom_tokens
 from bots.meeting_url_utils import meeting_type_from_url
 from bots.models import (
-    AudioChunk,
     Bot,
     BotChatMessageRequestManager,
     BotChatMessageRequestStates,
@@ -37,34 +36,41 @@ from bots.models import (
     ChatMessageToOptions,
     Credentials,
     MeetingTypes,
-    Participant,
     ParticipantEvent,
     RealtimeTriggerTypes,
-    Recording,
     RecordingFormats,
     RecordingManager,
+    RecordingTranscriptionStates,
     RecordingTypes,
     TranscriptionProviders,
     Utterance,
     WebhookTriggerTypes,
 )
+from bots.transcription_dispatcher import TranscriptionDispatcher, get_transcription_dispatcher, transcription_dispatcher_enabled
 from bots.webhook_payloads import chat_message_webhook_payload, participant_event_webhook_payload, utterance_webhook_payload
 from bots.webhook_utils import trigger_webhook
 from bots.websocket_payloads import mixed_audio_websocket_payload
 
 from .audio_output_manager import AudioOutputManager
 from .azure_file_uploader import AzureFileUploader
+from .bot_cache import BotCache
+from .bot_instrumentation import BotInstrumentation, get_bot_metrics_port
 from .bot_resource_snapshot_taker import BotResourceSnapshotTaker
 from .closed_caption_manager import ClosedCaptionManager
 from .grouped_closed_caption_manager import GroupedClosedCaptionManager
 from .gstreamer_pipeline import GstreamerPipeline
+from .latency_histogram import LatencyHistogram
 from .per_participant_non_streaming_audio_input_manager import PerParticipantNonStreamingAudioInputManager
 from .per_participant_streaming_audio_input_manager import PerParticipantStreamingAudioInputManager
+from .persistence_worker import PersistenceWorker
 from .pipeline_configuration import PipelineConfiguration
 from .realtime_audio_output_manager import RealtimeAudioOutputManager
 from .rtmp_client import RTMPClient
 from .s3_file_uploader import S3FileUploader
 from .screen_and_audio_recorder import ScreenAndAudioRecorder
+from .streaming_uploader import StreamingUploader, StreamingUploadPartTracker
+from .transcription_micro_batcher import TranscriptionMicroBatcher
+from .utterance_batch_writer import UtteranceBatchWriter
 from .video_output_manager import VideoOutputManager
 # from .file_uploader import FileUploader
 import requests
@@ -87,40 +93,43 @@ class BotController:
     # Default wait time for utterance termination (5 minutes)
     UTTERANCE_TERMINATION_WAIT_TIME_SECONDS = 300
 
-    def get_meeting_detials(self, bot_name):
-        meetings_map = {}
-        json_str = redis_client.get(MEETING_DETAILS_KEY)
-        if json_str:
-            meetings_map = json.loads(json_str)
+    def get_meeting_detials(self, bot_name, meeting_url):
+        # Each of the bot's meetings has its own hash. The bot wide one holds details migrated from the old single JSON key, which had no meeting url.
+        return redis_client.hgetall(f"{MEETING_DETAILS_KEY}:{bot_name}:{meeting_url}") or redis_client.hgetall(f"{MEETING_DETAILS_KEY}:{bot_name}") or None
 
-        return meetings_map.get(bot_name)
-
-    def call_lingo_callback(self, file_key):
+    def call_lingo_callback(self, file_keys):
         url = os.environ.get('LINGO_BOT_URL') + "/meetings/call-to-lingo"
-        data = self.get_meeting_detials(self.bot_in_db.name)
-        item = data[0]  # get the first dictionary
+        item = self.get_meeting_detials(self.bot_in_db.name, self.bot_in_db.meeting_url)
+        if not item:
+            logger.warning(f"No meeting details found for bot {self.bot_in_db.name} in {self.bot_in_db.meeting_url}, not calling Lingo")
+            return
         title = item['title']
         user_id = item['user_id']
         date = item['meeting_time'].split('T')[0]  # take only the date part
 
         meeting_details_str = f"{title}_{date}"
-        payload = {"key": f"s3://{os.environ.get('AWS_RECORDING_STORAGE_BUCKET_NAME')}/{file_key}", "meeting_details": meeting_details_str, "user_id": user_id}
+        payloads = []
+        # A recording split by bot restarts is sent a part at a time
+        for index, file_key in enumerate(file_keys):
+            meeting_details = meeting_details_str if len(file_keys) == 1 else f"{meeting_details_str}_part{index + 1}"
+            payloads.append({"key": f"s3://{os.environ.get('AWS_RECORDING_STORAGE_BUCKET_NAME')}/{file_key}", "meeting_details": meeting_details, "user_id": user_id})
         
         def send_request():
-            try:
-                response = requests.post(url, json=payload)  # Optional timeout
-                if response.status_code == 200:
-                    logger.info("Callback received successfully.")
-                else:
-                    logger.info(f"Failed to get callback. Status code: {response.status_code}, Response: {response.text}")
-            except Exception as e:
-                logger.info(f"Failed to send callback: {e}")
+            for payload in payloads:
+                try:
+                    response = requests.post(url, json=payload)  # Optional timeout
+                    if response.status_code == 200:
+                        logger.info("Callback received successfully.")
+                    else:
+                        logger.info(f"Failed to get callback. Status code: {response.status_code}, Response: {response.text}")
+                except Exception as e:
+                    logger.info(f"Failed to send callback: {e}")
 
         # Fire and forget
         threading.Thread(target=send_request, daemon=True).start()
     
     def per_participant_audio_input_manager(self):
-        if self.bot_in_db.transcription_settings.deepgram_use_streaming():
+        if self.bot_in_db.transcription_settings.use_streaming(self.get_recording_transcription_provider()):
             return self.per_participant_streaming_audio_input_manager
         else:
             return self.per_participant_non_streaming_audio_input_manager
@@ -168,6 +177,7 @@ class BotController:
             video_frame_size=self.bot_in_db.recording_dimensions(),
             record_chat_messages_when_paused=self.bot_in_db.record_chat_messages_when_paused(),
             disable_incoming_video=self.disable_incoming_video_for_web_bots(),
+            record_websocket_message_callback=self.instrumentation.record_message,
         )
 
     def get_teams_bot_adapter(self):
@@ -178,8 +188,6 @@ class BotController:
         else:
             add_audio_chunk_callback = None
 
-        teams_bot_login_credentials = self.bot_in_db.project.credentials.filter(credential_type=Credentials.CredentialTypes.TEAMS_BOT_LOGIN).first()
-
         return TeamsBotAdapter(
             display_name=self.bot_in_db.name,
             send_message_callback=self.on_message_from_adapter,
@@ -201,17 +209,17 @@ class BotController:
             start_recording_screen_callback=self.screen_and_audio_recorder.start_recording if self.screen_and_audio_recorder else None,
             stop_recording_screen_callback=self.screen_and_audio_recorder.stop_recording if self.screen_and_audio_recorder else None,
             video_frame_size=self.bot_in_db.recording_dimensions(),
-            teams_bot_login_credentials=teams_bot_login_credentials.get_credentials() if teams_bot_login_credentials and self.bot_in_db.teams_use_bot_login() else None,
+            teams_bot_login_credentials=self.bot_cache.get_credentials(Credentials.CredentialTypes.TEAMS_BOT_LOGIN) if self.bot_in_db.teams_use_bot_login() else None,
             record_chat_messages_when_paused=self.bot_in_db.record_chat_messages_when_paused(),
             disable_incoming_video=self.disable_incoming_video_for_web_bots(),
+            record_websocket_message_callback=self.instrumentation.record_message,
         )
 
     def get_zoom_oauth_credentials(self):
-        zoom_oauth_credentials_record = self.bot_in_db.project.credentials.filter(credential_type=Credentials.CredentialTypes.ZOOM_OAUTH).first()
-        if not zoom_oauth_credentials_record:
+        if not self.bot_cache.get_credentials_record(Credentials.CredentialTypes.ZOOM_OAUTH):
             raise Exception("Zoom OAuth credentials not found")
 
-        zoom_oauth_credentials = zoom_oauth_credentials_record.get_credentials()
+        zoom_oauth_credentials = self.bot_cache.get_credentials(Credentials.CredentialTypes.ZOOM_OAUTH)
         if not zoom_oauth_credentials:
             raise Exception("Zoom OAuth credentials data not found")
 
@@ -257,6 +265,7 @@ class BotController:
             should_ask_for_recording_permission=self.pipeline_configuration.record_audio or self.pipeline_configuration.rtmp_stream_audio or self.pipeline_configuration.websocket_stream_audio or self.pipeline_configuration.record_video or self.pipeline_configuration.rtmp_stream_video,
             record_chat_messages_when_paused=self.bot_in_db.record_chat_messages_when_paused(),
             disable_incoming_video=self.disable_incoming_video_for_web_bots(),
+            record_websocket_message_callback=self.instrumentation.record_message,
             zoom_tokens=zoom_tokens,
         )
 
@@ -390,24 +399,26 @@ class BotController:
                 return None
             return int(self.gstreamer_pipeline.start_time_ns / 1_000_000) + self.adapter.get_first_buffer_timestamp_ms_offset()
 
-    def recording_file_saved(self, s3_storage_key):
-        recording = Recording.objects.get(bot=self.bot_in_db, is_default_recording=True)
-        recording.file = s3_storage_key
+    def recording_file_saved(self, s3_storage_keys):
+        recording = self.bot_cache.get_default_recording()
+        # The cached recording's state may be out of date, and saving it would overwrite the newer one
+        recording.refresh_from_db()
+        recording.file = s3_storage_keys[0]
+        recording.file_segments = s3_storage_keys if len(s3_storage_keys) > 1 else []
         recording.first_buffer_timestamp_ms = self.get_first_buffer_timestamp_ms()
         recording.save()
 
     def get_recording_transcription_provider(self):
-        recording = Recording.objects.get(bot=self.bot_in_db, is_default_recording=True)
+        recording = self.bot_cache.get_default_recording()
         return recording.transcription_provider
 
     def get_recording_filename(self):
-        recording = Recording.objects.get(bot=self.bot_in_db, is_default_recording=True)
+        recording = self.bot_cache.get_default_recording()
         return f"{self.bot_in_db.object_id}-{recording.object_id}.{self.bot_in_db.recording_format()}"
 
     def on_rtmp_connection_failed(self):
         logger.info("RTMP connection failed")
-        BotEventManager.create_event(
-            bot=self.bot_in_db,
+        self.create_event_after_queued_writes(
             event_type=BotEventTypes.FATAL_ERROR,
             event_sub_type=BotEventSubTypes.FATAL_ERROR_RTMP_CONNECTION_FAILED,
             event_metadata={"rtmp_destination_url": self.bot_in_db.rtmp_destination_url()},
@@ -420,19 +431,33 @@ class BotController:
             write_succeeded = self.rtmp_client.write_data(data)
             if not write_succeeded:
                 GLib.idle_add(lambda: self.on_rtmp_connection_failed())
+        elif self.streaming_uploader:
+            self.streaming_uploader.upload_part(data)
         else:
-            raise Exception("No rtmp client found")
+            raise Exception("No rtmp client or streaming uploader found")
+
+    def should_stream_recording_upload(self):
+        return self.get_recording_file_location() is not None and self.bot_in_db.stream_recording_upload()
+
+    def create_streaming_uploader(self):
+        bucket = settings.AWS_RECORDING_STORAGE_BUCKET_NAME
+        key = self.get_recording_filename()
+        # The tracker gets its own connection, because the pubsub connection can be torn down and recreated
+        part_tracker = StreamingUploadPartTracker(redis_client=redis.from_url(self.get_redis_url()), bucket=bucket, key=key)
+        streaming_uploader = StreamingUploader(bucket=bucket, key=key, part_tracker=part_tracker, spool_file_path=self.get_recording_file_location())
+        streaming_uploader.start_upload()
+        logger.info(f"Streaming recording upload started for {key} (upload id {streaming_uploader.upload_id})")
+        return streaming_uploader
 
     def upload_recording_to_external_media_storage_if_enabled(self):
         if not self.bot_in_db.external_media_storage_bucket_name():
             return
 
-        external_media_storage_credentials_record = self.bot_in_db.project.credentials.filter(credential_type=Credentials.CredentialTypes.EXTERNAL_MEDIA_STORAGE).first()
-        if not external_media_storage_credentials_record:
+        if not self.bot_cache.get_credentials_record(Credentials.CredentialTypes.EXTERNAL_MEDIA_STORAGE):
             logger.error(f"No external media storage credentials found for bot {self.bot_in_db.id}")
             return
 
-        external_media_storage_credentials = external_media_storage_credentials_record.get_credentials()
+        external_media_storage_credentials = self.bot_cache.get_credentials(Credentials.CredentialTypes.EXTERNAL_MEDIA_STORAGE)
         if not external_media_storage_credentials:
             logger.error(f"External media storage credentials data not found for bot {self.bot_in_db.id}")
             return
@@ -520,7 +545,33 @@ class BotController:
             logger.info("Telling websocket audio client to cleanup...")
             self.websocket_audio_client.cleanup()
 
-        if self.get_recording_file_location():
+        if self.utterance_batch_writer:
+            logger.info("Telling utterance batch writer to cleanup...")
+            self.utterance_batch_writer.cleanup()
+
+        if self.transcription_micro_batcher:
+            logger.info("Telling transcription micro batcher to flush...")
+            self.transcription_micro_batcher.flush()
+
+        if self.per_participant_streaming_audio_input_manager:
+            logger.info("Telling per participant streaming audio input manager to cleanup...")
+            self.per_participant_streaming_audio_input_manager.cleanup()
+
+        # After everything that hands it writes, and before anything that needs them to have happened
+        if self.persistence_worker:
+            logger.info("Telling persistence worker to cleanup...")
+            self.persistence_worker.cleanup()
+            # The worker may have moved the bot to a new state, and the main loop won't be around to hear about it
+            self.bot_in_db.refresh_from_db()
+
+        self.instrumentation.cleanup()
+
+        if self.streaming_uploader:
+            file_keys = self.complete_streaming_upload()
+            if file_keys:
+                self.call_lingo_callback(file_keys)
+                self.recording_file_saved(file_keys)
+        elif self.get_recording_file_location():
             self.upload_recording_to_external_media_storage_if_enabled()
             
             file_key = self.get_recording_filename()
@@ -539,8 +590,8 @@ class BotController:
             logger.info("File uploader finished uploading file")
             file_uploader.delete_file(self.get_recording_file_location())
             logger.info("File uploader deleted file from local filesystem")
-            self.call_lingo_callback(file_key)
-            self.recording_file_saved(file_key)
+            self.call_lingo_callback([file_key])
+            self.recording_file_saved([file_key])
 
         if self.bot_in_db.create_debug_recording():
             self.save_debug_recording()
@@ -551,27 +602,66 @@ class BotController:
 
         normal_quitting_process_worked = True
 
+    def complete_streaming_upload(self):
+        """Completes the streaming upload, falling back to uploading the local copy of the recording if it fails.
+
+        Returns the keys of the recording's files in order. If the bot was restarted, the earlier processes' recordings went to keys of their own."""
+        # The recording has been uploaded as it was produced, so we only need to flush the last part
+        file_key = self.streaming_uploader.key
+        spool_file_path = self.streaming_uploader.spool_file_path
+        logger.info("Telling streaming uploader to complete the upload...")
+        try:
+            self.streaming_uploader.complete_upload()
+            logger.info(f"Streaming uploader finished uploading {self.streaming_uploader.bytes_uploaded()} bytes")
+        except Exception as e:
+            logger.exception(f"Streaming upload of {file_key} failed, uploading the local copy of the recording instead: {e}")
+            if not spool_file_path or not os.path.exists(spool_file_path):
+                logger.error(f"No local copy of the recording at {spool_file_path}, {file_key} is lost")
+                return self.streaming_uploader.previous_keys
+            try:
+                file_uploader = S3FileUploader(bucket=self.streaming_uploader.bucket, filename=file_key, endpoint_url=os.environ.get("AWS_ENDPOINT_URL"))
+                upload_results = []
+                file_uploader.upload_file(spool_file_path, callback=upload_results.append)
+                file_uploader.wait_for_upload()
+            except Exception as e:
+                logger.exception(f"Failed to upload the local copy of the recording to {file_key}: {e}")
+                upload_results = []
+            if upload_results != [True]:
+                # The local copy and the upload state are kept, so the recording can still be recovered
+                return self.streaming_uploader.previous_keys
+            logger.info(f"Uploaded the local copy of the recording to {file_key}")
+            self.streaming_uploader.abort_upload()
+
+        if spool_file_path and os.path.exists(spool_file_path):
+            os.remove(spool_file_path)
+        if self.streaming_uploader.previous_keys:
+            logger.info(f"The recording was split by bot restarts, the earlier parts are in {self.streaming_uploader.previous_keys}")
+        return self.streaming_uploader.previous_keys + [file_key]
+
     # We're going to wait until all utterances are transcribed or have failed. If there are still
     # in progress utterances, after 5 minutes, then we'll consider them failed and mark them as timed out.
     def wait_until_all_utterances_are_terminated(self):
-        default_recording = self.bot_in_db.recordings.get(is_default_recording=True)
+        default_recording = self.bot_cache.get_default_recording()
 
         start_time = time.time()
         wait_time_seconds = self.UTTERANCE_TERMINATION_WAIT_TIME_SECONDS
         while time.time() - start_time < wait_time_seconds:
-            in_progress_utterances = default_recording.utterances.filter(transcription__isnull=True, failure_data__isnull=True)
+            # Reading the recording's pending utterance count is a single row lookup, so it can be checked often
+            default_recording.refresh_from_db(fields=["pending_utterance_count"])
             # If no more in progress utterances, then we're done
-            if not in_progress_utterances.exists():
+            if default_recording.pending_utterance_count == 0:
                 logger.info(f"All utterances are terminated for bot {self.bot_in_db.id}")
                 return
 
-            logger.info(f"Waiting for {len(in_progress_utterances)} utterances to terminate. It has been {time.time() - start_time} seconds. We will wait {wait_time_seconds} seconds.")
-            time.sleep(5)
+            logger.info(f"Waiting for {default_recording.pending_utterance_count} utterances to terminate. It has been {time.time() - start_time} seconds. We will wait {wait_time_seconds} seconds.")
+            time.sleep(1)
 
         logger.info(f"Timed out in post-processing waiting for utterances to terminate for bot {self.bot_in_db.id}. Transcription will be marked as failed because recording terminated.")
 
     def __init__(self, bot_id):
         self.bot_in_db = Bot.objects.get(id=bot_id)
+        self.bot_cache = BotCache(self.bot_in_db)
+        self.instrumentation = BotInstrumentation()
         self.cleanup_called = False
         self.run_called = False
 
@@ -609,6 +699,8 @@ class BotController:
     def get_gstreamer_sink_type(self):
         if self.pipeline_configuration.rtmp_stream_audio or self.pipeline_configuration.rtmp_stream_video:
             return GstreamerPipeline.SINK_TYPE_APPSINK
+        elif self.should_stream_recording_upload():
+            return GstreamerPipeline.SINK_TYPE_APPSINK
         else:
             return GstreamerPipeline.SINK_TYPE_FILE
 
@@ -659,6 +751,9 @@ class BotController:
 
         return not self.should_create_gstreamer_pipeline()
 
+    def get_redis_url(self):
+        return os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+
     def connect_to_redis(self):
         # Close both pubsub and client if they exist
         if self.pubsub:
@@ -666,8 +761,7 @@ class BotController:
         if self.redis_client:
             self.redis_client.close()
 
-        redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
-        self.redis_client = redis.from_url(redis_url)
+        self.redis_client = redis.from_url(self.get_redis_url())
         self.pubsub = self.redis_client.pubsub()
         self.pubsub.subscribe(self.pubsub_channel)
         logger.info(f"Redis connection established for bot {self.bot_in_db.id}")
@@ -693,6 +787,20 @@ class BotController:
 
         self.connect_to_redis()
 
+        self.transcription_micro_batcher = self.create_transcription_micro_batcher()
+
+        # The main loop hands its database writes to this, so it never waits on the database
+        self.persistence_worker = PersistenceWorker(name="persistence_worker", max_queue_size=self.get_persistence_worker_max_queue_size(), block_timeout_seconds=self.get_persistence_worker_block_timeout_seconds())
+        self.main_loop_tick_histogram = LatencyHistogram()
+
+        self.utterance_batch_writer = UtteranceBatchWriter(
+            bot=self.bot_in_db,
+            save_utterances=self.save_utterances_for_individual_audio_chunks(),
+            on_utterances_created_callback=self.dispatch_utterances_for_transcription,
+            flush_interval_seconds=self.get_utterance_batch_writer_flush_interval_seconds(),
+            max_batch_size=self.get_utterance_batch_writer_max_batch_size(),
+        )
+
         # Initialize core objects
         # Only used for adapters that can provide per-participant audio
 
@@ -709,17 +817,18 @@ class BotController:
             sample_rate=self.get_per_participant_audio_sample_rate(),
             transcription_provider=self.get_recording_transcription_provider(),
             bot=self.bot_in_db,
+            save_transcription_result_callback=self.save_streaming_transcription_utterance_in_background,
         )
 
         # Only used for adapters that can provide closed captions
         if self.bot_in_db.transcription_settings.meeting_closed_captions_merge_consecutive_captions():
             self.closed_caption_manager = GroupedClosedCaptionManager(
-                save_utterance_callback=self.save_closed_caption_utterance,
+                save_utterance_callback=self.save_closed_caption_utterance_in_background,
                 get_participant_callback=self.get_participant,
             )
         else:
             self.closed_caption_manager = ClosedCaptionManager(
-                save_utterance_callback=self.save_closed_caption_utterance,
+                save_utterance_callback=self.save_closed_caption_utterance_in_background,
                 get_participant_callback=self.get_participant,
             )
 
@@ -728,6 +837,10 @@ class BotController:
             self.rtmp_client = RTMPClient(rtmp_url=self.bot_in_db.rtmp_destination_url())
             self.rtmp_client.start()
 
+        self.streaming_uploader = None
+        if self.should_stream_recording_upload():
+            self.streaming_uploader = self.create_streaming_uploader()
+
         self.gstreamer_pipeline = None
         if self.should_create_gstreamer_pipeline():
             self.gstreamer_pipeline = GstreamerPipeline(
@@ -746,6 +859,7 @@ class BotController:
                 file_location=self.get_recording_file_location(),
                 recording_dimensions=self.bot_in_db.recording_dimensions(),
                 audio_only=not (self.pipeline_configuration.record_video or self.pipeline_configuration.rtmp_stream_video),
+                on_output_data_callback=self.streaming_uploader.upload_part if self.streaming_uploader else None,
             )
 
         self.websocket_audio_client = None
@@ -757,10 +871,13 @@ class BotController:
 
         self.adapter = self.get_bot_adapter()
 
+        self.start_instrumentation()
+
         self.audio_output_manager = AudioOutputManager(
             currently_playing_audio_media_request_finished_callback=self.currently_playing_audio_media_request_finished,
             play_raw_audio_callback=self.adapter.send_raw_audio,
             sleep_time_between_chunks_seconds=self.get_sleep_time_between_audio_output_chunks_seconds(),
+            get_credentials_callback=self.bot_cache.get_credentials,
         )
 
         self.realtime_audio_output_manager = RealtimeAudioOutputManager(
@@ -775,7 +892,7 @@ class BotController:
             play_video_callback=self.adapter.send_video,
         )
 
-        self.bot_resource_snapshot_taker = BotResourceSnapshotTaker(self.bot_in_db)
+        self.bot_resource_snapshot_taker = BotResourceSnapshotTaker(self.bot_in_db, get_metrics_callback=self.get_metrics, save_in_background_callback=self.save_resource_snapshot_in_background)
 
         # Create GLib main loop
         self.main_loop = GLib.MainLoop()
@@ -817,6 +934,7 @@ class BotController:
 
         # Add timeout just for audio processing
         self.first_timeout_call = True
+        self.last_heartbeat_timestamp = self.bot_in_db.last_heartbeat_timestamp
         GLib.timeout_add(100, self.on_main_loop_timeout)
 
         # Add signal handlers so that when we get a SIGTERM or SIGINT, we can clean up the bot
@@ -963,8 +1081,7 @@ class BotController:
         logger.info("handle_glib_shutdown called")
 
         try:
-            BotEventManager.create_event(
-                bot=self.bot_in_db,
+            self.create_event_after_queued_writes(
                 event_type=BotEventTypes.FATAL_ERROR,
                 event_sub_type=BotEventSubTypes.FATAL_ERROR_PROCESS_TERMINATED,
             )
@@ -974,11 +1091,25 @@ class BotController:
         self.cleanup()
         return False
 
+    def start_instrumentation(self):
+        self.instrumentation.add_histogram("main_loop_tick", self.main_loop_tick_histogram)
+        self.instrumentation.add_gauge("persistence_worker_queue_size", "worker", lambda: {self.persistence_worker.name: self.persistence_worker.queue.qsize()})
+        if self.gstreamer_pipeline:
+            self.instrumentation.add_gauge("gstreamer_queue_fill_ratio", "queue", self.gstreamer_pipeline.get_queue_fill_levels)
+            self.instrumentation.add_gauge("gstreamer_queue_drops", "queue", lambda: self.gstreamer_pipeline.queue_drops)
+
+        metrics_port = get_bot_metrics_port()
+        if metrics_port:
+            self.instrumentation.start_metrics_server(metrics_port)
+
     def handle_redis_message(self, message):
         if message and message["type"] == "message":
             data = json.loads(message["data"].decode("utf-8"))
             command = data.get("command")
 
+            # Every command reloads the bot, so anything cached from the database is reloaded too
+            self.bot_cache.invalidate()
+
             if command == "sync":
                 logger.info(f"Syncing bot {self.bot_in_db.object_id}")
                 self.bot_in_db.refresh_from_db()
@@ -1007,6 +1138,9 @@ class BotController:
                 logger.info(f"Admitting from waiting room for bot {self.bot_in_db.object_id}")
                 self.bot_in_db.refresh_from_db()
                 self.admit_from_waiting_room()
+            elif command == "profile":
+                logger.info(f"Taking a sampling profile for bot {self.bot_in_db.object_id}")
+                self.instrumentation.start_profile(duration_seconds=data.get("duration_seconds", BotInstrumentation.DEFAULT_PROFILE_DURATION_SECONDS))
             else:
                 logger.info(f"Unknown command: {command}")
 
@@ -1038,8 +1172,7 @@ class BotController:
         if not pause_recording_for_pipeline_objects_success:
             logger.error(f"Failed to pause recording for bot {self.bot_in_db.object_id}")
             return
-        BotEventManager.create_event(
-            bot=self.bot_in_db,
+        self.create_event_after_queued_writes(
             event_type=BotEventTypes.RECORDING_PAUSED,
         )
 
@@ -1072,10 +1205,19 @@ class BotController:
         )
 
     def set_bot_heartbeat(self):
-        if self.bot_in_db.last_heartbeat_timestamp is None or self.bot_in_db.last_heartbeat_timestamp <= int(timezone.now().timestamp()) - 60:
-            self.bot_in_db.set_heartbeat()
+        if self.last_heartbeat_timestamp is not None and self.last_heartbeat_timestamp > int(timezone.now().timestamp()) - 60:
+            return
+        self.last_heartbeat_timestamp = int(timezone.now().timestamp())
+
+        # The heartbeat reloads the bot it's set on, so it gets its own copy rather than changing bot_in_db from another thread
+        bot_id = self.bot_in_db.id
+        self.persistence_worker.submit(lambda: Bot.objects.get(id=bot_id).set_heartbeat(), coalesce_key="heartbeat")
 
     def on_main_loop_timeout(self):
+        with self.main_loop_tick_histogram.time():
+            return self.run_main_loop_tick()
+
+    def run_main_loop_tick(self):
         try:
             if self.first_timeout_call:
                 logger.info("First timeout call - taking initial action")
@@ -1084,31 +1226,45 @@ class BotController:
                 self.first_timeout_call = False
 
             # Set heartbeat
-            self.set_bot_heartbeat()
+            with self.instrumentation.time_subsystem("heartbeat"):
+                self.set_bot_heartbeat()
 
             # Process audio chunks
-            self.per_participant_non_streaming_audio_input_manager.process_chunks()
+            with self.instrumentation.time_subsystem("non_streaming_audio_input"):
+                self.per_participant_non_streaming_audio_input_manager.process_chunks()
 
             # Monitor transcription
-            self.per_participant_streaming_audio_input_manager.monitor_transcription()
+            with self.instrumentation.time_subsystem("streaming_audio_input"):
+                self.per_participant_streaming_audio_input_manager.monitor_transcription()
+
+            # Send off batches of utterances that have waited long enough
+            if self.transcription_micro_batcher:
+                with self.instrumentation.time_subsystem("transcription_micro_batcher"):
+                    self.transcription_micro_batcher.flush_due_batches()
 
             # Process captions
-            self.closed_caption_manager.process_captions()
+            with self.instrumentation.time_subsystem("closed_captions"):
+                self.closed_caption_manager.process_captions()
 
             # Check if auto-leave conditions are met
-            self.adapter.check_auto_leave_conditions()
+            with self.instrumentation.time_subsystem("auto_leave"):
+                self.adapter.check_auto_leave_conditions()
 
             # Process audio output
-            self.audio_output_manager.monitor_currently_playing_audio_media_request()
+            with self.instrumentation.time_subsystem("audio_output"):
+                self.audio_output_manager.monitor_currently_playing_audio_media_request()
 
             # Process video output
-            self.video_output_manager.monitor_currently_playing_video_media_request()
+            with self.instrumentation.time_subsystem("video_output"):
+                self.video_output_manager.monitor_currently_playing_video_media_request()
 
             # For staged bots, check if its time to join
-            self.join_if_staged_and_time_to_join()
+            with self.instrumentation.time_subsystem("staged_join"):
+                self.join_if_staged_and_time_to_join()
 
             # Take a resource snapshot if needed
-            self.bot_resource_snapshot_taker.save_snapshot_if_needed()
+            with self.instrumentation.time_subsystem("resource_snapshot"):
+                self.bot_resource_snapshot_taker.save_snapshot_if_needed()
 
             return True
 
@@ -1121,8 +1277,7 @@ class BotController:
 
     def handle_exception_in_timeout_callback(self, e):
         try:
-            BotEventManager.create_event(
-                bot=self.bot_in_db,
+            self.create_event_after_queued_writes(
                 event_type=BotEventTypes.FATAL_ERROR,
                 event_sub_type=BotEventSubTypes.FATAL_ERROR_ATTENDEE_INTERNAL_ERROR,
                 event_metadata={"error": str(e)},
@@ -1134,11 +1289,50 @@ class BotController:
         self.cleanup()
 
     def get_recording_in_progress(self):
-        return RecordingManager.get_recording_in_progress(self.bot_in_db)
+        return self.bot_cache.get_recording_in_progress()
 
-    def save_closed_caption_utterance(self, message):
-        participant, _ = Participant.objects.get_or_create(
-            bot=self.bot_in_db,
+    def set_recording_transcription_in_progress(self, recording):
+        # Once the transcription is in progress it stays that way for the rest of the meeting, so there's no need to check it again
+        if recording.transcription_state == RecordingTranscriptionStates.IN_PROGRESS:
+            return
+        RecordingManager.set_recording_transcription_in_progress(recording)
+
+    def get_metrics(self):
+        metrics = {
+            "utterance_batch_writer": self.utterance_batch_writer.get_metrics(),
+            "bot_cache": self.bot_cache.get_metrics(),
+            "persistence_worker": self.persistence_worker.get_metrics(),
+            "main_loop_tick": self.main_loop_tick_histogram.get_metrics(),
+        }
+        if self.transcription_micro_batcher:
+            metrics["transcription_micro_batcher"] = self.transcription_micro_batcher.get_metrics()
+        if self.per_participant_streaming_audio_input_manager:
+            metrics["streaming_transcribers"] = self.per_participant_streaming_audio_input_manager.get_metrics()
+        metrics["instrumentation"] = self.instrumentation.get_summary()
+        return metrics
+
+    # Saving to the database and sending the webhooks happens on the persistence worker, so these are what the main loop calls.
+    # Anything that needs the adapter is looked up first, because the meeting SDKs expect to be called from the thread they call us on.
+    # The recording is looked up first too, so a job that runs after the recording has ended still saves to the one it belongs to.
+
+    def save_closed_caption_utterance_in_background(self, message):
+        recording_in_progress = self.get_recording_in_progress()
+        self.persistence_worker.submit(lambda: self.save_closed_caption_utterance(message, recording_in_progress))
+
+    def save_streaming_transcription_utterance_in_background(self, speaker_id, result):
+        participant_data = self.get_participant(speaker_id)
+        if participant_data is None:
+            logger.warning(f"Warning: No participant found for speaker {speaker_id} so cannot save streaming transcription utterance")
+            return
+        recording_in_progress = self.get_recording_in_progress()
+        self.persistence_worker.submit(lambda: self.save_streaming_transcription_utterance(participant_data, result, recording_in_progress))
+
+    def save_resource_snapshot_in_background(self, save_snapshot):
+        # If the database is that far behind, a missing snapshot is the least of our problems
+        self.persistence_worker.submit(save_snapshot, policy=PersistenceWorker.DROP)
+
+    def save_closed_caption_utterance(self, message, recording_in_progress):
+        participant = self.bot_cache.get_participant(
             uuid=message["participant_uuid"],
             defaults={
                 "user_uuid": message["participant_user_uuid"],
@@ -1149,7 +1343,6 @@ class BotController:
         )
 
         # Create new utterance record
-        recording_in_progress = self.get_recording_in_progress()
         if recording_in_progress is None:
             logger.warning(f"Warning: No recording in progress found so cannot save closed caption utterance. Message: {message}")
             return
@@ -1174,61 +1367,103 @@ class BotController:
             payload=utterance_webhook_payload(utterance),
         )
 
-        RecordingManager.set_recording_transcription_in_progress(recording_in_progress)
-
-    def process_individual_audio_chunk(self, message):
-        from bots.tasks.process_utterance_task import process_utterance
-
-        logger.info("Received message that new individual audio chunk was detected")
+        self.set_recording_transcription_in_progress(recording_in_progress)
 
-        # Create participant record if it doesn't exist
-        participant, _ = Participant.objects.get_or_create(
-            bot=self.bot_in_db,
-            uuid=message["participant_uuid"],
+    def save_streaming_transcription_utterance(self, participant_data, result, recording_in_progress):
+        participant = self.bot_cache.get_participant(
+            uuid=participant_data["participant_uuid"],
             defaults={
-                "user_uuid": message["participant_user_uuid"],
-                "full_name": message["participant_full_name"],
-                "is_the_bot": message["participant_is_the_bot"],
-                "is_host": message["participant_is_host"],
+                "user_uuid": participant_data["participant_user_uuid"],
+                "full_name": participant_data["participant_full_name"],
+                "is_the_bot": participant_data["participant_is_the_bot"],
+                "is_host": participant_data.get("participant_is_host", False),
             },
         )
 
-        recording_in_progress = self.get_recording_in_progress()
         if recording_in_progress is None:
-            logger.warning("Warning: No recording in progress found so cannot save individual audio utterance.")
+            logger.warning(f"Warning: No recording in progress found so cannot save streaming transcription utterance for speaker {participant_data['participant_uuid']}")
             return
-
-        audio_chunk = AudioChunk.objects.create(
+        source_uuid = f"{recording_in_progress.object_id}-streaming-{participant.uuid}-{result['timestamp_ms']}"
+        utterance, _ = Utterance.objects.update_or_create(
             recording=recording_in_progress,
-            audio_blob=message["audio_data"],
-            audio_format=AudioChunk.AudioFormat.PCM,
-            timestamp_ms=message["timestamp_ms"] - self.get_per_participant_audio_utterance_delay_ms(),
-            duration_ms=len(message["audio_data"]) / ((message["sample_rate"] / 1000) * 2),
-            sample_rate=message["sample_rate"],
-            source=AudioChunk.Sources.PER_PARTICIPANT_AUDIO,
-            participant=participant,
+            source_uuid=source_uuid,
+            defaults={
+                "source": Utterance.Sources.PER_PARTICIPANT_AUDIO,
+                "participant": participant,
+                "transcription": {"transcript": result["transcript"], "words": result["words"]},
+                "timestamp_ms": result["timestamp_ms"],
+                "duration_ms": result["duration_ms"],
+                "sample_rate": self.get_per_participant_audio_sample_rate(),
+            },
         )
 
-        if not self.save_utterances_for_individual_audio_chunks():
+        trigger_webhook(
+            webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE,
+            bot=self.bot_in_db,
+            payload=utterance_webhook_payload(utterance),
+        )
+
+        self.set_recording_transcription_in_progress(recording_in_progress)
+
+    def process_individual_audio_chunk(self, message):
+        logger.info("Received message that new individual audio chunk was detected")
+
+        # The database writes happen in batches on the utterance batch writer's thread, so the main loop isn't blocked
+        self.utterance_batch_writer.add_audio_chunk(message, timestamp_ms=message["timestamp_ms"] - self.get_per_participant_audio_utterance_delay_ms())
+
+    def dispatch_utterances_for_transcription(self, utterances):
+        if self.transcription_micro_batcher:
+            self.transcription_micro_batcher.add_utterances(utterances)
             return
 
-        # Create new utterance record
-        utterance = Utterance.objects.create(
-            source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
-            async_transcription=None,  # This utterance is created during the meeting, so it's not associated with an async transcription
-            recording=recording_in_progress,
-            participant=participant,
-            audio_chunk=audio_chunk,
-            timestamp_ms=audio_chunk.timestamp_ms,
-            duration_ms=audio_chunk.duration_ms,
+        self.dispatch_utterance_ids_for_transcription([utterance.id for utterance in utterances])
+
+    def dispatch_utterance_batch_for_transcription(self, utterance_ids):
+        from bots.tasks.process_utterance_batch_task import process_utterance_batch
+
+        process_utterance_batch.delay(utterance_ids)
+
+    def dispatch_utterance_ids_for_transcription(self, utterance_ids):
+        from bots.tasks.process_utterance_task import process_utterance
+
+        if transcription_dispatcher_enabled():
+            transcription_dispatcher = get_transcription_dispatcher()
+            transcription_provider = self.get_recording_transcription_provider()
+            for utterance_id in utterance_ids:
+                transcription_dispatcher.enqueue(utterance_id, project_id=self.bot_in_db.project_id, transcription_provider=transcription_provider, priority=TranscriptionDispatcher.LIVE_PRIORITY)
+            return
+
+        for utterance_id in utterance_ids:
+            process_utterance.delay(utterance_id)
+
+    def create_transcription_micro_batcher(self):
+        if not self.save_utterances_for_individual_audio_chunks():
+            return None
+        # Deepgram is the only provider whose results can be split back into utterances
+        if self.get_recording_transcription_provider() != TranscriptionProviders.DEEPGRAM:
+            return None
+        transcription_settings = self.bot_in_db.transcription_settings
+        if not transcription_settings.deepgram_micro_batching_enabled():
+            return None
+
+        return TranscriptionMicroBatcher(
+            max_batch_size=transcription_settings.deepgram_micro_batching_max_batch_size(),
+            max_added_latency_ms=transcription_settings.deepgram_micro_batching_max_added_latency_ms(),
+            dispatch_batch_callback=self.dispatch_utterance_batch_for_transcription,
+            dispatch_utterances_callback=self.dispatch_utterance_ids_for_transcription,
         )
 
-        # Set the recording transcription in progress
-        RecordingManager.set_recording_transcription_in_progress(recording_in_progress)
+    def get_utterance_batch_writer_flush_interval_seconds(self):
+        return float(os.getenv("UTTERANCE_BATCH_FLUSH_INTERVAL_SECONDS", UtteranceBatchWriter.DEFAULT_FLUSH_INTERVAL_SECONDS))
 
-        # Process the utterance immediately
-        process_utterance.delay(utterance.id)
-        return
+    def get_utterance_batch_writer_max_batch_size(self):
+        return int(os.getenv("UTTERANCE_BATCH_MAX_SIZE", UtteranceBatchWriter.DEFAULT_MAX_BATCH_SIZE))
+
+    def get_persistence_worker_max_queue_size(self):
+        return int(os.getenv("PERSISTENCE_WORKER_MAX_QUEUE_SIZE", PersistenceWorker.DEFAULT_MAX_QUEUE_SIZE))
+
+    def get_persistence_worker_block_timeout_seconds(self):
+        return float(os.getenv("PERSISTENCE_WORKER_BLOCK_TIMEOUT_SECONDS", PersistenceWorker.DEFAULT_BLOCK_TIMEOUT_SECONDS))
 
     def on_new_chat_message(self, chat_message):
         GLib.idle_add(lambda: self.upsert_chat_message(chat_message))
@@ -1242,9 +1477,11 @@ class BotController:
             logger.warning(f"Warning: No participant found for participant event: {event}")
             return
 
+        self.persistence_worker.submit(lambda: self.save_participant_event(event, participant))
+
+    def save_participant_event(self, event, participant):
         # Create participant record if it doesn't exist
-        participant, _ = Participant.objects.get_or_create(
-            bot=self.bot_in_db,
+        participant = self.bot_cache.get_participant(
             uuid=participant["participant_uuid"],
             defaults={
                 "user_uuid": participant["participant_user_uuid"],
@@ -1282,8 +1519,10 @@ class BotController:
             logger.warning(f"Warning: No participant found for chat message: {chat_message}")
             return
 
-        participant, _ = Participant.objects.get_or_create(
-            bot=self.bot_in_db,
+        self.persistence_worker.submit(lambda: self.save_chat_message(chat_message, participant))
+
+    def save_chat_message(self, chat_message, participant):
+        participant = self.bot_cache.get_participant(
             uuid=participant["participant_uuid"],
             defaults={
                 "user_uuid": participant["participant_user_uuid"],
@@ -1326,10 +1565,40 @@ class BotController:
         if self.per_participant_non_streaming_audio_input_manager:
             logger.info("Flushing utterances...")
             self.per_participant_non_streaming_audio_input_manager.flush_utterances()
+        if self.utterance_batch_writer:
+            logger.info("Flushing utterance batch writer...")
+            self.utterance_batch_writer.flush()
+        if self.transcription_micro_batcher:
+            logger.info("Flushing transcription micro batcher...")
+            self.transcription_micro_batcher.flush()
         if self.closed_caption_manager:
             logger.info("Flushing captions...")
             self.closed_caption_manager.flush_captions()
 
+    def create_event_after_queued_writes(self, *, event_type, event_sub_type=None, event_metadata=None, after_event_created=None):
+        # Events that stop the recording are created on the persistence worker, so the captions and utterances the main loop
+        # has already handed it are saved first, without the main loop waiting for them
+        bot_id = self.bot_in_db.id
+
+        def create_event():
+            bot = Bot.objects.get(id=bot_id)
+            new_bot_event = BotEventManager.create_event(bot=bot, event_type=event_type, event_sub_type=event_sub_type, event_metadata=event_metadata)
+            GLib.idle_add(lambda: self.update_bot_state_from(bot))
+            if after_event_created:
+                after_event_created(new_bot_event)
+
+        if self.persistence_worker:
+            self.persistence_worker.submit(create_event)
+        else:
+            create_event()
+
+    def update_bot_state_from(self, bot):
+        # The main loop's copy of the bot is only changed on the main loop. Events create_event has made since then are newer.
+        if bot.version > self.bot_in_db.version:
+            self.bot_in_db.state = bot.state
+            self.bot_in_db.version = bot.version
+        return False
+
     def save_debug_recording(self):
         # Only save if the file exists
         if not os.path.exists(BotAdapter.DEBUG_RECORDING_FILE_PATH):
@@ -1437,8 +1706,7 @@ class BotController:
             if bot_start_time < timezone.now() - timedelta(minutes=15):
                 logger.info("Received message that we were blocked by platform repeatedly but bot was created more than 15 minutes ago, so not recreating pod")
 
-                new_bot_event = BotEventManager.create_event(
-                    bot=self.bot_in_db,
+                self.create_event_after_queued_writes(
                     event_type=BotEventTypes.FATAL_ERROR,
                     event_sub_type=BotEventSubTypes.FATAL_ERROR_UI_ELEMENT_NOT_FOUND,
                     event_metadata={
@@ -1463,8 +1731,35 @@ class BotController:
             screenshot_available = message.get("screenshot_path") is not None
             mhtml_file_available = message.get("mhtml_file_path") is not None
 
-            new_bot_event = BotEventManager.create_event(
-                bot=self.bot_in_db,
+            def save_debug_screenshots(new_bot_event):
+                logger.info(f"Created bot event for #{self.bot_in_db.object_id} for UI element not found. Exception info: {message}")
+
+                if screenshot_available:
+                    # Create debug screenshot
+                    debug_screenshot = BotDebugScreenshot.objects.create(bot_event=new_bot_event)
+
+                    # Read the file content from the path
+                    with open(message.get("screenshot_path"), "rb") as f:
+                        screenshot_content = f.read()
+                        debug_screenshot.file.save(
+                            f"debug_screenshot_{debug_screenshot.object_id}.png",
+                            ContentFile(screenshot_content),
+                            save=True,
+                        )
+
+                if mhtml_file_available:
+                    # Create debug screenshot
+                    mhtml_debug_screenshot = BotDebugScreenshot.objects.create(bot_event=new_bot_event)
+
+                    with open(message.get("mhtml_file_path"), "rb") as f:
+                        mhtml_content = f.read()
+                        mhtml_debug_screenshot.file.save(
+                            f"debug_screenshot_{mhtml_debug_screenshot.object_id}.mhtml",
+                            ContentFile(mhtml_content),
+                            save=True,
+                        )
+
+            self.create_event_after_queued_writes(
                 event_type=BotEventTypes.FATAL_ERROR,
                 event_sub_type=BotEventSubTypes.FATAL_ERROR_UI_ELEMENT_NOT_FOUND,
                 event_metadata={
@@ -1473,35 +1768,9 @@ class BotController:
                     "exception_type": message.get("exception_type"),
                     "inner_exception_type": message.get("inner_exception_type"),
                 },
+                after_event_created=save_debug_screenshots,
             )
 
-            logger.info(f"Created bot event for #{self.bot_in_db.object_id} for UI element not found. Exception info: {message}")
-
-            if screenshot_available:
-                # Create debug screenshot
-                debug_screenshot = BotDebugScreenshot.objects.create(bot_event=new_bot_event)
-
-                # Read the file content from the path
-                with open(message.get("screenshot_path"), "rb") as f:
-                    screenshot_content = f.read()
-                    debug_screenshot.file.save(
-                        f"debug_screenshot_{debug_screenshot.object_id}.png",
-                        ContentFile(screenshot_content),
-                        save=True,
-                    )
-
-            if mhtml_file_available:
-                # Create debug screenshot
-                mhtml_debug_screenshot = BotDebugScreenshot.objects.create(bot_event=new_bot_event)
-
-                with open(message.get("mhtml_file_path"), "rb") as f:
-                    mhtml_content = f.read()
-                    mhtml_debug_screenshot.file.save(
-                        f"debug_screenshot_{mhtml_debug_screenshot.object_id}.mhtml",
-                        ContentFile(mhtml_content),
-                        save=True,
-                    )
-
             self.cleanup()
             return
 
@@ -1523,9 +1792,9 @@ class BotController:
             logger.info("Received message that meeting ended")
             self.flush_utterances()
             if self.bot_in_db.state == BotStates.LEAVING:
-                BotEventManager.create_event(bot=self.bot_in_db, event_type=BotEventTypes.BOT_LEFT_MEETING)
+                self.create_event_after_queued_writes(event_type=BotEventTypes.BOT_LEFT_MEETING)
             else:
-                BotEventManager.create_event(bot=self.bot_in_db, event_type=BotEventTypes.MEETING_ENDED)
+                self.create_event_after_queued_writes(event_type=BotEventTypes.MEETING_ENDED)
             self.cleanup()
 
             return
@@ -1653,8 +1922,7 @@ class BotController:
             else:
                 raise Exception(f"Received unexpected denied reason from bot adapter: {message.get('denied_reason')}")
 
-            BotEventManager.create_event(
-                bot=self.bot_in_db,
+            self.create_event_after_queued_writes(
                 event_type=BotEventTypes.BOT_RECORDING_PERMISSION_DENIED,
                 event_sub_type=event_sub_type_for_permission_denied,
             )
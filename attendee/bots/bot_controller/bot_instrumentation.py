@@ -0,0 +1,248 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .latency_histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+def get_bot_metrics_port():
+    port = os.getenv("BOT_METRICS_PORT")
+    return int(port) if port else None
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all the process's Python threads every interval_ms for duration_seconds, on a thread of its own.
+    The result counts how often each stack was seen, in the collapsed format flame graph tools take, e.g. "MainThread;bot_controller.py:run_main_loop_tick;...".
+    """
+
+    MAX_STACKS_IN_RESULT = 50
+
+    def __init__(self, *, duration_seconds, interval_ms, on_finished_callback):
+        self.duration_seconds = duration_seconds
+        self.interval_seconds = interval_ms / 1000
+        self.on_finished_callback = on_finished_callback
+        self.stack_counts = collections.Counter()
+        self.sample_count = 0
+        self.thread = threading.Thread(target=self.run, name="sampling_profiler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def take_sample(self):
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self.thread.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            stack.append(thread_names.get(thread_id, str(thread_id)))
+            self.stack_counts[";".join(reversed(stack))] += 1
+        self.sample_count += 1
+
+    def run(self):
+        started_at = time.time()
+        while time.time() - started_at < self.duration_seconds:
+            self.take_sample()
+            time.sleep(self.interval_seconds)
+
+        self.on_finished_callback(
+            {
+                "started_at": started_at,
+                "duration_seconds": self.duration_seconds,
+                "interval_ms": int(self.interval_seconds * 1000),
+                "samples": self.sample_count,
+                "stacks": [[stack, count] for stack, count in self.stack_counts.most_common(self.MAX_STACKS_IN_RESULT)],
+            }
+        )
+
+
+class BotInstrumentation:
+    """
+    Shows where a bot pod spends its time. It collects:
+    - timing histograms for each subsystem the main loop runs
+    - counts and bytes for each type of message the adapter receives
+    - gauges such as the GStreamer queues' fill levels
+
+    A summary goes in the resource snapshots. If BOT_METRICS_PORT is set, everything is served as Prometheus metrics.
+    A sampling profile of the Python threads can be taken on demand.
+    It can be recorded to from any thread.
+    """
+
+    METRIC_PREFIX = "attendee_bot"
+    DEFAULT_PROFILE_DURATION_SECONDS = 30
+    DEFAULT_PROFILE_INTERVAL_MS = 10
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subsystem_histograms = {}
+        # Histograms owned by other objects, which are reported under their own names
+        self.histograms = {}
+        self.message_counts = collections.Counter()
+        self.message_bytes = collections.Counter()
+        # name -> (label name, callback returning {label value: value})
+        self.gauge_callbacks = {}
+
+        self.sampling_profiler = None
+        # A finished profile goes in the next summary only, so it isn't repeated in every snapshot
+        self.unreported_profile = None
+        self.metrics_server = None
+
+    # Recording
+
+    @contextmanager
+    def time_subsystem(self, name):
+        histogram = self.subsystem_histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.subsystem_histograms.setdefault(name, LatencyHistogram())
+        with histogram.time():
+            yield
+
+    def record_message(self, message_type, size_bytes):
+        with self.lock:
+            self.message_counts[message_type] += 1
+            self.message_bytes[message_type] += size_bytes
+
+    def add_histogram(self, name, histogram):
+        self.histograms[name] = histogram
+
+    def add_gauge(self, name, label_name, callback):
+        self.gauge_callbacks[name] = (label_name, callback)
+
+    def get_gauges(self):
+        gauges = {}
+        for name, (label_name, callback) in self.gauge_callbacks.items():
+            try:
+                gauges[name] = dict(callback() or {})
+            except Exception as e:
+                logger.warning(f"Error getting gauge {name}: {e}")
+        return gauges
+
+    # Profiling
+
+    def start_profile(self, duration_seconds=DEFAULT_PROFILE_DURATION_SECONDS, interval_ms=DEFAULT_PROFILE_INTERVAL_MS):
+        if self.sampling_profiler and self.sampling_profiler.is_running():
+            logger.info("A sampling profile is already being taken, not starting another one")
+            return False
+        logger.info(f"Taking a sampling profile for {duration_seconds} seconds")
+        self.sampling_profiler = SamplingProfiler(duration_seconds=duration_seconds, interval_ms=interval_ms, on_finished_callback=self.on_profile_finished)
+        self.sampling_profiler.start()
+        return True
+
+    def on_profile_finished(self, profile):
+        self.unreported_profile = profile
+        logger.info(f"Sampling profile finished with {profile['samples']} samples. Most common stacks:")
+        for stack, count in profile["stacks"][:10]:
+            logger.info(f"  {count} {stack}")
+
+    # Reporting
+
+    def get_summary(self):
+        with self.lock:
+            message_counts = dict(self.message_counts)
+            message_bytes = dict(self.message_bytes)
+        summary = {
+            "subsystems": {name: self.summarize_histogram(histogram) for name, histogram in list(self.subsystem_histograms.items())},
+            "messages": {message_type: {"count": count, "bytes": message_bytes[message_type]} for message_type, count in message_counts.items()},
+            "gauges": self.get_gauges(),
+        }
+        profile, self.unreported_profile = self.unreported_profile, None
+        if profile:
+            summary["profile"] = profile
+        return summary
+
+    def summarize_histogram(self, histogram):
+        metrics = histogram.get_metrics()
+        return {key: metrics[key] for key in ["count", "mean_ms", "p50_ms", "p99_ms", "max_ms"]}
+
+    def render_prometheus(self):
+        lines = []
+
+        def add_histogram_lines(metric_name, histogram, labels):
+            bucket_counts, count, total_ms = histogram.get_bucket_counts()
+            cumulative_count = 0
+            for bound, bucket_count in zip(histogram.BUCKET_UPPER_BOUNDS_MS + ["+Inf"], bucket_counts):
+                cumulative_count += bucket_count
+                lines.append(f"{metric_name}_bucket{self.format_labels({**labels, 'le': bound})} {cumulative_count}")
+            lines.append(f"{metric_name}_sum{self.format_labels(labels)} {total_ms}")
+            lines.append(f"{metric_name}_count{self.format_labels(labels)} {count}")
+
+        metric_name = f"{self.METRIC_PREFIX}_subsystem_duration_ms"
+        lines.append(f"# TYPE {metric_name} histogram")
+        for name, histogram in list(self.subsystem_histograms.items()):
+            add_histogram_lines(metric_name, histogram, {"subsystem": name})
+
+        for name, histogram in self.histograms.items():
+            metric_name = f"{self.METRIC_PREFIX}_{name}_duration_ms"
+            lines.append(f"# TYPE {metric_name} histogram")
+            add_histogram_lines(metric_name, histogram, {})
+
+        with self.lock:
+            message_counts = dict(self.message_counts)
+            message_bytes = dict(self.message_bytes)
+        for metric_suffix, values in [("messages_total", message_counts), ("message_bytes_total", message_bytes)]:
+            metric_name = f"{self.METRIC_PREFIX}_{metric_suffix}"
+            lines.append(f"# TYPE {metric_name} counter")
+            for message_type, value in values.items():
+                lines.append(f"{metric_name}{self.format_labels({'type': message_type})} {value}")
+
+        gauges = self.get_gauges()
+        for name, (label_name, _) in self.gauge_callbacks.items():
+            metric_name = f"{self.METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric_name} gauge")
+            for label_value, value in gauges.get(name, {}).items():
+                lines.append(f"{metric_name}{self.format_labels({label_name: label_value})} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def format_labels(self, labels):
+        if not labels:
+            return ""
+        formatted_labels = ",".join(f'{key}="{self.escape_label_value(value)}"' for key, value in labels.items())
+        return "{" + formatted_labels + "}"
+
+    def escape_label_value(self, value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    # Serving
+
+    def start_metrics_server(self, port):
+        instrumentation = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = instrumentation.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.metrics_server = ThreadingHTTPServer(("", port), MetricsRequestHandler)
+        threading.Thread(target=self.metrics_server.serve_forever, name="metrics_server", daemon=True).start()
+        logger.info(f"Serving bot metrics on port {self.metrics_server.server_address[1]}")
+
+    def cleanup(self):
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
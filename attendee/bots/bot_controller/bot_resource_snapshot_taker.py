@@ -101,14 +101,18 @@ class BotResourceSnapshotTaker:
     A class to handle taking snapshots of bot resource usage (CPU, RAM).
     """
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, get_metrics_callback=None, save_in_background_callback=None):
         """
         Initializes the snapshot taker for a specific bot.
 
         It fetches the last snapshot time from the database once upon creation to
-        minimize database queries.
+        minimize database queries. If get_metrics_callback is provided, the metrics
+        it returns are saved alongside the resource usage. If save_in_background_callback
+        is provided, the snapshot is saved by passing a function that saves it to it.
         """
         self.bot = bot
+        self.save_in_background_callback = save_in_background_callback
+        self.get_metrics_callback = get_metrics_callback
         self._last_snapshot_time = timezone.now()
         self._first_cpu_usage_millicores = None
         self._first_cpu_usage_sample_time = None
@@ -164,6 +168,17 @@ class BotResourceSnapshotTaker:
             "cpu_usage_millicores": cpu_usage_millicores_delta_per_second,
         }
 
-        BotResourceSnapshot.objects.create(bot=self.bot, data=snapshot_data)
+        if self.get_metrics_callback:
+            try:
+                snapshot_data["metrics"] = self.get_metrics_callback()
+            except Exception as e:
+                logger.error(f"Error getting metrics for bot {self.bot.object_id}: {e}")
+
+        def save_snapshot():
+            BotResourceSnapshot.objects.create(bot=self.bot, data=snapshot_data)
+            logger.info(f"Saved resource snapshot for bot {self.bot.object_id}: {snapshot_data}")
 
-        logger.info(f"Saved resource snapshot for bot {self.bot.object_id}: {snapshot_data}")
+        if self.save_in_background_callback:
+            self.save_in_background_callback(save_snapshot)
+        else:
+            save_snapshot()
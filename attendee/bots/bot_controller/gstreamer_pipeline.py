@@ -56,6 +56,7 @@ class GstreamerPipeline:
 
         self.queue_drops = {}
         self.last_reported_drops = {}
+        self.queue_elements = {}
 
     def on_new_sample_from_appsink(self, sink):
         """Handle new samples from the appsink"""
@@ -72,12 +73,19 @@ class GstreamerPipeline:
         self.start_time_ns = None
 
         # Setup muxer based on output format
+        # An appsink can't seek back to rewrite the header, so the muxers need to produce a streamable output in that case
         if self.output_format == self.OUTPUT_FORMAT_MP4:
-            muxer_string = "mp4mux name=muxer"
+            if self.sink_type == self.SINK_TYPE_APPSINK:
+                muxer_string = "mp4mux name=muxer fragment-duration=1000 streamable=true"
+            else:
+                muxer_string = "mp4mux name=muxer"
         elif self.output_format == self.OUTPUT_FORMAT_FLV:
             muxer_string = "h264parse ! flvmux name=muxer streamable=true"
         elif self.output_format == self.OUTPUT_FORMAT_WEBM:
-            muxer_string = "h264parse ! matroskamux name=muxer"
+            if self.sink_type == self.SINK_TYPE_APPSINK:
+                muxer_string = "h264parse ! matroskamux name=muxer streamable=true"
+            else:
+                muxer_string = "h264parse ! matroskamux name=muxer"
         elif self.output_format == self.OUTPUT_FORMAT_MP3:
             muxer_string = ""
         else:
@@ -171,6 +179,7 @@ class GstreamerPipeline:
         # Initialize queue monitoring
         self.queue_drops = {}
         self.last_reported_drops = {}
+        self.queue_elements = {}
 
         # Find all queue elements and connect drop signals
         iterator = self.pipeline.iterate_elements()
@@ -185,6 +194,7 @@ class GstreamerPipeline:
                 queue_name = element.get_name()
                 self.queue_drops[queue_name] = 0
                 self.last_reported_drops[queue_name] = 0
+                self.queue_elements[queue_name] = element
                 element.connect("overrun", self.on_queue_overrun, queue_name)
 
         # Start statistics monitoring
@@ -239,6 +249,18 @@ class GstreamerPipeline:
 
         return True  # Continue timer
 
+    def get_queue_fill_levels(self):
+        """How full each queue is, from 0 to 1. A queue is full when it reaches any of its limits."""
+        fill_levels = {}
+        for queue_name, element in list(self.queue_elements.items()):
+            fill_level = 0.0
+            for limit in ["buffers", "bytes", "time"]:
+                max_size = element.get_property(f"max-size-{limit}")
+                if max_size:
+                    fill_level = max(fill_level, element.get_property(f"current-level-{limit}") / max_size)
+            fill_levels[queue_name] = round(fill_level, 3)
+        return fill_levels
+
     def on_queue_overrun(self, queue, queue_name):
         """Callback for when a queue drops buffers"""
         self.queue_drops[queue_name] += 1
@@ -0,0 +1,67 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    """
+    Counts durations into fixed buckets, so the percentiles can be reported for the whole meeting without keeping every sample.
+    The percentiles are the upper bound of the bucket they fall in. It can be recorded to from any thread.
+    """
+
+    BUCKET_UPPER_BOUNDS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # The last bucket is for everything over the largest bound
+        self.bucket_counts = [0] * (len(self.BUCKET_UPPER_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms):
+        bucket_index = bisect.bisect_left(self.BUCKET_UPPER_BOUNDS_MS, duration_ms)
+        with self.lock:
+            self.bucket_counts[bucket_index] += 1
+            self.count += 1
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+
+    @contextmanager
+    def time(self):
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record((time.monotonic() - start_time) * 1000)
+
+    def get_bucket_counts(self):
+        """Returns the count in each bucket, with the count over the largest bound last, along with the total count and sum."""
+        with self.lock:
+            return list(self.bucket_counts), self.count, self.total_ms
+
+    def percentile_ms(self, percentile):
+        with self.lock:
+            if self.count == 0:
+                return None
+            rank = percentile / 100 * self.count
+            cumulative_count = 0
+            for bucket_index, bucket_count in enumerate(self.bucket_counts):
+                cumulative_count += bucket_count
+                if cumulative_count >= rank and bucket_count > 0:
+                    return self.BUCKET_UPPER_BOUNDS_MS[bucket_index] if bucket_index < len(self.BUCKET_UPPER_BOUNDS_MS) else self.max_ms
+            return self.max_ms
+
+    def get_metrics(self):
+        p50_ms = self.percentile_ms(50)
+        p99_ms = self.percentile_ms(99)
+        with self.lock:
+            return {
+                "count": self.count,
+                "mean_ms": round(self.total_ms / self.count, 2) if self.count else None,
+                "max_ms": round(self.max_ms, 2),
+                "p50_ms": p50_ms,
+                "p99_ms": p99_ms,
+                "buckets": {f"le_{bound}ms": count for bound, count in zip(self.BUCKET_UPPER_BOUNDS_MS, self.bucket_counts)} | {"gt_max": self.bucket_counts[-1]},
+            }
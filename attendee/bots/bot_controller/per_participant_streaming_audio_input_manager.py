@@ -2,85 +2,139 @@ import logging
 import queue
 import time
 
-import numpy as np
 import webrtcvad
 
 from bots.models import Credentials, TranscriptionProviders
+from bots.transcription_providers.assembly_ai.assembly_ai_streaming_transcriber import AssemblyAIStreamingTranscriber
 from bots.transcription_providers.deepgram.deepgram_streaming_transcriber import DeepgramStreamingTranscriber
+from bots.transcription_providers.elevenlabs.elevenlabs_streaming_transcriber import ElevenLabsStreamingTranscriber
+from bots.transcription_providers.gladia.gladia_streaming_transcriber import GladiaStreamingTranscriber
+from bots.transcription_providers.openai.openai_streaming_transcriber import OpenAIStreamingTranscriber
+from bots.transcription_providers.streaming_transcriber import StreamingTranscriberPool
 
-logger = logging.getLogger(__name__)
-
+from .per_speaker_vad_engine import calculate_normalized_rms
 
-def calculate_normalized_rms(audio_bytes):
-    samples = np.frombuffer(audio_bytes, dtype=np.int16)
-    rms = np.sqrt(np.mean(np.square(samples)))
-    # Normalize by max possible value for 16-bit audio (32768)
-    return rms / 32768
+logger = logging.getLogger(__name__)
 
 
 class PerParticipantStreamingAudioInputManager:
-    def __init__(self, *, get_participant_callback, sample_rate, transcription_provider, bot):
-        self.queue = queue.Queue()
-
+    CREDENTIAL_TYPE_FOR_TRANSCRIPTION_PROVIDER = {
+        TranscriptionProviders.DEEPGRAM: Credentials.CredentialTypes.DEEPGRAM,
+        TranscriptionProviders.GLADIA: Credentials.CredentialTypes.GLADIA,
+        TranscriptionProviders.OPENAI: Credentials.CredentialTypes.OPENAI,
+        TranscriptionProviders.ASSEMBLY_AI: Credentials.CredentialTypes.ASSEMBLY_AI,
+        TranscriptionProviders.ELEVENLABS: Credentials.CredentialTypes.ELEVENLABS,
+    }
+
+    def __init__(self, *, get_participant_callback, sample_rate, transcription_provider, bot, save_transcription_result_callback=None, interim_transcription_result_callback=None):
         self.get_participant_callback = get_participant_callback
+        # Results arrive on the transcribers' threads, and are handed to these callbacks on the main loop
+        self.save_transcription_result_callback = save_transcription_result_callback
+        self.interim_transcription_result_callback = interim_transcription_result_callback
+        self.transcription_results = queue.SimpleQueue()
 
-        self.utterances = {}
         self.sample_rate = sample_rate
 
-        self.last_nonsilent_audio_time = {}
-
         self.SILENCE_DURATION_LIMIT = 10  # seconds
 
         self.vad = webrtcvad.Vad()
         self.transcription_provider = transcription_provider
-        self.streaming_transcribers = {}
         self.last_nonsilent_audio_time = {}
 
         self.project = bot.project
         self.bot = bot
-        self.deepgram_api_key = self.get_deepgram_api_key()
+        self.api_key = self.get_api_key()
+
+        self.streaming_transcriber_pool = StreamingTranscriberPool(create_transcriber=self.create_streaming_transcriber, max_active_transcribers=4)
 
-    def silence_detected(self, chunk_bytes):
-        if calculate_normalized_rms(chunk_bytes) < 0.0025:
+    @property
+    def streaming_transcribers(self):
+        return self.streaming_transcriber_pool.active_transcribers
+
+    def silence_detected(self, chunk_bytes, normalized_rms=None):
+        if normalized_rms is None:
+            normalized_rms = calculate_normalized_rms(chunk_bytes)
+        if normalized_rms < 0.0025:
             return True
         return not self.vad.is_speech(chunk_bytes, self.sample_rate)
 
-    def get_deepgram_api_key(self):
-        deepgram_credentials_record = self.project.credentials.filter(credential_type=Credentials.CredentialTypes.DEEPGRAM).first()
-        if not deepgram_credentials_record:
+    def get_api_key(self):
+        credential_type = self.CREDENTIAL_TYPE_FOR_TRANSCRIPTION_PROVIDER.get(self.transcription_provider)
+        if credential_type is None:
+            return None
+
+        credentials_record = self.project.credentials.filter(credential_type=credential_type).first()
+        if not credentials_record:
             return None
 
-        deepgram_credentials = deepgram_credentials_record.get_credentials()
-        return deepgram_credentials["api_key"]
+        credentials = credentials_record.get_credentials()
+        return credentials["api_key"]
 
-    def create_streaming_transcriber(self, speaker_id, metadata):
+    def on_transcription_result(self, speaker_id, result):
+        self.transcription_results.put((speaker_id, result))
+
+    def create_streaming_transcriber(self, speaker_id):
         logger.info(f"Creating streaming transcriber for speaker {speaker_id}")
+        transcription_settings = self.bot.transcription_settings
         if self.transcription_provider == TranscriptionProviders.DEEPGRAM:
-            metadata_list = [f"{key}:{value}" for key, value in metadata.items()] if metadata else None
+            metadata = {"bot_id": self.bot.object_id, **(self.bot.metadata or {}), **self.get_participant_callback(speaker_id)}
+            metadata_list = [f"{key}:{value}" for key, value in metadata.items()]
             return DeepgramStreamingTranscriber(
-                deepgram_api_key=self.deepgram_api_key,
+                deepgram_api_key=self.api_key,
                 interim_results=True,
-                language=self.bot.transcription_settings.deepgram_language(),
-                model=self.bot.transcription_settings.deepgram_model(),
-                callback=self.bot.transcription_settings.deepgram_callback(),
+                language=transcription_settings.deepgram_language(),
+                model=transcription_settings.deepgram_model(),
+                callback=transcription_settings.deepgram_callback(),
                 sample_rate=self.sample_rate,
                 metadata=metadata_list,
-                redaction_settings=self.bot.transcription_settings.deepgram_redaction_settings(),
+                redaction_settings=transcription_settings.deepgram_redaction_settings(),
+                speaker_id=speaker_id,
+                on_result_callback=self.on_transcription_result,
+            )
+        elif self.transcription_provider == TranscriptionProviders.GLADIA:
+            return GladiaStreamingTranscriber(
+                api_key=self.api_key,
+                sample_rate=self.sample_rate,
+                code_switching_languages=transcription_settings.gladia_code_switching_languages(),
+                enable_code_switching=transcription_settings.gladia_enable_code_switching(),
+                speaker_id=speaker_id,
+                on_result_callback=self.on_transcription_result,
+            )
+        elif self.transcription_provider == TranscriptionProviders.OPENAI:
+            return OpenAIStreamingTranscriber(
+                api_key=self.api_key,
+                sample_rate=self.sample_rate,
+                model=transcription_settings.openai_transcription_model(),
+                prompt=transcription_settings.openai_transcription_prompt(),
+                language=transcription_settings.openai_transcription_language(),
+                speaker_id=speaker_id,
+                on_result_callback=self.on_transcription_result,
+            )
+        elif self.transcription_provider == TranscriptionProviders.ASSEMBLY_AI:
+            return AssemblyAIStreamingTranscriber(
+                api_key=self.api_key,
+                sample_rate=self.sample_rate,
+                keyterms_prompt=transcription_settings.assemblyai_keyterms_prompt(),
+                speaker_id=speaker_id,
+                on_result_callback=self.on_transcription_result,
+            )
+        elif self.transcription_provider == TranscriptionProviders.ELEVENLABS:
+            return ElevenLabsStreamingTranscriber(
+                api_key=self.api_key,
+                sample_rate=self.sample_rate,
+                model_id=transcription_settings.elevenlabs_model_id(),
+                language_code=transcription_settings.elevenlabs_language_code(),
+                speaker_id=speaker_id,
+                on_result_callback=self.on_transcription_result,
             )
         else:
             raise Exception(f"Unsupported transcription provider: {self.transcription_provider}")
 
-    def find_or_create_streaming_transcriber_for_speaker(self, speaker_id):
-        if speaker_id not in self.streaming_transcribers:
-            metadata = {"bot_id": self.bot.object_id, **(self.bot.metadata or {}), **self.get_participant_callback(speaker_id)}
-            self.streaming_transcribers[speaker_id] = self.create_streaming_transcriber(speaker_id, metadata)
-        return self.streaming_transcribers[speaker_id]
-
-    def add_chunk(self, speaker_id, chunk_time, chunk_bytes):
-        if not self.deepgram_api_key:
+    def add_chunk(self, speaker_id, chunk_time, chunk_bytes, normalized_rms=None):
+        if not self.api_key:
             return
 
-        audio_is_silent = self.silence_detected(chunk_bytes)
+        audio_is_silent = self.silence_detected(chunk_bytes, normalized_rms)
 
         if not audio_is_silent:
             self.last_nonsilent_audio_time[speaker_id] = time.time()
@@ -88,25 +142,37 @@ class PerParticipantStreamingAudioInputManager:
         if audio_is_silent and speaker_id not in self.streaming_transcribers:
             return
 
-        streaming_transcriber = self.find_or_create_streaming_transcriber_for_speaker(speaker_id)
+        streaming_transcriber = self.streaming_transcriber_pool.acquire(speaker_id)
         streaming_transcriber.send(chunk_bytes)
 
+    def process_transcription_results(self):
+        while True:
+            try:
+                speaker_id, result = self.transcription_results.get_nowait()
+            except queue.Empty:
+                break
+
+            callback = self.save_transcription_result_callback if result["is_final"] else self.interim_transcription_result_callback
+            if callback is None:
+                continue
+            try:
+                callback(speaker_id, result)
+            except Exception as e:
+                logger.exception(f"Error processing streaming transcription result for speaker {speaker_id}: {e}")
+
     def monitor_transcription(self):
-        speakers_to_remove = []
-        streaming_transcriber_keys = list(self.streaming_transcribers.keys())
-        for speaker_id in streaming_transcriber_keys:
-            streaming_transcriber = self.streaming_transcribers[speaker_id]
+        self.process_transcription_results()
+
+        for speaker_id in list(self.streaming_transcribers.keys()):
             if time.time() - self.last_nonsilent_audio_time[speaker_id] > self.SILENCE_DURATION_LIMIT:
-                streaming_transcriber.finish()
-                speakers_to_remove.append(speaker_id)
+                self.streaming_transcriber_pool.release(speaker_id)
                 logger.info(f"Speaker {speaker_id} has been silent for too long, stopping streaming transcriber")
 
-        for speaker_id in speakers_to_remove:
-            del self.streaming_transcribers[speaker_id]
+        self.streaming_transcriber_pool.reap_idle_transcribers()
+
+    def cleanup(self):
+        self.streaming_transcriber_pool.close_all()
+        self.process_transcription_results()
 
-        # If Number of streaming transcibers is greater than 4, then stop the oldest one
-        if len(self.streaming_transcribers) > 4:
-            oldest_transcriber = min(self.streaming_transcribers.values(), key=lambda x: x.last_send_time)
-            oldest_transcriber.finish()
-            del self.streaming_transcribers[oldest_transcriber.speaker_id]
-            logger.info(f"Stopped oldest streaming transcriber for speaker {oldest_transcriber.speaker_id}")
+    def get_metrics(self):
+        return self.streaming_transcriber_pool.get_metrics()
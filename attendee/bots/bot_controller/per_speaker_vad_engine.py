@@ -0,0 +1,212 @@
+import math
+
+import numpy as np
+import webrtcvad
+
+# Sample rates and frame durations that webrtcvad can process
+VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+VAD_FRAME_DURATIONS_MS = (10, 20, 30)
+
+
+def calculate_normalized_rms(audio_bytes):
+    samples = np.frombuffer(audio_bytes, dtype=np.int16)
+    if samples.size == 0:
+        return 0.0
+    # Accumulate the squares in float64, so they can't overflow and no squared copy of the samples is allocated
+    sum_of_squares = np.einsum("i,i->", samples, samples, dtype=np.float64)
+    # Normalize by max possible value for 16-bit audio (32768)
+    return math.sqrt(sum_of_squares / samples.size) / 32768
+
+
+class SilenceTimerWheel:
+    """
+    Hashed timer wheel for the per-speaker silence timeouts.
+
+    Scheduling a timeout is O(1) and advancing the wheel only visits the buckets for the ticks
+    that have passed, so the cost of a main loop tick doesn't grow with the number of speakers.
+    Entries are never cancelled. The engine checks whether an expired entry is still current.
+    """
+
+    def __init__(self, tick_ms=100, num_buckets=256):
+        self.tick_ms = tick_ms
+        self.num_buckets = num_buckets
+        self.buckets = [[] for _ in range(num_buckets)]
+        self.current_tick = None
+
+    def schedule(self, slot, generation, deadline_ms):
+        tick = math.ceil(deadline_ms / self.tick_ms)
+        if self.current_tick is None:
+            self.current_tick = tick - 1
+        # A deadline that has already passed fires on the next advance
+        tick = max(tick, self.current_tick + 1)
+        self.buckets[tick % self.num_buckets].append((tick, slot, generation))
+
+    def advance(self, now_ms):
+        """Returns the (slot, generation) of every entry whose deadline is at or before now_ms."""
+        if self.current_tick is None:
+            return []
+
+        now_tick = math.floor(now_ms / self.tick_ms)
+        expired = []
+        # Every bucket holds entries for all the ticks that map onto it, so each bucket needs to be visited at most once
+        for tick in range(self.current_tick + 1, min(now_tick, self.current_tick + self.num_buckets) + 1):
+            bucket = self.buckets[tick % self.num_buckets]
+            if not bucket:
+                continue
+            remaining = []
+            for entry in bucket:
+                if entry[0] <= now_tick:
+                    expired.append((entry[1], entry[2]))
+                else:
+                    remaining.append(entry)
+            self.buckets[tick % self.num_buckets] = remaining
+        self.current_tick = max(self.current_tick, now_tick)
+        return expired
+
+
+class PerSpeakerVadEngine:
+    """
+    Voice activity detection and utterance segmentation for many speakers at once.
+
+    Each speaker gets a slot, and the per-speaker state lives in arrays indexed by slot. Audio is
+    cut into frames that webrtcvad accepts, with the leftover samples carried over to the speaker's
+    next chunk. Utterances end when their buffer is full, or when the speaker has been silent for
+    silence_duration_limit seconds, which is tracked by a SilenceTimerWheel.
+
+    Finished utterances are returned as (speaker_id, audio_data, first_nonsilent_ms, flush_reason) tuples.
+    """
+
+    def __init__(self, *, sample_rate, utterance_size_limit, silence_duration_limit, rms_threshold=0.01, frame_duration_ms=10, initial_capacity=16):
+        if frame_duration_ms not in VAD_FRAME_DURATIONS_MS:
+            raise ValueError(f"Invalid VAD frame duration {frame_duration_ms}ms, must be one of {VAD_FRAME_DURATIONS_MS}")
+
+        self.sample_rate = sample_rate
+        self.utterance_size_limit = utterance_size_limit
+        self.silence_duration_limit_ms = silence_duration_limit * 1000
+        self.rms_threshold = rms_threshold
+        self.frame_bytes = sample_rate * frame_duration_ms // 1000 * 2
+        # For sample rates webrtcvad doesn't support, we can only go by the RMS
+        self.vad = webrtcvad.Vad() if sample_rate in VAD_SAMPLE_RATES else None
+
+        self.timer_wheel = SilenceTimerWheel()
+
+        self.slot_by_speaker_id = {}
+        self.speaker_ids = []
+        self.utterance_buffers = []
+        self.frame_remainders = []
+        self.capacity = 0
+        self.num_slots = 0
+        self.in_utterance = np.zeros(0, dtype=bool)
+        self.last_vad_decision = np.zeros(0, dtype=bool)
+        self.generation = np.zeros(0, dtype=np.int64)
+        self.first_nonsilent_ms = np.zeros(0, dtype=np.float64)
+        self.last_nonsilent_ms = np.zeros(0, dtype=np.float64)
+        self.grow(initial_capacity)
+
+    def grow(self, capacity):
+        def resized(array):
+            new_array = np.zeros(capacity, dtype=array.dtype)
+            new_array[: self.num_slots] = array[: self.num_slots]
+            return new_array
+
+        self.in_utterance = resized(self.in_utterance)
+        self.last_vad_decision = resized(self.last_vad_decision)
+        self.generation = resized(self.generation)
+        self.first_nonsilent_ms = resized(self.first_nonsilent_ms)
+        self.last_nonsilent_ms = resized(self.last_nonsilent_ms)
+        self.capacity = capacity
+
+    def slot_for_speaker(self, speaker_id):
+        slot = self.slot_by_speaker_id.get(speaker_id)
+        if slot is not None:
+            return slot
+
+        if self.num_slots == self.capacity:
+            self.grow(self.capacity * 2)
+        slot = self.num_slots
+        self.num_slots += 1
+        self.slot_by_speaker_id[speaker_id] = slot
+        self.speaker_ids.append(speaker_id)
+        self.utterance_buffers.append(bytearray())
+        self.frame_remainders.append(b"")
+        return slot
+
+    def is_speech(self, slot, chunk_bytes, normalized_rms=None):
+        if normalized_rms is None:
+            normalized_rms = calculate_normalized_rms(chunk_bytes)
+
+        if normalized_rms < self.rms_threshold:
+            # The carried over samples belonged to speech that has now ended
+            self.frame_remainders[slot] = b""
+            self.last_vad_decision[slot] = False
+            return False
+
+        if self.vad is None:
+            return True
+
+        remainder = self.frame_remainders[slot]
+        audio = remainder + chunk_bytes if remainder else chunk_bytes
+        audio_view = memoryview(audio)
+        num_frames = len(audio) // self.frame_bytes
+
+        if num_frames == 0:
+            # Not enough audio for a frame yet, so go with what the last frame said
+            self.frame_remainders[slot] = bytes(audio)
+            return bool(self.last_vad_decision[slot])
+
+        speech_detected = False
+        for frame_index in range(num_frames):
+            if self.vad.is_speech(audio_view[frame_index * self.frame_bytes : (frame_index + 1) * self.frame_bytes], self.sample_rate):
+                speech_detected = True
+                break
+
+        self.frame_remainders[slot] = bytes(audio_view[num_frames * self.frame_bytes :])
+        self.last_vad_decision[slot] = speech_detected
+        return speech_detected
+
+    def add_chunk(self, speaker_id, chunk_time_ms, chunk_bytes, normalized_rms=None):
+        slot = self.slot_for_speaker(speaker_id)
+        audio_is_silent = not self.is_speech(slot, chunk_bytes, normalized_rms)
+
+        if not self.in_utterance[slot]:
+            if audio_is_silent:
+                return []
+            self.in_utterance[slot] = True
+            self.first_nonsilent_ms[slot] = chunk_time_ms
+            self.last_nonsilent_ms[slot] = chunk_time_ms
+            self.timer_wheel.schedule(slot, self.generation[slot], chunk_time_ms + self.silence_duration_limit_ms)
+        elif not audio_is_silent:
+            # The timer wheel entry isn't moved, it gets rescheduled when it fires
+            self.last_nonsilent_ms[slot] = chunk_time_ms
+
+        self.utterance_buffers[slot].extend(chunk_bytes)
+
+        if len(self.utterance_buffers[slot]) >= self.utterance_size_limit:
+            return [self.finish_utterance(slot, "buffer_full")]
+        return []
+
+    def expire_silent_speakers(self, now_ms):
+        finished_utterances = []
+        for slot, generation in self.timer_wheel.advance(now_ms):
+            # Skip entries for utterances that have already finished
+            if generation != self.generation[slot] or not self.in_utterance[slot]:
+                continue
+            deadline_ms = self.last_nonsilent_ms[slot] + self.silence_duration_limit_ms
+            if deadline_ms <= now_ms:
+                finished_utterances.append(self.finish_utterance(slot, "silence_limit"))
+            else:
+                self.timer_wheel.schedule(slot, generation, deadline_ms)
+        return finished_utterances
+
+    def flush_all(self, reason):
+        return [self.finish_utterance(slot, reason) for slot in np.flatnonzero(self.in_utterance[: self.num_slots])]
+
+    def finish_utterance(self, slot, reason):
+        finished_utterance = (self.speaker_ids[slot], bytes(self.utterance_buffers[slot]), int(self.first_nonsilent_ms[slot]), reason)
+        self.utterance_buffers[slot] = bytearray()
+        self.in_utterance[slot] = False
+        self.generation[slot] += 1
+        return finished_utterance
+
+    def active_speaker_count(self):
+        return int(np.count_nonzero(self.in_utterance[: self.num_slots]))
@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+
+from django.db import connection
+
+from .latency_histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceWorker:
+    """
+    Runs the bot controller's database writes on a background thread, so the GLib main loop never waits on the database.
+
+    Jobs run one at a time, in the order they were submitted. When the queue is full, the job's backpressure policy decides what happens:
+    BLOCK waits up to block_timeout_seconds for room and then runs the job on the caller's thread, and is for writes that mustn't be lost,
+    like transcript utterances. DROP drops the job.
+    A job with a coalesce_key replaces a job with the same key that hasn't run yet, for writes where only the latest one matters, like heartbeats.
+    Coalesced jobs aren't queued behind the other jobs, they run as soon as the job that's running has finished.
+    """
+
+    BLOCK = "block"
+    DROP = "drop"
+
+    DEFAULT_MAX_QUEUE_SIZE = 1000
+    DEFAULT_BLOCK_TIMEOUT_SECONDS = 2
+
+    def __init__(self, *, name, max_queue_size=DEFAULT_MAX_QUEUE_SIZE, block_timeout_seconds=DEFAULT_BLOCK_TIMEOUT_SECONDS):
+        self.name = name
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.block_timeout_seconds = block_timeout_seconds
+        # The latest job for each coalesce key. They're kept out of the queue, so they never wait behind it or take up room in it.
+        self.coalesced_jobs = {}
+        self.coalesced_jobs_lock = threading.Lock()
+
+        self.metrics = {
+            "jobs_run": 0,
+            "jobs_failed": 0,
+            "jobs_dropped": 0,
+            "jobs_coalesced": 0,
+            "jobs_run_inline": 0,
+            "submits_blocked": 0,
+            "submit_blocked_ms": 0,
+            "submits_timed_out": 0,
+            "largest_queue_size": 0,
+        }
+        self.queue_wait_histogram = LatencyHistogram()
+        self.job_duration_histogram = LatencyHistogram()
+
+        self.stopped = False
+        self.worker_thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.worker_thread.start()
+
+    def submit(self, job, *, policy=BLOCK, coalesce_key=None):
+        if self.stopped:
+            # Nothing is left to run it once the worker has been cleaned up
+            self.metrics["jobs_run_inline"] += 1
+            self.run_job(job, submitted_at=time.monotonic())
+            return True
+
+        if coalesce_key is not None:
+            with self.coalesced_jobs_lock:
+                already_pending = coalesce_key in self.coalesced_jobs
+                self.coalesced_jobs[coalesce_key] = (job, time.monotonic())
+            if already_pending:
+                self.metrics["jobs_coalesced"] += 1
+            else:
+                self.wake()
+            return True
+
+        item = ("job", (job, time.monotonic()))
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if policy == self.DROP:
+                self.metrics["jobs_dropped"] += 1
+                logger.warning(f"{self.name} queue is full, dropped a job")
+                return False
+            self.metrics["submits_blocked"] += 1
+            logger.warning(f"{self.name} queue is full, waiting for room")
+            blocked_at = time.monotonic()
+            try:
+                self.queue.put(item, timeout=self.block_timeout_seconds)
+            except queue.Full:
+                # Waiting any longer would stall the caller's main loop, and the job mustn't be lost, so it runs here instead
+                self.metrics["submits_timed_out"] += 1
+                self.metrics["jobs_run_inline"] += 1
+                logger.warning(f"{self.name} queue is still full after {self.block_timeout_seconds}s, running the job inline")
+                self.run_job(job, submitted_at=blocked_at)
+            finally:
+                self.metrics["submit_blocked_ms"] += int((time.monotonic() - blocked_at) * 1000)
+
+        self.metrics["largest_queue_size"] = max(self.metrics["largest_queue_size"], self.queue.qsize())
+        return True
+
+    def wake(self):
+        # Wakes the worker up if it's waiting for a job. If the queue is full the worker is busy, and runs the coalesced jobs before its next job anyway.
+        try:
+            self.queue.put_nowait(("wake", None))
+        except queue.Full:
+            pass
+
+    def run_coalesced_jobs(self):
+        with self.coalesced_jobs_lock:
+            coalesced_jobs = list(self.coalesced_jobs.values())
+            self.coalesced_jobs = {}
+        for job, submitted_at in coalesced_jobs:
+            self.run_job(job, submitted_at)
+
+    def run(self):
+        try:
+            while True:
+                kind, value = self.queue.get()
+                try:
+                    self.run_coalesced_jobs()
+                    if kind == "stop":
+                        return
+                    if kind == "job":
+                        job, submitted_at = value
+                        self.run_job(job, submitted_at)
+                finally:
+                    self.queue.task_done()
+        finally:
+            # Django opens a connection per thread, so we need to close this thread's one ourselves
+            connection.close()
+
+    def run_job(self, job, submitted_at):
+        started_at = time.monotonic()
+        self.queue_wait_histogram.record((started_at - submitted_at) * 1000)
+        try:
+            job()
+            self.metrics["jobs_run"] += 1
+        except Exception as e:
+            self.metrics["jobs_failed"] += 1
+            logger.exception(f"Error running {self.name} job: {e}")
+        self.job_duration_histogram.record((time.monotonic() - started_at) * 1000)
+
+    def flush(self):
+        """Waits until every job submitted so far has run."""
+        if self.stopped:
+            return
+        self.queue.join()
+        with self.coalesced_jobs_lock:
+            coalesced_jobs_pending = bool(self.coalesced_jobs)
+        if coalesced_jobs_pending:
+            # The queue is empty, so this wakes the worker up to run them
+            self.queue.put(("wake", None))
+            self.queue.join()
+
+    def get_metrics(self):
+        return {
+            **self.metrics,
+            "queue_size": self.queue.qsize(),
+            "queue_wait": self.queue_wait_histogram.get_metrics(),
+            "job_duration": self.job_duration_histogram.get_metrics(),
+        }
+
+    def cleanup(self):
+        if self.stopped:
+            return
+        # Jobs submitted from now on run straight away. The stop marker goes behind every job that's already queued, so they all run first.
+        self.stopped = True
+        self.queue.put(("stop", None))
+        self.worker_thread.join()
+        logger.info(f"{self.name} metrics: {self.get_metrics()}")
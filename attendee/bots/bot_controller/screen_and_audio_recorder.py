@@ -1,13 +1,20 @@
 import logging
 import os
 import subprocess
+import threading
 
 logger = logging.getLogger(__name__)
 
 
 class ScreenAndAudioRecorder:
-    def __init__(self, file_location, recording_dimensions, audio_only):
+    OUTPUT_READ_SIZE = 256 * 1024
+
+    def __init__(self, file_location, recording_dimensions, audio_only, on_output_data_callback=None):
         self.file_location = file_location
+        # When set, ffmpeg writes a streamable recording to stdout and the data is handed to this callback
+        # as it is produced, instead of being written to file_location
+        self.on_output_data_callback = on_output_data_callback
+        self.output_reader_thread = None
         self.ffmpeg_proc = None
         # Screen will have buffer, we will crop to the recording dimensions
         self.screen_dimensions = (recording_dimensions[0] + 10, recording_dimensions[1] + 10)
@@ -38,13 +45,42 @@ class ScreenAndAudioRecorder:
                 "44100",  # Sample rate
                 "-ac",
                 "1",  # Mono
-                self.file_location,
+                *self.output_args(),
             ]
         else:
-            ffmpeg_cmd = ["ffmpeg", "-y", "-thread_queue_size", "4096", "-framerate", "30", "-video_size", f"{self.screen_dimensions[0]}x{self.screen_dimensions[1]}", "-f", "x11grab", "-draw_mouse", "0", "-probesize", "32", "-i", display_var, "-thread_queue_size", "4096", "-f", "alsa", "-i", "default", "-vf", f"crop={self.recording_dimensions[0]}:{self.recording_dimensions[1]}:10:10", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", "30", "-c:a", "aac", "-strict", "experimental", "-b:a", "128k", self.file_location]
+            ffmpeg_cmd = ["ffmpeg", "-y", "-thread_queue_size", "4096", "-framerate", "30", "-video_size", f"{self.screen_dimensions[0]}x{self.screen_dimensions[1]}", "-f", "x11grab", "-draw_mouse", "0", "-probesize", "32", "-i", display_var, "-thread_queue_size", "4096", "-f", "alsa", "-i", "default", "-vf", f"crop={self.recording_dimensions[0]}:{self.recording_dimensions[1]}:10:10", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", "30", "-c:a", "aac", "-strict", "experimental", "-b:a", "128k", *self.output_args()]
 
         logger.info(f"Starting FFmpeg command: {' '.join(ffmpeg_cmd)}")
-        self.ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        if self.on_output_data_callback:
+            self.ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            self.output_reader_thread = threading.Thread(target=self.read_output, args=(self.ffmpeg_proc.stdout,), daemon=True)
+            self.output_reader_thread.start()
+        else:
+            self.ffmpeg_proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+    def output_args(self):
+        if not self.on_output_data_callback:
+            return [self.file_location]
+
+        if self.audio_only:
+            return ["-f", "mp3", "pipe:1"]
+
+        # A fragmented MP4 never needs to seek back to the start of the file, so it can be written to a pipe
+        # and uploaded as it is produced. The moov atom is written up front, so the result is already seekable.
+        if self.file_location and self.file_location.endswith(".webm"):
+            return ["-f", "webm", "pipe:1"]
+        return ["-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4", "pipe:1"]
+
+    def read_output(self, output_pipe):
+        while True:
+            data = output_pipe.read(self.OUTPUT_READ_SIZE)
+            if not data:
+                break
+            try:
+                self.on_output_data_callback(data)
+            except Exception as e:
+                logger.error(f"Error handling recorder output data: {e}")
+        logger.info("Screen and audio recorder output stream ended")
 
     # Pauses by muting the audio and showing a black xterm covering the entire screen
     def pause_recording(self):
@@ -87,6 +123,10 @@ class ScreenAndAudioRecorder:
         self.ffmpeg_proc.terminate()
         self.ffmpeg_proc.wait()
         self.ffmpeg_proc = None
+        # Make sure everything ffmpeg wrote has been handed off before we return
+        if self.output_reader_thread:
+            self.output_reader_thread.join()
+            self.output_reader_thread = None
         logger.info(f"Stopped screen and audio recorder for display with dimensions {self.screen_dimensions} and file location {self.file_location}")
 
     def get_seekable_path(self, path):
@@ -98,6 +138,11 @@ class ScreenAndAudioRecorder:
         return f"{base}.seekable{ext}"
 
     def cleanup(self):
+        # When streaming the output there is no local file to finalize
+        if self.on_output_data_callback:
+            self.stop_recording()
+            return
+
         input_path = self.file_location
 
         # If no input path at all, then we aren't trying to generate a file at all
@@ -1,6 +1,8 @@
+import json
 import logging
 import os
 import threading
+import time
 from io import BytesIO
 from queue import Queue
 
@@ -9,22 +11,101 @@ import boto3
 logger = logging.getLogger(__name__)
 
 
+class StreamingUploadPartTracker:
+    """Persists the state of an in-progress multipart upload in Redis, so that if the bot
+    process is restarted, the parts that were already uploaded are not lost.
+
+    The state is kept under the recording's original key, and says which object the
+    upload is for, because a restarted process uploads to a new object (see StreamingUploader)."""
+
+    # S3 keeps incomplete multipart uploads around until they are aborted, so the tracker
+    # only needs to outlive the longest meeting we expect.
+    TTL_SECONDS = 7 * 24 * 60 * 60
+
+    def __init__(self, redis_client, bucket, key):
+        self.redis_client = redis_client
+        self.redis_key = f"streaming_upload:{bucket}:{key}"
+
+    def load(self):
+        try:
+            state_json = self.redis_client.get(self.redis_key)
+        except Exception as e:
+            logger.warning(f"Error loading streaming upload state from {self.redis_key}: {e}")
+            return None
+        if not state_json:
+            return None
+        return json.loads(state_json)
+
+    def save(self, upload_id, parts, key=None, segment=0, previous_keys=None):
+        state = {"upload_id": upload_id, "parts": parts, "key": key, "segment": segment, "previous_keys": previous_keys or []}
+        try:
+            self.redis_client.set(self.redis_key, json.dumps(state), ex=self.TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Error saving streaming upload state to {self.redis_key}: {e}")
+
+    def clear(self):
+        try:
+            self.redis_client.delete(self.redis_key)
+        except Exception as e:
+            logger.warning(f"Error clearing streaming upload state at {self.redis_key}: {e}")
+
+
 class StreamingUploader:
-    def __init__(self, bucket, key, chunk_size=5242880):  # 5MB chunks
+    """Uploads a recording to S3 in parts while it is being produced.
+
+    Pausing and resuming the recording keeps the same muxer running, so the upload is
+    one continuous stream. A restarted bot process starts a new muxer though, whose
+    output begins with its own init segment. Appending that to the object the previous
+    process was uploading would leave a file most players stop reading at the first
+    moov box, so on restart the previous upload is completed as an object of its own,
+    and the new process uploads to the next segment's key (recording_1.mp4, recording_2.mp4, ...).
+
+    If spool_file_path is given, the data is also written there, so that the recording can
+    still be uploaded in one go if the multipart upload fails.
+    """
+
+    MAX_PART_UPLOAD_ATTEMPTS = 5
+
+    def __init__(self, bucket, key, chunk_size=5242880, part_tracker=None, spool_file_path=None):  # 5MB chunks
         self.s3_client = boto3.client("s3", endpoint_url=os.getenv("AWS_ENDPOINT_URL"))
         self.bucket = bucket
+        self.base_key = key
         self.key = key
+        self.segment = 0
+        # The objects completed by the processes before a restart
+        self.previous_keys = []
         self.chunk_size = chunk_size
+        self.part_tracker = part_tracker
         self.buffer = BytesIO()
         self.upload_id = None
         self.parts = []
+        self.parts_lock = threading.Lock()
         self.part_number = 1
+        self.failed_part_numbers = []
+        self.spool_file_path = spool_file_path
+        self.spool_file = open(spool_file_path, "wb") if spool_file_path else None
 
         # Add upload queue and worker thread
         self.upload_queue = Queue()
         self.upload_thread = threading.Thread(target=self._upload_worker, daemon=True)
         self.upload_thread.start()
 
+    def _upload_part_with_retries(self, chunk, part_num):
+        for attempt in range(1, self.MAX_PART_UPLOAD_ATTEMPTS + 1):
+            try:
+                return self.s3_client.upload_part(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    PartNumber=part_num,
+                    UploadId=self.upload_id,
+                    Body=chunk,
+                )
+            except Exception as e:
+                if attempt == self.MAX_PART_UPLOAD_ATTEMPTS:
+                    raise
+                logger.warning(f"Error uploading part {part_num} of {self.key} (attempt {attempt} / {self.MAX_PART_UPLOAD_ATTEMPTS}): {e}")
+                time.sleep(2**attempt)
+
     def _upload_worker(self):
         """Background thread to handle uploads"""
         while True:
@@ -33,21 +114,24 @@ class StreamingUploader:
                 if chunk is None:  # Sentinel value to stop the thread
                     break
 
-                response = self.s3_client.upload_part(
-                    Bucket=self.bucket,
-                    Key=self.key,
-                    PartNumber=part_num,
-                    UploadId=self.upload_id,
-                    Body=chunk,
-                )
+                response = self._upload_part_with_retries(chunk, part_num)
+
+                with self.parts_lock:
+                    self.parts.append({"PartNumber": part_num, "ETag": response["ETag"], "Size": len(chunk)})
+                    parts_snapshot = list(self.parts)
 
-                self.parts.append({"PartNumber": part_num, "ETag": response["ETag"]})
+                # Record the part so that it can be reused if the process restarts
+                if self.part_tracker:
+                    self.save_state(parts_snapshot)
             except Exception as e:
-                logging.error(f"Upload error: {e}")
+                logger.error(f"Upload error: {e}")
+                self.failed_part_numbers.append(part_num)
             finally:
                 self.upload_queue.task_done()
 
     def upload_part(self, data):
+        if self.spool_file:
+            self.spool_file.write(data)
         self.buffer.write(data)
 
         # Upload complete chunks
@@ -64,13 +148,23 @@ class StreamingUploader:
             self.buffer = BytesIO()
             self.buffer.write(remaining)
 
+    def bytes_uploaded(self):
+        with self.parts_lock:
+            return sum(part.get("Size", 0) for part in self.parts)
+
     def complete_upload(self):
-        # If we never started a multipart upload (len(self.parts) == 0), do a regular upload
-        if len(self.parts) == 0:
+        self.close_spool_file()
+
+        # If this process never queued a part, do a regular upload
+        if self.part_number == 1:
             self.buffer.seek(0)
             data = self.buffer.getvalue()
             self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=data)
-            logger.info("len(self.parts) == 0, so did a regular upload")
+            logger.info("No parts were queued, so did a regular upload")
+            self._abort_multipart_upload()
+            self._stop_worker()
+            if self.part_tracker:
+                self.part_tracker.clear()
             return
 
         # Upload final part if any data remains
@@ -78,21 +172,108 @@ class StreamingUploader:
             self.buffer.seek(0)
             final_chunk = self.buffer.getvalue()
             self.upload_queue.put((final_chunk, self.part_number))
+            self.part_number += 1
+            self.buffer = BytesIO()
 
         # Wait for all uploads to complete
         self.upload_queue.join()
-        self.upload_queue.put((None, None))  # Stop the worker thread
-        self.upload_thread.join()
+        self._stop_worker()
+
+        if self.failed_part_numbers:
+            raise Exception(f"Failed to upload parts {self.failed_part_numbers} of {self.key}. The upload state has been kept so the uploaded parts can be completed by a restarted process.")
 
         # Complete multipart upload
         self.s3_client.complete_multipart_upload(
             Bucket=self.bucket,
             Key=self.key,
             UploadId=self.upload_id,
-            MultipartUpload={"Parts": sorted(self.parts, key=lambda x: x["PartNumber"])},
+            MultipartUpload={"Parts": [{"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in sorted(self.parts, key=lambda x: x["PartNumber"])]},
         )
+        logger.info(f"Completed multipart upload of {self.key} with {len(self.parts)} parts ({self.bytes_uploaded()} bytes)")
+
+        if self.part_tracker:
+            self.part_tracker.clear()
+
+    def abort_upload(self):
+        """Gives up on the multipart upload, e.g. because the spooled copy of the recording was uploaded instead."""
+        self.close_spool_file()
+        self._stop_worker()
+        self._abort_multipart_upload()
+        if self.part_tracker:
+            self.part_tracker.clear()
+
+    def close_spool_file(self):
+        if self.spool_file and not self.spool_file.closed:
+            self.spool_file.close()
+
+    def _stop_worker(self):
+        if not self.upload_thread.is_alive():
+            return
+        self.upload_queue.put((None, None))  # Stop the worker thread
+        self.upload_thread.join()
+
+    def _abort_multipart_upload(self):
+        if not self.upload_id:
+            return
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            logger.warning(f"Error aborting unused multipart upload for {self.key}: {e}")
+
+    def _list_uploaded_parts(self, upload_id, key):
+        parts = []
+        paginator = self.s3_client.get_paginator("list_parts")
+        for page in paginator.paginate(Bucket=self.bucket, Key=key, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                parts.append({"PartNumber": part["PartNumber"], "ETag": part["ETag"], "Size": part["Size"]})
+        return parts
+
+    def save_state(self, parts):
+        self.part_tracker.save(self.upload_id, parts, key=self.key, segment=self.segment, previous_keys=self.previous_keys)
+
+    def segment_key(self, segment):
+        if segment == 0:
+            return self.base_key
+        stem, extension = os.path.splitext(self.base_key)
+        return f"{stem}_{segment}{extension}"
+
+    def _complete_previous_segment(self):
+        """Completes the upload a previous process left unfinished, as an object of its own, and moves on to the next segment's key."""
+        if not self.part_tracker:
+            return
+
+        saved_state = self.part_tracker.load()
+        if not saved_state or not saved_state.get("upload_id"):
+            return
+
+        previous_key = saved_state.get("key") or self.base_key
+        self.previous_keys = saved_state.get("previous_keys", [])
+        self.segment = saved_state.get("segment", 0) + 1
+        self.key = self.segment_key(self.segment)
+
+        # S3 is the source of truth for which parts actually made it, the tracker just remembers the upload id
+        try:
+            uploaded_parts = self._list_uploaded_parts(saved_state["upload_id"], previous_key)
+            if uploaded_parts:
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=previous_key,
+                    UploadId=saved_state["upload_id"],
+                    MultipartUpload={"Parts": [{"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in sorted(uploaded_parts, key=lambda x: x["PartNumber"])]},
+                )
+                self.previous_keys = self.previous_keys + [previous_key]
+                logger.info(f"Completed multipart upload {saved_state['upload_id']} left by a previous process as {previous_key}, with {len(uploaded_parts)} parts")
+            else:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=previous_key, UploadId=saved_state["upload_id"])
+        except Exception as e:
+            logger.warning(f"Could not complete multipart upload {saved_state['upload_id']} left by a previous process for {previous_key}: {e}")
 
     def start_upload(self):
-        """Initialize the multipart upload and get the upload ID"""
+        """Initialize the multipart upload and get the upload ID. If a previous process already
+        started uploading this recording, its upload is completed first, and this one goes to the next segment's key."""
+        self._complete_previous_segment()
+
         response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
         self.upload_id = response["UploadId"]
+        if self.part_tracker:
+            self.save_state([])
@@ -5,7 +5,7 @@ from google.cloud import texttospeech
 from bots.models import Credentials
 
 
-def generate_audio_from_text(bot, text, settings, sample_rate):
+def generate_audio_from_text(bot, text, settings, sample_rate, get_credentials_callback=None):
     """
     Generate audio from text using text-to-speech settings.
 
@@ -17,6 +17,8 @@ def generate_audio_from_text(bot, text, settings, sample_rate):
                 voice_language_code (str): Language code (e.g., "en-US")
                 voice_name (str): Name of the voice to use
         sample_rate (int): The sample rate in Hz
+        get_credentials_callback (callable, optional): Returns the decrypted credentials of a given type.
+            If not provided, they're looked up from the bot's project.
     Returns:
         tuple: (bytes, int) containing:
             - Audio data in LINEAR16 format
@@ -24,14 +26,18 @@ def generate_audio_from_text(bot, text, settings, sample_rate):
     """
 
     # Additional providers will be added, for now we only support Google TTS
-    google_tts_credentials = bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.GOOGLE_TTS).first()
+    if get_credentials_callback:
+        google_tts_credentials = get_credentials_callback(Credentials.CredentialTypes.GOOGLE_TTS)
+    else:
+        google_tts_credentials_record = bot.project.credentials.filter(credential_type=Credentials.CredentialTypes.GOOGLE_TTS).first()
+        google_tts_credentials = google_tts_credentials_record.get_credentials() if google_tts_credentials_record else None
 
-    if not google_tts_credentials:
+    if google_tts_credentials is None:
         raise ValueError("Could not find Google Text-to-Speech credentials.")
 
     try:
         # Create client with credentials
-        client = texttospeech.TextToSpeechClient.from_service_account_info(json.loads(google_tts_credentials.get_credentials().get("service_account_json", {})))
+        client = texttospeech.TextToSpeechClient.from_service_account_info(json.loads(google_tts_credentials.get("service_account_json", {})))
     except (ValueError, json.JSONDecodeError) as e:
         raise ValueError("Invalid Google Text-to-Speech credentials format: " + str(e)) from e
     except Exception as e:
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionMicroBatcher:
+    """
+    Groups short utterances so several of them can be transcribed with a single provider request.
+
+    A batch is dispatched as soon as it has max_batch_size utterances, or once its oldest utterance has waited
+    max_added_latency_ms. Utterances that are too long to benefit from batching are dispatched on their own right away.
+    Utterances are added from the utterance batch writer's thread, and due batches are flushed from the main loop.
+    """
+
+    MAX_BATCHED_UTTERANCE_DURATION_MS = 5000
+
+    def __init__(self, *, max_batch_size, max_added_latency_ms, dispatch_batch_callback, dispatch_utterances_callback):
+        self.max_batch_size = max_batch_size
+        self.max_added_latency_seconds = max_added_latency_ms / 1000
+        self.dispatch_batch_callback = dispatch_batch_callback
+        self.dispatch_utterances_callback = dispatch_utterances_callback
+
+        self.lock = threading.Lock()
+        self.pending_utterance_ids = []
+        self.oldest_pending_time = None
+
+        self.metrics = {
+            "batches_dispatched": 0,
+            "utterances_batched": 0,
+            "utterances_dispatched_individually": 0,
+        }
+
+    def add_utterances(self, utterances):
+        individual_utterance_ids = []
+        full_batches = []
+        with self.lock:
+            for utterance in utterances:
+                if utterance.duration_ms > self.MAX_BATCHED_UTTERANCE_DURATION_MS:
+                    individual_utterance_ids.append(utterance.id)
+                    continue
+                if not self.pending_utterance_ids:
+                    self.oldest_pending_time = time.monotonic()
+                self.pending_utterance_ids.append(utterance.id)
+                if len(self.pending_utterance_ids) >= self.max_batch_size:
+                    full_batches.append(self.take_pending_utterance_ids())
+
+        if individual_utterance_ids:
+            self.dispatch_utterances(individual_utterance_ids)
+        for batch in full_batches:
+            self.dispatch_batch(batch)
+
+    def flush_due_batches(self):
+        with self.lock:
+            if not self.pending_utterance_ids or time.monotonic() - self.oldest_pending_time < self.max_added_latency_seconds:
+                return
+            batch = self.take_pending_utterance_ids()
+        self.dispatch_batch(batch)
+
+    def flush(self):
+        with self.lock:
+            batch = self.take_pending_utterance_ids()
+        if batch:
+            self.dispatch_batch(batch)
+
+    def take_pending_utterance_ids(self):
+        batch = self.pending_utterance_ids
+        self.pending_utterance_ids = []
+        self.oldest_pending_time = None
+        return batch
+
+    def dispatch_batch(self, utterance_ids):
+        # A batch of one is no cheaper than transcribing the utterance on its own
+        if len(utterance_ids) == 1:
+            self.dispatch_utterances(utterance_ids)
+            return
+        self.metrics["batches_dispatched"] += 1
+        self.metrics["utterances_batched"] += len(utterance_ids)
+        logger.info(f"Dispatching batch of {len(utterance_ids)} utterances for transcription")
+        self.dispatch_batch_callback(utterance_ids)
+
+    def dispatch_utterances(self, utterance_ids):
+        self.metrics["utterances_dispatched_individually"] += len(utterance_ids)
+        self.dispatch_utterances_callback(utterance_ids)
+
+    def get_metrics(self):
+        return dict(self.metrics)
@@ -0,0 +1,175 @@
+import logging
+import queue
+import threading
+import time
+
+from django.db import connection, transaction
+
+from bots.models import AudioChunk, Participant, PendingUtteranceManager, RecordingManager, Utterance
+
+logger = logging.getLogger(__name__)
+
+
+class UtteranceBatchWriter:
+    """
+    Write-behind buffer for the per-participant audio chunks produced during a meeting.
+
+    The GLib main loop only enqueues the chunks. A background thread writes them with
+    bulk_create every flush interval (or sooner once max_batch_size chunks are waiting),
+    and then hands the new utterances to on_utterances_created_callback.
+    """
+
+    DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+    DEFAULT_MAX_BATCH_SIZE = 50
+
+    def __init__(self, *, bot, save_utterances, on_utterances_created_callback, flush_interval_seconds=DEFAULT_FLUSH_INTERVAL_SECONDS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self.bot = bot
+        self.save_utterances = save_utterances
+        self.on_utterances_created_callback = on_utterances_created_callback
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch_size = max_batch_size
+
+        self.queue = queue.Queue()
+        # Participants never change uuid during a meeting, so once we have the row we can keep it
+        self.participants = {}
+        # Serializes the background flushes with the explicit ones done when the meeting ends
+        self.flush_lock = threading.Lock()
+
+        self.metrics = {
+            "audio_chunks_written": 0,
+            "utterances_written": 0,
+            "audio_chunks_dropped": 0,
+            "batches_written": 0,
+            "batches_failed": 0,
+            "largest_batch_size": 0,
+            "last_batch_duration_ms": 0,
+            "max_batch_duration_ms": 0,
+        }
+
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.writer_thread = threading.Thread(target=self.run, daemon=True)
+        self.writer_thread.start()
+
+    def add_audio_chunk(self, message, timestamp_ms):
+        self.queue.put((message, timestamp_ms))
+        if self.queue.qsize() >= self.max_batch_size:
+            self.wake_event.set()
+
+    def get_metrics(self):
+        return {**self.metrics, "pending_audio_chunks": self.queue.qsize()}
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                self.wake_event.wait(self.flush_interval_seconds)
+                self.wake_event.clear()
+                self.flush()
+        finally:
+            # Django opens a connection per thread, so we need to close this thread's one ourselves
+            connection.close()
+
+    def flush(self):
+        with self.flush_lock:
+            while True:
+                batch = self.get_next_batch()
+                if not batch:
+                    return
+                try:
+                    self.write_batch(batch)
+                except Exception as e:
+                    self.metrics["batches_failed"] += 1
+                    self.metrics["audio_chunks_dropped"] += len(batch)
+                    logger.exception(f"Error writing batch of {len(batch)} audio chunks for bot {self.bot.object_id}: {e}")
+
+    def get_next_batch(self):
+        batch = []
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def get_participant(self, message):
+        participant = self.participants.get(message["participant_uuid"])
+        if participant is None:
+            participant, _ = Participant.objects.get_or_create(
+                bot=self.bot,
+                uuid=message["participant_uuid"],
+                defaults={
+                    "user_uuid": message["participant_user_uuid"],
+                    "full_name": message["participant_full_name"],
+                    "is_the_bot": message["participant_is_the_bot"],
+                    "is_host": message["participant_is_host"],
+                },
+            )
+            self.participants[message["participant_uuid"]] = participant
+        return participant
+
+    def write_batch(self, batch):
+        start_time = time.monotonic()
+
+        # One lookup per batch instead of one per chunk
+        recording_in_progress = RecordingManager.get_recording_in_progress(self.bot)
+        if recording_in_progress is None:
+            logger.warning(f"Warning: No recording in progress found so cannot save {len(batch)} individual audio utterances.")
+            self.metrics["audio_chunks_dropped"] += len(batch)
+            return
+
+        audio_chunks = []
+        for message, timestamp_ms in batch:
+            audio_chunk = AudioChunk(
+                recording=recording_in_progress,
+                audio_format=AudioChunk.AudioFormat.PCM,
+                timestamp_ms=timestamp_ms,
+                duration_ms=len(message["audio_data"]) / ((message["sample_rate"] / 1000) * 2),
+                sample_rate=message["sample_rate"],
+                source=AudioChunk.Sources.PER_PARTICIPANT_AUDIO,
+                participant=self.get_participant(message),
+            )
+            # Depending on the audio chunk storage setting, this may upload the audio
+            audio_chunk.set_audio_blob(message["audio_data"])
+            audio_chunks.append(audio_chunk)
+
+        utterances = []
+        with transaction.atomic():
+            AudioChunk.objects.bulk_create(audio_chunks)
+
+            if self.save_utterances:
+                utterances = Utterance.objects.bulk_create(
+                    [
+                        Utterance(
+                            source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
+                            async_transcription=None,  # These utterances are created during the meeting, so they're not associated with an async transcription
+                            recording=recording_in_progress,
+                            participant=audio_chunk.participant,
+                            audio_chunk=audio_chunk,
+                            timestamp_ms=audio_chunk.timestamp_ms,
+                            duration_ms=audio_chunk.duration_ms,
+                        )
+                        for audio_chunk in audio_chunks
+                    ]
+                )
+                PendingUtteranceManager.add_pending_utterances(utterances)
+
+        if utterances:
+            RecordingManager.set_recording_transcription_in_progress(recording_in_progress)
+            self.on_utterances_created_callback(utterances)
+
+        batch_duration_ms = int((time.monotonic() - start_time) * 1000)
+        self.metrics["audio_chunks_written"] += len(audio_chunks)
+        self.metrics["utterances_written"] += len(utterances)
+        self.metrics["batches_written"] += 1
+        self.metrics["largest_batch_size"] = max(self.metrics["largest_batch_size"], len(batch))
+        self.metrics["last_batch_duration_ms"] = batch_duration_ms
+        self.metrics["max_batch_duration_ms"] = max(self.metrics["max_batch_duration_ms"], batch_duration_ms)
+        logger.info(f"Wrote batch of {len(audio_chunks)} audio chunks and {len(utterances)} utterances in {batch_duration_ms}ms")
+
+    def cleanup(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        self.writer_thread.join()
+        # Anything that was queued after the writer thread's last flush
+        self.flush()
+        logger.info(f"Utterance batch writer metrics: {self.get_metrics()}")
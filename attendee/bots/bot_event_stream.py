@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import time
+
+import redis
+import redis.asyncio
+
+logger = logging.getLogger(__name__)
+
+# One stream per Redis URL, so publishing an event doesn't open a new connection
+_bot_event_streams = {}
+
+
+def bot_event_stream_enabled():
+    return str(os.getenv("BOT_EVENT_STREAM_ENABLED", "false")).lower() == "true"
+
+
+def get_redis_url():
+    return os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+
+
+class BotEventStream:
+    """
+    Fans out bot events (transcript updates, state changes, participant events and chat messages) to clients with a
+    long-lived server-sent events connection, instead of polling the API.
+
+    Each event is added to a Redis stream for its bot and one for its project. Redis streams keep the most recent events,
+    so a client that reconnects passes the id of the last event it received and continues from there. Readers block on
+    the stream, so an idle connection costs nothing until there's an event or a keepalive is due.
+    """
+
+    # Roughly how many events are kept per stream for clients to resume from
+    MAX_STREAM_LENGTH = int(os.getenv("BOT_EVENT_STREAM_MAX_LENGTH", 10000))
+    # Streams expire this long after their last event, so the streams of bots that are done don't stay in Redis
+    STREAM_TTL_SECONDS = int(os.getenv("BOT_EVENT_STREAM_TTL_SECONDS", 24 * 60 * 60))
+    # How long an idle connection waits before sending a keepalive comment
+    KEEPALIVE_SECONDS = 15
+    # Connections are closed after this long, and the client reconnects from where it left off. Under a WSGI server each
+    # connection holds a worker, so this has to be shorter than the worker timeout.
+    MAX_CONNECTION_SECONDS = int(os.getenv("BOT_EVENT_STREAM_MAX_CONNECTION_SECONDS", 25))
+    # How long the client should wait before reconnecting, in milliseconds
+    RECONNECT_DELAY_MS = 1000
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    @staticmethod
+    def bot_stream_key(bot_object_id):
+        return f"bot_event_stream:bot:{bot_object_id}"
+
+    @staticmethod
+    def project_stream_key(project_object_id):
+        return f"bot_event_stream:project:{project_object_id}"
+
+    def publish(self, *, bot_object_id, project_object_id, trigger, data):
+        fields = {"bot_id": bot_object_id, "trigger": trigger, "data": json.dumps(data)}
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for stream_key in [self.bot_stream_key(bot_object_id), self.project_stream_key(project_object_id)]:
+            pipeline.xadd(stream_key, fields, maxlen=self.MAX_STREAM_LENGTH, approximate=True)
+            pipeline.expire(stream_key, self.STREAM_TTL_SECONDS)
+        pipeline.execute()
+
+    def delete_bot_events(self, *, bot_object_id, project_object_id):
+        """Deletes the bot's stream, and the bot's events from its project's stream."""
+        self.redis_client.delete(self.bot_stream_key(bot_object_id))
+        project_stream_key = self.project_stream_key(project_object_id)
+        start = "-"
+        while True:
+            entries = self.redis_client.xrange(project_stream_key, min=start, count=1000)
+            if not entries:
+                return
+            bot_event_ids = [event_id for event_id, fields in entries if self.decode(fields.get(b"bot_id", fields.get("bot_id"))) == bot_object_id]
+            if bot_event_ids:
+                self.redis_client.xdel(project_stream_key, *bot_event_ids)
+            # Exclusive range, so the last entry isn't read again
+            start = f"({self.decode(entries[-1][0])}"
+
+    @staticmethod
+    def decode(value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    @classmethod
+    def format_event(cls, event_id, fields):
+        fields = {cls.decode(key): cls.decode(value) for key, value in fields.items()}
+        event = {"bot_id": fields["bot_id"], "trigger": fields["trigger"], "data": json.loads(fields["data"])}
+        return f"id: {cls.decode(event_id)}\nevent: {fields['trigger']}\ndata: {json.dumps(event)}\n\n"
+
+    @classmethod
+    def start_message(cls):
+        return f"retry: {cls.RECONNECT_DELAY_MS}\n\n"
+
+    @staticmethod
+    def keepalive_message():
+        return ": keepalive\n\n"
+
+    @staticmethod
+    def wants_event(fields, triggers):
+        if not triggers:
+            return True
+        trigger = fields.get(b"trigger", fields.get("trigger"))
+        return BotEventStream.decode(trigger) in triggers
+
+    @staticmethod
+    def latest_event_id(latest_entries):
+        # "$" would only mean the latest event for the first read, so it's resolved to an id once, up front
+        return latest_entries[0][0] if latest_entries else "0-0"
+
+    def stream_events(self, stream_key, last_event_id, triggers=None):
+        """Yields server-sent events from the stream, starting after last_event_id, until the connection has been open for MAX_CONNECTION_SECONDS."""
+        yield self.start_message()
+        if last_event_id == "$":
+            last_event_id = self.latest_event_id(self.redis_client.xrevrange(stream_key, count=1))
+        connection_deadline = time.monotonic() + self.MAX_CONNECTION_SECONDS
+        while True:
+            block_seconds = min(self.KEEPALIVE_SECONDS, connection_deadline - time.monotonic())
+            if block_seconds <= 0:
+                return
+            response = self.redis_client.xread({stream_key: last_event_id}, block=int(block_seconds * 1000), count=100)
+            if not response:
+                yield self.keepalive_message()
+                continue
+            for event_id, fields in response[0][1]:
+                last_event_id = event_id
+                if self.wants_event(fields, triggers):
+                    yield self.format_event(event_id, fields)
+
+    async def stream_events_async(self, stream_key, last_event_id, triggers=None):
+        """The same as stream_events, for ASGI servers, where waiting for events doesn't hold a thread."""
+        yield self.start_message()
+        async_redis_client = redis.asyncio.from_url(get_redis_url())
+        try:
+            if last_event_id == "$":
+                last_event_id = self.latest_event_id(await async_redis_client.xrevrange(stream_key, count=1))
+            connection_deadline = time.monotonic() + self.MAX_CONNECTION_SECONDS
+            while True:
+                block_seconds = min(self.KEEPALIVE_SECONDS, connection_deadline - time.monotonic())
+                if block_seconds <= 0:
+                    return
+                response = await async_redis_client.xread({stream_key: last_event_id}, block=int(block_seconds * 1000), count=100)
+                if not response:
+                    yield self.keepalive_message()
+                    continue
+                for event_id, fields in response[0][1]:
+                    last_event_id = event_id
+                    if self.wants_event(fields, triggers):
+                        yield self.format_event(event_id, fields)
+        finally:
+            await async_redis_client.aclose()
+
+
+def get_bot_event_stream():
+    redis_url = get_redis_url()
+    if redis_url not in _bot_event_streams:
+        _bot_event_streams[redis_url] = BotEventStream(redis.from_url(redis_url))
+    return _bot_event_streams[redis_url]
+
+
+def publish_bot_event(webhook_trigger_type, bot, payload):
+    """Adds an event to the bot's event streams, once the transaction it happened in (if any) has committed."""
+    from django.db import transaction
+
+    from bots.models import WebhookTriggerTypes
+
+    event = {
+        "bot_object_id": bot.object_id,
+        "project_object_id": bot.project.object_id,
+        "trigger": WebhookTriggerTypes.trigger_type_to_api_code(webhook_trigger_type),
+        "data": payload,
+    }
+
+    def publish():
+        try:
+            get_bot_event_stream().publish(**event)
+        except redis.RedisError as e:
+            logger.warning(f"Could not publish {event['trigger']} event for bot {event['bot_object_id']} to its event stream: {e}")
+
+    transaction.on_commit(publish)
@@ -124,7 +124,10 @@ class BotPodCreator:
         memory_limit = os.getenv("BOT_MEMORY_LIMIT", "4Gi")
         ephemeral_storage_request = os.getenv("BOT_EPHEMERAL_STORAGE_REQUEST", "10Gi")
 
-        args = ["python", "manage.py", "run_bot", "--botid", str(self.bot_id)]
+        if self.warm_pod_pool:
+            args = ["python", "manage.py", "run_warm_bot_pod", "--pool", self.warm_pod_pool, "--podname", self.bot_name]
+        else:
+            args = ["python", "manage.py", "run_bot", "--botid", str(self.bot_id)]
 
         return client.V1Container(
                         name="bot-proc",
@@ -185,37 +188,17 @@ class BotPodCreator:
             )
         ]
 
-    def create_bot_pod(
-        self,
-        bot_id: int,
-        bot_name: Optional[str] = None,
-        bot_cpu_request: Optional[int] = None,
-        add_webpage_streamer: Optional[bool] = False,
-    ) -> Dict:
-        """
-        Create a bot pod with configuration from environment.
-        
-        Args:
-            bot_id: Integer ID of the bot to run
-            bot_name: Optional name for the bot (will generate if not provided)
-        """
-        if bot_name is None:
-            bot_name = f"bot-{bot_id}-{uuid.uuid4().hex[:8]}"
-
-        self.bot_id = bot_id
-        self.bot_cpu_request = bot_cpu_request
-
+    def get_bot_pod_labels(self):
         # Metadata labels matching the deployment
-        bot_pod_labels = {
+        return {
             "app.kubernetes.io/name": self.app_name,
             "app.kubernetes.io/instance": self.app_instance,
             "app.kubernetes.io/version": self.app_version,
             "app.kubernetes.io/managed-by": "cuber",
             "app": "bot-proc",
         }
-        if add_webpage_streamer:
-            bot_pod_labels["network-role"] = "attendee-webpage-streamer-receiver"
 
+    def get_bot_pod_annotations(self):
         annotations = {}
         
         # Currently, experimenting with this flag to see if it helps with bot pod evictions
@@ -227,9 +210,12 @@ class BotPodCreator:
             annotations["karpenter.sh/do-not-disrupt"] = "true"
             annotations["karpenter.sh/do-not-evict"] = "true"
 
-        bot_pod = client.V1Pod(
+        return annotations
+
+    def get_bot_pod(self, bot_pod_labels, annotations):
+        return client.V1Pod(
             metadata=client.V1ObjectMeta(
-                name=bot_name,
+                name=self.bot_name,
                 namespace=self.namespace,
                 labels=bot_pod_labels,
                 annotations=annotations
@@ -244,6 +230,36 @@ class BotPodCreator:
             )
         )
 
+    def create_bot_pod(
+        self,
+        bot_id: int,
+        bot_name: Optional[str] = None,
+        bot_cpu_request: Optional[int] = None,
+        add_webpage_streamer: Optional[bool] = False,
+    ) -> Dict:
+        """
+        Create a bot pod with configuration from environment.
+        
+        Args:
+            bot_id: Integer ID of the bot to run
+            bot_name: Optional name for the bot (will generate if not provided)
+        """
+        if bot_name is None:
+            bot_name = f"bot-{bot_id}-{uuid.uuid4().hex[:8]}"
+
+        self.bot_id = bot_id
+        self.bot_name = bot_name
+        self.bot_cpu_request = bot_cpu_request
+        self.warm_pod_pool = None
+
+        bot_pod_labels = self.get_bot_pod_labels()
+        if add_webpage_streamer:
+            bot_pod_labels["network-role"] = "attendee-webpage-streamer-receiver"
+
+        annotations = self.get_bot_pod_annotations()
+
+        bot_pod = self.get_bot_pod(bot_pod_labels, annotations)
+
         if add_webpage_streamer:
             # Create specific labels for the webpage streamer pod
             webpage_streamer_labels = {
@@ -324,6 +340,36 @@ class BotPodCreator:
                 "error": str(e)
             }
 
+    def create_warm_bot_pod(self, pod_name: str, warm_pod_pool: str, bot_cpu_request: Optional[str] = None) -> Dict:
+        """
+        Create an idle bot pod for the warm pod pool. It waits until it's claimed by a bot, then runs it.
+        """
+        self.bot_id = None
+        self.bot_name = pod_name
+        self.bot_cpu_request = bot_cpu_request
+        self.warm_pod_pool = warm_pod_pool
+
+        bot_pod_labels = self.get_bot_pod_labels()
+        bot_pod_labels["warm-pod-pool"] = "true"
+
+        try:
+            bot_pod_api_response = self.v1.create_namespaced_pod(
+                namespace=self.namespace,
+                body=self.get_bot_pod(bot_pod_labels, self.get_bot_pod_annotations())
+            )
+            return {
+                "name": bot_pod_api_response.metadata.name,
+                "status": bot_pod_api_response.status.phase,
+                "created": True,
+            }
+        except client.ApiException as e:
+            return {
+                "name": pod_name,
+                "status": "Error",
+                "created": False,
+                "error": str(e)
+            }
+
     def delete_bot_pod(self, pod_name: str) -> Dict:
         try:
             self.v1.delete_namespaced_pod(
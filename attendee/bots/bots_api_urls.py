@@ -89,6 +89,16 @@ urlpatterns = [
         bots_api_views.ParticipantsView.as_view(),
         name="bot-participants",
     ),
+    path(
+        "bots/<str:object_id>/events/stream",
+        bots_api_views.BotEventStreamView.as_view(),
+        name="bot-event-stream",
+    ),
+    path(
+        "events/stream",
+        bots_api_views.ProjectEventStreamView.as_view(),
+        name="project-event-stream",
+    ),
     path(
         "bots/<str:bot_name>/api-key",
         bots_api_views.BotApiKeyView.as_view(),
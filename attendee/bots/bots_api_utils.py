@@ -434,7 +434,7 @@ def validate_webhook_data(url, triggers, project, bot=None):
     return None
 
 
-def create_webhook_subscription(url, triggers, project, bot=None):
+def create_webhook_subscription(url, triggers, project, bot=None, batch_deliveries=False):
     """
     Creates a single webhook subscription for a project or bot.
 
@@ -443,6 +443,7 @@ def create_webhook_subscription(url, triggers, project, bot=None):
         triggers: List of trigger types (api codes as strings)
         project: The Project instance
         bot: Optional Bot instance for bot-level webhooks
+        batch_deliveries: Whether the subscriber accepts several webhooks in one request
 
     Returns:
         None
@@ -467,6 +468,7 @@ def create_webhook_subscription(url, triggers, project, bot=None):
         bot=bot,
         url=url,
         triggers=triggers_mapped_to_integers,
+        batch_deliveries=batch_deliveries,
     )
 
 
@@ -493,5 +495,6 @@ def create_webhook_subscriptions(webhook_data_list, project, bot=None):
     for webhook_data in webhook_data_list:
         url = webhook_data.get("url", "")
         triggers = webhook_data.get("triggers", [])
+        batch_deliveries = webhook_data.get("batch_deliveries", False)
 
-        create_webhook_subscription(url, triggers, project, bot)
+        create_webhook_subscription(url, triggers, project, bot, batch_deliveries=batch_deliveries)
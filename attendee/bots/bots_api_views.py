@@ -1,8 +1,13 @@
+import hashlib
+import json
 import logging
 import os
+import re
 import time
 
 from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 from django.utils.dateparse import parse_datetime
 from drf_spectacular.utils import (
@@ -14,16 +19,19 @@ from drf_spectacular.utils import (
 from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.pagination import CursorPagination
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .authentication import ApiKeyAuthentication
+from .bot_event_stream import BotEventStream, bot_event_stream_enabled, get_bot_event_stream
 from .bots_api_utils import BotCreationSource, create_bot, create_bot_chat_message_request, create_bot_media_request_for_image, delete_bot, patch_bot, patch_bot_transcription_settings, send_sync_command
 from .launch_bot_utils import launch_bot
 from .meeting_url_utils import meeting_type_from_url
 from .models import (
     AsyncTranscription,
     AsyncTranscriptionStates,
+    AudioChunk,
     Bot,
     ApiKey,
     BotEventManager,
@@ -40,7 +48,9 @@ from .models import (
     Participant,
     ParticipantEvent,
     Recording,
+    TranscriptSnapshotManager,
     Utterance,
+    WebhookTriggerTypes,
 )
 from .serializers import (
     AsyncTranscriptionSerializer,
@@ -718,6 +728,8 @@ class TranscriptView(APIView):
                 response=TranscriptUtteranceSerializer(many=True),
                 description="List of transcribed utterances",
             ),
+            304: OpenApiResponse(description="The transcript hasn't changed since the response with the ETag in If-None-Match"),
+            400: OpenApiResponse(description="Invalid cursor"),
             404: OpenApiResponse(description="Bot not found"),
         },
         parameters=[
@@ -737,6 +749,35 @@ class TranscriptView(APIView):
                 required=False,
                 examples=[OpenApiExample("DateTime Example", value="2024-01-18T12:34:56Z")],
             ),
+            OpenApiParameter(
+                name="cursor",
+                type=int,
+                location=OpenApiParameter.QUERY,
+                description="Only return transcript entries transcribed or updated since the response that returned this cursor, in its X-Transcript-Cursor header. Use 0 to start. Entries may be returned again, so merge them by speaker_uuid and timestamp_ms. Polling with a cursor only reads what changed since the last poll.",
+                required=False,
+                examples=[OpenApiExample("Cursor Example", value=0)],
+            ),
+            OpenApiParameter(
+                name="If-None-Match",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                description="The ETag of a previous response with the same query parameters. If the transcript hasn't changed since, the response is a 304 with no body.",
+                required=False,
+            ),
+            OpenApiParameter(
+                name="ETag",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                description="Identifies this version of the transcript, for the If-None-Match header of the next request.",
+                response=[200, 304],
+            ),
+            OpenApiParameter(
+                name="X-Transcript-Cursor",
+                type=int,
+                location=OpenApiParameter.HEADER,
+                description="The cursor to pass in the next request to only get what was transcribed or updated since this one.",
+                response=[200],
+            ),
         ],
         tags=["Bots"],
     )
@@ -759,12 +800,28 @@ class TranscriptView(APIView):
                 if async_transcription.state != AsyncTranscriptionStates.COMPLETE:
                     return Response({"error": f"Async transcription {async_transcription.object_id} is not complete. It is in state {AsyncTranscriptionStates.state_to_api_code(async_transcription.state)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get all utterances with transcriptions, sorted by timeline
-            utterances_query = Utterance.objects.select_related("participant").filter(recording=recording, transcription__isnull=False, async_transcription=async_transcription)
+            utterances_query = Utterance.objects.filter(recording=recording, transcription__isnull=False, async_transcription=async_transcription)
+
+            # The transcript only changes when an utterance's transcription is saved, so the latest sequence number identifies this version of it
+            latest_transcript_sequence_number = TranscriptSnapshotManager.latest_transcript_sequence_number(utterances_query)
+            query_params_digest = hashlib.md5(request.query_params.urlencode().encode()).hexdigest()[:12]
+            etag = f'"{recording.object_id}-{latest_transcript_sequence_number}-{query_params_digest}"'
+            if request.headers.get("If-None-Match") == etag:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-            # Apply updated_after filter if provided
+            cursor = request.query_params.get("cursor")
             updated_after = request.query_params.get("updated_after")
-            if updated_after:
+            if cursor is not None:
+                try:
+                    cursor = int(cursor)
+                except ValueError:
+                    return Response({"error": "Invalid cursor. Use the value of the X-Transcript-Cursor header from a previous response, or 0 to start."}, status=status.HTTP_400_BAD_REQUEST)
+
+                # Read the settled sequence number first, so nothing transcribed while the entries are read is skipped
+                next_cursor = max(cursor, TranscriptSnapshotManager.settled_transcript_sequence_number(utterances_query))
+                utterances = utterances_query.select_related("participant").filter(transcript_sequence_number__gt=cursor).order_by("timestamp_ms")
+                transcript_data = TranscriptSnapshotManager.transcript_entries(utterances)
+            elif updated_after:
                 try:
                     updated_after_datetime = parse_datetime(str(updated_after))
                 except Exception:
@@ -775,28 +832,18 @@ class TranscriptView(APIView):
                         {"error": "Invalid updated_after format. Use ISO 8601 format (e.g., 2024-01-18T12:34:56Z)"},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
-                utterances_query = utterances_query.filter(updated_at__gt=updated_after_datetime)
-
-            # Apply ordering
-            utterances = utterances_query.order_by("timestamp_ms")
-
-            # Format the response, skipping empty transcriptions
-            transcript_data = [
-                {
-                    "speaker_name": utterance.participant.full_name,
-                    "speaker_uuid": utterance.participant.uuid,
-                    "speaker_user_uuid": utterance.participant.user_uuid,
-                    "speaker_is_host": utterance.participant.is_host,
-                    "timestamp_ms": utterance.timestamp_ms,
-                    "duration_ms": utterance.duration_ms,
-                    "transcription": utterance.transcription,
-                }
-                for utterance in utterances
-                if utterance.transcription.get("transcript", "")
-            ]
+                next_cursor = TranscriptSnapshotManager.settled_transcript_sequence_number(utterances_query)
+                utterances = utterances_query.select_related("participant").filter(updated_at__gt=updated_after_datetime).order_by("timestamp_ms")
+                transcript_data = TranscriptSnapshotManager.transcript_entries(utterances)
+            elif async_transcription is None:
+                next_cursor = TranscriptSnapshotManager.settled_transcript_sequence_number(utterances_query)
+                transcript_data = TranscriptSnapshotManager.get_transcript_entries(recording)
+            else:
+                next_cursor = TranscriptSnapshotManager.settled_transcript_sequence_number(utterances_query)
+                transcript_data = TranscriptSnapshotManager.transcript_entries(utterances_query.select_related("participant").order_by("timestamp_ms"))
 
             serializer = TranscriptUtteranceSerializer(transcript_data, many=True)
-            return Response(serializer.data)
+            return Response(serializer.data, headers={"ETag": etag, "X-Transcript-Cursor": str(next_cursor)})
 
         except Bot.DoesNotExist:
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -823,7 +870,7 @@ class TranscriptView(APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            if not recording.audio_chunks.exclude(audio_blob=b"").exists():
+            if not recording.audio_chunks.filter(AudioChunk.has_audio_blob_filter()).exists():
                 return Response({"error": "Cannot create async transcription because the per-speaker audio data has been deleted or was never created."}, status=status.HTTP_400_BAD_REQUEST)
 
             existing_async_transcription_count = AsyncTranscription.objects.filter(
@@ -1514,6 +1561,125 @@ class ParticipantsView(GenericAPIView):
         except Bot.DoesNotExist:
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
 
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients ask for text/event-stream. Event streams are returned as StreamingHttpResponses, so this only renders error responses."""
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+def event_stream_response(request, stream_key):
+    """
+    Streams events from stream_key as server-sent events. Clients resume after the last event they received by passing
+    its id in the Last-Event-ID header (which EventSource does when it reconnects) or the last_event_id query parameter.
+    """
+    if not bot_event_stream_enabled():
+        return Response({"error": "Event streams are not enabled"}, status=status.HTTP_404_NOT_FOUND)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id") or "$"
+    if last_event_id != "$" and not re.fullmatch(r"\d+(-\d+)?", last_event_id):
+        return Response({"error": "Invalid last_event_id"}, status=status.HTTP_400_BAD_REQUEST)
+
+    triggers = [trigger for trigger in request.query_params.get("triggers", "").split(",") if trigger]
+    invalid_triggers = [trigger for trigger in triggers if WebhookTriggerTypes.api_code_to_trigger_type(trigger) is None]
+    if invalid_triggers:
+        return Response({"error": f"Invalid triggers: {', '.join(invalid_triggers)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    bot_event_stream = get_bot_event_stream()
+    if isinstance(request._request, ASGIRequest):
+        events = bot_event_stream.stream_events_async(stream_key, last_event_id, triggers)
+    else:
+        events = bot_event_stream.stream_events(stream_key, last_event_id, triggers)
+
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop proxies like nginx from buffering the events
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+EventStreamParameters = [
+    OpenApiParameter(
+        name="Last-Event-ID",
+        type=str,
+        location=OpenApiParameter.HEADER,
+        description="Resume after the event with this id. EventSource sends this automatically when it reconnects.",
+        required=False,
+    ),
+    OpenApiParameter(
+        name="last_event_id",
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="The same as the Last-Event-ID header, for clients that can't set headers.",
+        required=False,
+        examples=[OpenApiExample("Event ID Example", value="1718101234567-0")],
+    ),
+    OpenApiParameter(
+        name="triggers",
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="Comma separated list of the events to stream, using the webhook trigger names. Defaults to all of them.",
+        required=False,
+        examples=[OpenApiExample("Triggers Example", value="transcript.update,bot.state_change")],
+    ),
+]
+
+
+class BotEventStreamView(APIView):
+    authentication_classes = [ApiKeyAuthentication]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    @extend_schema(
+        operation_id="Stream Bot Events",
+        summary="Stream a bot's events",
+        description="Streams the bot's transcript updates, state changes, participant events and chat messages as server-sent events, with the same payloads as the corresponding webhooks. The connection is closed periodically; reconnect with the id of the last event received to continue where it left off.",
+        responses={
+            200: OpenApiResponse(description="Stream of server-sent events"),
+            404: OpenApiResponse(description="Bot not found"),
+        },
+        parameters=[
+            *TokenHeaderParameter,
+            OpenApiParameter(
+                name="object_id",
+                type=str,
+                location=OpenApiParameter.PATH,
+                description="Bot ID",
+                examples=[OpenApiExample("Bot ID Example", value="bot_xxxxxxxxxxx")],
+            ),
+            *EventStreamParameters,
+        ],
+        tags=["Bots"],
+    )
+    def get(self, request, object_id):
+        try:
+            bot = Bot.objects.get(object_id=object_id, project=request.auth.project)
+        except Bot.DoesNotExist:
+            return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return event_stream_response(request, BotEventStream.bot_stream_key(bot.object_id))
+
+
+class ProjectEventStreamView(APIView):
+    authentication_classes = [ApiKeyAuthentication]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    @extend_schema(
+        operation_id="Stream Project Events",
+        summary="Stream the events of all the project's bots",
+        description="Streams the transcript updates, state changes, participant events and chat messages of every bot in the project as server-sent events. Each event includes the id of its bot.",
+        responses={200: OpenApiResponse(description="Stream of server-sent events")},
+        parameters=[*TokenHeaderParameter, *EventStreamParameters],
+        tags=["Bots"],
+    )
+    def get(self, request):
+        return event_stream_response(request, BotEventStream.project_stream_key(request.auth.project.object_id))
+
+
 import uuid
 from accounts.models import Organization
 from bots.models import Project, ApiKey
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Defaults for every pool. They can be overridden for all pools, e.g. HTTP_POOL_MAXSIZE,
+# or for a single pool, e.g. HTTP_POOL_OPENAI_MAXSIZE.
+DEFAULT_POOL_MAXSIZE = 10
+# How many hosts to keep connections open to. Providers only use one or two, but webhooks go to many.
+DEFAULT_POOL_HOSTS = 10
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 10.0
+DEFAULT_READ_TIMEOUT_SECONDS = 300.0
+
+
+def get_pool_setting(pool_name, setting_name, default):
+    value = os.getenv(f"HTTP_POOL_{pool_name.upper()}_{setting_name}") or os.getenv(f"HTTP_POOL_{setting_name}")
+    return type(default)(value) if value else default
+
+
+def get_pool_timeout(pool_name):
+    return (
+        get_pool_setting(pool_name, "CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT_SECONDS),
+        get_pool_setting(pool_name, "READ_TIMEOUT", DEFAULT_READ_TIMEOUT_SECONDS),
+    )
+
+
+def http2_enabled(pool_name):
+    if str(get_pool_setting(pool_name, "HTTP2", "false")).lower() != "true":
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning(f"HTTP/2 was enabled for the {pool_name} HTTP pool, but the h2 package is not installed, so HTTP/1.1 will be used")
+        return False
+    return True
+
+
+class DefaultTimeoutHTTPAdapter(HTTPAdapter):
+    """An HTTPAdapter that applies a timeout to requests that weren't given one."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+
+class KeepAliveHTTPTransport(httpx.HTTPTransport):
+    """
+    An httpx transport whose connection pool outlives the clients that use it.
+    Some SDKs create a new httpx.Client for every request and close it afterwards, which would otherwise close the pool too.
+    """
+
+    def __exit__(self, exc_type=None, exc_value=None, traceback=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class HttpClientPool:
+    """
+    Keeps one HTTP session per named pool (usually a transcription provider) for the lifetime of the process,
+    so connections stay open between requests instead of paying for a new TCP and TLS handshake every time.
+
+    Celery workers fork after this module is imported, and connections can't be shared across a fork,
+    so each process builds its own sessions the first time it needs them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.sessions = {}
+        self.transports = {}
+
+    def reset_if_forked(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.sessions = {}
+            self.transports = {}
+
+    def get_session(self, pool_name):
+        with self.lock:
+            self.reset_if_forked()
+            session = self.sessions.get(pool_name)
+            if session is None:
+                session = self.create_session(pool_name)
+                self.sessions[pool_name] = session
+            return session
+
+    def create_session(self, pool_name):
+        pool_maxsize = get_pool_setting(pool_name, "MAXSIZE", DEFAULT_POOL_MAXSIZE)
+        # Retries are handled by the callers, e.g. by retrying the Celery task
+        adapter = DefaultTimeoutHTTPAdapter(
+            timeout=get_pool_timeout(pool_name),
+            pool_connections=get_pool_setting(pool_name, "HOSTS", DEFAULT_POOL_HOSTS),
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        logger.info(f"Created HTTP session for the {pool_name} pool with pool size {pool_maxsize}")
+        return session
+
+    def get_httpx_transport(self, pool_name):
+        with self.lock:
+            self.reset_if_forked()
+            transport = self.transports.get(pool_name)
+            if transport is None:
+                pool_maxsize = get_pool_setting(pool_name, "MAXSIZE", DEFAULT_POOL_MAXSIZE)
+                transport = KeepAliveHTTPTransport(
+                    http2=http2_enabled(pool_name),
+                    limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+                )
+                self.transports[pool_name] = transport
+            return transport
+
+    def get_httpx_timeout(self, pool_name):
+        connect_timeout, read_timeout = get_pool_timeout(pool_name)
+        return httpx.Timeout(read_timeout, connect=connect_timeout)
+
+
+http_client_pool = HttpClientPool()
+
+
+def get_http_session(pool_name):
+    return http_client_pool.get_session(pool_name)
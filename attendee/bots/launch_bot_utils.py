@@ -3,6 +3,7 @@ import logging
 import os
 
 from bots.models import BotEventManager, BotEventSubTypes, BotEventTypes
+from bots.warm_pod_pool import WarmPodPool, get_app_version, get_warm_pod_pool, warm_pod_pool_enabled
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +14,11 @@ def launch_bot(bot):
     if os.getenv("LAUNCH_BOT_METHOD") == "kubernetes":
         from .bot_pod_creator import BotPodCreator
 
+        if warm_pod_pool_enabled():
+            if launch_bot_in_warm_pod(bot):
+                return
+            get_warm_pod_pool().record_launch(bot.id, WarmPodPool.COLD)
+
         bot_pod_creator = BotPodCreator()
         create_pod_result = bot_pod_creator.create_bot_pod(bot_id=bot.id, bot_name=bot.k8s_pod_name(), bot_cpu_request=bot.cpu_request(), add_webpage_streamer=bot.should_launch_webpage_streamer())
         logger.info(f"Bot {bot.object_id} ({bot.id}) launched via Kubernetes: {create_pod_result}")
@@ -34,3 +40,28 @@ def launch_bot(bot):
         from .tasks.run_bot_task import run_bot
 
         run_bot.delay(bot.id)
+
+
+def launch_bot_in_warm_pod(bot):
+    # The warm pods don't come with a webpage streamer pod
+    if bot.should_launch_webpage_streamer():
+        return False
+
+    warm_pod_pool = get_warm_pod_pool()
+    pool = WarmPodPool.pool_name(get_app_version(), bot.cpu_request())
+    try:
+        pod_name = warm_pod_pool.claim_pod(pool)
+    except Exception as e:
+        logger.error(f"Failed to claim a warm pod for bot {bot.object_id} ({bot.id}): {str(e)}")
+        return False
+    if pod_name is None:
+        logger.info(f"No warm pod available in pool {pool} for bot {bot.object_id} ({bot.id}), launching a new pod")
+        return False
+
+    # Saved before the pod is told to run the bot, so the pod can be found by its name when the bot needs to be terminated
+    bot.warm_pod_name = pod_name
+    bot.save()
+    warm_pod_pool.record_launch(bot.id, WarmPodPool.WARM)
+    warm_pod_pool.send_claim(pod_name, {"bot_id": bot.id})
+    logger.info(f"Bot {bot.object_id} ({bot.id}) launched in warm pod {pod_name}")
+    return True
@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from bots.bot_controller.per_speaker_vad_engine import calculate_normalized_rms
+from bots.web_bot_adapter.audio_frame_converter import AudioFrameConverter
+
+
+def convert_frame_with_astype(frame):
+    # The conversion the web bot adapter did before AudioFrameConverter existed
+    audio_data = np.frombuffer(frame, dtype=np.float32)
+    audio_data = (audio_data * 32768.0).astype(np.int16)
+    audio_bytes = audio_data.tobytes()
+    return audio_bytes, calculate_normalized_rms(audio_bytes) if np.any(audio_data) else 0.0
+
+
+class Command(BaseCommand):
+    help = "Benchmarks converting the float32 audio frames sent by web bots into 16-bit PCM, for meetings with 1, 10 and 50 participants."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--participants", type=int, nargs="+", default=[1, 10, 50], help="Participant counts to benchmark")
+        parser.add_argument("--seconds", type=int, default=10, help="Seconds of meeting audio to simulate for each participant count")
+        parser.add_argument("--frames-per-second", type=int, default=100, help="Audio frames each participant sends per second")
+        parser.add_argument("--samples-per-frame", type=int, default=480, help="float32 samples in each audio frame")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        # A few distinct frames is enough, and keeps generating the input out of the measurement
+        frames = [(rng.standard_normal(options["samples_per_frame"]) * 0.3).astype(np.float32).tobytes() for _ in range(16)]
+
+        for participant_count in options["participants"]:
+            num_frames = participant_count * options["frames_per_second"] * options["seconds"]
+            converter = AudioFrameConverter()
+
+            astype_seconds = self.time_conversion(convert_frame_with_astype, frames, num_frames)
+            converter_seconds = self.time_conversion(converter.convert, frames, num_frames)
+
+            # The fraction of a CPU core the conversion uses while keeping up with the meeting in real time
+            self.stdout.write(f"{participant_count} participants, {num_frames} frames: astype {astype_seconds / num_frames * 1e6:.2f}us/frame ({astype_seconds / options['seconds'] * 100:.2f}% of a core), converter {converter_seconds / num_frames * 1e6:.2f}us/frame ({converter_seconds / options['seconds'] * 100:.2f}% of a core), speedup {astype_seconds / converter_seconds:.2f}x")
+
+    def time_conversion(self, convert, frames, num_frames):
+        start_time = time.perf_counter()
+        for i in range(num_frames):
+            convert(frames[i % len(frames)])
+        return time.perf_counter() - start_time
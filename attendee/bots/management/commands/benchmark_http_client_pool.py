@@ -0,0 +1,79 @@
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+
+from bots.http_client_pool import HttpClientPool
+
+
+class StubTranscriptionHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so the connection is kept alive between requests
+    protocol_version = "HTTP/1.1"
+    # Otherwise the headers and body of the response wait on each other's ACKs, which adds ~40ms to every request
+    disable_nagle_algorithm = True
+    connect_delay_seconds = 0
+
+    def setup(self):
+        # Runs once per connection, so this stands in for the TCP and TLS handshakes with a real provider
+        time.sleep(self.connect_delay_seconds)
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"transcript": "hello world", "words": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the latency per utterance of sending transcription requests with a new connection each time, versus with a pooled HTTP session, against a local stub server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utterances", type=int, default=200, help="Number of transcription requests to send with each client")
+        parser.add_argument("--audio-kb", type=int, default=100, help="Size of the audio sent with each request")
+        parser.add_argument("--connect-delay-ms", type=int, default=50, help="Delay the stub server adds to every new connection, to simulate the handshakes with a remote provider")
+
+    def handle(self, *args, **options):
+        StubTranscriptionHandler.connect_delay_seconds = options["connect_delay_ms"] / 1000
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubTranscriptionHandler)
+        server.daemon_threads = True
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/listen"
+        audio = bytes(options["audio_kb"] * 1024)
+
+        try:
+            unpooled_latencies = self.time_requests(lambda: requests.post(url, data=audio), options["utterances"])
+            pooled_session = HttpClientPool().get_session("benchmark")
+            pooled_latencies = self.time_requests(lambda: pooled_session.post(url, data=audio), options["utterances"])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"{options['utterances']} utterances of {options['audio_kb']}KB, {options['connect_delay_ms']}ms per new connection")
+        self.report("requests.post", unpooled_latencies)
+        self.report("pooled session", pooled_latencies)
+        self.stdout.write(f"Pooled session saves {statistics.mean(unpooled_latencies) - statistics.mean(pooled_latencies):.2f}ms per utterance")
+
+    def time_requests(self, send_request, num_requests):
+        latencies = []
+        for _ in range(num_requests):
+            start_time = time.perf_counter()
+            response = send_request()
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start_time) * 1000)
+        return latencies
+
+    def report(self, name, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(f"{name}: mean {statistics.mean(latencies):.2f}ms, p50 {statistics.median(latencies):.2f}ms, p95 {p95:.2f}ms per utterance")
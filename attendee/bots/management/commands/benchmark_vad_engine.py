@@ -0,0 +1,50 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from bots.bot_controller.per_speaker_vad_engine import PerSpeakerVadEngine
+
+
+class Command(BaseCommand):
+    help = "Benchmarks per-speaker voice activity detection and utterance segmentation, for meetings with 1, 10 and 50 speakers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--speakers", type=int, nargs="+", default=[1, 10, 50], help="Speaker counts to benchmark")
+        parser.add_argument("--seconds", type=int, default=60, help="Seconds of meeting audio to simulate for each speaker count")
+        parser.add_argument("--sample-rate", type=int, default=48000, help="Sample rate of the simulated audio")
+        parser.add_argument("--chunk-ms", type=int, default=10, help="Duration of each audio chunk")
+
+    def handle(self, *args, **options):
+        chunk_ms = options["chunk_ms"]
+        samples_per_chunk = options["sample_rate"] * chunk_ms // 1000
+        rng = np.random.default_rng(0)
+        # Alternate between speech-like noise and silence, so utterances start and end during the run
+        loud_chunk = (rng.standard_normal(samples_per_chunk) * 8000).astype(np.int16).tobytes()
+        quiet_chunk = bytes(samples_per_chunk * 2)
+        chunks_per_second = 1000 // chunk_ms
+
+        for speaker_count in options["speakers"]:
+            engine = PerSpeakerVadEngine(
+                sample_rate=options["sample_rate"],
+                utterance_size_limit=19000000,
+                silence_duration_limit=3,
+            )
+            num_chunks = options["seconds"] * chunks_per_second
+            num_utterances = 0
+
+            start_time = time.process_time()
+            for chunk_index in range(num_chunks):
+                chunk_time_ms = chunk_index * chunk_ms
+                # Each speaker talks for 5 seconds, then is quiet for 5 seconds, offset from the others
+                for speaker_index in range(speaker_count):
+                    speaking = (chunk_index + speaker_index * 37) // (5 * chunks_per_second) % 2 == 0
+                    num_utterances += len(engine.add_chunk(speaker_index, chunk_time_ms, loud_chunk if speaking else quiet_chunk))
+                # The main loop checks for silent speakers every 100ms
+                if chunk_time_ms % 100 == 0:
+                    num_utterances += len(engine.expire_silent_speakers(chunk_time_ms))
+            num_utterances += len(engine.flush_all("silence_limit"))
+            cpu_seconds = time.process_time() - start_time
+
+            speaker_minutes = speaker_count * options["seconds"] / 60
+            self.stdout.write(f"{speaker_count} speakers, {options['seconds']}s of audio: {cpu_seconds:.3f} CPU seconds, {speaker_minutes / cpu_seconds:.1f} speaker-minutes of audio per CPU second, {num_utterances} utterances")
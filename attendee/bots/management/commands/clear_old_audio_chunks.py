@@ -9,9 +9,15 @@ logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = "Clears out audio chunks that are older than 1 day. Audio chunks are storing raw pcm audio in the database, so we don't want to keep them around for too long."
+    help = "Clears out audio chunks that are older than 1 day. Audio chunks are storing raw pcm audio in the database or blob storage, so we don't want to keep them around for too long."
 
     def handle(self, *args, **options):
-        expired_audio_chunks = AudioChunk.objects.exclude(audio_blob=b"").filter(created_at__lt=timezone.now() - timezone.timedelta(days=1))
+        expired_audio_chunks = AudioChunk.objects.filter(AudioChunk.has_audio_blob_filter(), created_at__lt=timezone.now() - timezone.timedelta(days=1))
         logger.info(f"Clearing out {expired_audio_chunks.count()} audio chunks")
-        expired_audio_chunks.update(audio_blob=b"")
+
+        # Audio chunks in blob storage need their blobs deleted one at a time
+        for audio_chunk in expired_audio_chunks.filter(audio_blob_storage_key__isnull=False).defer("audio_blob").iterator():
+            audio_chunk.clear_audio_blob()
+            audio_chunk.save(update_fields=["audio_blob", "audio_blob_storage_key", "audio_blob_size", "audio_blob_codec"])
+
+        expired_audio_chunks.filter(audio_blob_storage_key__isnull=True).update(audio_blob=b"")
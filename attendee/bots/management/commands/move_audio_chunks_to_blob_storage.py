@@ -0,0 +1,84 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bots.models import AudioChunk, Utterance
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Moves the raw pcm audio that is stored in the audio chunk and utterance tables into the audio chunk storage, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of rows to move per batch")
+        parser.add_argument("--limit", type=int, default=None, help="Stop after moving this many rows of each type")
+
+    def handle(self, *args, **options):
+        if settings.AUDIO_CHUNK_STORAGE == "database":
+            raise CommandError("AUDIO_CHUNK_STORAGE is set to 'database', set it to 'object_storage' or 'local' before moving the audio chunks")
+
+        moved_audio_chunks = self.move_audio_chunks(options["batch_size"], options["limit"])
+        logger.info(f"Moved {moved_audio_chunks} audio chunks to blob storage")
+
+        moved_utterances = self.move_utterances(options["batch_size"], options["limit"])
+        logger.info(f"Moved the audio of {moved_utterances} utterances to blob storage")
+
+    def move_audio_chunks(self, batch_size, limit):
+        moved_count = 0
+        last_id = 0
+        while limit is None or moved_count < limit:
+            current_batch_size = batch_size if limit is None else min(batch_size, limit - moved_count)
+            batch = list(AudioChunk.objects.select_related("recording").filter(id__gt=last_id, audio_blob_storage_key__isnull=True).exclude(audio_blob=b"").order_by("id")[:current_batch_size])
+            if not batch:
+                break
+
+            for audio_chunk in batch:
+                audio_chunk.set_audio_blob(bytes(audio_chunk.audio_blob))
+            AudioChunk.objects.bulk_update(batch, ["audio_blob", "audio_blob_storage_key", "audio_blob_size", "audio_blob_codec"])
+
+            moved_count += len(batch)
+            last_id = batch[-1].id
+            logger.info(f"Moved {moved_count} audio chunks so far")
+
+        return moved_count
+
+    # Utterances created before the audio chunk table existed store their audio in the deprecated audio_blob column.
+    # Give each of them an audio chunk, so that their audio can be moved too.
+    def move_utterances(self, batch_size, limit):
+        moved_count = 0
+        last_id = 0
+        while limit is None or moved_count < limit:
+            current_batch_size = batch_size if limit is None else min(batch_size, limit - moved_count)
+            batch = list(Utterance.objects.select_related("recording").filter(id__gt=last_id, audio_chunk__isnull=True, sample_rate__isnull=False).exclude(audio_blob=b"").order_by("id")[:current_batch_size])
+            if not batch:
+                break
+
+            audio_chunks = []
+            for utterance in batch:
+                audio_chunk = AudioChunk(
+                    recording=utterance.recording,
+                    participant_id=utterance.participant_id,
+                    audio_format=AudioChunk.AudioFormat.PCM,
+                    timestamp_ms=utterance.timestamp_ms,
+                    duration_ms=utterance.duration_ms,
+                    sample_rate=utterance.sample_rate,
+                    source=AudioChunk.Sources.PER_PARTICIPANT_AUDIO,
+                )
+                audio_chunk.set_audio_blob(bytes(utterance.audio_blob))
+                audio_chunks.append(audio_chunk)
+
+            with transaction.atomic():
+                AudioChunk.objects.bulk_create(audio_chunks)
+                for utterance, audio_chunk in zip(batch, audio_chunks):
+                    utterance.audio_chunk = audio_chunk
+                    utterance.audio_blob = b""
+                Utterance.objects.bulk_update(batch, ["audio_chunk", "audio_blob"])
+
+            moved_count += len(batch)
+            last_id = batch[-1].id
+            logger.info(f"Moved the audio of {moved_count} utterances so far")
+
+        return moved_count
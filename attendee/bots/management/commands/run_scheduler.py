@@ -10,8 +10,11 @@ from django.utils import timezone
 from accounts.models import Organization
 from bots.models import Bot, BotStates, Calendar, CalendarStates
 from bots.tasks.autopay_charge_task import enqueue_autopay_charge_task
+from bots.tasks.deliver_pending_webhooks_task import reclaim_stale_delivery_attempts
 from bots.tasks.launch_scheduled_bot_task import launch_scheduled_bot
 from bots.tasks.sync_calendar_task import enqueue_sync_calendar_task
+from bots.transcription_dispatcher import get_transcription_dispatcher, transcription_dispatcher_enabled
+from bots.warm_pod_pool import WarmPodPool, get_app_version, get_warm_pod_pool, warm_pod_pool_enabled
 
 log = logging.getLogger(__name__)
 
@@ -48,6 +51,9 @@ class Command(BaseCommand):
                 self._run_scheduled_bots()
                 self._run_periodic_calendar_syncs()
                 self._run_autopay_tasks()
+                self._run_transcription_dispatch()
+                self._run_warm_pod_pool_replenishment()
+                self._run_webhook_delivery_reclaim()
             except Exception:
                 log.exception("Scheduler cycle failed")
             finally:
@@ -156,3 +162,59 @@ class Command(BaseCommand):
             enqueue_autopay_charge_task(organization)
 
         log.info("Enqueued %d autopay tasks", len(organizations))
+
+    def _run_transcription_dispatch(self):
+        """
+        Dispatch pending utterances for every transcription dispatcher bucket.
+        The dispatcher normally schedules its own wakeups, this catches any bucket whose wakeup was lost.
+        """
+        if not transcription_dispatcher_enabled():
+            return
+
+        transcription_dispatcher = get_transcription_dispatcher()
+        transcription_dispatcher.dispatch_all()
+
+        for bucket, stats in transcription_dispatcher.get_all_stats().items():
+            log.info("Transcription dispatcher bucket %s: %s", bucket, stats)
+
+    def _run_webhook_delivery_reclaim(self):
+        """
+        Send again the webhooks whose delivery task died after claiming them.
+        """
+        reclaimed_count = reclaim_stale_delivery_attempts()
+        if reclaimed_count:
+            log.info("Reclaimed %d stale webhook deliveries", reclaimed_count)
+
+    def _run_warm_pod_pool_replenishment(self):
+        """
+        Keep a warm pod pool for each CPU request, sized for the bots scheduled to join soon.
+        """
+        if not warm_pod_pool_enabled():
+            return
+
+        from bots.bot_pod_creator import BotPodCreator
+
+        warm_pod_pool = get_warm_pod_pool()
+        bot_pod_creator = BotPodCreator()
+        app_version = get_app_version()
+
+        # The bots that will be launched within the lookahead. The bots joining in the next 5 minutes have already been launched.
+        now = timezone.now()
+        scheduled_bots = Bot.objects.filter(
+            state=BotStates.SCHEDULED,
+            join_at__gt=now + timezone.timedelta(minutes=5),
+            join_at__lte=now + timezone.timedelta(minutes=5 + warm_pod_pool.get_lookahead_minutes()),
+        )
+        scheduled_bot_counts = {}
+        for bot in scheduled_bots:
+            if bot.should_launch_webpage_streamer():
+                continue
+            scheduled_bot_counts[bot.cpu_request()] = scheduled_bot_counts.get(bot.cpu_request(), 0) + 1
+
+        for cpu_request in warm_pod_pool.get_cpu_requests():
+            pool = WarmPodPool.pool_name(app_version, cpu_request)
+            target_size = warm_pod_pool.get_target_size(scheduled_bot_counts.get(cpu_request, 0))
+            warm_pod_pool.replenish(pool, cpu_request, target_size, bot_pod_creator)
+            log.info("Warm pod pool %s (target size %d): %s", pool, target_size, warm_pod_pool.get_stats(pool))
+
+        log.info("Warm pod launches: %s", warm_pod_pool.get_launch_stats())
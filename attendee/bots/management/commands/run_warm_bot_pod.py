@@ -0,0 +1,37 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Waits in the warm pod pool until a bot claims this pod, then runs the bot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pool", type=str, help="Warm pod pool", required=True)
+        parser.add_argument("--podname", type=str, help="Name of this pod", required=True)
+
+    def handle(self, *args, **options):
+        # Importing the bot controller loads GStreamer, GLib and the meeting adapters, which is most of a bot's startup time after Django
+        from bots.tasks import run_bot
+        from bots.warm_pod_pool import get_warm_pod_pool
+
+        warm_pod_pool = get_warm_pod_pool()
+        pool = options["pool"]
+        pod_name = options["podname"]
+
+        warm_pod_pool.register_idle_pod(pool, pod_name)
+        claim = warm_pod_pool.wait_for_claim(pool, pod_name, max_idle_seconds=warm_pod_pool.get_max_idle_seconds())
+
+        if claim is None:
+            logger.info(f"Warm pod {pod_name} was not claimed, exiting")
+            return
+        if claim.get("command") == "stop":
+            logger.info(f"Warm pod {pod_name} was retired from pool {pool}, exiting")
+            return
+
+        logger.info(f"Warm pod {pod_name} was claimed by bot {claim['bot_id']}")
+        result = run_bot.run(claim["bot_id"])
+
+        logger.info(f"Run bot task completed with result: {result}")
@@ -0,0 +1,20 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bots.models import TranscriptionProviders
+from bots.transcription_dispatcher import get_transcription_dispatcher
+
+
+class Command(BaseCommand):
+    help = "Shows the queue depth, in flight count and rate limit backoff for each transcription dispatcher bucket (project and transcription provider)."
+
+    def handle(self, *args, **options):
+        all_stats = get_transcription_dispatcher().get_all_stats()
+        if not all_stats:
+            self.stdout.write("No transcription dispatcher buckets")
+            return
+
+        for bucket, stats in all_stats.items():
+            project_id, transcription_provider = bucket.split(":")
+            self.stdout.write(f"Project {project_id}, {TranscriptionProviders(int(transcription_provider)).label}: {json.dumps(stats)}")
@@ -0,0 +1,18 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bots.warm_pod_pool import WarmPodPool, get_app_version, get_warm_pod_pool
+
+
+class Command(BaseCommand):
+    help = "Shows the size of each warm pod pool, and how long bots took to start after warm and cold launches."
+
+    def handle(self, *args, **options):
+        warm_pod_pool = get_warm_pod_pool()
+        for cpu_request in warm_pod_pool.get_cpu_requests():
+            pool = WarmPodPool.pool_name(get_app_version(), cpu_request)
+            self.stdout.write(f"Pool {pool}: {json.dumps(warm_pod_pool.get_stats(pool))}")
+
+        for launch_method, stats in warm_pod_pool.get_launch_stats().items():
+            self.stdout.write(f"{launch_method.capitalize()} launches: {json.dumps(stats)}")
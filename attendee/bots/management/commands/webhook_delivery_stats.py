@@ -0,0 +1,41 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookTriggerTypes
+from bots.webhook_utils import calculate_latency_percentiles
+
+
+class Command(BaseCommand):
+    help = "Shows webhook delivery latency percentiles (from the event to the successful delivery) and the number of pending and failed webhooks, for each trigger type."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--minutes", type=int, default=60, help="Only include webhooks created in the last N minutes")
+
+    def handle(self, *args, **options):
+        delivery_attempts = WebhookDeliveryAttempt.objects.filter(created_at__gte=timezone.now() - timedelta(minutes=options["minutes"])).values_list("webhook_trigger_type", "status", "created_at", "succeeded_at")
+
+        stats_by_trigger_type = {}
+        for webhook_trigger_type, status, created_at, succeeded_at in delivery_attempts.iterator():
+            stats = stats_by_trigger_type.setdefault(webhook_trigger_type, {"latencies_ms": [], "pending": 0, "failed": 0})
+            if status == WebhookDeliveryAttemptStatus.SUCCESS and succeeded_at:
+                stats["latencies_ms"].append((succeeded_at - created_at).total_seconds() * 1000)
+            elif status == WebhookDeliveryAttemptStatus.PENDING:
+                stats["pending"] += 1
+            else:
+                stats["failed"] += 1
+
+        if not stats_by_trigger_type:
+            self.stdout.write(f"No webhooks in the last {options['minutes']} minutes")
+            return
+
+        for webhook_trigger_type, stats in sorted(stats_by_trigger_type.items()):
+            summary = {
+                "delivered": len(stats["latencies_ms"]),
+                "pending": stats["pending"],
+                "failed": stats["failed"],
+                "latency_ms": {percentile: round(latency) if latency is not None else None for percentile, latency in calculate_latency_percentiles(stats["latencies_ms"]).items()},
+            }
+            self.stdout.write(f"{WebhookTriggerTypes.trigger_type_to_api_code(webhook_trigger_type)}: {json.dumps(summary)}")
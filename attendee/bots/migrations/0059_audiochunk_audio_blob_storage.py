@@ -0,0 +1,28 @@
+# Generated by Django 5.1.13 on 2026-10-18 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0058_alter_webhookdeliveryattempt_webhook_trigger_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiochunk',
+            name='audio_blob_codec',
+            field=models.IntegerField(blank=True, choices=[(1, 'PCM'), (2, 'FLAC'), (3, 'Opus')], null=True),
+        ),
+        migrations.AddField(
+            model_name='audiochunk',
+            name='audio_blob_size',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiochunk',
+            name='audio_blob_storage_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
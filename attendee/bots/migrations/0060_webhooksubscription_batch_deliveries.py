@@ -0,0 +1,18 @@
+# Generated by Django 5.1.13 on 2026-10-18 21:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0059_audiochunk_audio_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooksubscription',
+            name='batch_deliveries',
+            field=models.BooleanField(default=False),
+        ),
+    ]
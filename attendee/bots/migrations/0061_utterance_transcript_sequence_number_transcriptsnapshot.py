@@ -0,0 +1,38 @@
+# Generated by Django 5.1.13 on 2026-10-18 22:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0060_webhooksubscription_batch_deliveries'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="CREATE SEQUENCE IF NOT EXISTS bots_utterance_transcript_sequence",
+            reverse_sql="DROP SEQUENCE IF EXISTS bots_utterance_transcript_sequence",
+        ),
+        migrations.CreateModel(
+            name='TranscriptSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transcript_sequence_number', models.BigIntegerField(default=0)),
+                ('entries', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='utterance',
+            name='transcript_sequence_number',
+            field=models.BigIntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcriptsnapshot',
+            name='recording',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='transcript_snapshot', to='bots.recording'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.13 on 2026-10-18 22:27
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models.expressions import RawSQL
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_transcript_sequence_numbers(apps, schema_editor):
+    # Utterances transcribed before the sequence existed need a number too, or transcript cursors would never return them.
+    # The migration isn't atomic, so each batch is committed on its own instead of locking the whole table until the end.
+    Utterance = apps.get_model('bots', 'Utterance')
+    while True:
+        utterance_ids = list(Utterance.objects.filter(transcription__isnull=False, transcript_sequence_number__isnull=True).order_by('id').values_list('id', flat=True)[:BACKFILL_BATCH_SIZE])
+        if not utterance_ids:
+            return
+        Utterance.objects.filter(id__in=utterance_ids).update(transcript_sequence_number=RawSQL("nextval('bots_utterance_transcript_sequence')", []))
+
+
+class Migration(migrations.Migration):
+    # The indexes are on busy tables, so they're built without locking out writes
+    atomic = False
+
+    dependencies = [
+        ('bots', '0061_utterance_transcript_sequence_number_transcriptsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transcript_sequence_numbers, reverse_code=migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='utterance',
+            index=models.Index(fields=['recording', 'transcript_sequence_number'], name='utterance_transcript_seq_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='audiochunk',
+            index=models.Index(condition=models.Q(('audio_blob_storage_key__isnull', False), models.Q(('audio_blob', b''), _negated=True), _connector='OR'), fields=['created_at'], name='audiochunk_with_blob_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bot',
+            index=models.Index(fields=['project', 'state'], name='bot_project_state_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bot',
+            index=models.Index(fields=['project', 'meeting_url'], name='bot_project_meeting_url_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bot',
+            index=models.Index(condition=models.Q(('deduplication_key__isnull', False)), fields=['project', 'deduplication_key'], name='bot_project_dedup_key_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='botevent',
+            index=models.Index(fields=['bot', '-created_at'], name='botevent_bot_created_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='utterance',
+            index=models.Index(condition=models.Q(('transcription__isnull', True)), fields=['recording', 'async_transcription'], name='utterance_untranscribed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='webhookdeliveryattempt',
+            index=models.Index(fields=['bot', '-created_at'], name='webhook_attempt_bot_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='webhookdeliveryattempt',
+            index=models.Index(condition=models.Q(('attempt_count', 0), ('status', 1)), fields=['webhook_subscription', 'created_at'], name='webhook_attempt_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.13 on 2026-10-18 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0062_add_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asynctranscription',
+            name='pending_utterance_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='pending_utterance_count',
+            field=models.IntegerField(default=0),
+        ),
+        # Count the utterances that are already waiting for recordings and async transcriptions that are in progress
+        migrations.RunSQL(
+            sql="""
+                UPDATE bots_recording SET pending_utterance_count = (
+                    SELECT COUNT(*) FROM bots_utterance
+                    WHERE bots_utterance.recording_id = bots_recording.id AND bots_utterance.async_transcription_id IS NULL
+                    AND bots_utterance.transcription IS NULL AND bots_utterance.failure_data IS NULL
+                ) WHERE transcription_state = 2;
+                UPDATE bots_asynctranscription SET pending_utterance_count = (
+                    SELECT COUNT(*) FROM bots_utterance
+                    WHERE bots_utterance.async_transcription_id = bots_asynctranscription.id
+                    AND bots_utterance.transcription IS NULL AND bots_utterance.failure_data IS NULL
+                ) WHERE state IN (1, 2);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
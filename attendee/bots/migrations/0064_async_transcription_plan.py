@@ -0,0 +1,43 @@
+# Generated by Django 5.1.13 on 2026-10-18 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0063_pending_utterance_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asynctranscription',
+            name='dispatched_utterance_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='asynctranscription',
+            name='last_dispatched_utterance_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asynctranscription',
+            name='utterance_count',
+            field=models.IntegerField(default=0),
+        ),
+        # Transcriptions that were already in progress dispatched all their utterances up front
+        migrations.RunSQL(
+            sql="""
+                UPDATE bots_asynctranscription SET
+                    utterance_count = utterances.utterance_count,
+                    dispatched_utterance_count = utterances.utterance_count,
+                    last_dispatched_utterance_id = utterances.last_utterance_id
+                FROM (
+                    SELECT async_transcription_id, COUNT(*) AS utterance_count, MAX(id) AS last_utterance_id
+                    FROM bots_utterance WHERE async_transcription_id IS NOT NULL GROUP BY async_transcription_id
+                ) AS utterances
+                WHERE utterances.async_transcription_id = bots_asynctranscription.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.13 on 2026-10-18 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0064_async_transcription_plan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bot',
+            name='warm_pod_name',
+            field=models.CharField(blank=True, help_text='The warm pod pool pod the bot was launched in, if it was', max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.13 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0065_bot_warm_pod_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='file_segments',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.13 on 2026-10-19 10:12
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The webhook delivery attempts table is busy, so the index is built without locking out writes
+    atomic = False
+
+    dependencies = [
+        ('bots', '0066_recording_file_segments'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='webhookdeliveryattempt',
+            index=models.Index(condition=models.Q(('attempt_count__gte', 1), ('status', 1)), fields=['last_attempt_at'], name='webhook_attempt_claimed_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import collections
+import datetime
 import hashlib
 import json
 import math
@@ -7,19 +9,22 @@ import secrets
 import string
 import logging
 
+import redis
 from concurrency.exceptions import RecordModifiedError
 from concurrency.fields import IntegerVersionField
 from cryptography.fernet import Fernet, InvalidToken
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
 from django.core.files.storage import Storage, storages
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.db.models import Q
 from django.db.utils import IntegrityError
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 
 from accounts.models import Organization, User, UserRole
+from bots.bot_event_stream import bot_event_stream_enabled, get_bot_event_stream
 from bots.webhook_utils import trigger_webhook
 
 logger = logging.getLogger(__name__)
@@ -304,12 +309,18 @@ class TranscriptionSettings:
     def openai_transcription_language(self):
         return self._settings.get("openai", {}).get("language", None)
 
+    def openai_use_streaming(self):
+        return self._settings.get("openai", {}).get("streaming", False)
+
     def gladia_code_switching_languages(self):
         return self._settings.get("gladia", {}).get("code_switching_languages", None)
 
     def gladia_enable_code_switching(self):
         return self._settings.get("gladia", {}).get("enable_code_switching", False)
 
+    def gladia_use_streaming(self):
+        return self._settings.get("gladia", {}).get("streaming", False)
+
     def assembly_ai_language_code(self):
         return self._settings.get("assembly_ai", {}).get("language_code", None)
 
@@ -325,6 +336,9 @@ class TranscriptionSettings:
     def assemblyai_speaker_labels(self):
         return self._settings.get("assembly_ai", {}).get("speaker_labels", False)
 
+    def assemblyai_use_streaming(self):
+        return self._settings.get("assembly_ai", {}).get("streaming", False)
+
     def assemblyai_base_url(self):
         if os.getenv("ASSEMBLYAI_BASE_URL"):
             return os.getenv("ASSEMBLYAI_BASE_URL")
@@ -357,6 +371,9 @@ class TranscriptionSettings:
     def elevenlabs_tag_audio_events(self):
         return self._settings.get("elevenlabs", {}).get("tag_audio_events", None)
 
+    def elevenlabs_use_streaming(self):
+        return self._settings.get("elevenlabs", {}).get("streaming", False)
+
     def deepgram_language(self):
         return self._settings.get("deepgram", {}).get("language", None)
 
@@ -375,6 +392,19 @@ class TranscriptionSettings:
     def deepgram_use_streaming(self):
         return self.deepgram_callback() is not None
 
+    def use_streaming(self, transcription_provider):
+        if transcription_provider == TranscriptionProviders.DEEPGRAM:
+            return self.deepgram_use_streaming()
+        if transcription_provider == TranscriptionProviders.GLADIA:
+            return self.gladia_use_streaming()
+        if transcription_provider == TranscriptionProviders.OPENAI:
+            return self.openai_use_streaming()
+        if transcription_provider == TranscriptionProviders.ASSEMBLY_AI:
+            return self.assemblyai_use_streaming()
+        if transcription_provider == TranscriptionProviders.ELEVENLABS:
+            return self.elevenlabs_use_streaming()
+        return False
+
     def deepgram_model(self):
         model_from_settings = self._settings.get("deepgram", {}).get("model", None)
         if model_from_settings:
@@ -395,6 +425,15 @@ class TranscriptionSettings:
     def deepgram_redaction_settings(self):
         return self._settings.get("deepgram", {}).get("redact", [])
 
+    def deepgram_micro_batching_enabled(self):
+        return self._settings.get("deepgram", {}).get("micro_batching", {}).get("enabled", False)
+
+    def deepgram_micro_batching_max_batch_size(self):
+        return self._settings.get("deepgram", {}).get("micro_batching", {}).get("max_batch_size", 8)
+
+    def deepgram_micro_batching_max_added_latency_ms(self):
+        return self._settings.get("deepgram", {}).get("micro_batching", {}).get("max_added_latency_ms", 2000)
+
     def google_meet_closed_captions_language(self):
         return self._settings.get("meeting_closed_captions", {}).get("google_meet_language", None)
 
@@ -434,6 +473,7 @@ class Bot(models.Model):
     join_at = models.DateTimeField(null=True, blank=True, help_text="The time the bot should join the meeting")
     deduplication_key = models.CharField(max_length=1024, null=True, blank=True, help_text="Optional key for deduplicating bots")
     calendar_event = models.ForeignKey(CalendarEvent, on_delete=models.SET_NULL, null=True, blank=True, related_name="bots")
+    warm_pod_name = models.CharField(max_length=255, null=True, blank=True, help_text="The warm pod pool pod the bot was launched in, if it was")
 
     def delete_data(self):
         # Check if bot is in a state where the data deleted event can be created
@@ -446,14 +486,29 @@ class Bot(models.Model):
 
             # Delete all utterances and recording files for each recording
             for recording in self.recordings.all():
-                # Delete all audio chunks and utterances first
+                # Delete all audio chunks and utterances first. Audio kept in the audio chunk storage has to be deleted from there,
+                # deleting the rows would leave it behind.
+                for audio_chunk in recording.audio_chunks.filter(audio_blob_storage_key__isnull=False).only("id", "audio_blob_storage_key"):
+                    audio_chunk.clear_audio_blob()
                 recording.audio_chunks.all().delete()
                 recording.utterances.all().delete()
+                # The transcript snapshot holds a copy of the utterances' transcriptions
+                TranscriptSnapshot.objects.filter(recording=recording).delete()
 
                 # Delete the actual recording file if it exists
                 if recording.file and recording.file.name:
+                    # The first segment is the file itself
+                    for segment_key in recording.file_segments[1:]:
+                        recording.file.storage.delete(segment_key)
                     recording.file.delete()
 
+            # The event streams hold copies of the transcript and the other events
+            if bot_event_stream_enabled():
+                try:
+                    get_bot_event_stream().delete_bot_events(bot_object_id=self.object_id, project_object_id=self.project.object_id)
+                except redis.RedisError as e:
+                    logger.warning(f"Could not delete the event streams of bot {self.object_id}, they'll expire on their own: {e}")
+
             # Delete all participants
             self.participants.all().delete()
 
@@ -634,6 +689,14 @@ class Bot(models.Model):
         save_resource_snapshots_env_var_value = os.getenv("SAVE_BOT_RESOURCE_SNAPSHOTS", "false")
         return str(save_resource_snapshots_env_var_value).lower() == "true"
 
+    def stream_recording_upload(self):
+        # Streaming the recording to storage while the meeting is running is only supported
+        # for S3 and for our own bucket
+        if settings.STORAGE_PROTOCOL != "s3" or self.external_media_storage_bucket_name():
+            return False
+        stream_recording_upload_env_var_value = os.getenv("STREAM_RECORDING_UPLOAD", "false")
+        return str(stream_recording_upload_env_var_value).lower() == "true"
+
     def create_debug_recording(self):
         from bots.meeting_url_utils import meeting_type_from_url
 
@@ -673,6 +736,8 @@ class Bot(models.Model):
         return f"{self.object_id} - {self.project.name} in {self.meeting_url}"
 
     def k8s_pod_name(self):
+        if self.warm_pod_name:
+            return self.warm_pod_name
         return f"bot-pod-{self.id}-{self.object_id}".lower().replace("_", "-")
 
     def k8s_webpage_streamer_service_hostname(self):
@@ -686,6 +751,10 @@ class Bot(models.Model):
         # The partial index will exclude bots without a join_at which should speed up the query and reduce the space used by the index.
         indexes = [
             models.Index(fields=["join_at"], name="bot_join_at_idx", condition=models.Q(join_at__isnull=False)),
+            # For listing a project's bots filtered by state, meeting url or deduplication key
+            models.Index(fields=["project", "state"], name="bot_project_state_idx"),
+            models.Index(fields=["project", "meeting_url"], name="bot_project_meeting_url_idx"),
+            models.Index(fields=["project", "deduplication_key"], name="bot_project_dedup_key_idx", condition=models.Q(deduplication_key__isnull=False)),
         ]
 
         # Within a project, we don't want to allow bots that aren't in apost-meeting state with the same deduplication key.
@@ -957,6 +1026,10 @@ class BotEvent(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        # For finding a bot's latest event
+        indexes = [
+            models.Index(fields=["bot", "-created_at"], name="botevent_bot_created_at_idx"),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=(
@@ -1539,6 +1612,16 @@ class RecordingStorage(Storage):
         return storages["recordings"]
 
 
+def exclude_counter_fields(instance, save_kwargs):
+    """
+    Returns the keyword arguments for saving a recording or async transcription without writing its COUNTER_FIELDS.
+    Other processes change the counters while the instance is in memory, so saving them would undo their changes.
+    """
+    if instance._state.adding or save_kwargs.get("update_fields") is not None:
+        return save_kwargs
+    return {**save_kwargs, "update_fields": [field.name for field in instance._meta.concrete_fields if not field.primary_key and field.name not in instance.COUNTER_FIELDS]}
+
+
 class Recording(models.Model):
     bot = models.ForeignKey(Bot, on_delete=models.CASCADE, related_name="recordings")
 
@@ -1567,7 +1650,13 @@ class Recording(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     first_buffer_timestamp_ms = models.BigIntegerField(null=True, blank=True)
 
+    # How many of the recording's utterances are waiting to be transcribed. Only changed by PendingUtteranceManager.
+    pending_utterance_count = models.IntegerField(default=0)
+    COUNTER_FIELDS = ["pending_utterance_count"]
+
     file = models.FileField(storage=RecordingStorage())
+    # When bot restarts split the recording into several files, the keys of all of them in order. file is the first.
+    file_segments = models.JSONField(default=list, blank=True)
 
     def __str__(self):
         return f"Recording for {self.bot.object_id}"
@@ -1595,7 +1684,7 @@ class Recording(models.Model):
             # Generate a random 16-character string
             random_string = "".join(random.choices(string.ascii_letters + string.digits, k=16))
             self.object_id = f"{self.OBJECT_ID_PREFIX}{random_string}"
-        super().save(*args, **kwargs)
+        super().save(*args, **exclude_counter_fields(self, kwargs))
 
 
 class RecordingManager:
@@ -1675,7 +1764,7 @@ class RecordingManager:
 
         # If there is an in progress transcription recording
         # that has no utterances left to transcribe, set it to complete
-        if recording.transcription_state == RecordingTranscriptionStates.IN_PROGRESS and Utterance.objects.filter(recording=recording, transcription__isnull=True).count() == 0:
+        if recording.transcription_state == RecordingTranscriptionStates.IN_PROGRESS and PendingUtteranceManager.all_utterances_transcribed(recording):
             RecordingManager.set_recording_transcription_complete(recording)
 
     @classmethod
@@ -1784,17 +1873,32 @@ class AsyncTranscription(models.Model):
     settings = models.JSONField(null=False, default=dict)
     failure_data = models.JSONField(null=True, default=None)
     version = IntegerVersionField()
+    # How many of the transcription's utterances are waiting to be transcribed. Only changed by PendingUtteranceManager.
+    pending_utterance_count = models.IntegerField(default=0)
+    # How many utterances the transcription has, and how far through them it's got. Only changed by AsyncTranscriptionPlanner.
+    utterance_count = models.IntegerField(default=0)
+    dispatched_utterance_count = models.IntegerField(default=0)
+    last_dispatched_utterance_id = models.BigIntegerField(null=True, blank=True)
+    COUNTER_FIELDS = ["pending_utterance_count", "utterance_count", "dispatched_utterance_count", "last_dispatched_utterance_id"]
 
     def save(self, *args, **kwargs):
         if not self.object_id:
             # Generate a random 16-character string
             random_string = "".join(random.choices(string.ascii_letters + string.digits, k=16))
             self.object_id = f"{self.OBJECT_ID_PREFIX}{random_string}"
-        super().save(*args, **kwargs)
+        super().save(*args, **exclude_counter_fields(self, kwargs))
 
     def __str__(self):
         return f"Post Meeting Transcription {self.object_id} - {self.get_state_display()}"
 
+    @property
+    def progress_percent(self):
+        if self.state == AsyncTranscriptionStates.COMPLETE:
+            return 100
+        if self.utterance_count == 0:
+            return 0
+        return int(100 * (self.utterance_count - self.pending_utterance_count) / self.utterance_count)
+
     @property
     def transcription_settings(self):
         return TranscriptionSettings(self.settings.get("transcription_settings"))
@@ -1868,6 +1972,61 @@ class AsyncTranscriptionManager:
         cls.delivery_webhook(async_transcription)
 
 
+class PendingUtteranceManager:
+    """
+    Keeps count of the utterances each recording (or async transcription) has waiting to be transcribed, so that
+    finding out whether its transcription is done doesn't mean counting them. The count goes up when pending
+    utterances are created and down when one is transcribed or fails, and only the utterance that takes it to zero
+    sees it reach zero.
+    """
+
+    @classmethod
+    def counter_model_and_id(cls, utterance):
+        if utterance.async_transcription_id is not None:
+            return AsyncTranscription, utterance.async_transcription_id
+        return Recording, utterance.recording_id
+
+    @classmethod
+    def add_pending_utterances(cls, utterances):
+        """Counts utterances that were created without a transcription. Utterance.save does this, bulk_create callers have to."""
+        pending_utterance_counts = collections.Counter(cls.counter_model_and_id(utterance) for utterance in utterances if utterance.transcription is None and utterance.failure_data is None)
+        for (model, object_id), pending_utterance_count in pending_utterance_counts.items():
+            model.objects.filter(id=object_id).update(pending_utterance_count=models.F("pending_utterance_count") + pending_utterance_count)
+
+    @classmethod
+    def save_terminated_utterance(cls, utterance):
+        """
+        Saves an utterance that has just been transcribed or has failed. Returns how many utterances its recording (or
+        async transcription) still has waiting, or None if the utterance had already been transcribed or failed, for
+        example by another task for the same utterance.
+        """
+        model, object_id = cls.counter_model_and_id(utterance)
+        with transaction.atomic():
+            was_pending = Utterance.objects.select_for_update().filter(id=utterance.id, transcription__isnull=True, failure_data__isnull=True).exists()
+            utterance.save()
+            if not was_pending:
+                return None
+            with connection.cursor() as cursor:
+                cursor.execute(f"UPDATE {model._meta.db_table} SET pending_utterance_count = GREATEST(pending_utterance_count - 1, 0) WHERE id = %s RETURNING pending_utterance_count", [object_id])
+                return cursor.fetchone()[0]
+
+    @classmethod
+    def all_utterances_transcribed(cls, recording):
+        """Whether the recording has no utterances waiting and none that failed"""
+        recording.refresh_from_db(fields=["pending_utterance_count"])
+        return recording.pending_utterance_count == 0 and not recording.utterances.filter(async_transcription=None, failure_data__isnull=False).exists()
+
+
+class AudioChunkStorage(Storage):
+    """
+    Returns the configured 'audio_chunks' storage from Django's registry.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # return the actual storage instance
+        return storages["audio_chunks"]
+
+
 class AudioChunk(models.Model):
     class Sources(models.IntegerChoices):
         PER_PARTICIPANT_AUDIO = 1, "Per Participant Audio"
@@ -1877,8 +2036,26 @@ class AudioChunk(models.Model):
         PCM = 1, "PCM"
         MP3 = 2, "MP3"
 
+    class BlobCodecs(models.IntegerChoices):
+        PCM = 1, "PCM"
+        FLAC = 2, "FLAC"
+        OPUS = 3, "Opus"
+
+        @classmethod
+        def from_setting(cls, value):
+            return {"pcm": cls.PCM, "flac": cls.FLAC, "opus": cls.OPUS}[value]
+
+        @classmethod
+        def file_extension(cls, value):
+            return {cls.PCM: "pcm", cls.FLAC: "flac", cls.OPUS: "ogg"}[value]
+
     recording = models.ForeignKey(Recording, on_delete=models.CASCADE, related_name="audio_chunks")
+    # Only used when the audio is kept in the database. Otherwise the audio is in the audio chunk storage
+    # and audio_blob_storage_key, audio_blob_size and audio_blob_codec describe it.
     audio_blob = models.BinaryField()
+    audio_blob_storage_key = models.CharField(max_length=255, null=True, blank=True)
+    audio_blob_size = models.IntegerField(null=True, blank=True)
+    audio_blob_codec = models.IntegerField(choices=BlobCodecs.choices, null=True, blank=True)
     audio_format = models.IntegerField(choices=AudioFormat.choices, default=AudioFormat.PCM)
     timestamp_ms = models.BigIntegerField()
     duration_ms = models.IntegerField()
@@ -1889,6 +2066,70 @@ class AudioChunk(models.Model):
     source = models.IntegerField(choices=Sources.choices, default=Sources.PER_PARTICIPANT_AUDIO)
     participant = models.ForeignKey(Participant, on_delete=models.PROTECT, related_name="audio_chunks")
 
+    class Meta:
+        # For finding old audio chunks whose audio hasn't been cleared yet. The condition has to match has_audio_blob_filter.
+        indexes = [
+            models.Index(fields=["created_at"], name="audiochunk_with_blob_idx", condition=Q(audio_blob_storage_key__isnull=False) | ~Q(audio_blob=b"")),
+        ]
+
+    @classmethod
+    def has_audio_blob_filter(cls):
+        return Q(audio_blob_storage_key__isnull=False) | ~Q(audio_blob=b"")
+
+    def set_audio_blob(self, pcm_data):
+        """
+        Sets the raw PCM audio for the chunk. Depending on the AUDIO_CHUNK_STORAGE setting it is either
+        kept in the audio_blob column or compressed and written to the audio chunk storage.
+        The caller is responsible for saving the chunk.
+        """
+        if settings.AUDIO_CHUNK_STORAGE == "database":
+            self.audio_blob = pcm_data
+            return
+
+        from bots.utils import pcm_to_flac, pcm_to_opus
+
+        codec = AudioChunk.BlobCodecs.from_setting(settings.AUDIO_CHUNK_STORAGE_CODEC)
+        if codec == AudioChunk.BlobCodecs.FLAC:
+            encoded_data = pcm_to_flac(pcm_data, sample_rate=self.sample_rate)
+        elif codec == AudioChunk.BlobCodecs.OPUS:
+            encoded_data = pcm_to_opus(pcm_data, sample_rate=self.sample_rate)
+        else:
+            encoded_data = bytes(pcm_data)
+
+        storage_key = f"{self.recording.object_id}/{get_random_string(32)}.{AudioChunk.BlobCodecs.file_extension(codec)}"
+        self.audio_blob_storage_key = AudioChunkStorage().save(storage_key, ContentFile(encoded_data))
+        self.audio_blob_size = len(encoded_data)
+        self.audio_blob_codec = codec
+        self.audio_blob = b""
+
+    def get_audio_blob(self):
+        """Returns the raw PCM audio for the chunk, wherever it is stored."""
+        if not self.audio_blob_storage_key:
+            return bytes(self.audio_blob)
+
+        from bots.utils import compressed_audio_to_pcm
+
+        with AudioChunkStorage().open(self.audio_blob_storage_key, "rb") as audio_blob_file:
+            encoded_data = audio_blob_file.read()
+
+        if self.audio_blob_codec == AudioChunk.BlobCodecs.FLAC:
+            return compressed_audio_to_pcm(encoded_data, format="flac", sample_rate=self.sample_rate)
+        if self.audio_blob_codec == AudioChunk.BlobCodecs.OPUS:
+            return compressed_audio_to_pcm(encoded_data, format="ogg", sample_rate=self.sample_rate)
+        return encoded_data
+
+    def clear_audio_blob(self):
+        """Deletes the audio for the chunk. The caller is responsible for saving the chunk."""
+        if self.audio_blob_storage_key:
+            try:
+                AudioChunkStorage().delete(self.audio_blob_storage_key)
+            except Exception as e:
+                logger.warning(f"Error deleting audio chunk {self.id} from storage at {self.audio_blob_storage_key}: {e}")
+            self.audio_blob_storage_key = None
+            self.audio_blob_size = None
+            self.audio_blob_codec = None
+        self.audio_blob = b""
+
 
 class Utterance(models.Model):
     # If transcription is None and failure_data is not None, then the transcription failed
@@ -1927,15 +2168,36 @@ class Utterance(models.Model):
     audio_format = models.IntegerField(choices=AudioFormat.choices, default=AudioFormat.PCM, null=True)
     sample_rate = models.IntegerField(null=True, default=None)
 
+    # Increases every time an utterance's transcription is saved, so transcript readers can ask for what changed since they last read
+    transcript_sequence_number = models.BigIntegerField(null=True, default=None)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recording", "transcript_sequence_number"], name="utterance_transcript_seq_idx"),
+            # For finding the utterances of a recording or async transcription that are still being transcribed
+            models.Index(fields=["recording", "async_transcription"], name="utterance_untranscribed_idx", condition=Q(transcription__isnull=True)),
+        ]
+
     def __str__(self):
         return f"Utterance at {self.timestamp_ms}ms ({self.duration_ms}ms long)"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self.transcription is not None and (update_fields is None or "transcription" in update_fields):
+            self.transcript_sequence_number = next_transcript_sequence_number()
+            if update_fields is not None:
+                kwargs["update_fields"] = [*update_fields, "transcript_sequence_number"]
+        is_new_pending_utterance = self._state.adding and self.transcription is None and self.failure_data is None
+        super().save(*args, **kwargs)
+        if is_new_pending_utterance:
+            PendingUtteranceManager.add_pending_utterances([self])
+
     # Helper methods, because we may be working with an outdated model that is still using the audio_blob field
     # on the utterance model and not using the separate audio chunk model.
     def get_audio_blob(self):
         if self.audio_chunk:
-            return self.audio_chunk.audio_blob
-        return self.audio_blob
+            return self.audio_chunk.get_audio_blob()
+        return bytes(self.audio_blob)
 
     def get_sample_rate(self):
         if self.audio_chunk:
@@ -1955,6 +2217,94 @@ class Utterance(models.Model):
         return self.recording.transcription_provider
 
 
+def next_transcript_sequence_number():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval('bots_utterance_transcript_sequence')")
+        return cursor.fetchone()[0]
+
+
+class TranscriptSnapshot(models.Model):
+    """
+    The serialized transcript of a recording's realtime transcription, as of transcript_sequence_number. It's brought up to date
+    when it's read, by applying only the utterances that were transcribed since, so reading the transcript of a long meeting
+    doesn't mean re-reading every utterance.
+    """
+
+    recording = models.OneToOneField(Recording, on_delete=models.CASCADE, related_name="transcript_snapshot")
+    transcript_sequence_number = models.BigIntegerField(default=0)
+    # Transcript entries in timeline order, each with the id of the utterance it came from
+    entries = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TranscriptSnapshotManager:
+    # Sequence numbers are taken before the utterance is saved, so an utterance can become visible after one with a higher
+    # sequence number. Readers only move past sequence numbers of utterances that were saved at least this long ago.
+    TRANSCRIPT_SEQUENCE_SETTLE_SECONDS = 5
+
+    @classmethod
+    def latest_transcript_sequence_number(cls, utterances_query):
+        return utterances_query.filter(transcript_sequence_number__isnull=False).order_by("-transcript_sequence_number").values_list("transcript_sequence_number", flat=True).first() or 0
+
+    @classmethod
+    def settled_transcript_sequence_number(cls, utterances_query):
+        """The sequence number up to which no more utterances can appear, which is where a reader can safely continue from."""
+        settled_before = timezone.now() - datetime.timedelta(seconds=cls.TRANSCRIPT_SEQUENCE_SETTLE_SECONDS)
+        return cls.latest_transcript_sequence_number(utterances_query.filter(updated_at__lte=settled_before))
+
+    @classmethod
+    def transcript_entry(cls, utterance):
+        return {
+            "utterance_id": utterance.id,
+            "speaker_name": utterance.participant.full_name,
+            "speaker_uuid": utterance.participant.uuid,
+            "speaker_user_uuid": utterance.participant.user_uuid,
+            "speaker_is_host": utterance.participant.is_host,
+            "timestamp_ms": utterance.timestamp_ms,
+            "duration_ms": utterance.duration_ms,
+            "transcription": utterance.transcription,
+        }
+
+    @classmethod
+    def transcript_entries(cls, utterances):
+        return [cls.transcript_entry(utterance) for utterance in utterances if utterance.transcription.get("transcript", "")]
+
+    @classmethod
+    def get_transcript_entries(cls, recording):
+        """
+        Returns the entries of the recording's realtime transcript, in timeline order. Only the utterances transcribed since
+        the snapshot was saved are read. The snapshot is only written when what has settled has moved past it, so reading a
+        transcript that hasn't changed doesn't write to the database.
+        """
+        utterances_query = Utterance.objects.filter(recording=recording, async_transcription=None, transcription__isnull=False)
+        snapshot = TranscriptSnapshot.objects.filter(recording=recording).first()
+        settled_transcript_sequence_number = cls.settled_transcript_sequence_number(utterances_query)
+
+        utterances = utterances_query.select_related("participant")
+        if snapshot is None:
+            entries_by_utterance_id = {}
+        else:
+            entries_by_utterance_id = {entry["utterance_id"]: entry for entry in snapshot.entries}
+            utterances = utterances.filter(transcript_sequence_number__gt=snapshot.transcript_sequence_number)
+
+        for utterance in utterances:
+            if utterance.transcription.get("transcript", ""):
+                entries_by_utterance_id[utterance.id] = cls.transcript_entry(utterance)
+            else:
+                entries_by_utterance_id.pop(utterance.id, None)
+        entries = sorted(entries_by_utterance_id.values(), key=lambda entry: (entry["timestamp_ms"], entry["utterance_id"]))
+
+        if snapshot is None:
+            if settled_transcript_sequence_number > 0:
+                # Another reader may have created it in the meantime, in which case keep theirs
+                TranscriptSnapshot.objects.bulk_create([TranscriptSnapshot(recording=recording, transcript_sequence_number=settled_transcript_sequence_number, entries=entries)], ignore_conflicts=True)
+        elif settled_transcript_sequence_number > snapshot.transcript_sequence_number:
+            # Another reader may have moved the snapshot further forward in the meantime, in which case keep theirs
+            TranscriptSnapshot.objects.filter(id=snapshot.id, transcript_sequence_number__lte=settled_transcript_sequence_number).update(transcript_sequence_number=settled_transcript_sequence_number, entries=entries, updated_at=timezone.now())
+        return entries
+
+
 class Credentials(models.Model):
     class CredentialTypes(models.IntegerChoices):
         DEEPGRAM = 1, "Deepgram"
@@ -2370,6 +2720,8 @@ class WebhookSubscription(models.Model):
     url = models.URLField()
     triggers = models.JSONField(default=default_triggers)
     is_active = models.BooleanField(default=True)
+    # Whether the subscriber accepts several webhooks in one request, as an array of webhook bodies
+    batch_deliveries = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -2395,6 +2747,16 @@ class WebhookDeliveryAttempt(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # For listing a bot's webhook deliveries, newest first
+            models.Index(fields=["bot", "-created_at"], name="webhook_attempt_bot_idx"),
+            # For claiming a subscription's webhooks that haven't been sent yet
+            models.Index(fields=["webhook_subscription", "created_at"], name="webhook_attempt_pending_idx", condition=Q(status=WebhookDeliveryAttemptStatus.PENDING, attempt_count=0)),
+            # For reclaiming webhooks whose delivery task died after claiming them
+            models.Index(fields=["last_attempt_at"], name="webhook_attempt_claimed_idx", condition=Q(status=WebhookDeliveryAttemptStatus.PENDING, attempt_count__gte=1)),
+        ]
+
     def add_to_response_body_list(self, response_body):
         """Add content to the response body list without saving."""
         if self.response_body_list is None:
@@ -10,6 +10,9 @@ from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.db import models, transaction
+from django.db.models import Max
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
 from django.http import HttpResponse, QueryDict
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
@@ -24,7 +27,6 @@ from .models import (
     ApiKey,
     Bot,
     BotEvent,
-    BotEventSubTypes,
     BotEventTypes,
     BotStates,
     Calendar,
@@ -436,7 +438,9 @@ class ProjectBotsView(LoginRequiredMixin, ProjectUrlContextMixin, ListView):
         if search_query:
             queryset = queryset.filter(models.Q(object_id__icontains=search_query) | models.Q(meeting_url__icontains=search_query) | models.Q(name__icontains=search_query))
 
-        # Get the latest bot event type and subtype for each bot using subquery annotations
+        # Get the latest bot event type and subtype for each bot using subquery annotations. The queryset is only
+        # evaluated once it's been paginated, so these only run for the bots on the current page. The template maps
+        # them to their display names.
         latest_event_subquery_base = BotEvent.objects.filter(bot=models.OuterRef("pk")).order_by("-created_at")
         latest_event_type = latest_event_subquery_base.values("event_type")[:1]
         latest_event_sub_type = latest_event_subquery_base.values("event_sub_type")[:1]
@@ -444,13 +448,6 @@ class ProjectBotsView(LoginRequiredMixin, ProjectUrlContextMixin, ListView):
         # Apply annotations and ordering
         queryset = queryset.annotate(last_event_type=models.Subquery(latest_event_type), last_event_sub_type=models.Subquery(latest_event_sub_type)).order_by("-created_at")
 
-        # Add display names for the event types
-        for bot in queryset:
-            if bot.last_event_type:
-                bot.last_event_type_display = dict(BotEventTypes.choices).get(bot.last_event_type, str(bot.last_event_type))
-            if bot.last_event_sub_type:
-                bot.last_event_sub_type_display = dict(BotEventSubTypes.choices).get(bot.last_event_sub_type, str(bot.last_event_sub_type))
-
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -663,18 +660,12 @@ class ProjectBotDetailView(LoginRequiredMixin, ProjectUrlContextMixin, View):
         resource_snapshots = bot.resource_snapshots.all().order_by("created_at")
 
         # Calculate maximum values from resource snapshots
-        max_ram_usage = 0
-        max_cpu_usage = 0
-        if resource_snapshots.exists():
-            for snapshot in resource_snapshots:
-                data = snapshot.data
-                ram_usage = data.get("ram_usage_megabytes", 0)
-                cpu_usage = data.get("cpu_usage_millicores", 0)
-
-                if ram_usage > max_ram_usage:
-                    max_ram_usage = ram_usage
-                if cpu_usage > max_cpu_usage:
-                    max_cpu_usage = cpu_usage
+        resource_usage_maxima = resource_snapshots.aggregate(
+            max_ram_usage=Max(Cast(KeyTextTransform("ram_usage_megabytes", "data"), models.FloatField())),
+            max_cpu_usage=Max(Cast(KeyTextTransform("cpu_usage_millicores", "data"), models.FloatField())),
+        )
+        max_ram_usage = int(resource_usage_maxima["max_ram_usage"] or 0)
+        max_cpu_usage = int(resource_usage_maxima["max_cpu_usage"] or 0)
 
         context = self.get_project_context(object_id, project)
         context.update(
@@ -252,6 +252,16 @@ TRANSCRIPTION_SETTINGS_SCHEMA = {
                 "language": {"description": "The language code for transcription. Defaults to 'multi' if not specified, which selects the language automatically and can change the detected language in the middle of the audio. See here for available languages: https://developers.deepgram.com/docs/models-languages-overview.", "type": "string"},
                 "model": {"description": "The model to use for transcription. Defaults to 'nova-3' if not specified, which is the recommended model for most use cases. See here for details: https://developers.deepgram.com/docs/models-languages-overview", "type": "string"},
                 "redact": {"type": "array", "items": {"type": "string", "enum": ["pci", "pii", "numbers"]}, "uniqueItems": True, "description": "Array of redaction types to apply to transcription. Automatically removes or masks sensitive information like PII, PCI data, and numbers from transcripts. See here for details: https://developers.deepgram.com/docs/redaction"},
+                "micro_batching": {
+                    "type": "object",
+                    "description": "Transcribe several short per-participant utterances with a single Deepgram request. Reduces the number of requests, at the cost of some added latency before each utterance is transcribed.",
+                    "properties": {
+                        "enabled": {"type": "boolean", "description": "Whether to batch utterances. Defaults to false."},
+                        "max_batch_size": {"type": "integer", "minimum": 2, "maximum": 50, "description": "The most utterances to send in one request. Defaults to 8."},
+                        "max_added_latency_ms": {"type": "integer", "minimum": 0, "maximum": 30000, "description": "The longest an utterance will wait for a batch to fill up before being sent, in milliseconds. Defaults to 2000."},
+                    },
+                    "additionalProperties": False,
+                },
             },
             "additionalProperties": False,
         },
@@ -267,6 +277,7 @@ TRANSCRIPTION_SETTINGS_SCHEMA = {
                     "type": "boolean",
                     "description": "Whether to use code switching to transcribe the meeting in multiple languages.",
                 },
+                "streaming": {"type": "boolean", "description": "Whether to transcribe each participant's audio in realtime over a streaming connection to Gladia, instead of transcribing each utterance once it ends. Only supported for bots that receive per-participant audio. Defaults to false."},
             },
             "required": [],
             "additionalProperties": False,
@@ -287,6 +298,7 @@ TRANSCRIPTION_SETTINGS_SCHEMA = {
                     "type": "string",
                     "description": "The language to use for transcription. See here in the 'Set 1' column for available language codes: https://en.wikipedia.org/wiki/List_of_ISO_639_language_codes. This parameter is optional but if you know the language in advance, setting it will improve accuracy.",
                 },
+                "streaming": {"type": "boolean", "description": "Whether to transcribe each participant's audio in realtime over a streaming connection to OpenAI, instead of transcribing each utterance once it ends. Only supported for bots that receive per-participant audio. Defaults to false."},
             },
             "required": ["model"],
             "additionalProperties": False,
@@ -307,6 +319,7 @@ TRANSCRIPTION_SETTINGS_SCHEMA = {
                 "speaker_labels": {"type": "boolean", "description": "Whether to enable AssemblyAI's ML-based diarization. Only needed if multiple people are speaking into a single microphone. Defaults to false."},
                 "use_eu_server": {"type": "boolean", "description": "Whether to use the EU server for transcription. Defaults to false."},
                 "language_detection_options": {"type": "object", "properties": {"expected_languages": {"type": "array", "items": {"type": "string"}}, "fallback_language": {"type": "string"}}, "description": "Options for controlling the automatic language detection. See AssemblyAI docs for details.", "additionalProperties": False},
+                "streaming": {"type": "boolean", "description": "Whether to transcribe each participant's audio in realtime over a streaming connection to AssemblyAI, instead of transcribing each utterance once it ends. Only supported for bots that receive per-participant audio. Defaults to false."},
             },
             "required": [],
             "additionalProperties": False,
@@ -361,6 +374,7 @@ TRANSCRIPTION_SETTINGS_SCHEMA = {
                     "enum": get_elevenlabs_language_codes(),
                 },
                 "tag_audio_events": {"type": "boolean", "description": "Whether to tag audio events like 'laughter' in the transcription."},
+                "streaming": {"type": "boolean", "description": "Whether to transcribe each participant's audio in realtime over a streaming connection to ElevenLabs, instead of transcribing each utterance once it ends. Only supported for bots that receive per-participant audio. Defaults to false."},
             },
             "required": ["model_id"],
             "additionalProperties": False,
@@ -670,6 +684,10 @@ def get_webhook_trigger_enum():
                     "description": "List of webhook trigger types",
                     "uniqueItems": True,
                 },
+                "batch_deliveries": {
+                    "type": "boolean",
+                    "description": "Whether to send several webhooks in one request, as a JSON array of webhook bodies, when events happen in quick succession. Defaults to false.",
+                },
             },
             "required": ["url", "triggers"],
             "additionalProperties": False,
@@ -904,6 +922,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
                     "minItems": 1,
                     "uniqueItems": True,
                 },
+                "batch_deliveries": {"type": "boolean"},
             },
             "required": ["url", "triggers"],
             "additionalProperties": False,
@@ -1906,10 +1925,11 @@ class AsyncTranscriptionSerializer(serializers.ModelSerializer):
     bot_id = serializers.SerializerMethodField()
     state = serializers.SerializerMethodField()
     id = serializers.CharField(source="object_id")
+    progress = serializers.IntegerField(source="progress_percent", help_text="The percentage of the recording's utterances that have been transcribed")
 
     class Meta:
         model = AsyncTranscription
-        fields = ["bot_id", "id", "created_at", "updated_at", "state", "failure_data"]
+        fields = ["bot_id", "id", "created_at", "updated_at", "state", "progress", "failure_data"]
         read_only_fields = fields
 
     def get_bot_id(self, obj):
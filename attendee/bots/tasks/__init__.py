@@ -1,7 +1,10 @@
 from .autopay_charge_task import autopay_charge
+from .deliver_pending_webhooks_task import deliver_pending_webhooks, deliver_webhook_batch
 from .deliver_webhook_task import deliver_webhook
+from .dispatch_transcriptions_task import dispatch_transcriptions
 from .launch_scheduled_bot_task import launch_scheduled_bot
 from .process_async_transcription_task import process_async_transcription
+from .process_utterance_batch_task import process_utterance_batch
 from .process_utterance_task import process_utterance
 from .restart_bot_pod_task import restart_bot_pod
 from .run_bot_task import run_bot
@@ -12,9 +15,13 @@ __all__ = [
     "process_utterance",
     "run_bot",
     "deliver_webhook",
+    "deliver_pending_webhooks",
+    "deliver_webhook_batch",
     "restart_bot_pod",
     "launch_scheduled_bot",
     "sync_calendar",
     "autopay_charge",
     "process_async_transcription",
+    "dispatch_transcriptions",
+    "process_utterance_batch",
 ]
@@ -0,0 +1,205 @@
+import logging
+
+import requests
+from celery import shared_task
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from bots.http_client_pool import get_http_session
+from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSubscription
+from bots.tasks.deliver_webhook_task import deliver_webhook
+from bots.webhook_utils import (
+    build_webhook_data,
+    calculate_latency_percentiles,
+    get_redis_client,
+    get_webhook_delivery_claim_timeout_seconds,
+    get_webhook_delivery_max_batch_size,
+    get_webhook_secret,
+    sign_payload,
+    webhook_delivery_scheduled_key,
+)
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_ATTEMPT_FIELDS_TO_UPDATE = ["status", "succeeded_at", "response_body_list"]
+
+
+def claim_pending_delivery_attempts(subscription_id, max_batch_size):
+    """
+    Picks up the subscription's webhooks that haven't been sent yet, counting this as their first attempt so that
+    no other worker picks them up too.
+    """
+    with transaction.atomic():
+        delivery_attempts = list(WebhookDeliveryAttempt.objects.select_for_update(skip_locked=True, of=("self",)).filter(webhook_subscription_id=subscription_id, status=WebhookDeliveryAttemptStatus.PENDING, attempt_count=0).select_related("bot", "calendar").order_by("created_at", "id")[:max_batch_size])
+        now = timezone.now()
+        WebhookDeliveryAttempt.objects.filter(id__in=[delivery_attempt.id for delivery_attempt in delivery_attempts]).update(attempt_count=F("attempt_count") + 1, last_attempt_at=now)
+    for delivery_attempt in delivery_attempts:
+        delivery_attempt.attempt_count += 1
+        delivery_attempt.last_attempt_at = now
+    return delivery_attempts
+
+
+def reclaim_stale_delivery_attempts():
+    """
+    Sends again the webhooks whose delivery task died after claiming them, e.g. because its worker was killed. They're
+    still pending with an attempt counted, and nothing else would ever pick them up. Each is claimed again so that a
+    later reclaim doesn't send it twice, and they're retried the way a failed delivery would be. Returns how many were
+    reclaimed.
+    """
+    with transaction.atomic():
+        claimed_before = timezone.now() - timezone.timedelta(seconds=get_webhook_delivery_claim_timeout_seconds())
+        delivery_attempts = list(WebhookDeliveryAttempt.objects.select_for_update(skip_locked=True, of=("self",)).filter(status=WebhookDeliveryAttemptStatus.PENDING, attempt_count__gte=1, last_attempt_at__lt=claimed_before).select_related("webhook_subscription").order_by("created_at", "id"))
+        WebhookDeliveryAttempt.objects.filter(id__in=[delivery_attempt.id for delivery_attempt in delivery_attempts]).update(last_attempt_at=timezone.now())
+
+    delivery_attempts_by_subscription = {}
+    for delivery_attempt in delivery_attempts:
+        delivery_attempts_by_subscription.setdefault(delivery_attempt.webhook_subscription, []).append(delivery_attempt)
+
+    for subscription, subscription_delivery_attempts in delivery_attempts_by_subscription.items():
+        logger.warning(f"Reclaiming {len(subscription_delivery_attempts)} webhook deliveries to subscription {subscription.object_id} that were claimed but never finished")
+        if subscription.batch_deliveries and len(subscription_delivery_attempts) > 1:
+            deliver_webhook_batch.delay([delivery_attempt.id for delivery_attempt in subscription_delivery_attempts])
+        else:
+            for delivery_attempt in subscription_delivery_attempts:
+                deliver_webhook.delay(delivery_attempt.id)
+
+    return len(delivery_attempts)
+
+
+def post_webhook(subscription, body, secret):
+    """Sends a webhook body. Returns the response body to store, and whether the delivery succeeded."""
+    try:
+        response = get_http_session("webhooks").post(
+            subscription.url,
+            json=body,
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": "Attendee-Webhook/1.0",
+                "X-Webhook-Signature": sign_payload(body, secret),
+            },
+            timeout=10,  # 10-second timeout
+        )
+    except requests.RequestException as e:
+        return {"status_code": None, "error_type": type(e).__name__, "error_message": str(e), "request_url": subscription.url}, False
+
+    # Limit response body storage to prevent DB issues with large responses
+    return response.text[:10000], 200 <= response.status_code < 300
+
+
+def record_inactive_subscription(delivery_attempt, subscription):
+    delivery_attempt.status = WebhookDeliveryAttemptStatus.FAILURE
+    delivery_attempt.add_to_response_body_list({"status_code": None, "error_type": "InactiveSubscription", "error_message": "Webhook subscription is no longer active", "request_url": subscription.url})
+
+
+def record_delivery_result(delivery_attempt, response_body, succeeded, latencies_ms):
+    delivery_attempt.add_to_response_body_list(response_body)
+    if succeeded:
+        delivery_attempt.status = WebhookDeliveryAttemptStatus.SUCCESS
+        delivery_attempt.succeeded_at = timezone.now()
+        latencies_ms.append((delivery_attempt.succeeded_at - delivery_attempt.created_at).total_seconds() * 1000)
+
+
+@shared_task(bind=True, soft_time_limit=300)
+def deliver_pending_webhooks(self, subscription_id):
+    """
+    Delivers all of a subscription's pending webhooks together, over a pooled keep-alive connection. Subscriptions with
+    batch_deliveries get them in a single request, as an array of webhook bodies. Webhooks that fail are retried by
+    deliver_webhook, or together by deliver_webhook_batch if they were sent as a batch.
+    """
+    try:
+        get_redis_client().delete(webhook_delivery_scheduled_key(subscription_id))
+    except Exception as e:
+        logger.warning(f"Could not clear the scheduled webhook delivery for subscription {subscription_id}: {e}")
+
+    subscription = WebhookSubscription.objects.filter(id=subscription_id).first()
+    if subscription is None:
+        logger.info(f"Webhook subscription {subscription_id} no longer exists, nothing to deliver")
+        return
+
+    max_batch_size = get_webhook_delivery_max_batch_size()
+    delivery_attempts = claim_pending_delivery_attempts(subscription_id, max_batch_size)
+    if not delivery_attempts:
+        return
+
+    latencies_ms = []
+    failed_delivery_attempts = []
+    failed_batch = None
+    if not subscription.is_active:
+        for delivery_attempt in delivery_attempts:
+            record_inactive_subscription(delivery_attempt, subscription)
+    else:
+        secret = get_webhook_secret(subscription.project_id)
+        if subscription.batch_deliveries and len(delivery_attempts) > 1:
+            response_body, succeeded = post_webhook(subscription, [build_webhook_data(delivery_attempt) for delivery_attempt in delivery_attempts], secret)
+            for delivery_attempt in delivery_attempts:
+                record_delivery_result(delivery_attempt, response_body, succeeded, latencies_ms)
+            if not succeeded:
+                failed_batch = delivery_attempts
+        else:
+            for delivery_attempt in delivery_attempts:
+                response_body, succeeded = post_webhook(subscription, build_webhook_data(delivery_attempt), secret)
+                record_delivery_result(delivery_attempt, response_body, succeeded, latencies_ms)
+                if not succeeded:
+                    failed_delivery_attempts.append(delivery_attempt)
+
+    WebhookDeliveryAttempt.objects.bulk_update(delivery_attempts, DELIVERY_ATTEMPT_FIELDS_TO_UPDATE)
+
+    for delivery_attempt in failed_delivery_attempts:
+        logger.info(f"Retrying webhook delivery {delivery_attempt.id} individually (attempt {delivery_attempt.attempt_count})")
+        deliver_webhook.delay(delivery_attempt.id)
+    if failed_batch:
+        # The subscription expects an array, so the batch is retried as one
+        logger.info(f"Retrying batch of {len(failed_batch)} webhook deliveries to subscription {subscription.object_id} (attempt 1)")
+        deliver_webhook_batch.delay([delivery_attempt.id for delivery_attempt in failed_batch])
+
+    latency_percentiles = calculate_latency_percentiles(latencies_ms)
+    logger.info(f"Delivered {len(latencies_ms)} of {len(delivery_attempts)} webhooks to subscription {subscription.object_id}. Latency (ms): {latency_percentiles}")
+
+    # There may be more than one batch's worth waiting
+    if len(delivery_attempts) == max_batch_size:
+        deliver_pending_webhooks.delay(subscription_id)
+
+
+@shared_task(
+    bind=True,
+    retry_backoff=True,  # Enable exponential backoff
+    max_retries=3,
+    autoretry_for=(Exception,),
+)
+def deliver_webhook_batch(self, delivery_ids):
+    """
+    Retries a batch delivery that failed, sending the webhooks in it that haven't been delivered as one array again.
+    """
+    delivery_attempts = list(WebhookDeliveryAttempt.objects.filter(id__in=delivery_ids).exclude(status=WebhookDeliveryAttemptStatus.SUCCESS).select_related("webhook_subscription", "bot", "calendar").order_by("created_at", "id"))
+    if not delivery_attempts:
+        return
+
+    subscription = delivery_attempts[0].webhook_subscription
+    now = timezone.now()
+    for delivery_attempt in delivery_attempts:
+        delivery_attempt.attempt_count += 1
+        delivery_attempt.last_attempt_at = now
+
+    latencies_ms = []
+    succeeded = True
+    if not subscription.is_active:
+        for delivery_attempt in delivery_attempts:
+            record_inactive_subscription(delivery_attempt, subscription)
+    else:
+        response_body, succeeded = post_webhook(subscription, [build_webhook_data(delivery_attempt) for delivery_attempt in delivery_attempts], get_webhook_secret(subscription.project_id))
+        for delivery_attempt in delivery_attempts:
+            record_delivery_result(delivery_attempt, response_body, succeeded, latencies_ms)
+            if not succeeded:
+                delivery_attempt.status = WebhookDeliveryAttemptStatus.FAILURE
+
+    WebhookDeliveryAttempt.objects.bulk_update(delivery_attempts, DELIVERY_ATTEMPT_FIELDS_TO_UPDATE + ["attempt_count", "last_attempt_at"])
+
+    if not succeeded:
+        attempt_count = delivery_attempts[0].attempt_count
+        # Check if this was the last retry attempt
+        if attempt_count >= self.max_retries:
+            logger.error(f"Batch webhook delivery failed after {attempt_count} attempts. Webhook IDs: {[delivery_attempt.id for delivery_attempt in delivery_attempts]}, URL: {subscription.url}")
+        else:
+            logger.info(f"Retrying batch of {len(delivery_attempts)} webhook deliveries (attempt {attempt_count}/{self.max_retries})")
+            raise Exception("Retry due to failure")
@@ -4,8 +4,9 @@ import requests
 from celery import shared_task
 from django.utils import timezone
 
-from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookTriggerTypes
-from bots.webhook_utils import sign_payload
+from bots.http_client_pool import get_http_session
+from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus
+from bots.webhook_utils import build_webhook_data, sign_payload
 
 logger = logging.getLogger(__name__)
 
@@ -41,23 +42,8 @@ def deliver_webhook(self, delivery_id):
         delivery.save()
         return
 
-    related_object_specific_webhook_data = {}
-
-    if delivery.bot:
-        related_object_specific_webhook_data["bot_id"] = delivery.bot.object_id
-        related_object_specific_webhook_data["bot_metadata"] = delivery.bot.metadata
-    elif delivery.calendar:
-        related_object_specific_webhook_data["calendar_id"] = delivery.calendar.object_id
-        related_object_specific_webhook_data["calendar_deduplication_key"] = delivery.calendar.deduplication_key
-        related_object_specific_webhook_data["calendar_metadata"] = delivery.calendar.metadata
-
     # Prepare the webhook payload
-    webhook_data = {
-        "idempotency_key": str(delivery.idempotency_key),
-        **related_object_specific_webhook_data,
-        "trigger": WebhookTriggerTypes.trigger_type_to_api_code(delivery.webhook_trigger_type),
-        "data": delivery.payload,
-    }
+    webhook_data = build_webhook_data(delivery)
 
     # Sign the payload
     active_secret = subscription.project.webhook_secrets.filter().order_by("-created_at").first()
@@ -69,7 +55,7 @@ def deliver_webhook(self, delivery_id):
 
     # Send the webhook
     try:
-        response = requests.post(
+        response = get_http_session("webhooks").post(
             subscription.url,
             json=webhook_data,
             headers={
@@ -0,0 +1,20 @@
+import logging
+
+from celery import shared_task
+
+from bots.transcription_dispatcher import get_transcription_dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, soft_time_limit=60)
+def dispatch_transcriptions(self, bucket=None):
+    """
+    Dispatch pending utterances for one transcription dispatcher bucket, or for all of them if no bucket is given.
+    Scheduled by the dispatcher when a bucket runs out of tokens or is backing off from a rate limit.
+    """
+    transcription_dispatcher = get_transcription_dispatcher()
+    if bucket is None:
+        transcription_dispatcher.dispatch_all()
+    else:
+        transcription_dispatcher.dispatch(bucket)
@@ -1,40 +1,37 @@
 import logging
 
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
 
-from bots.models import AsyncTranscription, AsyncTranscriptionManager, AsyncTranscriptionStates, TranscriptionFailureReasons, Utterance
-from bots.tasks.process_utterance_task import process_utterance
+from bots.async_transcription_planner import AsyncTranscriptionPlanner
+from bots.models import AsyncTranscription, AsyncTranscriptionManager, AsyncTranscriptionStates, TranscriptionFailureReasons
 
 logger = logging.getLogger(__name__)
 
+# Transcriptions normally finish when their last utterance does, and move on to the next utterances as earlier ones finish, so this is only a backstop
+TRANSCRIPTION_COMPLETION_CHECK_INTERVAL_SECONDS = 300
+
 
 def create_utterances_for_transcription(async_transcription):
-    recording = async_transcription.recording
-
-    # Get all the audio chunks for the recording
-    # then create utterances for each audio chunk
-    utterance_task_delay_seconds = 0
-    for audio_chunk in recording.audio_chunks.all():
-        utterance = Utterance.objects.create(
-            source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
-            recording=recording,
-            async_transcription=async_transcription,
-            participant=audio_chunk.participant,
-            audio_chunk=audio_chunk,
-            timestamp_ms=audio_chunk.timestamp_ms,
-            duration_ms=audio_chunk.duration_ms,
-        )
-
-        # Spread out the utterance tasks a bit
-        process_utterance.apply_async(args=[utterance.id], countdown=utterance_task_delay_seconds)
-        utterance_task_delay_seconds += 1
-
-    # After the utterances have been created and queued for transcription, set the recording artifact to in progress
+    planner = AsyncTranscriptionPlanner(async_transcription)
+    planner.create_utterances()
+
+    # After the utterances have been created, set the recording artifact to in progress and send the first window of them for transcription
     AsyncTranscriptionManager.set_async_transcription_in_progress(async_transcription)
+    planner.dispatch_next()
 
 
 def terminate_transcription(async_transcription):
+    with transaction.atomic():
+        # Lock the transcription, so that if the last utterance finishes just as the transcription times out, only one of them terminates it
+        async_transcription = AsyncTranscription.objects.select_for_update().get(id=async_transcription.id)
+        if async_transcription.state != AsyncTranscriptionStates.IN_PROGRESS:
+            return
+        set_transcription_terminal_state(async_transcription)
+
+
+def set_transcription_terminal_state(async_transcription):
     # We'll mark it as failed if there are any failed utterances or any in progress utterances
     any_in_progress_utterances = async_transcription.utterances.filter(transcription__isnull=True, failure_data__isnull=True).exists()
     any_failed_utterances = async_transcription.utterances.filter(failure_data__isnull=False).exists()
@@ -48,18 +45,20 @@ def terminate_transcription(async_transcription):
 
 
 def check_for_transcription_completion(async_transcription):
-    in_progress_utterances = async_transcription.utterances.filter(transcription__isnull=True, failure_data__isnull=True)
-
-    # If no in progress utterances exist or it's been more than max_runtime_seconds, then we need to terminate the transcription
+    # The transcription is terminated when its last utterance is transcribed (see on_utterance_terminated).
+    # This check is for when that doesn't happen: if there were no utterances, or if it's been more than max_runtime_seconds.
+    async_transcription.refresh_from_db()
     max_runtime_seconds = max(1800, async_transcription.utterances.count() * 3)
-    if not in_progress_utterances.exists() or timezone.now() - async_transcription.started_at > timezone.timedelta(seconds=max_runtime_seconds):
-        logger.info(f"Terminating transcription for recording artifact {async_transcription.id} because no in progress utterances exist or it's been more than 30 minutes")
+    if async_transcription.pending_utterance_count == 0 or timezone.now() - async_transcription.started_at > timezone.timedelta(seconds=max_runtime_seconds):
+        logger.info(f"Terminating transcription for recording artifact {async_transcription.id} because no in progress utterances exist or it's been more than {max_runtime_seconds} seconds")
         terminate_transcription(async_transcription)
         return
 
-    # An in progress utterance exists and we haven't timed out, so we need to check again in 1 minute
-    logger.info(f"Checking for transcription completion for recording artifact {async_transcription.id} again in 1 minute")
-    process_async_transcription.apply_async(args=[async_transcription.id], countdown=60)
+    # In case an utterance's task finished but failed to send the next ones
+    AsyncTranscriptionPlanner(async_transcription).dispatch_next()
+
+    logger.info(f"Checking for transcription completion for recording artifact {async_transcription.id} again in {TRANSCRIPTION_COMPLETION_CHECK_INTERVAL_SECONDS} seconds")
+    process_async_transcription.apply_async(args=[async_transcription.id], countdown=TRANSCRIPTION_COMPLETION_CHECK_INTERVAL_SECONDS)
 
 
 @shared_task(
@@ -0,0 +1,124 @@
+import bisect
+import logging
+
+from celery import shared_task
+
+from bots.models import TranscriptionFailureReasons, TranscriptionProviders, Utterance
+from bots.tasks.process_utterance_task import on_utterance_terminated, process_utterance, save_utterance_transcription, transcribe_audio_via_deepgram
+from bots.transcription_dispatcher import TranscriptionDispatcher, get_transcription_dispatcher, transcription_dispatcher_enabled
+
+logger = logging.getLogger(__name__)
+
+# Enough silence that the provider won't run words from neighbouring utterances together
+SILENCE_BETWEEN_UTTERANCES_SECONDS = 1.0
+
+
+def build_batch_audio(utterances, sample_rate):
+    """Joins the utterances' audio with silence in between. Returns the audio and the (start, end) of each utterance in it, in seconds."""
+    silence = bytes(int(sample_rate * SILENCE_BETWEEN_UTTERANCES_SECONDS) * 2)
+    audio = bytearray()
+    segments = []
+    for utterance in utterances:
+        if audio:
+            audio.extend(silence)
+        start_seconds = len(audio) / 2 / sample_rate
+        audio.extend(utterance.get_audio_blob())
+        segments.append((start_seconds, len(audio) / 2 / sample_rate))
+    return bytes(audio), segments
+
+
+def split_words_into_utterances(words, segments):
+    """Assigns each word to the utterance it was spoken in, with its times made relative to the start of that utterance."""
+    segment_starts = [start for start, _ in segments]
+    words_for_segments = [[] for _ in segments]
+    for word in words:
+        midpoint = (word["start"] + word["end"]) / 2
+        segment_index = max(0, bisect.bisect_right(segment_starts, midpoint) - 1)
+        # A word in the silence between two utterances goes to whichever one it's closer to
+        if midpoint > segments[segment_index][1] and segment_index + 1 < len(segments):
+            if segment_starts[segment_index + 1] - midpoint < midpoint - segments[segment_index][1]:
+                segment_index += 1
+
+        segment_start, segment_end = segments[segment_index]
+        segment_duration = segment_end - segment_start
+        words_for_segments[segment_index].append(
+            {
+                **word,
+                "start": min(segment_duration, max(0.0, word["start"] - segment_start)),
+                "end": min(segment_duration, max(0.0, word["end"] - segment_start)),
+            }
+        )
+    return words_for_segments
+
+
+def transcription_from_words(words):
+    return {
+        "transcript": " ".join(word.get("punctuated_word") or word["word"] for word in words),
+        "words": words,
+    }
+
+
+def dispatch_utterances_individually(utterances):
+    if transcription_dispatcher_enabled():
+        transcription_dispatcher = get_transcription_dispatcher()
+        for utterance in utterances:
+            transcription_dispatcher.enqueue_utterance(utterance)
+        return
+
+    for utterance in utterances:
+        process_utterance.delay(utterance.id)
+
+
+@shared_task(bind=True, soft_time_limit=3600)
+def process_utterance_batch(self, utterance_ids):
+    """
+    Transcribes several short utterances from the same recording with one provider request.
+    The utterances' audio is joined with silence in between, and the words in the result are split back out
+    by their timestamps. If anything goes wrong, the utterances are transcribed individually instead.
+    When the transcription dispatcher is enabled, the request takes one of its tokens like any other, and if
+    none is available the utterances are queued in the dispatcher individually.
+    """
+    utterances = list(Utterance.objects.filter(id__in=utterance_ids, transcription__isnull=True, failure_data__isnull=True).select_related("recording__bot", "audio_chunk").order_by("timestamp_ms", "id"))
+    if not utterances:
+        return
+
+    logger.info(f"Processing batch of {len(utterances)} utterances: {[utterance.id for utterance in utterances]}")
+
+    first_utterance = utterances[0]
+    sample_rates = {utterance.get_sample_rate() for utterance in utterances}
+    if len(utterances) == 1 or len(sample_rates) != 1 or first_utterance.transcription_provider != TranscriptionProviders.DEEPGRAM:
+        logger.info(f"Batch of utterances {utterance_ids} can't be transcribed together, transcribing them individually")
+        dispatch_utterances_individually(utterances)
+        return
+
+    transcription_dispatcher = get_transcription_dispatcher() if transcription_dispatcher_enabled() else None
+    if transcription_dispatcher:
+        bucket = TranscriptionDispatcher.bucket_name(first_utterance.recording.bot.project_id, first_utterance.transcription_provider)
+        request_id = f"batch:{first_utterance.id}"
+        if not transcription_dispatcher.acquire_request(bucket, request_id):
+            logger.info(f"Transcription dispatcher bucket {bucket} is at its limit, queueing the batch of utterances {utterance_ids} individually")
+            dispatch_utterances_individually(utterances)
+            return
+
+    try:
+        sample_rate = sample_rates.pop()
+        audio, segments = build_batch_audio(utterances, sample_rate)
+        transcription, failure_data = transcribe_audio_via_deepgram(first_utterance.recording, first_utterance.transcription_settings, audio, sample_rate)
+    except Exception as e:
+        transcription, failure_data = None, {"error": str(e)}
+
+    if transcription_dispatcher:
+        rate_limited = failure_data is not None and failure_data.get("reason") == TranscriptionFailureReasons.RATE_LIMIT_EXCEEDED
+        transcription_dispatcher.finish_request(bucket, request_id, rate_limited=rate_limited)
+
+    if failure_data:
+        # The individual tasks have the retry and failure handling, so leave it to them
+        logger.info(f"Batch transcription failed for utterances {utterance_ids}, transcribing them individually. Failure data: {failure_data}")
+        dispatch_utterances_individually(utterances)
+        return
+
+    words_for_utterances = split_words_into_utterances(transcription.get("words", []), segments)
+    for utterance, words in zip(utterances, words_for_utterances):
+        utterance.transcription_attempt_count += 1
+        pending_utterance_count = save_utterance_transcription(utterance, transcription_from_words(words))
+        on_utterance_terminated(utterance, pending_utterance_count)
@@ -8,7 +8,9 @@ from celery import shared_task
 
 logger = logging.getLogger(__name__)
 
-from bots.models import Credentials, RecordingManager, TranscriptionFailureReasons, TranscriptionProviders, Utterance, WebhookTriggerTypes
+from bots.http_client_pool import get_http_session, http_client_pool
+from bots.models import Credentials, PendingUtteranceManager, RecordingManager, TranscriptionFailureReasons, TranscriptionProviders, Utterance, WebhookTriggerTypes
+from bots.transcription_dispatcher import get_transcription_dispatcher
 from bots.utils import pcm_to_mp3
 from bots.webhook_payloads import utterance_webhook_payload
 from bots.webhook_utils import trigger_webhook
@@ -53,11 +55,14 @@ def get_transcription(utterance):
     retry_backoff=True,  # Enable exponential backoff
     max_retries=6,
 )
-def process_utterance(self, utterance_id):
+def process_utterance(self, utterance_id, dispatched=False):
+    # dispatched is True when the task was sent by the TranscriptionDispatcher, which needs to know when it's done
     utterance = Utterance.objects.get(id=utterance_id)
     logger.info(f"Processing utterance {utterance_id}")
 
-    recording = utterance.recording
+    if dispatched and (utterance.failure_data or utterance.transcription is not None):
+        # No transcription request will be made, so free up the utterance's slot right away
+        get_transcription_dispatcher().finish_utterance(utterance)
 
     if utterance.failure_data:
         logger.info(f"process_utterance was called for utterance {utterance_id} but it has already failed, skipping")
@@ -68,6 +73,15 @@ def process_utterance(self, utterance_id):
 
         transcription, failure_data = get_transcription(utterance)
 
+        if dispatched:
+            rate_limited = failure_data is not None and failure_data.get("reason") == TranscriptionFailureReasons.RATE_LIMIT_EXCEEDED
+            # The dispatcher puts rate limited utterances back in its queue and stops sending requests to the provider for a while,
+            # so there's no need to retry them here, or to count it as an attempt
+            get_transcription_dispatcher().finish_utterance(utterance, rate_limited=rate_limited)
+            if rate_limited:
+                logger.info(f"Transcription provider rate limited utterance {utterance_id}, it was returned to the transcription dispatcher")
+                return
+
         if failure_data:
             if utterance.transcription_attempt_count < 5 and is_retryable_failure(failure_data):
                 utterance.save()
@@ -75,41 +89,71 @@ def process_utterance(self, utterance_id):
             else:
                 # Keep the audio blob around if it fails
                 utterance.failure_data = failure_data
-                utterance.save()
+                pending_utterance_count = PendingUtteranceManager.save_terminated_utterance(utterance)
                 logger.info(f"Transcription failed for utterance {utterance_id}, failure data: {failure_data}")
+                on_utterance_terminated(utterance, pending_utterance_count)
                 return
 
-        # The direct audio_blob column on the utterance model is deprecated, but for backwards compatibility, we need to clear it if it exists
-        if utterance.audio_blob:
-            utterance.audio_blob = b""  # set the audio blob binary field to empty byte string
+        pending_utterance_count = save_utterance_transcription(utterance, transcription)
+        on_utterance_terminated(utterance, pending_utterance_count)
+
 
-        # If the utterance has an associated audio chunk, clear the audio blob on the audio chunk.
-        # If async transcription data is being saved, do NOT clear it, because we may use it later in an async transcription.
-        if utterance.audio_chunk and not utterance.recording.bot.record_async_transcription_audio_chunks():
-            utterance_audio_chunk = utterance.audio_chunk
-            utterance_audio_chunk.audio_blob = b""
-            utterance_audio_chunk.save()
+def save_utterance_transcription(utterance, transcription):
+    """Saves the utterance's transcription. Returns how many utterances are still waiting, as PendingUtteranceManager.save_terminated_utterance does."""
+    # The direct audio_blob column on the utterance model is deprecated, but for backwards compatibility, we need to clear it if it exists
+    if utterance.audio_blob:
+        utterance.audio_blob = b""  # set the audio blob binary field to empty byte string
 
-        utterance.transcription = transcription
-        utterance.save()
+    # If the utterance has an associated audio chunk, clear the audio blob on the audio chunk.
+    # If async transcription data is being saved, do NOT clear it, because we may use it later in an async transcription.
+    if utterance.audio_chunk and not utterance.recording.bot.record_async_transcription_audio_chunks():
+        utterance_audio_chunk = utterance.audio_chunk
+        utterance_audio_chunk.clear_audio_blob()
+        utterance_audio_chunk.save()
 
-        logger.info(f"Transcription complete for utterance {utterance_id}")
+    utterance.transcription = transcription
+    pending_utterance_count = PendingUtteranceManager.save_terminated_utterance(utterance)
 
-        # Don't send webhook for empty transcript or an async transcription
-        if utterance.transcription.get("transcript") and utterance.async_transcription is None:
-            trigger_webhook(
-                webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE,
-                bot=recording.bot,
-                payload=utterance_webhook_payload(utterance),
-            )
+    logger.info(f"Transcription complete for utterance {utterance.id}")
+
+    # Don't send webhook for empty transcript or an async transcription
+    if utterance.transcription.get("transcript") and utterance.async_transcription is None:
+        trigger_webhook(
+            webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE,
+            bot=utterance.recording.bot,
+            payload=utterance_webhook_payload(utterance),
+        )
+
+    return pending_utterance_count
+
+
+def on_utterance_terminated(utterance, pending_utterance_count):
+    """
+    Called with the count returned when an utterance was transcribed or failed. The utterance that was the last one waiting
+    completes the transcription. For async transcriptions, the others make room for the next utterances in the plan.
+    """
+    if pending_utterance_count is None:
+        return
 
-    # If the utterance is for an async transcription, we don't need to do anything with the recording state.
     if utterance.async_transcription is not None:
+        from bots.async_transcription_planner import AsyncTranscriptionPlanner
+        from bots.tasks.process_async_transcription_task import terminate_transcription
+
+        if pending_utterance_count == 0:
+            terminate_transcription(utterance.async_transcription)
+        else:
+            AsyncTranscriptionPlanner(utterance.async_transcription).dispatch_next()
         return
 
-    # If the recording is in a terminal state and there are no more utterances to transcribe, set the recording's transcription state to complete
-    if RecordingManager.is_terminal_state(utterance.recording.state) and Utterance.objects.filter(recording=utterance.recording, transcription__isnull=True).count() == 0:
-        RecordingManager.set_recording_transcription_complete(utterance.recording)
+    if pending_utterance_count != 0:
+        return
+
+    # If the recording is in a terminal state and there are no more utterances to transcribe, set the recording's transcription state to complete.
+    # If it isn't yet, RecordingManager does this when it gets there.
+    recording = utterance.recording
+    recording.refresh_from_db()
+    if RecordingManager.is_terminal_state(recording.state) and PendingUtteranceManager.all_utterances_transcribed(recording):
+        RecordingManager.set_recording_transcription_complete(recording)
 
 
 def get_transcription_via_gladia(utterance):
@@ -125,12 +169,12 @@ def get_transcription_via_gladia(utterance):
 
     upload_url = "https://api.gladia.io/v2/upload"
 
-    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate())
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob(), sample_rate=utterance.get_sample_rate())
     headers = {
         "x-gladia-key": gladia_credentials["api_key"],
     }
     files = {"audio": ("file.mp3", payload_mp3, "audio/mpeg")}
-    upload_response = requests.request("POST", upload_url, headers=headers, files=files)
+    upload_response = get_http_session("gladia").request("POST", upload_url, headers=headers, files=files)
 
     if upload_response.status_code == 401:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -148,7 +192,7 @@ def get_transcription_via_gladia(utterance):
         transcribe_request_body["code_switching_config"] = {
             "languages": transcription_settings.gladia_code_switching_languages(),
         }
-    transcribe_response = requests.request("POST", transcribe_url, headers=headers, json=transcribe_request_body)
+    transcribe_response = get_http_session("gladia").request("POST", transcribe_url, headers=headers, json=transcribe_request_body)
 
     if transcribe_response.status_code != 200 and transcribe_response.status_code != 201:
         return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "step": "transcribe_request", "status_code": transcribe_response.status_code}
@@ -161,7 +205,7 @@ def get_transcription_via_gladia(utterance):
     retry_count = 0
 
     while retry_count < max_retries:
-        result_response = requests.get(result_url, headers=headers)
+        result_response = get_http_session("gladia").get(result_url, headers=headers)
 
         if result_response.status_code != 200:
             logger.error(f"Gladia result fetch failed with status code {result_response.status_code}")
@@ -177,7 +221,7 @@ def get_transcription_via_gladia(utterance):
             transcription = result_data.get("result", {}).get("transcription", "")
             logger.info("Gladia transcription completed successfully, now deleting audio file from Gladia")
             # Delete the audio file from Gladia
-            delete_response = requests.request("DELETE", result_url, headers=headers)
+            delete_response = get_http_session("gladia").request("DELETE", result_url, headers=headers)
             if delete_response.status_code != 200 and delete_response.status_code != 202:
                 logger.error(f"Gladia delete failed with status code {delete_response.status_code}")
             else:
@@ -215,6 +259,10 @@ def get_transcription_via_gladia(utterance):
 
 
 def get_transcription_via_deepgram(utterance):
+    return transcribe_audio_via_deepgram(utterance.recording, utterance.transcription_settings, utterance.get_audio_blob(), utterance.get_sample_rate())
+
+
+def transcribe_audio_via_deepgram(recording, transcription_settings, audio_blob, sample_rate):
     from deepgram import (
         DeepgramApiError,
         DeepgramClient,
@@ -222,10 +270,8 @@ def get_transcription_via_deepgram(utterance):
         PrerecordedOptions,
     )
 
-    recording = utterance.recording
-    transcription_settings = utterance.transcription_settings
     payload: FileSource = {
-        "buffer": utterance.get_audio_blob().tobytes(),
+        "buffer": audio_blob,
     }
 
     deepgram_model = transcription_settings.deepgram_model()
@@ -238,7 +284,7 @@ def get_transcription_via_deepgram(utterance):
         keyterm=transcription_settings.deepgram_keyterms(),
         keywords=transcription_settings.deepgram_keywords(),
         encoding="linear16",  # for 16-bit PCM
-        sample_rate=utterance.get_sample_rate(),
+        sample_rate=sample_rate,
         redact=transcription_settings.deepgram_redaction_settings(),
     )
 
@@ -253,8 +299,16 @@ def get_transcription_via_deepgram(utterance):
     deepgram = DeepgramClient(deepgram_credentials["api_key"])
 
     try:
-        response = deepgram.listen.rest.v("1").transcribe_file(payload, options)
+        # The Deepgram SDK opens a new httpx client for every request, so give it a transport that keeps its connections open
+        response = deepgram.listen.rest.v("1").transcribe_file(
+            payload,
+            options,
+            timeout=http_client_pool.get_httpx_timeout("deepgram"),
+            transport=http_client_pool.get_httpx_transport("deepgram"),
+        )
     except DeepgramApiError as e:
+        if str(e.status) == "429":
+            return None, {"reason": TranscriptionFailureReasons.RATE_LIMIT_EXCEEDED, "status_code": 429}
         original_error_json = json.loads(e.original_error)
         if original_error_json.get("err_code") == "INVALID_AUTH":
             return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -287,7 +341,7 @@ def get_transcription_via_openai(utterance):
         return {"transcript": ""}, None
 
     # Convert PCM audio to MP3
-    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate())
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob(), sample_rate=utterance.get_sample_rate())
 
     # Prepare the request for OpenAI's transcription API
     base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
@@ -300,7 +354,7 @@ def get_transcription_via_openai(utterance):
         files["prompt"] = (None, transcription_settings.openai_transcription_prompt())
     if transcription_settings.openai_transcription_language():
         files["language"] = (None, transcription_settings.openai_transcription_language())
-    response = requests.post(url, headers=headers, files=files)
+    response = get_http_session("openai").post(url, headers=headers, files=files)
 
     if response.status_code == 401:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -343,9 +397,9 @@ def get_transcription_via_assemblyai(utterance):
     headers = {"authorization": api_key}
     base_url = transcription_settings.assemblyai_base_url()
 
-    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate())
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob(), sample_rate=utterance.get_sample_rate())
 
-    upload_response = requests.post(f"{base_url}/upload", headers=headers, data=payload_mp3)
+    upload_response = get_http_session("assembly_ai").post(f"{base_url}/upload", headers=headers, data=payload_mp3)
 
     if upload_response.status_code == 401:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -381,7 +435,7 @@ def get_transcription_via_assemblyai(utterance):
         data["language_detection_options"] = language_detection_options
 
     url = f"{base_url}/transcript"
-    response = requests.post(url, json=data, headers=headers)
+    response = get_http_session("assembly_ai").post(url, json=data, headers=headers)
 
     if response.status_code != 200:
         return None, {"reason": TranscriptionFailureReasons.TRANSCRIPTION_REQUEST_FAILED, "status_code": response.status_code, "text": response.text}
@@ -394,7 +448,7 @@ def get_transcription_via_assemblyai(utterance):
     retry_count = 0
 
     while retry_count < max_retries:
-        polling_response = requests.get(polling_endpoint, headers=headers)
+        polling_response = get_http_session("assembly_ai").get(polling_endpoint, headers=headers)
 
         if polling_response.status_code != 200:
             logger.error(f"AssemblyAI result fetch failed with status code {polling_response.status_code}")
@@ -408,7 +462,7 @@ def get_transcription_via_assemblyai(utterance):
             logger.info("AssemblyAI transcription completed successfully, now deleting from AssemblyAI.")
 
             # Delete the transcript from AssemblyAI
-            delete_response = requests.delete(polling_endpoint, headers=headers)
+            delete_response = get_http_session("assembly_ai").delete(polling_endpoint, headers=headers)
             if delete_response.status_code != 200:
                 logger.error(f"AssemblyAI delete failed with status code {delete_response.status_code}: {delete_response.text}")
             else:
@@ -478,7 +532,7 @@ def get_transcription_via_sarvam(utterance):
         return {"transcript": ""}, None
 
     # Sarvam says 16kHz sample rate works best
-    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate(), output_sample_rate=16000)
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob(), sample_rate=utterance.get_sample_rate(), output_sample_rate=16000)
 
     files = {"file": ("audio.mp3", payload_mp3, "audio/mpeg")}
 
@@ -490,7 +544,7 @@ def get_transcription_via_sarvam(utterance):
         data["model"] = transcription_settings.sarvam_model()
 
     try:
-        response = requests.post(base_url, headers=headers, files=files, data=data if data else None)
+        response = get_http_session("sarvam").post(base_url, headers=headers, files=files, data=data if data else None)
 
         if response.status_code == 403:
             return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -540,7 +594,7 @@ def get_transcription_via_elevenlabs(utterance):
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND, "error": "api_key not in credentials"}
 
     # Convert PCM audio to MP3 for ElevenLabs
-    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate())
+    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob(), sample_rate=utterance.get_sample_rate())
 
     # Prepare the request for ElevenLabs speech-to-text API
     url = "https://api.elevenlabs.io/v1/speech-to-text"
@@ -562,7 +616,7 @@ def get_transcription_via_elevenlabs(utterance):
     data["tag_audio_events"] = transcription_settings.elevenlabs_tag_audio_events()
 
     try:
-        response = requests.post(url, headers=headers, files=files, data=data if data else None)
+        response = get_http_session("elevenlabs").post(url, headers=headers, files=files, data=data if data else None)
 
         if response.status_code == 401:
             return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
@@ -78,6 +78,8 @@ def restart_bot_pod(self, bot_id):
 
     bot.first_heartbeat_timestamp = None
     bot.last_heartbeat_timestamp = None
+    # The new pod is always a cold one, named after the bot
+    bot.warm_pod_name = None
     bot.save()
 
     bot_pod_creator = BotPodCreator()
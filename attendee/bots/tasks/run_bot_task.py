@@ -6,6 +6,7 @@ from celery import shared_task
 from celery.signals import worker_shutting_down
 
 from bots.bot_controller import BotController
+from bots.warm_pod_pool import get_warm_pod_pool, warm_pod_pool_enabled
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +14,8 @@ logger = logging.getLogger(__name__)
 @shared_task(bind=True, soft_time_limit=3600)
 def run_bot(self, bot_id):
     logger.info(f"Running bot {bot_id}")
+    if warm_pod_pool_enabled():
+        get_warm_pod_pool().record_bot_started(bot_id)
     bot_controller = BotController(bot_id)
     bot_controller.run()
 
@@ -2,7 +2,7 @@ import hashlib
 
 from django import template
 
-from bots.models import WebhookTriggerTypes
+from bots.models import BotEventSubTypes, BotEventTypes, WebhookTriggerTypes
 
 register = template.Library()
 
@@ -56,6 +56,16 @@ def participant_color(uuid):
     return f"#{r:02x}{g:02x}{b:02x}"
 
 
+@register.filter
+def bot_event_type_display(event_type):
+    return dict(BotEventTypes.choices).get(event_type, str(event_type))
+
+
+@register.filter
+def bot_event_sub_type_display(event_sub_type):
+    return dict(BotEventSubTypes.choices).get(event_sub_type, str(event_sub_type))
+
+
 @register.filter
 def md5(value):
     return hashlib.md5(str(value).encode()).hexdigest()
@@ -0,0 +1,106 @@
+import os
+import uuid
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from bots.async_transcription_planner import AsyncTranscriptionPlanner
+from bots.models import (
+    AsyncTranscription,
+    AsyncTranscriptionManager,
+    AsyncTranscriptionStates,
+    AudioChunk,
+    Bot,
+    Organization,
+    Participant,
+    Project,
+    Recording,
+    RecordingStates,
+    Utterance,
+)
+from bots.serializers import AsyncTranscriptionSerializer
+from bots.tasks.process_async_transcription_task import create_utterances_for_transcription
+from bots.tasks.process_utterance_task import process_utterance
+
+
+@mock.patch.dict(os.environ, {"ASYNC_TRANSCRIPTION_MAX_IN_FLIGHT": "3"})
+class AsyncTranscriptionPlannerTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1, state=RecordingStates.COMPLETE)
+        self.participants = [Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4())) for _ in range(2)]
+
+    def create_audio_chunks(self, participant_indexes, duration_ms=1000):
+        for i, participant_index in enumerate(participant_indexes):
+            AudioChunk.objects.create(recording=self.recording, participant=self.participants[participant_index], audio_blob=b"rawpcmbytes", timestamp_ms=i * duration_ms, duration_ms=duration_ms, sample_rate=16000)
+
+    def create_async_transcription(self, provider_settings):
+        return AsyncTranscription.objects.create(recording=self.recording, settings={"transcription_settings": provider_settings})
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription", return_value=({"transcript": "hello"}, None))
+    @mock.patch("bots.tasks.process_utterance_task.process_utterance.delay")
+    def test_only_a_window_of_utterances_is_transcribed_at_once(self, mock_delay, mock_get_transcription):
+        self.create_audio_chunks([0, 1, 0, 1, 0, 1, 0])
+        async_transcription = self.create_async_transcription({"openai": {"model": "gpt-4o-transcribe"}})
+
+        create_utterances_for_transcription(async_transcription)
+
+        utterance_ids = list(async_transcription.utterances.order_by("timestamp_ms").values_list("id", flat=True))
+        self.assertEqual([call.args[0] for call in mock_delay.call_args_list], utterance_ids[:3])
+
+        # Finishing an utterance makes room for the next one in the plan
+        with mock.patch.object(AsyncTranscriptionManager, "delivery_webhook") as mock_delivery_webhook:
+            while mock_delay.call_args_list:
+                utterance_id = mock_delay.call_args_list.pop(0).args[0]
+                process_utterance.apply(args=[utterance_id])
+            mock_delivery_webhook.assert_called_once()
+
+        self.assertEqual(mock_get_transcription.call_count, 7)
+        async_transcription.refresh_from_db()
+        self.assertEqual(async_transcription.state, AsyncTranscriptionStates.COMPLETE)
+        self.assertEqual(async_transcription.dispatched_utterance_count, 7)
+        self.assertEqual(async_transcription.last_dispatched_utterance_id, utterance_ids[-1])
+
+    @mock.patch("bots.tasks.process_utterance_task.process_utterance.delay")
+    def test_the_window_is_not_exceeded_while_utterances_are_in_flight(self, mock_delay):
+        self.create_audio_chunks([0, 1, 0, 1, 0])
+        async_transcription = self.create_async_transcription({"openai": {"model": "gpt-4o-transcribe"}})
+        create_utterances_for_transcription(async_transcription)
+
+        self.assertEqual(AsyncTranscriptionPlanner(async_transcription).dispatch_next(), 0)
+        self.assertEqual(mock_delay.call_count, 3)
+
+    @mock.patch("bots.tasks.process_utterance_batch_task.process_utterance_batch.delay")
+    @mock.patch("bots.tasks.process_utterance_task.process_utterance.delay")
+    def test_consecutive_utterances_from_the_same_participant_are_merged_for_deepgram(self, mock_delay, mock_batch_delay):
+        self.create_audio_chunks([0, 0, 1])
+        async_transcription = self.create_async_transcription({"deepgram": {"language": "en"}})
+
+        create_utterances_for_transcription(async_transcription)
+
+        utterance_ids = list(async_transcription.utterances.order_by("timestamp_ms").values_list("id", flat=True))
+        mock_batch_delay.assert_called_once_with(utterance_ids[:2])
+        mock_delay.assert_called_once_with(utterance_ids[2])
+
+    def test_long_utterances_are_not_merged(self):
+        self.create_audio_chunks([0, 0], duration_ms=10000)
+        async_transcription = self.create_async_transcription({"deepgram": {"language": "en"}})
+        planner = AsyncTranscriptionPlanner(async_transcription)
+        utterances = planner.create_utterances()
+
+        self.assertEqual(len(planner.group_utterances(utterances, async_transcription.transcription_provider)), 2)
+
+    def test_progress(self):
+        self.create_audio_chunks([0, 1, 0, 1])
+        async_transcription = self.create_async_transcription({"openai": {"model": "gpt-4o-transcribe"}})
+        self.assertEqual(async_transcription.progress_percent, 0)
+
+        AsyncTranscriptionPlanner(async_transcription).create_utterances()
+        Utterance.objects.filter(id=async_transcription.utterances.first().id).update(transcription={"transcript": "hello"})
+        AsyncTranscription.objects.filter(id=async_transcription.id).update(pending_utterance_count=3)
+
+        async_transcription.refresh_from_db()
+        self.assertEqual(async_transcription.progress_percent, 25)
+        self.assertEqual(AsyncTranscriptionSerializer(async_transcription).data["progress"], 25)
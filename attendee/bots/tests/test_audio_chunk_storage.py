@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+import unittest
+import uuid
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from bots.models import AudioChunk, AudioChunkStorage, Bot, Organization, Participant, Project, Recording, RecordingStates, Utterance
+
+
+class AudioChunkStorageTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1, state=RecordingStates.IN_PROGRESS, transcription_provider=1)
+        self.participant = Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4()))
+        self.pcm_data = bytes(range(256)) * 64
+
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir)
+        storages_setting = {**settings.STORAGES, "audio_chunks": {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.storage_dir}}}
+        settings_override = override_settings(STORAGES=storages_setting, AUDIO_CHUNK_STORAGE="local", AUDIO_CHUNK_STORAGE_CODEC="pcm")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_audio_chunk(self, pcm_data):
+        audio_chunk = AudioChunk(recording=self.recording, participant=self.participant, timestamp_ms=0, duration_ms=500, sample_rate=16000)
+        audio_chunk.set_audio_blob(pcm_data)
+        audio_chunk.save()
+        return audio_chunk
+
+    def test_audio_is_written_to_storage_instead_of_the_database(self):
+        audio_chunk = self.create_audio_chunk(self.pcm_data)
+        audio_chunk.refresh_from_db()
+
+        self.assertEqual(bytes(audio_chunk.audio_blob), b"")
+        self.assertEqual(audio_chunk.audio_blob_codec, AudioChunk.BlobCodecs.PCM)
+        self.assertEqual(audio_chunk.audio_blob_size, len(self.pcm_data))
+        self.assertTrue(audio_chunk.audio_blob_storage_key.startswith(f"{self.recording.object_id}/"))
+        self.assertTrue(AudioChunkStorage().exists(audio_chunk.audio_blob_storage_key))
+        self.assertEqual(audio_chunk.get_audio_blob(), self.pcm_data)
+
+        utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, audio_chunk=audio_chunk, timestamp_ms=0, duration_ms=500)
+        self.assertEqual(utterance.get_audio_blob(), self.pcm_data)
+
+    def test_clear_audio_blob_deletes_from_storage(self):
+        audio_chunk = self.create_audio_chunk(self.pcm_data)
+        storage_key = audio_chunk.audio_blob_storage_key
+
+        audio_chunk.clear_audio_blob()
+        audio_chunk.save()
+
+        self.assertFalse(AudioChunkStorage().exists(storage_key))
+        self.assertFalse(AudioChunk.objects.filter(AudioChunk.has_audio_blob_filter()).exists())
+
+    def test_database_storage_keeps_audio_in_the_row(self):
+        with override_settings(AUDIO_CHUNK_STORAGE="database"):
+            audio_chunk = self.create_audio_chunk(self.pcm_data)
+        audio_chunk.refresh_from_db()
+
+        self.assertIsNone(audio_chunk.audio_blob_storage_key)
+        self.assertEqual(audio_chunk.get_audio_blob(), self.pcm_data)
+        self.assertTrue(AudioChunk.objects.filter(AudioChunk.has_audio_blob_filter()).exists())
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is required to encode FLAC")
+    def test_flac_round_trip(self):
+        with override_settings(AUDIO_CHUNK_STORAGE_CODEC="flac"):
+            audio_chunk = self.create_audio_chunk(self.pcm_data)
+
+        self.assertEqual(audio_chunk.audio_blob_codec, AudioChunk.BlobCodecs.FLAC)
+        self.assertLess(audio_chunk.audio_blob_size, len(self.pcm_data))
+        self.assertEqual(audio_chunk.get_audio_blob(), self.pcm_data)
+
+    def test_move_audio_chunks_to_blob_storage_command(self):
+        with override_settings(AUDIO_CHUNK_STORAGE="database"):
+            audio_chunks = [self.create_audio_chunk(self.pcm_data + bytes([i])) for i in range(5)]
+        legacy_utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=self.pcm_data, sample_rate=16000, timestamp_ms=0, duration_ms=500)
+
+        call_command("move_audio_chunks_to_blob_storage", batch_size=2)
+
+        for i, audio_chunk in enumerate(audio_chunks):
+            audio_chunk.refresh_from_db()
+            self.assertEqual(bytes(audio_chunk.audio_blob), b"")
+            self.assertIsNotNone(audio_chunk.audio_blob_storage_key)
+            self.assertEqual(audio_chunk.get_audio_blob(), self.pcm_data + bytes([i]))
+
+        legacy_utterance.refresh_from_db()
+        self.assertEqual(bytes(legacy_utterance.audio_blob), b"")
+        self.assertIsNotNone(legacy_utterance.audio_chunk.audio_blob_storage_key)
+        self.assertEqual(legacy_utterance.get_audio_blob(), self.pcm_data)
+
+    def test_clear_old_audio_chunks_command(self):
+        audio_chunk_in_storage = self.create_audio_chunk(self.pcm_data)
+        with override_settings(AUDIO_CHUNK_STORAGE="database"):
+            audio_chunk_in_database = self.create_audio_chunk(self.pcm_data)
+        AudioChunk.objects.update(created_at=timezone.now() - timezone.timedelta(days=2))
+        storage_key = audio_chunk_in_storage.audio_blob_storage_key
+
+        call_command("clear_old_audio_chunks")
+
+        audio_chunk_in_storage.refresh_from_db()
+        audio_chunk_in_database.refresh_from_db()
+        self.assertIsNone(audio_chunk_in_storage.audio_blob_storage_key)
+        self.assertFalse(AudioChunkStorage().exists(storage_key))
+        self.assertEqual(bytes(audio_chunk_in_database.audio_blob), b"")
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from bots.bot_controller.per_speaker_vad_engine import calculate_normalized_rms
+from bots.web_bot_adapter.audio_frame_converter import AudioFrameConverter
+
+
+class TestAudioFrameConverter(unittest.TestCase):
+    def setUp(self):
+        self.converter = AudioFrameConverter(initial_capacity=8)
+
+    def test_matches_astype_conversion_for_in_range_samples(self):
+        samples = np.random.default_rng(0).uniform(-0.99, 0.99, 480).astype(np.float32)
+
+        pcm_bytes, normalized_rms = self.converter.convert(samples.tobytes())
+
+        self.assertEqual(pcm_bytes, (samples * 32768.0).astype(np.int16).tobytes())
+        self.assertAlmostEqual(normalized_rms, calculate_normalized_rms(pcm_bytes), places=5)
+
+    def test_clips_out_of_range_samples(self):
+        samples = np.array([1.0, 1.5, -1.0, -2.0, 0.5], dtype=np.float32)
+
+        pcm_bytes, _ = self.converter.convert(samples.tobytes())
+
+        self.assertEqual(np.frombuffer(pcm_bytes, dtype=np.int16).tolist(), [32767, 32767, -32768, -32768, 16384])
+
+    def test_silent_frame_has_zero_rms(self):
+        # Values this small truncate to 0 in 16-bit PCM
+        samples = np.full(100, 1e-6, dtype=np.float32)
+
+        pcm_bytes, normalized_rms = self.converter.convert(samples.tobytes())
+
+        self.assertEqual(pcm_bytes, bytes(200))
+        self.assertEqual(normalized_rms, 0.0)
+
+    def test_reused_buffers_do_not_leak_between_frames(self):
+        first_pcm_bytes, _ = self.converter.convert(np.full(20, 0.5, dtype=np.float32).tobytes())
+        second_pcm_bytes, _ = self.converter.convert(np.full(4, -0.5, dtype=np.float32).tobytes())
+
+        self.assertEqual(np.frombuffer(first_pcm_bytes, dtype=np.int16).tolist(), [16384] * 20)
+        self.assertEqual(np.frombuffer(second_pcm_bytes, dtype=np.int16).tolist(), [-16384] * 4)
+
+    def test_accepts_memoryview_slices(self):
+        message = b"\x01\x02\x03\x04" + np.array([0.25, -0.25], dtype=np.float32).tobytes()
+
+        pcm_bytes, _ = self.converter.convert(memoryview(message)[4:])
+
+        self.assertEqual(np.frombuffer(pcm_bytes, dtype=np.int16).tolist(), [8192, -8192])
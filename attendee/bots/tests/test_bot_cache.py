@@ -0,0 +1,66 @@
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from bots.bot_controller.bot_cache import BotCache
+from bots.models import Bot, BotStates, Credentials, Organization, Participant, Project, Recording, RecordingStates
+
+
+class BotCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz", state=BotStates.JOINED_RECORDING)
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1, state=RecordingStates.IN_PROGRESS, is_default_recording=True)
+        self.credentials = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.DEEPGRAM)
+        self.credentials.set_credentials({"api_key": "test_api_key"})
+        self.bot_cache = BotCache(self.bot)
+
+    def test_repeated_lookups_do_not_query_the_database(self):
+        defaults = {"full_name": "Participant", "is_the_bot": False, "is_host": False}
+        with CaptureQueriesContext(connection) as first_lookups:
+            participant = self.bot_cache.get_participant("participant-1", defaults)
+            recording_in_progress = self.bot_cache.get_recording_in_progress()
+            default_recording = self.bot_cache.get_default_recording()
+            credentials = self.bot_cache.get_credentials(Credentials.CredentialTypes.DEEPGRAM)
+
+        with CaptureQueriesContext(connection) as repeated_lookups:
+            for _ in range(100):
+                self.assertEqual(self.bot_cache.get_participant("participant-1", defaults), participant)
+                self.assertEqual(self.bot_cache.get_recording_in_progress(), recording_in_progress)
+                self.assertEqual(self.bot_cache.get_default_recording(), default_recording)
+                self.assertEqual(self.bot_cache.get_credentials(Credentials.CredentialTypes.DEEPGRAM), credentials)
+
+        self.assertGreater(len(first_lookups), 0)
+        self.assertEqual(len(repeated_lookups), 0)
+        self.assertEqual(Participant.objects.filter(bot=self.bot).count(), 1)
+        self.assertEqual(recording_in_progress, self.recording)
+        self.assertEqual(credentials, {"api_key": "test_api_key"})
+
+        metrics = self.bot_cache.get_metrics()
+        self.assertEqual(metrics["hits"], 400)
+        self.assertEqual(metrics["misses"], 4)
+        self.assertEqual(metrics["hit_rate"], round(400 / 404, 3))
+
+    def test_recording_in_progress_is_reloaded_when_the_bot_changes_state(self):
+        self.assertEqual(self.bot_cache.get_recording_in_progress(), self.recording)
+
+        Recording.objects.filter(id=self.recording.id).update(state=RecordingStates.COMPLETE)
+        self.assertEqual(self.bot_cache.get_recording_in_progress(), self.recording)
+
+        self.bot.state = BotStates.LEAVING
+        self.assertIsNone(self.bot_cache.get_recording_in_progress())
+
+    def test_invalidate_reloads_credentials(self):
+        self.assertEqual(self.bot_cache.get_credentials(Credentials.CredentialTypes.DEEPGRAM), {"api_key": "test_api_key"})
+        self.assertIsNone(self.bot_cache.get_credentials(Credentials.CredentialTypes.GLADIA))
+
+        self.credentials.set_credentials({"api_key": "new_api_key"})
+        Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.GLADIA).set_credentials({"api_key": "gladia_api_key"})
+        self.assertEqual(self.bot_cache.get_credentials(Credentials.CredentialTypes.DEEPGRAM), {"api_key": "test_api_key"})
+
+        self.bot_cache.invalidate()
+
+        self.assertEqual(self.bot_cache.get_credentials(Credentials.CredentialTypes.DEEPGRAM), {"api_key": "new_api_key"})
+        self.assertEqual(self.bot_cache.get_credentials(Credentials.CredentialTypes.GLADIA), {"api_key": "gladia_api_key"})
+        self.assertEqual(self.bot_cache.get_metrics()["invalidations"], 1)
@@ -0,0 +1,69 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from bots.bot_controller.bot_controller import BotController
+
+
+class FakeRedis:
+    """Just enough of the Redis API for reading the meeting details."""
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+@patch.dict(os.environ, {"LINGO_BOT_URL": "http://lingo-bot", "AWS_RECORDING_STORAGE_BUCKET_NAME": "recordings"})
+class TestBotControllerMeetingDetails(unittest.TestCase):
+    def setUp(self):
+        # The meeting details don't depend on anything set up by __init__
+        self.controller = BotController.__new__(BotController)
+        self.controller.bot_in_db = SimpleNamespace(name="Lingo Bot", meeting_url="https://meet.google.com/abc-defg-hij")
+
+    def call_lingo_callback(self, hashes, file_keys=("recording.mp4",)):
+        with patch("bots.bot_controller.bot_controller.redis_client", FakeRedis(hashes)), patch("bots.bot_controller.bot_controller.threading") as mock_threading, patch("bots.bot_controller.bot_controller.requests.post") as mock_post:
+            self.controller.call_lingo_callback(list(file_keys))
+            for call in mock_threading.Thread.call_args_list:
+                call.kwargs["target"]()
+        return mock_post
+
+    def test_details_are_read_from_the_meetings_own_hash(self):
+        hashes = {
+            "meeting_details:Lingo Bot:https://meet.google.com/abc-defg-hij": {"title": "Standup", "meeting_time": "2025-01-02T10:00:00", "user_id": "user-1"},
+            "meeting_details:Lingo Bot:https://meet.google.com/other-meeting": {"title": "Retro", "meeting_time": "2025-01-02T11:00:00", "user_id": "user-1"},
+        }
+
+        mock_post = self.call_lingo_callback(hashes)
+
+        mock_post.assert_called_once_with(
+            "http://lingo-bot/meetings/call-to-lingo",
+            json={"key": "s3://recordings/recording.mp4", "meeting_details": "Standup_2025-01-02", "user_id": "user-1"},
+        )
+
+    def test_details_migrated_without_a_meeting_url_are_used_as_a_fallback(self):
+        hashes = {"meeting_details:Lingo Bot": {"title": "Planning", "meeting_time": "2025-01-03T09:00:00", "user_id": "user-2"}}
+
+        mock_post = self.call_lingo_callback(hashes)
+
+        self.assertEqual(mock_post.call_args.kwargs["json"]["meeting_details"], "Planning_2025-01-03")
+
+    def test_lingo_is_not_called_without_meeting_details(self):
+        mock_post = self.call_lingo_callback({})
+
+        mock_post.assert_not_called()
+
+    def test_each_part_of_a_split_recording_is_sent(self):
+        hashes = {"meeting_details:Lingo Bot:https://meet.google.com/abc-defg-hij": {"title": "Standup", "meeting_time": "2025-01-02T10:00:00", "user_id": "user-1"}}
+
+        mock_post = self.call_lingo_callback(hashes, file_keys=["recording.mp4", "recording_1.mp4"])
+
+        self.assertEqual(
+            [call.kwargs["json"] for call in mock_post.call_args_list],
+            [
+                {"key": "s3://recordings/recording.mp4", "meeting_details": "Standup_2025-01-02_part1", "user_id": "user-1"},
+                {"key": "s3://recordings/recording_1.mp4", "meeting_details": "Standup_2025-01-02_part2", "user_id": "user-1"},
+            ],
+        )
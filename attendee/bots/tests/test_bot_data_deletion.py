@@ -5,7 +5,7 @@ from django.core.files.base import ContentFile
 from django.test import TransactionTestCase
 from django.test.utils import override_settings
 
-from bots.models import AudioChunk, Bot, BotDebugScreenshot, BotEvent, BotEventTypes, BotStates, ChatMessage, ChatMessageToOptions, Organization, Participant, ParticipantEvent, ParticipantEventTypes, Project, Recording, RecordingStates, Utterance, WebhookDeliveryAttempt, WebhookSubscription, WebhookTriggerTypes
+from bots.models import ApiKey, AudioChunk, Bot, BotDebugScreenshot, BotEvent, BotEventTypes, BotStates, ChatMessage, ChatMessageToOptions, Organization, Participant, ParticipantEvent, ParticipantEventTypes, Project, Recording, RecordingStates, TranscriptSnapshot, Utterance, WebhookDeliveryAttempt, WebhookSubscription, WebhookTriggerTypes
 
 
 def mock_file_field_delete_sets_name_to_none(instance, save=True):
@@ -235,6 +235,59 @@ class TestBotDataDeletion(TransactionTestCase):
         for recording in Recording.objects.filter(bot=self.bot1):
             self.assertFalse(recording.file)
 
+    def test_delete_data_deletes_audio_chunks_from_storage(self):
+        """Test that audio kept in the audio chunk storage is deleted along with its chunk"""
+        stored_audio_chunk = AudioChunk.objects.create(
+            recording=self.recording1,
+            participant=self.participant1,
+            audio_blob=b"",
+            audio_blob_storage_key="audio_chunks/chunk1b.flac",
+            audio_blob_size=100,
+            audio_blob_codec=AudioChunk.BlobCodecs.FLAC,
+            timestamp_ms=2000,
+            duration_ms=500,
+            sample_rate=16000,
+        )
+        AudioChunk.objects.create(
+            recording=self.recording2,
+            participant=self.participant2,
+            audio_blob=b"",
+            audio_blob_storage_key="audio_chunks/chunk2b.flac",
+            audio_blob_size=100,
+            audio_blob_codec=AudioChunk.BlobCodecs.FLAC,
+            timestamp_ms=2000,
+            duration_ms=500,
+            sample_rate=16000,
+        )
+
+        with patch("bots.models.AudioChunkStorage") as mock_audio_chunk_storage, patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay"):
+            self.bot1.delete_data()
+
+        mock_audio_chunk_storage.return_value.delete.assert_called_once_with(stored_audio_chunk.audio_blob_storage_key)
+        self.assertEqual(AudioChunk.objects.filter(recording__bot=self.bot1).count(), 0)
+        self.assertEqual(AudioChunk.objects.filter(recording__bot=self.bot2).count(), 2)
+
+    def test_delete_data_deletes_transcript_snapshot(self):
+        """Test that the transcript endpoint doesn't return the transcript from the snapshot once the data is deleted"""
+        _, api_key_plain = ApiKey.create(project=self.project, name="Test API Key")
+        self.recording1.is_default_recording = True
+        self.recording1.save()
+        TranscriptSnapshot.objects.create(
+            recording=self.recording1,
+            transcript_sequence_number=1,
+            entries=[{"utterance_id": self.utterance1.id, "speaker_name": "Test Participant 1", "speaker_uuid": "participant1", "speaker_user_uuid": None, "speaker_is_host": False, "timestamp_ms": 1000, "duration_ms": 500, "transcription": {"transcript": "Hello"}}],
+        )
+        TranscriptSnapshot.objects.create(recording=self.recording2)
+
+        with patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay"):
+            self.bot1.delete_data()
+
+        self.assertFalse(TranscriptSnapshot.objects.filter(recording=self.recording1).exists())
+        self.assertTrue(TranscriptSnapshot.objects.filter(recording=self.recording2).exists())
+        response = self.client.get(f"/api/v1/bots/{self.bot1.object_id}/transcript", HTTP_AUTHORIZATION=f"Token {api_key_plain}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
     def test_fatal_error_to_data_deleted_transition(self):
         """Test that a bot in FATAL_ERROR state can transition to DATA_DELETED"""
         # Change bot state to FATAL_ERROR
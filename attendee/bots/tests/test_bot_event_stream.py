@@ -0,0 +1,161 @@
+import json
+import time
+import unittest
+from unittest.mock import patch
+
+from django.test import Client, TransactionTestCase
+
+from bots.bot_event_stream import BotEventStream, get_bot_event_stream
+from bots.models import ApiKey, Bot, BotStates, Organization, Project, WebhookTriggerTypes
+from bots.webhook_utils import trigger_webhook
+
+
+class FakeRedisStreams:
+    """Just enough of redis to add to and read from streams."""
+
+    def __init__(self):
+        self.streams = {}
+        self.expiries = {}
+        self.next_id = 1
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        event_id = f"{self.next_id}-0".encode()
+        self.next_id += 1
+        self.streams.setdefault(key, []).append((event_id, {name.encode(): str(value).encode() for name, value in fields.items()}))
+        return event_id
+
+    def expire(self, key, seconds):
+        self.expiries[key] = seconds
+
+    def delete(self, key):
+        self.streams.pop(key, None)
+
+    def xrange(self, key, min="-", count=None):
+        after_sequence = int(min[1:].split("-")[0]) if min.startswith("(") else 0
+        return [(event_id, fields) for event_id, fields in self.streams.get(key, []) if int(event_id.decode().split("-")[0]) > after_sequence][:count]
+
+    def xdel(self, key, *event_ids):
+        self.streams[key] = [(event_id, fields) for event_id, fields in self.streams.get(key, []) if event_id not in event_ids]
+
+    def xrevrange(self, key, count=None):
+        return list(reversed(self.streams.get(key, [])))[:count]
+
+    def xread(self, streams, block=None, count=None):
+        ((key, last_event_id),) = streams.items()
+        last_sequence = int(str(last_event_id.decode() if isinstance(last_event_id, bytes) else last_event_id).split("-")[0])
+        entries = [(event_id, fields) for event_id, fields in self.streams.get(key, []) if int(event_id.decode().split("-")[0]) > last_sequence][:count]
+        if not entries:
+            time.sleep(block / 1000)
+            return []
+        return [[key.encode(), entries]]
+
+
+def parse_events(body):
+    events = []
+    for message in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.split("\n") if line and not line.startswith(":") and ": " in line)
+        if "data" in lines:
+            events.append({"id": lines["id"], "event": lines["event"], "data": json.loads(lines["data"])})
+    return events
+
+
+@patch.object(BotEventStream, "MAX_CONNECTION_SECONDS", 0.2)
+@patch.object(BotEventStream, "KEEPALIVE_SECONDS", 0.1)
+@patch.dict("os.environ", {"BOT_EVENT_STREAM_ENABLED": "true"})
+class BotEventStreamTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Organization")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        self.other_bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/456", state=BotStates.JOINED_RECORDING)
+        self.client = Client()
+
+        self.redis = FakeRedisStreams()
+        get_bot_event_stream_patcher = patch("bots.bot_event_stream.get_bot_event_stream", return_value=BotEventStream(self.redis))
+        get_bot_event_stream_patcher.start()
+        self.addCleanup(get_bot_event_stream_patcher.stop)
+        views_patcher = patch("bots.bots_api_views.get_bot_event_stream", return_value=BotEventStream(self.redis))
+        views_patcher.start()
+        self.addCleanup(views_patcher.stop)
+        models_patcher = patch("bots.models.get_bot_event_stream", return_value=BotEventStream(self.redis))
+        models_patcher.start()
+        self.addCleanup(models_patcher.stop)
+
+    def get_events(self, path, **headers):
+        response = self.client.get(path, HTTP_AUTHORIZATION=f"Token {self.api_key}", HTTP_ACCEPT="text/event-stream", **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return parse_events(b"".join(response.streaming_content).decode())
+
+    def test_trigger_webhook_publishes_to_the_bot_and_project_streams(self):
+        trigger_webhook(WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcription": {"transcript": "Hello"}})
+
+        for key in [BotEventStream.bot_stream_key(self.bot.object_id), BotEventStream.project_stream_key(self.project.object_id)]:
+            ((_, fields),) = self.redis.streams[key]
+            self.assertEqual(fields[b"trigger"], b"transcript.update")
+            self.assertEqual(json.loads(fields[b"data"]), {"transcription": {"transcript": "Hello"}})
+            self.assertEqual(self.redis.expiries[key], BotEventStream.STREAM_TTL_SECONDS)
+
+    def test_deleting_a_bots_data_deletes_its_events(self):
+        trigger_webhook(WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcription": {"transcript": "Hello"}})
+        trigger_webhook(WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.other_bot, payload={"transcription": {"transcript": "World"}})
+        self.bot.state = BotStates.ENDED
+        self.bot.save()
+
+        self.bot.delete_data()
+
+        # Only the data_deleted state change, which is published afterwards, is left
+        bot_stream = self.redis.streams[BotEventStream.bot_stream_key(self.bot.object_id)]
+        self.assertEqual([fields[b"trigger"] for _, fields in bot_stream], [b"bot.state_change"])
+        project_stream = self.redis.streams[BotEventStream.project_stream_key(self.project.object_id)]
+        self.assertEqual([(fields[b"bot_id"].decode(), fields[b"trigger"]) for _, fields in project_stream], [(self.other_bot.object_id, b"transcript.update"), (self.bot.object_id, b"bot.state_change")])
+
+    def test_stream_resumes_after_the_last_event_id(self):
+        trigger_webhook(WebhookTriggerTypes.BOT_STATE_CHANGE, bot=self.bot, payload={"new_state": "joined_recording"})
+        trigger_webhook(WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcription": {"transcript": "Hello"}})
+
+        events = self.get_events(f"/api/v1/bots/{self.bot.object_id}/events/stream?last_event_id=0-0")
+        self.assertEqual([event["event"] for event in events], ["bot.state_change", "transcript.update"])
+        self.assertEqual(events[1]["data"], {"bot_id": self.bot.object_id, "trigger": "transcript.update", "data": {"transcription": {"transcript": "Hello"}}})
+
+        events = self.get_events(f"/api/v1/bots/{self.bot.object_id}/events/stream", HTTP_LAST_EVENT_ID=events[0]["id"])
+        self.assertEqual([event["event"] for event in events], ["transcript.update"])
+
+        # Without an id, only new events are streamed
+        self.assertEqual(self.get_events(f"/api/v1/bots/{self.bot.object_id}/events/stream"), [])
+
+    def test_project_stream_includes_all_bots_and_filters_by_trigger(self):
+        trigger_webhook(WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcription": {"transcript": "Hello"}})
+        trigger_webhook(WebhookTriggerTypes.CHAT_MESSAGES_UPDATE, bot=self.other_bot, payload={"text": "Hi"})
+        trigger_webhook(WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.other_bot, payload={"transcription": {"transcript": "World"}})
+
+        events = self.get_events("/api/v1/events/stream?last_event_id=0-0&triggers=transcript.update")
+        self.assertEqual([event["data"]["bot_id"] for event in events], [self.bot.object_id, self.other_bot.object_id])
+
+    def test_invalid_parameters_are_rejected(self):
+        response = self.client.get("/api/v1/events/stream?triggers=not_a_trigger", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get("/api/v1/events/stream?last_event_id=abc", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_projects_bots_are_not_found(self):
+        other_project = Project.objects.create(name="Other Project", organization=self.organization)
+        other_projects_bot = Bot.objects.create(project=other_project, meeting_url="https://zoom.us/j/789")
+        response = self.client.get(f"/api/v1/bots/{other_projects_bot.object_id}/events/stream", HTTP_AUTHORIZATION=f"Token {self.api_key}", HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 404)
+
+
+class GetBotEventStreamTest(unittest.TestCase):
+    @patch.dict("os.environ", {"REDIS_URL": "redis://event-stream-test:6379/5"})
+    @patch("bots.bot_event_stream.redis.from_url")
+    def test_stream_reuses_its_redis_client(self, mock_from_url):
+        self.assertIs(get_bot_event_stream(), get_bot_event_stream())
+        mock_from_url.assert_called_once()
@@ -0,0 +1,102 @@
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from bots.bot_controller.bot_instrumentation import BotInstrumentation
+from bots.bot_controller.latency_histogram import LatencyHistogram
+
+
+class TestBotInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = BotInstrumentation()
+
+    def tearDown(self):
+        self.instrumentation.cleanup()
+
+    def test_subsystems_are_timed(self):
+        for _ in range(3):
+            with self.instrumentation.time_subsystem("closed_captions"):
+                pass
+
+        subsystems = self.instrumentation.get_summary()["subsystems"]
+        self.assertEqual(list(subsystems.keys()), ["closed_captions"])
+        self.assertEqual(subsystems["closed_captions"]["count"], 3)
+
+    def test_messages_are_counted_by_type(self):
+        self.instrumentation.record_message("audio", 100)
+        self.instrumentation.record_message("audio", 50)
+        self.instrumentation.record_message("json", 10)
+
+        self.assertEqual(
+            self.instrumentation.get_summary()["messages"],
+            {"audio": {"count": 2, "bytes": 150}, "json": {"count": 1, "bytes": 10}},
+        )
+
+    def test_failing_gauge_is_left_out(self):
+        self.instrumentation.add_gauge("gstreamer_queue_fill_ratio", "queue", lambda: {"audio_queue": 0.5})
+        self.instrumentation.add_gauge("broken", "queue", lambda: 1 / 0)
+
+        self.assertEqual(self.instrumentation.get_summary()["gauges"], {"gstreamer_queue_fill_ratio": {"audio_queue": 0.5}})
+
+    def test_render_prometheus(self):
+        with self.instrumentation.time_subsystem("heartbeat"):
+            pass
+        histogram = LatencyHistogram()
+        histogram.record(3)
+        histogram.record(7000)
+        self.instrumentation.add_histogram("main_loop_tick", histogram)
+        self.instrumentation.record_message("audio", 100)
+        self.instrumentation.add_gauge("gstreamer_queue_drops", "queue", lambda: {'say "hi"': 2})
+
+        lines = self.instrumentation.render_prometheus().splitlines()
+
+        self.assertIn("# TYPE attendee_bot_subsystem_duration_ms histogram", lines)
+        self.assertIn('attendee_bot_subsystem_duration_ms_count{subsystem="heartbeat"} 1', lines)
+        # The buckets are cumulative, and +Inf counts everything
+        self.assertIn('attendee_bot_main_loop_tick_duration_ms_bucket{le="2"} 0', lines)
+        self.assertIn('attendee_bot_main_loop_tick_duration_ms_bucket{le="5"} 1', lines)
+        self.assertIn('attendee_bot_main_loop_tick_duration_ms_bucket{le="5000"} 1', lines)
+        self.assertIn('attendee_bot_main_loop_tick_duration_ms_bucket{le="+Inf"} 2', lines)
+        self.assertIn("attendee_bot_main_loop_tick_duration_ms_sum 7003.0", lines)
+        self.assertIn('attendee_bot_messages_total{type="audio"} 1', lines)
+        self.assertIn('attendee_bot_message_bytes_total{type="audio"} 100', lines)
+        self.assertIn('attendee_bot_gstreamer_queue_drops{queue="say \\"hi\\""} 2', lines)
+
+    def test_profile_samples_the_other_threads(self):
+        stop_busy_thread = threading.Event()
+
+        def busy_loop():
+            while not stop_busy_thread.is_set():
+                time.sleep(0.001)
+
+        busy_thread = threading.Thread(target=busy_loop, name="busy_thread")
+        busy_thread.start()
+        try:
+            self.assertTrue(self.instrumentation.start_profile(duration_seconds=0.2, interval_ms=10))
+            # Only one profile is taken at a time
+            self.assertFalse(self.instrumentation.start_profile(duration_seconds=0.2, interval_ms=10))
+            self.instrumentation.sampling_profiler.thread.join()
+        finally:
+            stop_busy_thread.set()
+            busy_thread.join()
+
+        profile = self.instrumentation.get_summary()["profile"]
+        self.assertGreater(profile["samples"], 0)
+        self.assertTrue(any(stack.startswith("busy_thread;") and stack.endswith(":busy_loop") for stack, _ in profile["stacks"]))
+        # The profile is only reported once
+        self.assertNotIn("profile", self.instrumentation.get_summary())
+
+    def test_metrics_server(self):
+        self.instrumentation.record_message("video", 1000)
+        self.instrumentation.start_metrics_server(0)
+        base_url = f"http://127.0.0.1:{self.instrumentation.metrics_server.server_address[1]}"
+
+        with urllib.request.urlopen(f"{base_url}/metrics") as response:
+            self.assertEqual(response.status, 200)
+            self.assertIn('attendee_bot_messages_total{type="video"} 1', response.read().decode("utf-8"))
+
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(f"{base_url}/other")
+        self.assertEqual(context.exception.code, 404)
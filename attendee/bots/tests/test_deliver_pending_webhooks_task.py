@@ -0,0 +1,183 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from bots.models import Bot, Organization, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.tasks.deliver_pending_webhooks_task import deliver_pending_webhooks, deliver_webhook_batch, reclaim_stale_delivery_attempts
+from bots.webhook_utils import calculate_latency_percentiles, get_redis_client, get_webhook_secret, schedule_webhook_delivery, trigger_webhook, verify_signature
+
+
+def mock_response(status_code=200):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = "ok"
+    return response
+
+
+@patch.dict("os.environ", {"WEBHOOK_DELIVERY_WORKER_ENABLED": "true", "REDIS_URL": "redis://localhost:6379/5"})
+@patch("bots.tasks.deliver_pending_webhooks_task.get_redis_client", MagicMock())
+class DeliverPendingWebhooksTaskTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Organization")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123")
+        self.webhook_secret = WebhookSecret.objects.create(project=self.project)
+        self.subscription = WebhookSubscription.objects.create(project=self.project, url="https://example.com/webhook", triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+
+    def trigger_transcript_updates(self, count):
+        with patch("bots.webhook_utils.schedule_webhook_delivery") as mock_schedule:
+            for index in range(count):
+                trigger_webhook(WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcription": {"transcript": f"utterance {index}"}})
+        return mock_schedule
+
+    def test_trigger_webhook_schedules_the_delivery_worker_instead_of_a_task_per_attempt(self):
+        with patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay") as mock_deliver_webhook:
+            mock_schedule = self.trigger_transcript_updates(3)
+
+        mock_deliver_webhook.assert_not_called()
+        self.assertEqual([call.args[0] for call in mock_schedule.call_args_list], [self.subscription.id] * 3)
+        self.assertEqual(WebhookDeliveryAttempt.objects.filter(webhook_subscription=self.subscription, status=WebhookDeliveryAttemptStatus.PENDING).count(), 3)
+
+    def test_delivery_is_only_scheduled_once_per_window(self):
+        redis_client = MagicMock()
+        redis_client.set.side_effect = [True, None]
+
+        with patch("bots.tasks.deliver_pending_webhooks_task.deliver_pending_webhooks.apply_async") as mock_apply_async:
+            schedule_webhook_delivery(self.subscription.id, redis_client=redis_client)
+            schedule_webhook_delivery(self.subscription.id, redis_client=redis_client)
+
+        mock_apply_async.assert_called_once_with(args=[self.subscription.id], countdown=1)
+
+    @patch("requests.Session.post")
+    def test_pending_webhooks_are_delivered_individually_over_one_session(self, mock_post):
+        mock_post.return_value = mock_response()
+        self.trigger_transcript_updates(3)
+
+        deliver_pending_webhooks.apply(args=[self.subscription.id])
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual([call.kwargs["json"]["data"]["transcription"]["transcript"] for call in mock_post.call_args_list], ["utterance 0", "utterance 1", "utterance 2"])
+        for delivery_attempt in WebhookDeliveryAttempt.objects.all():
+            self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.SUCCESS)
+            self.assertEqual(delivery_attempt.attempt_count, 1)
+
+    @patch("requests.Session.post")
+    def test_subscription_with_batch_deliveries_gets_one_signed_array(self, mock_post):
+        mock_post.return_value = mock_response()
+        self.subscription.batch_deliveries = True
+        self.subscription.save()
+        self.trigger_transcript_updates(3)
+
+        deliver_pending_webhooks.apply(args=[self.subscription.id])
+
+        mock_post.assert_called_once()
+        body = mock_post.call_args.kwargs["json"]
+        self.assertEqual(len(body), 3)
+        self.assertEqual(body[0]["trigger"], "transcript.update")
+        self.assertEqual(body[0]["bot_id"], self.bot.object_id)
+        self.assertTrue(verify_signature(json.loads(json.dumps(body)), mock_post.call_args.kwargs["headers"]["X-Webhook-Signature"], self.webhook_secret.get_secret()))
+        self.assertEqual(WebhookDeliveryAttempt.objects.filter(status=WebhookDeliveryAttemptStatus.SUCCESS).count(), 3)
+
+    @patch("bots.tasks.deliver_pending_webhooks_task.deliver_webhook.delay")
+    @patch("requests.Session.post")
+    def test_failed_webhooks_are_retried_individually(self, mock_post, mock_deliver_webhook):
+        mock_post.side_effect = [mock_response(), mock_response(status_code=500)]
+        self.trigger_transcript_updates(2)
+
+        deliver_pending_webhooks.apply(args=[self.subscription.id])
+
+        failed_delivery_attempt = WebhookDeliveryAttempt.objects.order_by("created_at", "id").last()
+        mock_deliver_webhook.assert_called_once_with(failed_delivery_attempt.id)
+        self.assertEqual(failed_delivery_attempt.status, WebhookDeliveryAttemptStatus.PENDING)
+        self.assertEqual(failed_delivery_attempt.attempt_count, 1)
+
+    @patch("bots.tasks.deliver_pending_webhooks_task.deliver_webhook.delay")
+    @patch("bots.tasks.deliver_pending_webhooks_task.deliver_webhook_batch.delay")
+    @patch("requests.Session.post")
+    def test_failed_batch_is_retried_as_a_batch(self, mock_post, mock_deliver_webhook_batch, mock_deliver_webhook):
+        mock_post.side_effect = [mock_response(status_code=500), mock_response()]
+        self.subscription.batch_deliveries = True
+        self.subscription.save()
+        self.trigger_transcript_updates(2)
+
+        deliver_pending_webhooks.apply(args=[self.subscription.id])
+
+        mock_deliver_webhook.assert_not_called()
+        delivery_ids = list(WebhookDeliveryAttempt.objects.order_by("created_at", "id").values_list("id", flat=True))
+        mock_deliver_webhook_batch.assert_called_once_with(delivery_ids)
+
+        deliver_webhook_batch.apply(args=[delivery_ids])
+
+        body = mock_post.call_args.kwargs["json"]
+        self.assertEqual([webhook["data"]["transcription"]["transcript"] for webhook in body], ["utterance 0", "utterance 1"])
+        for delivery_attempt in WebhookDeliveryAttempt.objects.all():
+            self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.SUCCESS)
+            self.assertEqual(delivery_attempt.attempt_count, 2)
+
+    @patch("requests.Session.post")
+    def test_failed_batch_retry_is_retried_again(self, mock_post):
+        mock_post.return_value = mock_response(status_code=500)
+        self.trigger_transcript_updates(2)
+        delivery_ids = list(WebhookDeliveryAttempt.objects.values_list("id", flat=True))
+
+        deliver_webhook_batch.apply(args=[delivery_ids])
+
+        # Celery retries the batch until its last attempt
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(len(mock_post.call_args.kwargs["json"]), 2)
+        for delivery_attempt in WebhookDeliveryAttempt.objects.all():
+            self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.FAILURE)
+            self.assertEqual(delivery_attempt.attempt_count, 3)
+
+    @patch("requests.Session.post")
+    def test_delivered_webhooks_are_not_picked_up_again(self, mock_post):
+        mock_post.return_value = mock_response()
+        self.trigger_transcript_updates(1)
+
+        deliver_pending_webhooks.apply(args=[self.subscription.id])
+        deliver_pending_webhooks.apply(args=[self.subscription.id])
+
+        mock_post.assert_called_once()
+
+    @patch("bots.tasks.deliver_pending_webhooks_task.deliver_webhook.delay")
+    @patch("bots.tasks.deliver_pending_webhooks_task.deliver_webhook_batch.delay")
+    def test_webhooks_claimed_by_a_task_that_died_are_reclaimed(self, mock_deliver_webhook_batch, mock_deliver_webhook):
+        self.trigger_transcript_updates(3)
+        stranded_delivery_attempt, recently_claimed_delivery_attempt, unclaimed_delivery_attempt = WebhookDeliveryAttempt.objects.order_by("created_at", "id")
+        WebhookDeliveryAttempt.objects.filter(id=stranded_delivery_attempt.id).update(attempt_count=1, last_attempt_at=timezone.now() - timezone.timedelta(hours=1))
+        WebhookDeliveryAttempt.objects.filter(id=recently_claimed_delivery_attempt.id).update(attempt_count=1, last_attempt_at=timezone.now())
+
+        self.assertEqual(reclaim_stale_delivery_attempts(), 1)
+
+        mock_deliver_webhook.assert_called_once_with(stranded_delivery_attempt.id)
+        mock_deliver_webhook_batch.assert_not_called()
+        # It's claimed again, so the next reclaim leaves it to the task that was just dispatched
+        self.assertEqual(reclaim_stale_delivery_attempts(), 0)
+        mock_deliver_webhook.assert_called_once()
+
+    @patch("bots.tasks.deliver_pending_webhooks_task.deliver_webhook_batch.delay")
+    def test_reclaimed_batch_is_retried_as_a_batch(self, mock_deliver_webhook_batch):
+        self.subscription.batch_deliveries = True
+        self.subscription.save()
+        self.trigger_transcript_updates(2)
+        WebhookDeliveryAttempt.objects.update(attempt_count=1, last_attempt_at=timezone.now() - timezone.timedelta(hours=1))
+
+        self.assertEqual(reclaim_stale_delivery_attempts(), 2)
+
+        mock_deliver_webhook_batch.assert_called_once_with(list(WebhookDeliveryAttempt.objects.order_by("created_at", "id").values_list("id", flat=True)))
+
+    @patch("bots.webhook_utils.redis.from_url")
+    def test_redis_client_is_reused(self, mock_from_url):
+        self.assertIs(get_redis_client(), get_redis_client())
+        mock_from_url.assert_called_once()
+
+    def test_webhook_secret_is_cached(self):
+        get_webhook_secret(self.project.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_webhook_secret(self.project.id), self.webhook_secret.get_secret())
+
+    def test_calculate_latency_percentiles(self):
+        self.assertEqual(calculate_latency_percentiles(list(range(1, 101))), {"p50": 50, "p95": 95, "p99": 99})
+        self.assertEqual(calculate_latency_percentiles([]), {"p50": None, "p95": None, "p99": None})
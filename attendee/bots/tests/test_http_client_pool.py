@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from bots.http_client_pool import DEFAULT_POOL_MAXSIZE, DefaultTimeoutHTTPAdapter, HttpClientPool
+
+
+class TestHttpClientPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = HttpClientPool()
+
+    def test_session_is_reused_for_the_same_pool(self):
+        self.assertIs(self.pool.get_session("openai"), self.pool.get_session("openai"))
+        self.assertIsNot(self.pool.get_session("openai"), self.pool.get_session("gladia"))
+
+    def test_sessions_are_rebuilt_after_fork(self):
+        session = self.pool.get_session("openai")
+
+        with patch("bots.http_client_pool.os.getpid", return_value=-1):
+            self.assertIsNot(self.pool.get_session("openai"), session)
+
+    def test_pool_settings_can_be_set_per_pool(self):
+        with patch.dict("os.environ", {"HTTP_POOL_MAXSIZE": "4", "HTTP_POOL_SARVAM_MAXSIZE": "2", "HTTP_POOL_SARVAM_READ_TIMEOUT": "30"}):
+            sarvam_adapter = self.pool.get_session("sarvam").get_adapter("https://api.sarvam.ai")
+            openai_adapter = self.pool.get_session("openai").get_adapter("https://api.openai.com")
+
+        self.assertIsInstance(sarvam_adapter, DefaultTimeoutHTTPAdapter)
+        self.assertEqual(sarvam_adapter._pool_maxsize, 2)
+        self.assertEqual(sarvam_adapter.timeout, (10.0, 30.0))
+        self.assertEqual(openai_adapter._pool_maxsize, 4)
+        self.assertEqual(self.pool.get_session("gladia").get_adapter("https://api.gladia.io")._pool_maxsize, DEFAULT_POOL_MAXSIZE)
+
+    def test_adapter_only_applies_default_timeout_when_none_is_given(self):
+        adapter = DefaultTimeoutHTTPAdapter(timeout=(1.0, 2.0))
+
+        with patch("requests.adapters.HTTPAdapter.send") as mock_send:
+            adapter.send("request")
+            adapter.send("request", timeout=5)
+
+        self.assertEqual(mock_send.call_args_list[0].kwargs["timeout"], (1.0, 2.0))
+        self.assertEqual(mock_send.call_args_list[1].kwargs["timeout"], 5)
+
+    def test_httpx_transport_survives_its_clients_being_closed(self):
+        transport = self.pool.get_httpx_transport("deepgram")
+
+        with patch.object(transport._pool, "close") as mock_close_pool:
+            with httpx.Client(transport=transport):
+                pass
+
+        mock_close_pool.assert_not_called()
+        self.assertIs(self.pool.get_httpx_transport("deepgram"), transport)
@@ -0,0 +1,118 @@
+import uuid
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from bots.models import (
+    AsyncTranscription,
+    AsyncTranscriptionManager,
+    AsyncTranscriptionStates,
+    AudioChunk,
+    Bot,
+    Organization,
+    Participant,
+    PendingUtteranceManager,
+    Project,
+    Recording,
+    RecordingManager,
+    RecordingStates,
+    RecordingTranscriptionStates,
+    TranscriptionFailureReasons,
+    Utterance,
+)
+from bots.tasks.process_async_transcription_task import create_utterances_for_transcription
+from bots.tasks.process_utterance_task import process_utterance
+
+
+class PendingUtteranceCountTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1, state=RecordingStates.IN_PROGRESS, transcription_state=RecordingTranscriptionStates.IN_PROGRESS)
+        self.participant = Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4()))
+
+    def create_utterance(self, timestamp_ms, async_transcription=None):
+        audio_chunk = AudioChunk.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"rawpcmbytes", timestamp_ms=timestamp_ms, duration_ms=500, sample_rate=16000)
+        return Utterance.objects.create(recording=self.recording, async_transcription=async_transcription, participant=self.participant, audio_chunk=audio_chunk, timestamp_ms=timestamp_ms, duration_ms=500)
+
+    def pending_utterance_count(self):
+        self.recording.refresh_from_db()
+        return self.recording.pending_utterance_count
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription", return_value=({"transcript": "hello"}, None))
+    def test_recording_transcription_completes_when_the_last_utterance_is_transcribed(self, mock_get_transcription):
+        utterances = [self.create_utterance(timestamp_ms) for timestamp_ms in [0, 1000, 2000]]
+        self.assertEqual(self.pending_utterance_count(), 3)
+
+        process_utterance.apply(args=[utterances[0].id])
+        self.assertEqual(self.pending_utterance_count(), 2)
+
+        RecordingManager.set_recording_complete(self.recording)
+        self.assertEqual(self.recording.transcription_state, RecordingTranscriptionStates.IN_PROGRESS)
+
+        with mock.patch("bots.tasks.process_utterance_task.RecordingManager.set_recording_transcription_complete", wraps=RecordingManager.set_recording_transcription_complete) as mock_set_complete:
+            process_utterance.apply(args=[utterances[1].id])
+            mock_set_complete.assert_not_called()
+            process_utterance.apply(args=[utterances[2].id])
+            mock_set_complete.assert_called_once()
+
+            # Processing an utterance again doesn't count it twice
+            process_utterance.apply(args=[utterances[2].id])
+            mock_set_complete.assert_called_once()
+
+        self.assertEqual(self.pending_utterance_count(), 0)
+        self.recording.refresh_from_db()
+        self.assertEqual(self.recording.transcription_state, RecordingTranscriptionStates.COMPLETE)
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription", return_value=(None, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND}))
+    def test_failed_utterances_are_no_longer_pending_but_stop_the_transcription_completing(self, mock_get_transcription):
+        utterance = self.create_utterance(0)
+        RecordingManager.set_recording_complete(self.recording)
+
+        process_utterance.apply(args=[utterance.id])
+
+        self.assertEqual(self.pending_utterance_count(), 0)
+        self.assertEqual(self.recording.transcription_state, RecordingTranscriptionStates.IN_PROGRESS)
+
+    def test_saving_a_recording_does_not_overwrite_its_count(self):
+        stale_recording = Recording.objects.get(id=self.recording.id)
+        self.create_utterance(0)
+        self.create_utterance(1000)
+
+        RecordingManager.set_recording_paused(stale_recording)
+
+        self.assertEqual(self.pending_utterance_count(), 2)
+        self.assertEqual(self.recording.state, RecordingStates.PAUSED)
+
+    def test_terminating_an_utterance_twice_only_counts_once(self):
+        utterance = self.create_utterance(0)
+        duplicate_utterance = Utterance.objects.get(id=utterance.id)
+
+        utterance.transcription = {"transcript": "hello"}
+        self.assertEqual(PendingUtteranceManager.save_terminated_utterance(utterance), 0)
+        duplicate_utterance.transcription = {"transcript": "hello"}
+        self.assertIsNone(PendingUtteranceManager.save_terminated_utterance(duplicate_utterance))
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription", return_value=({"transcript": "hello"}, None))
+    @mock.patch("bots.tasks.process_utterance_task.process_utterance.delay")
+    def test_async_transcription_completes_when_its_last_utterance_is_transcribed(self, mock_delay, mock_get_transcription):
+        for timestamp_ms in [0, 1000]:
+            AudioChunk.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"rawpcmbytes", timestamp_ms=timestamp_ms, duration_ms=500, sample_rate=16000)
+        async_transcription = AsyncTranscription.objects.create(recording=self.recording, settings={"transcription_settings": {"openai": {"model": "gpt-4o-transcribe"}}})
+
+        create_utterances_for_transcription(async_transcription)
+
+        async_transcription.refresh_from_db()
+        self.assertEqual(async_transcription.pending_utterance_count, 2)
+        self.assertEqual(self.pending_utterance_count(), 0)
+        self.assertEqual(mock_delay.call_count, 2)
+
+        with mock.patch.object(AsyncTranscriptionManager, "delivery_webhook") as mock_delivery_webhook:
+            for call in mock_delay.call_args_list:
+                process_utterance.apply(args=call.args)
+            mock_delivery_webhook.assert_called_once()
+
+        async_transcription.refresh_from_db()
+        self.assertEqual(async_transcription.pending_utterance_count, 0)
+        self.assertEqual(async_transcription.state, AsyncTranscriptionStates.COMPLETE)
@@ -0,0 +1,158 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from bots.bot_controller.per_participant_non_streaming_audio_input_manager import PerParticipantNonStreamingAudioInputManager
+from bots.bot_controller.per_speaker_vad_engine import PerSpeakerVadEngine, SilenceTimerWheel, calculate_normalized_rms
+
+LOUD_CHUNK = np.full(480, 16000, dtype=np.int16).tobytes()
+QUIET_CHUNK = bytes(960)
+
+
+class TestCalculateNormalizedRms(unittest.TestCase):
+    def test_does_not_overflow(self):
+        audio_bytes = np.array([30000, -30000, 30000, -30000], dtype=np.int16).tobytes()
+        self.assertAlmostEqual(calculate_normalized_rms(audio_bytes), 30000 / 32768)
+
+    def test_empty_audio(self):
+        self.assertEqual(calculate_normalized_rms(b""), 0.0)
+
+
+class TestSilenceTimerWheel(unittest.TestCase):
+    def test_entries_fire_once_their_deadline_passes(self):
+        wheel = SilenceTimerWheel(tick_ms=100, num_buckets=8)
+        wheel.schedule(slot=0, generation=0, deadline_ms=1000)
+        wheel.schedule(slot=1, generation=0, deadline_ms=1500)
+
+        self.assertEqual(wheel.advance(900), [])
+        self.assertEqual(wheel.advance(1000), [(0, 0)])
+        self.assertEqual(wheel.advance(1400), [])
+        self.assertEqual(wheel.advance(1550), [(1, 0)])
+
+    def test_deadlines_further_out_than_one_rotation(self):
+        wheel = SilenceTimerWheel(tick_ms=100, num_buckets=8)
+        wheel.schedule(slot=0, generation=0, deadline_ms=0)
+        wheel.schedule(slot=1, generation=0, deadline_ms=2000)
+
+        self.assertEqual(wheel.advance(1000), [(0, 0)])
+        self.assertEqual(wheel.advance(1999), [])
+        self.assertEqual(wheel.advance(5000), [(1, 0)])
+
+    def test_past_deadline_fires_on_next_advance(self):
+        wheel = SilenceTimerWheel(tick_ms=100, num_buckets=8)
+        wheel.schedule(slot=0, generation=0, deadline_ms=1000)
+        wheel.advance(2000)
+
+        wheel.schedule(slot=1, generation=3, deadline_ms=500)
+
+        self.assertEqual(wheel.advance(2100), [(1, 3)])
+
+
+class TestPerSpeakerVadEngine(unittest.TestCase):
+    def create_engine(self, sample_rate=44100, utterance_size_limit=100000):
+        # 44.1kHz isn't supported by webrtcvad, so these engines only go by the RMS
+        return PerSpeakerVadEngine(sample_rate=sample_rate, utterance_size_limit=utterance_size_limit, silence_duration_limit=3)
+
+    def test_silence_before_speech_is_dropped(self):
+        engine = self.create_engine()
+        self.assertEqual(engine.add_chunk("speaker", 0, QUIET_CHUNK), [])
+        self.assertEqual(engine.active_speaker_count(), 0)
+
+    def test_utterance_ends_after_silence_limit(self):
+        engine = self.create_engine()
+        engine.add_chunk("speaker", 1000, LOUD_CHUNK)
+        engine.add_chunk("speaker", 2000, LOUD_CHUNK)
+        engine.add_chunk("speaker", 2500, QUIET_CHUNK)
+
+        # Three seconds after the first chunk, but not after the last loud one
+        self.assertEqual(engine.expire_silent_speakers(4500), [])
+        self.assertEqual(engine.active_speaker_count(), 1)
+
+        finished_utterances = engine.expire_silent_speakers(5000)
+        self.assertEqual(finished_utterances, [("speaker", LOUD_CHUNK + LOUD_CHUNK + QUIET_CHUNK, 1000, "silence_limit")])
+        self.assertEqual(engine.active_speaker_count(), 0)
+        self.assertEqual(engine.expire_silent_speakers(100000), [])
+
+    def test_utterance_ends_when_buffer_is_full(self):
+        engine = self.create_engine(utterance_size_limit=len(LOUD_CHUNK) * 2)
+        self.assertEqual(engine.add_chunk("speaker", 0, LOUD_CHUNK), [])
+
+        finished_utterances = engine.add_chunk("speaker", 10, LOUD_CHUNK)
+
+        self.assertEqual(finished_utterances, [("speaker", LOUD_CHUNK + LOUD_CHUNK, 0, "buffer_full")])
+        # The silence timeout for the finished utterance must not end the next one early
+        engine.add_chunk("speaker", 2900, LOUD_CHUNK)
+        self.assertEqual(engine.expire_silent_speakers(3100), [])
+        self.assertEqual(len(engine.expire_silent_speakers(5900)), 1)
+
+    def test_flush_all(self):
+        engine = self.create_engine()
+        for i in range(40):
+            engine.add_chunk(f"speaker-{i}", 0, LOUD_CHUNK)
+        engine.add_chunk("quiet-speaker", 0, QUIET_CHUNK)
+
+        finished_utterances = engine.flush_all("silence_limit")
+
+        self.assertEqual(sorted(utterance[0] for utterance in finished_utterances), sorted(f"speaker-{i}" for i in range(40)))
+        self.assertEqual(engine.active_speaker_count(), 0)
+
+    def test_audio_is_cut_into_legal_vad_frames(self):
+        engine = PerSpeakerVadEngine(sample_rate=16000, utterance_size_limit=100000, silence_duration_limit=3)
+        engine.vad = MagicMock()
+        # With no speech found, every frame gets looked at
+        engine.vad.is_speech.return_value = False
+
+        # 10ms frames at 16kHz are 320 bytes. 500 bytes leaves 180 for the next chunk.
+        chunk = np.full(250, 16000, dtype=np.int16).tobytes()
+        engine.add_chunk("speaker", 0, chunk)
+        engine.add_chunk("speaker", 10, chunk)
+
+        frame_lengths = [len(call.args[0]) for call in engine.vad.is_speech.call_args_list]
+        self.assertEqual(frame_lengths, [320, 320, 320])
+        self.assertEqual(len(engine.frame_remainders[engine.slot_for_speaker("speaker")]), 1000 - 3 * 320)
+
+    def test_uses_last_vad_decision_when_chunk_is_shorter_than_a_frame(self):
+        engine = PerSpeakerVadEngine(sample_rate=16000, utterance_size_limit=100000, silence_duration_limit=3)
+        engine.vad = MagicMock()
+        engine.vad.is_speech.return_value = True
+        slot = engine.slot_for_speaker("speaker")
+
+        self.assertTrue(engine.is_speech(slot, np.full(160, 16000, dtype=np.int16).tobytes()))
+        self.assertTrue(engine.is_speech(slot, np.full(100, 16000, dtype=np.int16).tobytes()))
+        self.assertEqual(engine.vad.is_speech.call_count, 1)
+
+    def test_many_speakers_grow_the_state_arrays(self):
+        engine = PerSpeakerVadEngine(sample_rate=44100, utterance_size_limit=100000, silence_duration_limit=3, initial_capacity=2)
+        for i in range(10):
+            engine.add_chunk(f"speaker-{i}", i, LOUD_CHUNK)
+
+        self.assertEqual(engine.active_speaker_count(), 10)
+        self.assertEqual(engine.first_nonsilent_ms[engine.slot_for_speaker("speaker-7")], 7)
+
+
+class TestPerParticipantNonStreamingAudioInputManager(unittest.TestCase):
+    def test_saves_utterance_with_participant_info(self):
+        save_audio_chunk_callback = MagicMock()
+        manager = PerParticipantNonStreamingAudioInputManager(
+            save_audio_chunk_callback=save_audio_chunk_callback,
+            get_participant_callback=lambda speaker_id: {"participant_uuid": speaker_id},
+            sample_rate=44100,
+            utterance_size_limit=100000,
+            silence_duration_limit=3,
+        )
+        chunk_time = datetime.utcnow() - timedelta(seconds=10)
+        manager.add_chunk("speaker", chunk_time, LOUD_CHUNK, normalized_rms=0.5)
+
+        manager.process_chunks()
+
+        save_audio_chunk_callback.assert_called_once_with(
+            {
+                "participant_uuid": "speaker",
+                "audio_data": LOUD_CHUNK,
+                "timestamp_ms": int(chunk_time.timestamp() * 1000),
+                "flush_reason": "silence_limit",
+                "sample_rate": 44100,
+            }
+        )
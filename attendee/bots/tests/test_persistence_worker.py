@@ -0,0 +1,154 @@
+import threading
+import unittest
+
+from bots.bot_controller.latency_histogram import LatencyHistogram
+from bots.bot_controller.persistence_worker import PersistenceWorker
+
+
+class TestPersistenceWorker(unittest.TestCase):
+    def setUp(self):
+        self.workers = []
+        # Jobs wait on this, so the tests control when the worker gets through the queue
+        self.unblock_worker = threading.Event()
+        self.results = []
+
+    def tearDown(self):
+        self.unblock_worker.set()
+        for worker in self.workers:
+            worker.cleanup()
+
+    def create_worker(self, max_queue_size=10, block_timeout_seconds=PersistenceWorker.DEFAULT_BLOCK_TIMEOUT_SECONDS):
+        worker = PersistenceWorker(name="test_persistence_worker", max_queue_size=max_queue_size, block_timeout_seconds=block_timeout_seconds)
+        self.workers.append(worker)
+        return worker
+
+    def block_worker(self, worker):
+        worker_blocked = threading.Event()
+
+        def blocking_job():
+            worker_blocked.set()
+            self.unblock_worker.wait()
+
+        worker.submit(blocking_job)
+        worker_blocked.wait()
+
+    def test_jobs_run_in_order_on_the_worker_thread(self):
+        worker = self.create_worker()
+        for i in range(5):
+            worker.submit(lambda i=i: self.results.append((i, threading.current_thread().name)))
+        worker.flush()
+
+        self.assertEqual(self.results, [(i, "test_persistence_worker") for i in range(5)])
+        self.assertEqual(worker.get_metrics()["jobs_run"], 5)
+        self.assertEqual(worker.get_metrics()["queue_wait"]["count"], 5)
+
+    def test_failing_job_does_not_stop_the_worker(self):
+        worker = self.create_worker()
+        worker.submit(lambda: 1 / 0)
+        worker.submit(lambda: self.results.append("ran"))
+        worker.flush()
+
+        self.assertEqual(self.results, ["ran"])
+        self.assertEqual(worker.get_metrics()["jobs_failed"], 1)
+
+    def test_coalesced_jobs_only_run_the_latest(self):
+        worker = self.create_worker()
+        self.block_worker(worker)
+        for i in range(3):
+            worker.submit(lambda i=i: self.results.append(i), coalesce_key="heartbeat")
+        self.unblock_worker.set()
+        worker.flush()
+
+        self.assertEqual(self.results, [2])
+        self.assertEqual(worker.get_metrics()["jobs_coalesced"], 2)
+
+    def test_coalesced_jobs_run_before_the_queued_jobs(self):
+        worker = self.create_worker(max_queue_size=2)
+        self.block_worker(worker)
+        worker.submit(lambda: self.results.append("queued 1"))
+        worker.submit(lambda: self.results.append("queued 2"))
+        worker.submit(lambda: self.results.append("heartbeat"), coalesce_key="heartbeat")
+        self.unblock_worker.set()
+        worker.flush()
+
+        self.assertEqual(self.results, ["heartbeat", "queued 1", "queued 2"])
+
+    def test_flush_waits_for_coalesced_jobs(self):
+        worker = self.create_worker()
+        worker.flush()
+        worker.submit(lambda: self.results.append("heartbeat"), coalesce_key="heartbeat")
+        worker.flush()
+
+        self.assertEqual(self.results, ["heartbeat"])
+
+    def test_drop_policy_drops_jobs_when_the_queue_is_full(self):
+        worker = self.create_worker(max_queue_size=2)
+        self.block_worker(worker)
+        results = [worker.submit(lambda i=i: self.results.append(i), policy=PersistenceWorker.DROP) for i in range(4)]
+        self.unblock_worker.set()
+        worker.flush()
+
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(self.results, [0, 1])
+        self.assertEqual(worker.get_metrics()["jobs_dropped"], 2)
+
+    def test_block_policy_waits_for_room(self):
+        worker = self.create_worker(max_queue_size=1)
+        self.block_worker(worker)
+        worker.submit(lambda: self.results.append(0))
+
+        submitter = threading.Thread(target=lambda: worker.submit(lambda: self.results.append(1)))
+        submitter.start()
+        submitter.join(timeout=0.2)
+        self.assertTrue(submitter.is_alive())
+
+        self.unblock_worker.set()
+        submitter.join()
+        worker.flush()
+
+        self.assertEqual(self.results, [0, 1])
+        self.assertEqual(worker.get_metrics()["submits_blocked"], 1)
+
+    def test_block_policy_runs_the_job_inline_once_it_has_waited_too_long(self):
+        worker = self.create_worker(max_queue_size=1, block_timeout_seconds=0.1)
+        self.block_worker(worker)
+        worker.submit(lambda: self.results.append("queued"))
+
+        self.assertTrue(worker.submit(lambda: self.results.append(threading.current_thread().name)))
+
+        self.assertEqual(self.results, [threading.current_thread().name])
+        self.assertEqual(worker.get_metrics()["submits_timed_out"], 1)
+        self.assertEqual(worker.get_metrics()["jobs_run_inline"], 1)
+
+    def test_cleanup_runs_queued_jobs_and_later_ones_run_inline(self):
+        worker = self.create_worker()
+        self.block_worker(worker)
+        worker.submit(lambda: self.results.append("queued"))
+        self.unblock_worker.set()
+        worker.cleanup()
+
+        worker.submit(lambda: self.results.append(threading.current_thread().name))
+
+        self.assertEqual(self.results, ["queued", threading.current_thread().name])
+        self.assertFalse(worker.worker_thread.is_alive())
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_are_bucket_upper_bounds(self):
+        histogram = LatencyHistogram()
+        for duration_ms in [0.5] * 98 + [30, 7000]:
+            histogram.record(duration_ms)
+
+        metrics = histogram.get_metrics()
+        self.assertEqual(metrics["count"], 100)
+        self.assertEqual(metrics["p50_ms"], 1)
+        self.assertEqual(metrics["p99_ms"], 50)
+        self.assertEqual(metrics["max_ms"], 7000)
+        self.assertEqual(metrics["buckets"]["le_1ms"], 98)
+        self.assertEqual(metrics["buckets"]["gt_max"], 1)
+
+    def test_empty_histogram(self):
+        metrics = LatencyHistogram().get_metrics()
+        self.assertEqual(metrics["count"], 0)
+        self.assertIsNone(metrics["p50_ms"])
+        self.assertIsNone(metrics["mean_ms"])
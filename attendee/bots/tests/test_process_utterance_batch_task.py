@@ -0,0 +1,149 @@
+import unittest
+import uuid
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from bots.models import (
+    AudioChunk,
+    Bot,
+    Organization,
+    Participant,
+    Project,
+    Recording,
+    RecordingStates,
+    RecordingTranscriptionStates,
+    TranscriptionFailureReasons,
+    TranscriptionProviders,
+    Utterance,
+)
+from bots.tasks.process_utterance_batch_task import SILENCE_BETWEEN_UTTERANCES_SECONDS, build_batch_audio, process_utterance_batch, split_words_into_utterances
+
+
+def word(text, start, end):
+    return {"word": text.lower(), "punctuated_word": text, "start": start, "end": end, "confidence": 0.9}
+
+
+class SplitWordsIntoUtterancesTest(unittest.TestCase):
+    def test_words_are_assigned_to_their_utterance_with_relative_times(self):
+        segments = [(0.0, 2.0), (3.0, 4.5)]
+        words = [word("Hello", 0.1, 0.5), word("there.", 0.6, 1.1), word("Hi!", 3.2, 3.6)]
+
+        words_for_utterances = split_words_into_utterances(words, segments)
+
+        self.assertEqual([w["punctuated_word"] for w in words_for_utterances[0]], ["Hello", "there."])
+        self.assertEqual([w["punctuated_word"] for w in words_for_utterances[1]], ["Hi!"])
+        self.assertAlmostEqual(words_for_utterances[1][0]["start"], 0.2)
+        self.assertAlmostEqual(words_for_utterances[1][0]["end"], 0.6)
+
+    def test_word_in_the_silence_goes_to_the_closest_utterance(self):
+        segments = [(0.0, 2.0), (3.0, 4.0)]
+        words = [word("late", 2.0, 2.3), word("early", 2.7, 2.95)]
+
+        words_for_utterances = split_words_into_utterances(words, segments)
+
+        self.assertEqual([w["word"] for w in words_for_utterances[0]], ["late"])
+        self.assertEqual([w["word"] for w in words_for_utterances[1]], ["early"])
+        # Times are clamped to the utterance they were assigned to
+        self.assertEqual(words_for_utterances[0][0]["end"], 2.0)
+        self.assertEqual(words_for_utterances[1][0]["start"], 0.0)
+
+
+class ProcessUtteranceBatchTaskTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz", settings={"transcription_settings": {"deepgram": {"micro_batching": {"enabled": True}}}})
+        self.recording = Recording.objects.create(
+            bot=self.bot,
+            recording_type=1,
+            transcription_type=1,
+            state=RecordingStates.COMPLETE,
+            transcription_state=RecordingTranscriptionStates.IN_PROGRESS,
+            transcription_provider=TranscriptionProviders.DEEPGRAM,
+        )
+        self.participant = Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4()))
+        # 1 second and 0.5 seconds of 16kHz audio
+        self.utterances = [self.create_utterance(timestamp_ms=0, audio_blob=b"\x01\x00" * 16000), self.create_utterance(timestamp_ms=5000, audio_blob=b"\x02\x00" * 8000)]
+
+    def create_utterance(self, timestamp_ms, audio_blob):
+        audio_chunk = AudioChunk.objects.create(recording=self.recording, participant=self.participant, audio_blob=audio_blob, timestamp_ms=timestamp_ms, duration_ms=len(audio_blob) // 32, sample_rate=16000)
+        return Utterance.objects.create(recording=self.recording, participant=self.participant, audio_chunk=audio_chunk, timestamp_ms=timestamp_ms, duration_ms=audio_chunk.duration_ms)
+
+    def test_build_batch_audio_separates_utterances_with_silence(self):
+        audio, segments = build_batch_audio(self.utterances, 16000)
+
+        self.assertEqual(segments, [(0.0, 1.0), (1.0 + SILENCE_BETWEEN_UTTERANCES_SECONDS, 1.5 + SILENCE_BETWEEN_UTTERANCES_SECONDS)])
+        self.assertEqual(len(audio), (16000 + 8000 + int(16000 * SILENCE_BETWEEN_UTTERANCES_SECONDS)) * 2)
+
+    @mock.patch("bots.tasks.process_utterance_task.RecordingManager.set_recording_transcription_complete")
+    @mock.patch("bots.tasks.process_utterance_batch_task.transcribe_audio_via_deepgram")
+    def test_batch_is_transcribed_with_one_request_and_split_back_into_utterances(self, mock_transcribe, mock_set_complete):
+        second_utterance_start = 1.0 + SILENCE_BETWEEN_UTTERANCES_SECONDS
+        mock_transcribe.return_value = (
+            {"transcript": "Hello there. Bye.", "words": [word("Hello", 0.1, 0.4), word("there.", 0.5, 0.9), word("Bye.", second_utterance_start + 0.1, second_utterance_start + 0.3)]},
+            None,
+        )
+
+        process_utterance_batch.apply(args=[[utterance.id for utterance in self.utterances]])
+
+        mock_transcribe.assert_called_once()
+        first_utterance, second_utterance = [Utterance.objects.get(id=utterance.id) for utterance in self.utterances]
+        self.assertEqual(first_utterance.transcription["transcript"], "Hello there.")
+        self.assertEqual(second_utterance.transcription["transcript"], "Bye.")
+        self.assertAlmostEqual(second_utterance.transcription["words"][0]["start"], 0.1)
+        self.assertEqual(second_utterance.transcription_attempt_count, 1)
+        mock_set_complete.assert_called_once_with(self.recording)
+
+    @mock.patch("bots.tasks.process_utterance_batch_task.process_utterance")
+    @mock.patch("bots.tasks.process_utterance_batch_task.transcribe_audio_via_deepgram")
+    def test_failed_batch_falls_back_to_individual_transcription(self, mock_transcribe, mock_process_utterance):
+        mock_transcribe.return_value = (None, {"reason": "rate_limit_exceeded"})
+
+        process_utterance_batch.apply(args=[[utterance.id for utterance in self.utterances]])
+
+        self.assertEqual([call.args[0] for call in mock_process_utterance.delay.call_args_list], [utterance.id for utterance in self.utterances])
+        self.assertFalse(Utterance.objects.filter(transcription__isnull=False).exists())
+
+    @mock.patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_ENABLED": "true"})
+    @mock.patch("bots.tasks.process_utterance_task.RecordingManager.set_recording_transcription_complete")
+    @mock.patch("bots.tasks.process_utterance_batch_task.get_transcription_dispatcher")
+    @mock.patch("bots.tasks.process_utterance_batch_task.transcribe_audio_via_deepgram")
+    def test_batch_takes_a_token_from_the_transcription_dispatcher(self, mock_transcribe, mock_get_transcription_dispatcher, mock_set_complete):
+        mock_transcribe.return_value = ({"transcript": "Hello", "words": [word("Hello", 0.1, 0.4)]}, None)
+        transcription_dispatcher = mock_get_transcription_dispatcher.return_value
+        transcription_dispatcher.acquire_request.return_value = True
+
+        process_utterance_batch.apply(args=[[utterance.id for utterance in self.utterances]])
+
+        bucket = f"{self.project.id}:{int(TranscriptionProviders.DEEPGRAM)}"
+        request_id = f"batch:{self.utterances[0].id}"
+        transcription_dispatcher.acquire_request.assert_called_once_with(bucket, request_id)
+        transcription_dispatcher.finish_request.assert_called_once_with(bucket, request_id, rate_limited=False)
+        transcription_dispatcher.enqueue_utterance.assert_not_called()
+        mock_transcribe.assert_called_once()
+
+    @mock.patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_ENABLED": "true"})
+    @mock.patch("bots.tasks.process_utterance_batch_task.get_transcription_dispatcher")
+    @mock.patch("bots.tasks.process_utterance_batch_task.transcribe_audio_via_deepgram")
+    def test_batch_is_queued_individually_when_the_dispatcher_has_no_token(self, mock_transcribe, mock_get_transcription_dispatcher):
+        transcription_dispatcher = mock_get_transcription_dispatcher.return_value
+        transcription_dispatcher.acquire_request.return_value = False
+
+        process_utterance_batch.apply(args=[[utterance.id for utterance in self.utterances]])
+
+        mock_transcribe.assert_not_called()
+        self.assertEqual([call.args[0].id for call in transcription_dispatcher.enqueue_utterance.call_args_list], [utterance.id for utterance in self.utterances])
+
+    @mock.patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_ENABLED": "true"})
+    @mock.patch("bots.tasks.process_utterance_batch_task.get_transcription_dispatcher")
+    @mock.patch("bots.tasks.process_utterance_batch_task.transcribe_audio_via_deepgram")
+    def test_rate_limited_batch_backs_off_the_dispatcher(self, mock_transcribe, mock_get_transcription_dispatcher):
+        mock_transcribe.return_value = (None, {"reason": TranscriptionFailureReasons.RATE_LIMIT_EXCEEDED, "status_code": 429})
+        transcription_dispatcher = mock_get_transcription_dispatcher.return_value
+        transcription_dispatcher.acquire_request.return_value = True
+
+        process_utterance_batch.apply(args=[[utterance.id for utterance in self.utterances]])
+
+        self.assertTrue(transcription_dispatcher.finish_request.call_args.kwargs["rate_limited"])
+        self.assertEqual(transcription_dispatcher.enqueue_utterance.call_count, 2)
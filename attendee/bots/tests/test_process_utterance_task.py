@@ -99,6 +99,38 @@ class ProcessUtteranceTaskTest(TransactionTestCase):
         self.assertEqual(self.utterance.transcription_attempt_count, 1)
         self.assertIsNone(self.utterance.failure_data)
 
+    # ------------------------------------------------------------------
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription_dispatcher")
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription")
+    def test_dispatched_rate_limited_utterance_is_returned_to_dispatcher(self, mock_get_transcription, mock_get_transcription_dispatcher):
+        """Rate limited while dispatched → handed back to the dispatcher instead of retried, and not counted as an attempt."""
+        mock_get_transcription.return_value = (None, {"reason": TranscriptionFailureReasons.RATE_LIMIT_EXCEEDED, "status_code": 429})
+
+        process_utterance.apply(args=[self.utterance.id], kwargs={"dispatched": True})
+
+        mock_get_transcription_dispatcher.return_value.finish_utterance.assert_called_once()
+        self.assertTrue(mock_get_transcription_dispatcher.return_value.finish_utterance.call_args.kwargs["rate_limited"])
+        self.utterance.refresh_from_db()
+        self.assertEqual(self.utterance.transcription_attempt_count, 0)
+        self.assertIsNone(self.utterance.failure_data)
+        self.assertIsNone(self.utterance.transcription)
+
+    # ------------------------------------------------------------------
+
+    @mock.patch("bots.tasks.process_utterance_task.RecordingManager.set_recording_transcription_complete")
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription_dispatcher")
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription")
+    def test_dispatched_successful_transcription_finishes_utterance(self, mock_get_transcription, mock_get_transcription_dispatcher, mock_set_complete):
+        """Successful transcription while dispatched → dispatcher is told the utterance is done."""
+        mock_get_transcription.return_value = ({"transcript": "hello world"}, None)
+
+        process_utterance.apply(args=[self.utterance.id], kwargs={"dispatched": True})
+
+        self.assertFalse(mock_get_transcription_dispatcher.return_value.finish_utterance.call_args.kwargs["rate_limited"])
+        self.utterance.refresh_from_db()
+        self.assertEqual(self.utterance.transcription["transcript"], "hello world")
+
 
 class BotModelRedactionSettingsTest(TransactionTestCase):
     """Unit tests for Bot model deepgram_redaction_settings method."""
@@ -480,7 +512,7 @@ from unittest import mock
 from django.test import TransactionTestCase
 
 
-def _build_fake_deepgram(success=True, err_code=None):
+def _build_fake_deepgram(success=True, err_code=None, status="400"):
     """
     Return a fake 'deepgram' module and (optionally) the
     expected transcript text for the success case.
@@ -490,8 +522,9 @@ def _build_fake_deepgram(success=True, err_code=None):
     # ------------------------------------------------------------------ #
     # 1. DeepgramApiError
     class FakeDGError(Exception):
-        def __init__(self, original_error):
+        def __init__(self, original_error, status):
             super().__init__("DG error")
+            self.status = status
             self.original_error = original_error
 
     fake.DeepgramApiError = FakeDGError
@@ -507,7 +540,7 @@ def _build_fake_deepgram(success=True, err_code=None):
         response = mock.Mock(results=mock.Mock(channels=[channel]))
         (client_instance.listen.rest.v.return_value.transcribe_file).return_value = response
     else:
-        (client_instance.listen.rest.v.return_value.transcribe_file).side_effect = FakeDGError(json.dumps({"err_code": err_code}))
+        (client_instance.listen.rest.v.return_value.transcribe_file).side_effect = FakeDGError(json.dumps({"err_code": err_code}), status)
 
     fake.DeepgramClient = mock.Mock(return_value=client_instance)
 
@@ -583,6 +616,17 @@ class DeepgramProviderTest(TransactionTestCase):
             {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID},
         )
 
+    # ------------------------------------------------------------------ #
+    def test_deepgram_rate_limit(self):
+        fake = _build_fake_deepgram(success=False, err_code="TOO_MANY_REQUESTS", status="429")
+        transcription, failure = self._call_with_fake_module(fake)
+
+        self.assertIsNone(transcription)
+        self.assertEqual(
+            failure,
+            {"reason": TranscriptionFailureReasons.RATE_LIMIT_EXCEEDED, "status_code": 429},
+        )
+
     # ------------------------------------------------------------------ #
     def test_deepgram_other_error(self):
         fake = _build_fake_deepgram(success=False, err_code="SOME_OTHER")
@@ -691,8 +735,8 @@ class GladiaProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.request") as m_request,
-            mock.patch("bots.tasks.process_utterance_task.requests.get") as m_get,
+            mock.patch("requests.Session.request") as m_request,
+            mock.patch("requests.Session.get") as m_get,
         ):
             # ---- requests.request calls: upload, transcribe, delete -----------------------
             def _request_side_effect(method, url, **_):
@@ -744,7 +788,7 @@ class GladiaProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.request") as m_request,
+            mock.patch("requests.Session.request") as m_request,
         ):
             resp401 = mock.Mock(status_code=401)
             m_request.return_value = resp401
@@ -805,7 +849,7 @@ class OpenAIProviderTest(TransactionTestCase):
         self.creds = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.OPENAI)
 
     # ────────────────────────────────────────────────────────────────────────────────
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_success_path(self, mock_pcm, mock_post):
         mock_post.return_value.status_code = 200
@@ -819,7 +863,7 @@ class OpenAIProviderTest(TransactionTestCase):
         mock_post.assert_called_once()  # ensure request made
 
     # ────────────────────────────────────────────────────────────────────────────────
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_invalid_credentials(self, mock_pcm, mock_post):
         mock_post.return_value.status_code = 401
@@ -833,7 +877,7 @@ class OpenAIProviderTest(TransactionTestCase):
         )
 
     # ────────────────────────────────────────────────────────────────────────────────
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_request_failure(self, mock_pcm, mock_post):
         mock_post.return_value.status_code = 500
@@ -861,7 +905,7 @@ class OpenAIProviderTest(TransactionTestCase):
         self.assertEqual(failure, {"reason": TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND})
 
     # ────────────────────────────────────────────────────────────────────────────────
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     @mock.patch.dict("os.environ", {"OPENAI_BASE_URL": "https://custom.openai.com/v1"})
     def test_custom_base_url_from_env(self, mock_pcm, mock_post):
@@ -878,7 +922,7 @@ class OpenAIProviderTest(TransactionTestCase):
         self.assertEqual(call_args[0][0], "https://custom.openai.com/v1/audio/transcriptions")
 
     # ────────────────────────────────────────────────────────────────────────────────
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     @mock.patch.dict("os.environ", {"OPENAI_MODEL_NAME": "custom-model"})
     def test_custom_model_name_from_env(self, mock_pcm, mock_post):
@@ -896,7 +940,7 @@ class OpenAIProviderTest(TransactionTestCase):
         self.assertEqual(files_dict["model"][1], "custom-model")
 
     # ────────────────────────────────────────────────────────────────────────────────
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     @mock.patch.dict("os.environ", {"OPENAI_BASE_URL": "https://custom-ai-endpoint.example.com/v1", "OPENAI_MODEL_NAME": "gpt-4-turbo-transcribe"})
     def test_both_env_vars_together(self, mock_pcm, mock_post):
@@ -1024,9 +1068,9 @@ class AssemblyAIProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
-            mock.patch("bots.tasks.process_utterance_task.requests.get") as m_get,
-            mock.patch("bots.tasks.process_utterance_task.requests.delete") as m_delete,
+            mock.patch("requests.Session.post") as m_post,
+            mock.patch("requests.Session.get") as m_get,
+            mock.patch("requests.Session.delete") as m_delete,
         ):
             # 1. Mock upload response
             upload_response = mock.Mock(status_code=200)
@@ -1074,7 +1118,7 @@ class AssemblyAIProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
+            mock.patch("requests.Session.post") as m_post,
         ):
             resp401 = mock.Mock(status_code=401)
             m_post.return_value = resp401
@@ -1097,7 +1141,7 @@ class AssemblyAIProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
+            mock.patch("requests.Session.post") as m_post,
         ):
             upload_response = mock.Mock(status_code=200)
             upload_response.json.return_value = {"upload_url": "https://cdn.assemblyai.com/upload/123"}
@@ -1117,8 +1161,8 @@ class AssemblyAIProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
-            mock.patch("bots.tasks.process_utterance_task.requests.get") as m_get,
+            mock.patch("requests.Session.post") as m_post,
+            mock.patch("requests.Session.get") as m_get,
         ):
             upload_response = mock.Mock(status_code=200)
             upload_response.json.return_value = {"upload_url": "https://cdn.assemblyai.com/upload/123"}
@@ -1142,8 +1186,8 @@ class AssemblyAIProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
-            mock.patch("bots.tasks.process_utterance_task.requests.get") as m_get,
+            mock.patch("requests.Session.post") as m_post,
+            mock.patch("requests.Session.get") as m_get,
             mock.patch("bots.tasks.process_utterance_task.time.sleep"),  # speed up test
         ):
             upload_response = mock.Mock(status_code=200)
@@ -1177,9 +1221,9 @@ class AssemblyAIProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
-            mock.patch("bots.tasks.process_utterance_task.requests.get") as m_get,
-            mock.patch("bots.tasks.process_utterance_task.requests.delete") as m_delete,
+            mock.patch("requests.Session.post") as m_post,
+            mock.patch("requests.Session.get") as m_get,
+            mock.patch("requests.Session.delete") as m_delete,
         ):
             # 1. Mock upload response
             upload_response = mock.Mock(status_code=200)
@@ -1266,7 +1310,7 @@ class SarvamProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
+            mock.patch("requests.Session.post") as m_post,
         ):
             success_response = mock.Mock(status_code=200)
             success_response.json.return_value = {"transcript": "hello sarvam"}
@@ -1283,7 +1327,7 @@ class SarvamProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
+            mock.patch("requests.Session.post") as m_post,
         ):
             resp403 = mock.Mock(status_code=403)
             m_post.return_value = resp403
@@ -1298,7 +1342,7 @@ class SarvamProviderTest(TransactionTestCase):
         with (
             self._patch_creds(),
             mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3"),
-            mock.patch("bots.tasks.process_utterance_task.requests.post") as m_post,
+            mock.patch("requests.Session.post") as m_post,
         ):
             resp429 = mock.Mock(status_code=429)
             m_post.return_value = resp429
@@ -1352,7 +1396,7 @@ class ElevenLabsProviderTest(TransactionTestCase):
 
     # ------------------------------------------------------------------ SUCCESS PATH
 
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_success_path(self, mock_pcm, mock_post):
         """ElevenLabs transcription succeeds and returns formatted transcript with words."""
@@ -1385,7 +1429,7 @@ class ElevenLabsProviderTest(TransactionTestCase):
             # Check headers in kwargs
             self.assertEqual(call_args[1]["headers"]["xi-api-key"], "fake‑key")
 
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_success_path_with_bot_settings(self, mock_pcm, mock_post):
         """ElevenLabs transcription succeeds with bot-specific settings applied."""
@@ -1422,7 +1466,7 @@ class ElevenLabsProviderTest(TransactionTestCase):
         self.assertIsNone(transcript)
         self.assertEqual(failure["reason"], TranscriptionFailureReasons.CREDENTIALS_NOT_FOUND)
 
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_invalid_credentials_401(self, mock_pcm, mock_post):
         """ElevenLabs returns 401 → CREDENTIALS_INVALID."""
@@ -1435,7 +1479,7 @@ class ElevenLabsProviderTest(TransactionTestCase):
             self.assertIsNone(transcript)
             self.assertEqual(failure["reason"], TranscriptionFailureReasons.CREDENTIALS_INVALID)
 
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_request_failure_500(self, mock_pcm, mock_post):
         """ElevenLabs returns 500 → TRANSCRIPTION_REQUEST_FAILED."""
@@ -1451,7 +1495,7 @@ class ElevenLabsProviderTest(TransactionTestCase):
             self.assertEqual(failure["status_code"], 500)
             self.assertEqual(failure["response_text"], "Internal Server Error")
 
-    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    @mock.patch("requests.Session.post")
     @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3", return_value=b"mp3")
     def test_request_exception(self, mock_pcm, mock_post):
         """Network request exception → TRANSCRIPTION_REQUEST_FAILED."""
@@ -0,0 +1,56 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Organization, User, UserRole
+from bots.models import Bot, BotEvent, BotEventSubTypes, BotEventTypes, BotResourceSnapshot, BotStates, Project
+
+
+class ProjectBotsViewTest(TestCase):
+    # Enough bots for several pages, so reading more than the current one would show up in the queries
+    NUMBER_OF_BOTS = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name="Test Organization", centicredits=10000)
+        cls.user = User.objects.create_user(username="admin", email="admin@example.com", password="testpassword123", role=UserRole.ADMIN, organization=cls.organization)
+        cls.project = Project.objects.create(name="Test Project", organization=cls.organization)
+
+        # bulk_create skips Bot.save, so the object ids are set here
+        Bot.objects.bulk_create([Bot(project=cls.project, object_id=f"bot_{i:016d}", meeting_url=f"https://zoom.us/j/{i}", state=BotStates.ENDED) for i in range(cls.NUMBER_OF_BOTS)])
+        cls.newest_bot = Bot.objects.create(project=cls.project, meeting_url="https://zoom.us/j/newest", state=BotStates.FATAL_ERROR)
+        BotEvent.objects.create(bot=cls.newest_bot, old_state=BotStates.JOINING, new_state=BotStates.FATAL_ERROR, event_type=BotEventTypes.FATAL_ERROR, event_sub_type=BotEventSubTypes.FATAL_ERROR_HEARTBEAT_TIMEOUT)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_bot_list_only_reads_the_current_page(self):
+        url = reverse("bots:project-bots", kwargs={"object_id": self.project.object_id})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["bots"]), 20)
+        self.assertEqual(response.context["paginator"].count, self.NUMBER_OF_BOTS + 1)
+        self.assertContains(response, "Heartbeat timeout")
+
+        # Apart from the count, every query that reads bots is limited to the page
+        bot_queries = [query["sql"] for query in queries.captured_queries if 'FROM "bots_bot"' in query["sql"] and "COUNT(" not in query["sql"]]
+        self.assertTrue(bot_queries)
+        for sql in bot_queries:
+            self.assertIn("LIMIT", sql)
+        self.assertLess(len(queries.captured_queries), 20)
+
+    def test_bot_detail_computes_resource_usage_maxima(self):
+        BotResourceSnapshot.objects.create(bot=self.newest_bot, data={"ram_usage_megabytes": 512, "cpu_usage_millicores": 900})
+        BotResourceSnapshot.objects.create(bot=self.newest_bot, data={"ram_usage_megabytes": 1024, "cpu_usage_millicores": 300})
+        BotResourceSnapshot.objects.create(bot=self.newest_bot, data={"ram_usage_megabytes": None, "cpu_usage_millicores": None})
+
+        response = self.client.get(reverse("bots:project-bot-detail", kwargs={"object_id": self.project.object_id, "bot_object_id": self.newest_bot.object_id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["max_ram_usage"], 1024)
+        self.assertEqual(response.context["max_cpu_usage"], 900)
@@ -0,0 +1,115 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Organization
+from bots.models import (
+    AudioChunk,
+    Bot,
+    BotEvent,
+    BotEventTypes,
+    BotStates,
+    Participant,
+    Project,
+    Recording,
+    RecordingTypes,
+    TranscriptionTypes,
+    Utterance,
+    WebhookDeliveryAttempt,
+    WebhookDeliveryAttemptStatus,
+    WebhookSubscription,
+    WebhookTriggerTypes,
+)
+
+
+class QueryPlanTest(TestCase):
+    """
+    Runs EXPLAIN on the hot queries and checks that they use the index meant for them. Sequential scans are disabled, so
+    a query that has no usable index shows up as a sequential scan rather than being hidden by the small amount of data.
+    """
+
+    NUMBER_OF_BOTS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name="Test Organization")
+        cls.project = Project.objects.create(name="Test Project", organization=organization)
+        other_project = Project.objects.create(name="Other Project", organization=organization)
+
+        states = [BotStates.ENDED, BotStates.FATAL_ERROR, BotStates.JOINED_RECORDING, BotStates.SCHEDULED]
+        Bot.objects.bulk_create(
+            [
+                Bot(
+                    project=cls.project if i % 2 == 0 else other_project,
+                    object_id=f"bot_{i:016d}",
+                    meeting_url=f"https://zoom.us/j/{i}",
+                    state=states[i % len(states)],
+                    deduplication_key=f"key-{i}" if i % 10 == 0 else None,
+                )
+                for i in range(cls.NUMBER_OF_BOTS)
+            ]
+        )
+        cls.bot = Bot.objects.filter(project=cls.project).first()
+        bots = list(Bot.objects.all()[:200])
+        BotEvent.objects.bulk_create([BotEvent(bot=bot, old_state=BotStates.READY, new_state=BotStates.JOINING, event_type=BotEventTypes.JOIN_REQUESTED) for bot in bots for _ in range(5)])
+
+        cls.recording = Recording.objects.create(bot=cls.bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True)
+        participant = Participant.objects.create(bot=cls.bot, uuid="participant_uuid")
+        audio_chunks = AudioChunk.objects.bulk_create([AudioChunk(recording=cls.recording, participant=participant, audio_blob=b"\x00\x01" if i % 20 == 0 else b"", timestamp_ms=i * 1000, duration_ms=1000, sample_rate=16000) for i in range(1000)])
+        Utterance.objects.bulk_create([Utterance(recording=cls.recording, participant=participant, audio_chunk=audio_chunk, timestamp_ms=audio_chunk.timestamp_ms, duration_ms=1000, transcription=None if i % 20 == 0 else {"transcript": "Hello"}) for i, audio_chunk in enumerate(audio_chunks)])
+
+        cls.webhook_subscription = WebhookSubscription.objects.create(project=cls.project, url="https://example.com/webhook", triggers=[WebhookTriggerTypes.BOT_STATE_CHANGE])
+        WebhookDeliveryAttempt.objects.bulk_create(
+            [
+                WebhookDeliveryAttempt(
+                    webhook_subscription=cls.webhook_subscription,
+                    bot=bot,
+                    idempotency_key=f"00000000-0000-0000-0000-{i:012d}",
+                    status=WebhookDeliveryAttemptStatus.PENDING if i % 50 == 0 else WebhookDeliveryAttemptStatus.SUCCESS,
+                    attempt_count=0 if i % 50 == 0 else 1,
+                )
+                for i, bot in enumerate(bots * 5)
+            ]
+        )
+
+        with connection.cursor() as cursor:
+            for model in [Bot, BotEvent, AudioChunk, Utterance, WebhookDeliveryAttempt]:
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def setUp(self):
+        # Each test runs in a transaction, so this only lasts for the test
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, plan)
+        self.assertIn(index_name, plan, plan)
+
+    def test_bots_by_project_and_state(self):
+        self.assertUsesIndex(Bot.objects.filter(project=self.project, state=BotStates.JOINED_RECORDING), "bot_project_state_idx")
+
+    def test_bots_by_project_and_meeting_url(self):
+        self.assertUsesIndex(Bot.objects.filter(project=self.project, meeting_url="https://zoom.us/j/42"), "bot_project_meeting_url_idx")
+
+    def test_bots_by_project_and_deduplication_key(self):
+        self.assertUsesIndex(Bot.objects.filter(project=self.project, deduplication_key="key-40"), "bot_project_dedup_key_idx")
+
+    def test_untranscribed_utterances(self):
+        self.assertUsesIndex(Utterance.objects.filter(recording=self.recording, async_transcription=None, transcription__isnull=True), "utterance_untranscribed_idx")
+
+    def test_latest_bot_event(self):
+        self.assertUsesIndex(self.bot.bot_events.order_by("-created_at")[:1], "botevent_bot_created_at_idx")
+
+    def test_bot_webhook_delivery_attempts(self):
+        self.assertUsesIndex(WebhookDeliveryAttempt.objects.filter(bot=self.bot).order_by("-created_at")[:20], "webhook_attempt_bot_idx")
+
+    def test_pending_webhook_delivery_attempts(self):
+        queryset = WebhookDeliveryAttempt.objects.filter(webhook_subscription=self.webhook_subscription, status=WebhookDeliveryAttemptStatus.PENDING, attempt_count=0).order_by("created_at", "id")[:50]
+        self.assertUsesIndex(queryset, "webhook_attempt_pending_idx")
+
+    def test_old_audio_chunks_with_audio(self):
+        queryset = AudioChunk.objects.filter(AudioChunk.has_audio_blob_filter(), created_at__lt=timezone.now() - datetime.timedelta(days=1))
+        self.assertUsesIndex(queryset, "audiochunk_with_blob_idx")
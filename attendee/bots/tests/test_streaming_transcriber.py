@@ -0,0 +1,261 @@
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from websockets import ConnectionClosed
+
+from bots.bot_controller.per_participant_streaming_audio_input_manager import PerParticipantStreamingAudioInputManager
+from bots.models import TranscriptionProviders
+from bots.transcription_providers.assembly_ai.assembly_ai_streaming_transcriber import AssemblyAIStreamingTranscriber
+from bots.transcription_providers.elevenlabs.elevenlabs_streaming_transcriber import ElevenLabsStreamingTranscriber
+from bots.transcription_providers.fake.fake_streaming_transcriber import FakeStreamingTranscriber
+from bots.transcription_providers.gladia.gladia_streaming_transcriber import GladiaStreamingTranscriber
+from bots.transcription_providers.openai.openai_streaming_transcriber import OpenAIStreamingTranscriber
+from bots.transcription_providers.streaming_transcriber import StreamingTranscriberPool, resample_pcm
+
+SAMPLE_RATE = 16000
+ONE_SECOND_OF_AUDIO = b"\x01\x00" * SAMPLE_RATE
+
+
+class TestStreamingTranscriber(unittest.TestCase):
+    def setUp(self):
+        self.results = []
+
+    def on_result(self, speaker_id, result):
+        self.results.append((speaker_id, result))
+
+    @patch("bots.transcription_providers.streaming_transcriber.time.time")
+    def test_result_times_are_converted_to_wall_clock(self, mock_time):
+        mock_time.return_value = 1000.0
+        transcriber = FakeStreamingTranscriber(speaker_id="a", sample_rate=SAMPLE_RATE, on_result_callback=self.on_result)
+        transcriber.send(ONE_SECOND_OF_AUDIO)
+        transcriber.send(ONE_SECOND_OF_AUDIO)
+
+        transcriber.emit_result(transcript="Hello there", words=[{"word": "Hello", "start": 0.5, "end": 0.9}, {"word": "there", "start": 1.0, "end": 1.4}], is_final=True)
+
+        speaker_id, result = self.results[0]
+        self.assertEqual(speaker_id, "a")
+        self.assertEqual(result["timestamp_ms"], 1000500)
+        self.assertEqual(result["duration_ms"], 900)
+        self.assertAlmostEqual(result["words"][1]["start"], 0.5)
+
+    @patch("bots.transcription_providers.streaming_transcriber.time.time")
+    def test_late_result_on_reused_connection_goes_to_previous_speaker(self, mock_time):
+        mock_time.return_value = 1000.0
+        transcriber = FakeStreamingTranscriber(speaker_id="a", sample_rate=SAMPLE_RATE, on_result_callback=self.on_result)
+        transcriber.send(ONE_SECOND_OF_AUDIO)
+
+        mock_time.return_value = 1010.0
+        transcriber.assign_to_speaker("b")
+        transcriber.send(ONE_SECOND_OF_AUDIO)
+
+        transcriber.emit_transcript("from a", start_seconds=0.2, end_seconds=0.8)
+        transcriber.emit_transcript("from b", start_seconds=1.1, end_seconds=1.6)
+
+        self.assertEqual([(speaker_id, result["timestamp_ms"]) for speaker_id, result in self.results], [("a", 1000200), ("b", 1010100)])
+
+    def test_resample_pcm(self):
+        self.assertEqual(len(resample_pcm(ONE_SECOND_OF_AUDIO, 16000, 24000)), 24000 * 2)
+        self.assertEqual(resample_pcm(ONE_SECOND_OF_AUDIO, 16000, 16000), ONE_SECOND_OF_AUDIO)
+
+
+class TestStreamingTranscriberPool(unittest.TestCase):
+    def setUp(self):
+        self.transcribers = []
+        self.pool = StreamingTranscriberPool(create_transcriber=self.create_transcriber, max_active_transcribers=2, max_idle_transcribers=1, idle_timeout_seconds=30)
+
+    def create_transcriber(self, speaker_id):
+        transcriber = FakeStreamingTranscriber(speaker_id=speaker_id, sample_rate=SAMPLE_RATE, on_result_callback=MagicMock())
+        self.transcribers.append(transcriber)
+        return transcriber
+
+    def test_released_connection_is_reused_by_next_speaker(self):
+        first_transcriber = self.pool.acquire("a")
+        self.pool.release("a")
+
+        self.assertEqual(first_transcriber.finalize_count, 1)
+        self.assertFalse(first_transcriber.closed)
+        self.assertIs(self.pool.acquire("b"), first_transcriber)
+        self.assertEqual(first_transcriber.speaker_id, "b")
+        self.assertEqual(self.pool.get_metrics(), {"connections_opened": 1, "connections_reused": 1, "connections_reaped": 0, "connections_lost": 0, "active": 1, "idle": 0})
+
+    def test_dead_active_transcriber_is_replaced(self):
+        first_transcriber = self.pool.acquire("a")
+        first_transcriber.closed = True
+
+        second_transcriber = self.pool.acquire("a")
+
+        self.assertIsNot(second_transcriber, first_transcriber)
+        self.assertIs(self.pool.get("a"), second_transcriber)
+        self.assertEqual(self.pool.get_metrics()["connections_lost"], 1)
+
+    def test_dead_idle_transcriber_is_not_reused(self):
+        first_transcriber = self.pool.acquire("a")
+        self.pool.release("a")
+        first_transcriber.closed = True
+
+        self.assertIsNot(self.pool.acquire("b"), first_transcriber)
+        self.assertEqual(self.pool.get_metrics(), {"connections_opened": 2, "connections_reused": 0, "connections_reaped": 0, "connections_lost": 1, "active": 1, "idle": 0})
+
+    @patch("bots.transcription_providers.streaming_transcriber.time.time")
+    def test_idle_connections_are_reaped(self, mock_time):
+        mock_time.return_value = 1000.0
+        transcriber = self.pool.acquire("a")
+        transcriber.send(ONE_SECOND_OF_AUDIO)
+        self.pool.release("a")
+
+        mock_time.return_value = 1020.0
+        self.pool.reap_idle_transcribers()
+        self.assertFalse(transcriber.closed)
+
+        mock_time.return_value = 1031.0
+        self.pool.reap_idle_transcribers()
+        self.assertTrue(transcriber.closed)
+        self.assertEqual(self.pool.get_metrics()["connections_reaped"], 1)
+
+    @patch("bots.transcription_providers.streaming_transcriber.time.time")
+    def test_least_recently_used_transcriber_is_released_when_over_limit(self, mock_time):
+        for now, speaker_id in [(1000.0, "a"), (1001.0, "b"), (1002.0, "c")]:
+            mock_time.return_value = now
+            self.pool.acquire(speaker_id).send(ONE_SECOND_OF_AUDIO)
+
+        self.assertEqual(set(self.pool.active_transcribers), {"b", "c"})
+
+
+class TestWebsocketStreamingTranscriber(unittest.TestCase):
+    @patch("bots.transcription_providers.streaming_transcriber.connect")
+    def test_start_connects_in_the_background(self, mock_connect):
+        connecting = threading.Event()
+        websocket = MagicMock()
+        websocket.recv.side_effect = ConnectionClosed(None, None)
+        mock_connect.side_effect = lambda *args, **kwargs: connecting.wait(5) and websocket
+        transcriber = OpenAIStreamingTranscriber(api_key="key", sample_rate=SAMPLE_RATE, model="gpt-4o-transcribe", speaker_id="a", on_result_callback=MagicMock())
+
+        transcriber.start()
+        transcriber.send(ONE_SECOND_OF_AUDIO)
+
+        self.assertTrue(transcriber.is_alive())
+        self.assertEqual(transcriber.send_queue.qsize(), 1)
+        connecting.set()
+        transcriber.close()
+        transcriber.send_thread.join(5)
+
+    @patch("bots.transcription_providers.streaming_transcriber.connect")
+    def test_failed_connection_is_not_alive(self, mock_connect):
+        mock_connect.side_effect = OSError("Connection refused")
+        transcriber = OpenAIStreamingTranscriber(api_key="key", sample_rate=SAMPLE_RATE, model="gpt-4o-transcribe", speaker_id="a", on_result_callback=MagicMock())
+
+        transcriber.start()
+        transcriber.send_thread.join(5)
+
+        self.assertFalse(transcriber.is_alive())
+
+
+class TestStreamingProviderMessages(unittest.TestCase):
+    def setUp(self):
+        self.results = []
+
+    def on_result(self, speaker_id, result):
+        self.results.append(result)
+
+    def test_assembly_ai_turns(self):
+        transcriber = AssemblyAIStreamingTranscriber(api_key="key", sample_rate=SAMPLE_RATE, speaker_id="a", on_result_callback=self.on_result)
+        words = [{"text": "hello", "start": 100, "end": 400, "confidence": 0.9, "word_is_final": True}]
+        transcriber.handle_message({"type": "Turn", "transcript": "hello", "end_of_turn": False, "turn_is_formatted": False, "words": words})
+        transcriber.handle_message({"type": "Turn", "transcript": "hello", "end_of_turn": True, "turn_is_formatted": False, "words": words})
+        transcriber.handle_message({"type": "Turn", "transcript": "Hello.", "end_of_turn": True, "turn_is_formatted": True, "words": words})
+
+        self.assertEqual([(result["transcript"], result["is_final"]) for result in self.results], [("hello", False), ("Hello.", True)])
+        self.assertEqual(self.results[-1]["duration_ms"], 300)
+        self.assertIn("sample_rate=16000", transcriber.get_url())
+
+    def test_gladia_transcripts(self):
+        transcriber = GladiaStreamingTranscriber(api_key="key", sample_rate=SAMPLE_RATE, speaker_id="a", on_result_callback=self.on_result)
+        transcriber.handle_message({"type": "transcript", "data": {"is_final": True, "utterance": {"text": " Hi there", "start": 1.0, "end": 2.0, "words": [{"word": " Hi", "start": 1.0, "end": 1.3, "confidence": 1}]}}})
+
+        self.assertEqual(self.results[0]["transcript"], "Hi there")
+        self.assertEqual(self.results[0]["duration_ms"], 1000)
+        self.assertEqual(self.results[0]["words"][0]["word"], "Hi")
+
+    def test_openai_deltas_and_completed_transcript(self):
+        transcriber = OpenAIStreamingTranscriber(api_key="key", sample_rate=48000, model="gpt-4o-transcribe", speaker_id="a", on_result_callback=self.on_result)
+        transcriber.handle_message({"type": "input_audio_buffer.speech_started", "item_id": "item_1", "audio_start_ms": 200})
+        transcriber.handle_message({"type": "conversation.item.input_audio_transcription.delta", "item_id": "item_1", "delta": "Good"})
+        transcriber.handle_message({"type": "input_audio_buffer.speech_stopped", "item_id": "item_1", "audio_end_ms": 1200})
+        transcriber.handle_message({"type": "conversation.item.input_audio_transcription.completed", "item_id": "item_1", "transcript": "Good morning."})
+
+        self.assertEqual([(result["transcript"], result["is_final"]) for result in self.results], [("Good", False), ("Good morning.", True)])
+        self.assertEqual(self.results[-1]["duration_ms"], 1000)
+
+        audio_message = json.loads(transcriber.get_audio_message(b"\x00\x00" * 480))
+        self.assertEqual(audio_message["type"], "input_audio_buffer.append")
+
+    def test_elevenlabs_partial_and_committed_transcripts(self):
+        transcriber = ElevenLabsStreamingTranscriber(api_key="key", sample_rate=32000, model_id="scribe_v1", speaker_id="a", on_result_callback=self.on_result)
+        transcriber.handle_message({"message_type": "partial_transcript", "text": "how are"})
+        transcriber.handle_message({"message_type": "committed_transcript", "text": "How are you?"})
+        transcriber.handle_message(
+            {
+                "message_type": "committed_transcript_with_timestamps",
+                "text": "How are you?",
+                "words": [{"text": "How", "start": 0.1, "end": 0.3, "type": "word"}, {"text": " ", "start": 0.3, "end": 0.35, "type": "spacing"}, {"text": "are", "start": 0.35, "end": 0.5, "type": "word"}],
+            }
+        )
+
+        self.assertEqual([(result["transcript"], result["is_final"]) for result in self.results], [("how are", False), ("How are you?", True)])
+        self.assertEqual([word["word"] for word in self.results[-1]["words"]], ["How", "are"])
+        # 32kHz isn't accepted, so the audio is resampled
+        self.assertIn("audio_format=pcm_16000", transcriber.get_url())
+        self.assertIn("model_id=scribe_v2_realtime", transcriber.get_url())
+
+
+class TestPerParticipantStreamingAudioInputManager(unittest.TestCase):
+    def setUp(self):
+        self.saved_results = []
+        with patch.object(PerParticipantStreamingAudioInputManager, "get_api_key", return_value="key"):
+            self.manager = PerParticipantStreamingAudioInputManager(
+                get_participant_callback=MagicMock(return_value={}),
+                sample_rate=SAMPLE_RATE,
+                transcription_provider=TranscriptionProviders.OPENAI,
+                bot=MagicMock(),
+                save_transcription_result_callback=lambda speaker_id, result: self.saved_results.append((speaker_id, result["transcript"])),
+            )
+        self.manager.vad = MagicMock()
+        self.manager.vad.is_speech.return_value = True
+        self.transcribers = []
+        self.manager.streaming_transcriber_pool.create_transcriber = self.create_transcriber
+
+    def create_transcriber(self, speaker_id):
+        transcriber = FakeStreamingTranscriber(speaker_id=speaker_id, sample_rate=SAMPLE_RATE, on_result_callback=self.manager.on_transcription_result)
+        self.transcribers.append(transcriber)
+        return transcriber
+
+    def test_final_results_are_saved_on_the_main_loop(self):
+        self.manager.add_chunk("a", None, ONE_SECOND_OF_AUDIO, normalized_rms=0.5)
+        transcriber = self.transcribers[0]
+        transcriber.emit_transcript("interim", is_final=False)
+        transcriber.emit_transcript("Final.")
+        self.assertEqual(self.saved_results, [])
+
+        self.manager.monitor_transcription()
+
+        self.assertEqual(self.saved_results, [("a", "Final.")])
+
+    def test_silent_audio_does_not_open_a_connection(self):
+        self.manager.add_chunk("a", None, bytes(320), normalized_rms=0.0)
+
+        self.assertEqual(self.transcribers, [])
+
+    @patch("bots.bot_controller.per_participant_streaming_audio_input_manager.time.time")
+    def test_silent_speaker_connection_is_handed_to_next_speaker(self, mock_time):
+        mock_time.return_value = 1000.0
+        self.manager.add_chunk("a", None, ONE_SECOND_OF_AUDIO, normalized_rms=0.5)
+
+        mock_time.return_value = 1011.0
+        self.manager.monitor_transcription()
+        self.manager.add_chunk("b", None, ONE_SECOND_OF_AUDIO, normalized_rms=0.5)
+
+        self.assertEqual(len(self.transcribers), 1)
+        self.assertEqual(self.transcribers[0].speaker_id, "b")
+        self.assertEqual(len(self.transcribers[0].audio), 2 * len(ONE_SECOND_OF_AUDIO))
@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bots.bot_controller.streaming_uploader import StreamingUploader, StreamingUploadPartTracker
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+
+class TestStreamingUploader(unittest.TestCase):
+    def setUp(self):
+        self.s3_client = MagicMock()
+        self.s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+        self.s3_client.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+        self.s3_client.get_paginator.return_value.paginate.return_value = []
+
+        boto3_patcher = patch("bots.bot_controller.streaming_uploader.boto3")
+        self.mock_boto3 = boto3_patcher.start()
+        self.mock_boto3.client.return_value = self.s3_client
+        self.addCleanup(boto3_patcher.stop)
+
+        self.redis = FakeRedis()
+        self.tracker = StreamingUploadPartTracker(self.redis, "bucket", "recording.mp4")
+
+    def create_uploader(self, chunk_size=10, spool_file_path=None):
+        uploader = StreamingUploader("bucket", "recording.mp4", chunk_size=chunk_size, part_tracker=self.tracker, spool_file_path=spool_file_path)
+        uploader.start_upload()
+        return uploader
+
+    def test_parts_are_uploaded_as_data_arrives(self):
+        uploader = self.create_uploader()
+        uploader.upload_part(b"a" * 25)
+        uploader.upload_queue.join()
+
+        self.assertEqual(self.s3_client.upload_part.call_count, 2)
+        self.assertEqual(uploader.bytes_uploaded(), 20)
+        saved_state = json.loads(self.redis.get(self.tracker.redis_key))
+        self.assertEqual(saved_state["upload_id"], "upload-1")
+        self.assertEqual([part["PartNumber"] for part in saved_state["parts"]], [1, 2])
+
+        uploader.complete_upload()
+
+        self.assertEqual(self.s3_client.upload_part.call_count, 3)
+        multipart_upload = self.s3_client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]
+        self.assertEqual(multipart_upload["Parts"], [{"PartNumber": 1, "ETag": "etag-1"}, {"PartNumber": 2, "ETag": "etag-2"}, {"PartNumber": 3, "ETag": "etag-3"}])
+        self.assertIsNone(self.redis.get(self.tracker.redis_key))
+
+    def test_small_recording_uses_regular_upload(self):
+        uploader = self.create_uploader()
+        uploader.upload_part(b"abc")
+        uploader.complete_upload()
+
+        self.s3_client.put_object.assert_called_once_with(Bucket="bucket", Key="recording.mp4", Body=b"abc")
+        self.s3_client.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="recording.mp4", UploadId="upload-1")
+        self.s3_client.complete_multipart_upload.assert_not_called()
+        self.assertIsNone(self.redis.get(self.tracker.redis_key))
+
+    def test_restart_completes_the_previous_upload_and_starts_a_new_object(self):
+        self.tracker.save("upload-0", [{"PartNumber": 1, "ETag": "etag-1", "Size": 10}], key="recording.mp4")
+        self.s3_client.get_paginator.return_value.paginate.return_value = [{"Parts": [{"PartNumber": 1, "ETag": "etag-1", "Size": 10}]}]
+
+        uploader = self.create_uploader()
+
+        # The new process's stream starts with its own init segment, so it must not be appended to the previous upload
+        self.s3_client.complete_multipart_upload.assert_called_once_with(Bucket="bucket", Key="recording.mp4", UploadId="upload-0", MultipartUpload={"Parts": [{"PartNumber": 1, "ETag": "etag-1"}]})
+        self.s3_client.create_multipart_upload.assert_called_once_with(Bucket="bucket", Key="recording_1.mp4")
+        self.assertEqual(uploader.upload_id, "upload-1")
+        self.assertEqual(uploader.part_number, 1)
+        self.assertEqual(uploader.previous_keys, ["recording.mp4"])
+
+        uploader.upload_part(b"b" * 10)
+        uploader.complete_upload()
+
+        self.assertEqual(self.s3_client.upload_part.call_args.kwargs["Key"], "recording_1.mp4")
+        self.assertEqual(self.s3_client.complete_multipart_upload.call_args.kwargs["Key"], "recording_1.mp4")
+        self.assertEqual(self.s3_client.complete_multipart_upload.call_args.kwargs["UploadId"], "upload-1")
+
+    def test_second_restart_moves_on_to_the_next_segment(self):
+        self.tracker.save("upload-1", [], key="recording_1.mp4", segment=1, previous_keys=["recording.mp4"])
+        self.s3_client.get_paginator.return_value.paginate.return_value = [{"Parts": [{"PartNumber": 1, "ETag": "etag-1", "Size": 10}]}]
+
+        uploader = self.create_uploader()
+
+        self.assertEqual(self.s3_client.complete_multipart_upload.call_args.kwargs["Key"], "recording_1.mp4")
+        self.assertEqual(uploader.key, "recording_2.mp4")
+        self.assertEqual(uploader.previous_keys, ["recording.mp4", "recording_1.mp4"])
+        saved_state = json.loads(self.redis.get(self.tracker.redis_key))
+        self.assertEqual((saved_state["key"], saved_state["segment"]), ("recording_2.mp4", 2))
+
+    def test_restart_without_uploaded_parts_aborts_the_previous_upload(self):
+        self.tracker.save("upload-0", [], key="recording.mp4")
+
+        uploader = self.create_uploader()
+
+        self.s3_client.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="recording.mp4", UploadId="upload-0")
+        self.s3_client.complete_multipart_upload.assert_not_called()
+        self.assertEqual(uploader.key, "recording_1.mp4")
+        self.assertEqual(uploader.previous_keys, [])
+
+    def test_starts_new_upload_if_saved_upload_is_gone(self):
+        self.tracker.save("expired-upload", [])
+        self.s3_client.get_paginator.return_value.paginate.side_effect = Exception("NoSuchUpload")
+
+        uploader = self.create_uploader()
+
+        self.s3_client.create_multipart_upload.assert_called_once_with(Bucket="bucket", Key="recording_1.mp4")
+        self.assertEqual(uploader.upload_id, "upload-1")
+        self.assertEqual(uploader.part_number, 1)
+
+    @patch("bots.bot_controller.streaming_uploader.time.sleep")
+    def test_failed_part_is_retried(self, mock_sleep):
+        responses = [Exception("Timeout"), {"ETag": "etag-1"}]
+
+        def upload_part(**kwargs):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        self.s3_client.upload_part.side_effect = upload_part
+
+        uploader = self.create_uploader()
+        uploader.upload_part(b"a" * 10)
+        uploader.upload_queue.join()
+
+        self.assertEqual(self.s3_client.upload_part.call_count, 2)
+        self.assertEqual(uploader.failed_part_numbers, [])
+        mock_sleep.assert_called_once()
+
+    @patch("bots.bot_controller.streaming_uploader.time.sleep")
+    def test_complete_upload_raises_if_part_failed(self, mock_sleep):
+        self.s3_client.upload_part.side_effect = Exception("Timeout")
+
+        uploader = self.create_uploader()
+        uploader.upload_part(b"a" * 10)
+
+        with self.assertRaises(Exception):
+            uploader.complete_upload()
+
+        self.s3_client.complete_multipart_upload.assert_not_called()
+        # The state is kept so a restarted process can complete the uploaded parts
+        self.assertIsNotNone(self.redis.get(self.tracker.redis_key))
+
+    @patch("bots.bot_controller.streaming_uploader.time.sleep")
+    def test_spooled_copy_is_kept_for_a_failed_upload(self, mock_sleep):
+        self.s3_client.upload_part.side_effect = Exception("Timeout")
+        spool_file_path = os.path.join(tempfile.mkdtemp(), "recording.mp4")
+
+        uploader = self.create_uploader(spool_file_path=spool_file_path)
+        uploader.upload_part(b"a" * 15)
+        with self.assertRaises(Exception):
+            uploader.complete_upload()
+
+        with open(spool_file_path, "rb") as f:
+            self.assertEqual(f.read(), b"a" * 15)
+
+        uploader.abort_upload()
+
+        self.s3_client.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="recording.mp4", UploadId="upload-1")
+        self.assertIsNone(self.redis.get(self.tracker.redis_key))
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+from django.test import Client, TransactionTestCase
+
+from bots.models import ApiKey, Bot, BotStates, Organization, Participant, Project, Recording, RecordingStates, RecordingTypes, TranscriptionTypes, TranscriptSnapshot, TranscriptSnapshotManager, Utterance
+
+
+@patch.object(TranscriptSnapshotManager, "TRANSCRIPT_SEQUENCE_SETTLE_SECONDS", 0)
+class TranscriptApiTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Organization")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.IN_PROGRESS)
+        self.participant = Participant.objects.create(bot=self.bot, uuid="participant_uuid", full_name="Participant")
+        self.client = Client()
+
+    def create_utterance(self, timestamp_ms, transcript):
+        return Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=timestamp_ms, duration_ms=1000, transcription={"transcript": transcript})
+
+    def get_transcript(self, query_string="", **headers):
+        return self.client.get(f"/api/v1/bots/{self.bot.object_id}/transcript{query_string}", HTTP_AUTHORIZATION=f"Token {self.api_key}", **headers)
+
+    def transcripts(self, response):
+        return [entry["transcription"]["transcript"] for entry in response.json()]
+
+    def test_cursor_returns_only_utterances_transcribed_since(self):
+        self.create_utterance(1000, "First")
+        self.create_utterance(2000, "Second")
+
+        response = self.get_transcript("?cursor=0")
+        self.assertEqual(self.transcripts(response), ["First", "Second"])
+
+        third_utterance = self.create_utterance(3000, "Third")
+        response = self.get_transcript(f"?cursor={response['X-Transcript-Cursor']}")
+        self.assertEqual(self.transcripts(response), ["Third"])
+
+        # A retranscribed utterance comes back with its new transcription
+        third_utterance.transcription = {"transcript": "Third, corrected"}
+        third_utterance.save()
+        response = self.get_transcript(f"?cursor={response['X-Transcript-Cursor']}")
+        self.assertEqual(self.transcripts(response), ["Third, corrected"])
+
+    def test_unchanged_transcript_returns_304(self):
+        self.create_utterance(1000, "First")
+        response = self.get_transcript()
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get_transcript(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        self.create_utterance(2000, "Second")
+        response = self.get_transcript(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.transcripts(response), ["First", "Second"])
+
+    def test_full_transcript_is_served_from_the_snapshot(self):
+        self.create_utterance(2000, "Second")
+        self.create_utterance(1000, "First")
+        self.create_utterance(1500, "")
+
+        self.assertEqual(self.transcripts(self.get_transcript()), ["First", "Second"])
+        self.assertEqual(len(TranscriptSnapshot.objects.get(recording=self.recording).entries), 2)
+
+        self.create_utterance(3000, "Third")
+        # Only the new utterance is read to bring the snapshot up to date
+        with patch.object(TranscriptSnapshotManager, "transcript_entry", wraps=TranscriptSnapshotManager.transcript_entry) as mock_transcript_entry:
+            self.assertEqual(self.transcripts(self.get_transcript()), ["First", "Second", "Third"])
+        self.assertEqual(mock_transcript_entry.call_count, 1)
+
+    def test_snapshot_is_only_written_once_the_transcript_has_settled(self):
+        self.create_utterance(1000, "First")
+
+        with patch.object(TranscriptSnapshotManager, "TRANSCRIPT_SEQUENCE_SETTLE_SECONDS", 60):
+            self.assertEqual(self.transcripts(self.get_transcript()), ["First"])
+        self.assertFalse(TranscriptSnapshot.objects.filter(recording=self.recording).exists())
+
+        self.get_transcript()
+        snapshot = TranscriptSnapshot.objects.get(recording=self.recording)
+
+        # Reading it again without anything new doesn't write it
+        self.assertEqual(self.transcripts(self.get_transcript()), ["First"])
+        self.assertEqual(TranscriptSnapshot.objects.get(recording=self.recording).updated_at, snapshot.updated_at)
+
+    def test_cursor_does_not_move_past_unsettled_utterances(self):
+        self.create_utterance(1000, "First")
+
+        with patch.object(TranscriptSnapshotManager, "TRANSCRIPT_SEQUENCE_SETTLE_SECONDS", 60):
+            response = self.get_transcript("?cursor=0")
+
+        self.assertEqual(self.transcripts(response), ["First"])
+        self.assertEqual(response["X-Transcript-Cursor"], "0")
+
+    def test_invalid_cursor(self):
+        response = self.get_transcript("?cursor=abc")
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,220 @@
+import contextlib
+import unittest
+from unittest.mock import MagicMock, patch
+
+from bots.models import TranscriptionProviders
+from bots.transcription_dispatcher import TranscriptionDispatcher, get_transcription_dispatcher
+
+
+class FakeRedis:
+    """Just enough of the Redis API for the transcription dispatcher. Keys and members are stored as bytes, like redis-py returns them."""
+
+    def __init__(self):
+        self.store = {}
+
+    @staticmethod
+    def encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def lock(self, name, timeout=None, blocking_timeout=None):
+        return contextlib.nullcontext()
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = self.encode(value)
+        return True
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def sadd(self, key, member):
+        self.store.setdefault(key, set()).add(self.encode(member))
+
+    def srem(self, key, member):
+        self.store.get(key, set()).discard(self.encode(member))
+
+    def smembers(self, key):
+        return set(self.store.get(key, set()))
+
+    def hset(self, key, mapping):
+        self.store.setdefault(key, {}).update({self.encode(field): self.encode(value) for field, value in mapping.items()})
+
+    def hgetall(self, key):
+        return dict(self.store.get(key, {}))
+
+    def zadd(self, key, mapping):
+        self.store.setdefault(key, {}).update({self.encode(member): score for member, score in mapping.items()})
+
+    def zrem(self, key, member):
+        self.store.get(key, {}).pop(self.encode(member), None)
+
+    def zcard(self, key):
+        return len(self.store.get(key, {}))
+
+    def zcount(self, key, min_score, max_score):
+        def bound(value, default):
+            if value in ("-inf", "+inf"):
+                return default
+            return float(str(value).lstrip("("))
+
+        lower, upper = bound(min_score, float("-inf")), bound(max_score, float("inf"))
+        upper_exclusive = str(max_score).startswith("(")
+        return sum(1 for score in self.store.get(key, {}).values() if lower <= score and (score < upper if upper_exclusive else score <= upper))
+
+    def zremrangebyscore(self, key, min_score, max_score):
+        zset = self.store.get(key, {})
+        for member in [member for member, score in zset.items() if score <= max_score]:
+            del zset[member]
+
+    def zpopmin(self, key, count):
+        zset = self.store.get(key, {})
+        popped = sorted(zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del zset[member]
+        return popped
+
+
+class TestTranscriptionDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.dispatcher = TranscriptionDispatcher(self.redis)
+        self.dispatcher.send_utterance_task = MagicMock()
+        self.dispatcher.schedule_wakeup = MagicMock()
+        self.bucket = TranscriptionDispatcher.bucket_name(1, TranscriptionProviders.DEEPGRAM)
+
+        time_patcher = patch("bots.transcription_dispatcher.time.time", return_value=1000.0)
+        self.mock_time = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+
+    def dispatched_utterance_ids(self):
+        return [call.args[0] for call in self.dispatcher.send_utterance_task.call_args_list]
+
+    def create_utterance(self, utterance_id, async_transcription_id=None):
+        utterance = MagicMock()
+        utterance.id = utterance_id
+        utterance.recording.bot.project_id = 1
+        utterance.transcription_provider = TranscriptionProviders.DEEPGRAM
+        utterance.async_transcription_id = async_transcription_id
+        utterance.created_at.timestamp.return_value = 900.0 + utterance_id
+        return utterance
+
+    def fill_queue(self, live_utterance_ids=(), async_utterance_ids=()):
+        # Queue the utterances without dispatching them
+        with patch.object(self.dispatcher, "dispatch"):
+            for utterance_id in async_utterance_ids:
+                self.dispatcher.enqueue(utterance_id, 1, TranscriptionProviders.DEEPGRAM, TranscriptionDispatcher.ASYNC_PRIORITY, created_at=900.0 + utterance_id)
+            for utterance_id in live_utterance_ids:
+                self.dispatcher.enqueue(utterance_id, 1, TranscriptionProviders.DEEPGRAM, TranscriptionDispatcher.LIVE_PRIORITY, created_at=900.0 + utterance_id)
+
+    def test_live_utterances_are_dispatched_before_async_ones(self):
+        self.fill_queue(live_utterance_ids=[5, 6], async_utterance_ids=[1, 2, 3])
+
+        with patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_BURST_SIZE": "3"}):
+            self.dispatcher.dispatch(self.bucket)
+
+        self.assertEqual(self.dispatched_utterance_ids(), [5, 6, 1])
+        self.assertEqual(self.dispatcher.get_stats(self.bucket)["queue_depth"], 2)
+        self.assertEqual(self.dispatcher.get_stats(self.bucket)["in_flight"], 3)
+
+    def test_token_bucket_refills_over_time(self):
+        self.fill_queue(live_utterance_ids=range(1, 11))
+
+        with patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_BURST_SIZE": "2", "TRANSCRIPTION_DISPATCHER_REQUESTS_PER_SECOND": "4"}):
+            self.dispatcher.dispatch(self.bucket)
+            self.assertEqual(len(self.dispatched_utterance_ids()), 2)
+            # Out of tokens, so the bucket is woken up once the next one is available
+            self.dispatcher.schedule_wakeup.assert_called_once_with(self.bucket, 0.25)
+
+            self.mock_time.return_value = 1000.5
+            self.dispatcher.dispatch(self.bucket)
+
+        self.assertEqual(self.dispatched_utterance_ids(), [1, 2, 3, 4])
+
+    def test_in_flight_limit_is_per_provider(self):
+        self.fill_queue(live_utterance_ids=[1, 2, 3])
+        with patch.object(self.dispatcher, "dispatch"):
+            self.dispatcher.enqueue(4, 1, TranscriptionProviders.OPENAI, TranscriptionDispatcher.LIVE_PRIORITY)
+
+        with patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_DEEPGRAM_MAX_IN_FLIGHT": "1"}):
+            self.dispatcher.dispatch_all()
+
+        self.assertEqual(sorted(self.dispatched_utterance_ids()), [1, 4])
+
+    def test_finishing_an_utterance_dispatches_the_next_one(self):
+        self.fill_queue(live_utterance_ids=[1, 2])
+        with patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_MAX_IN_FLIGHT": "1"}):
+            self.dispatcher.dispatch(self.bucket)
+            self.dispatcher.finish_utterance(self.create_utterance(1))
+
+        self.assertEqual(self.dispatched_utterance_ids(), [1, 2])
+
+    def test_rate_limit_stops_dispatching_until_backoff_expires(self):
+        self.fill_queue(live_utterance_ids=[1, 2, 3])
+        self.dispatcher.dispatch(self.bucket)
+        self.dispatcher.send_utterance_task.reset_mock()
+
+        self.dispatcher.finish_utterance(self.create_utterance(1), rate_limited=True)
+        # A second rate limited request from before the backoff started doesn't extend it
+        self.dispatcher.finish_utterance(self.create_utterance(2), rate_limited=True)
+
+        stats = self.dispatcher.get_stats(self.bucket)
+        self.assertTrue(stats["backing_off"])
+        self.assertEqual(stats["backoff_seconds_remaining"], TranscriptionDispatcher.BASE_BACKOFF_SECONDS)
+        self.assertEqual(stats["consecutive_rate_limits"], 1)
+        self.assertEqual(stats["queue_depth"], 2)
+        self.assertEqual(stats["in_flight"], 1)
+        self.dispatcher.send_utterance_task.assert_not_called()
+        self.dispatcher.schedule_wakeup.assert_called_with(self.bucket, TranscriptionDispatcher.BASE_BACKOFF_SECONDS)
+
+        # Once the backoff is over, the bucket starts empty and refills
+        self.mock_time.return_value = 1000 + TranscriptionDispatcher.BASE_BACKOFF_SECONDS + 1
+        self.dispatcher.dispatch(self.bucket)
+        self.assertEqual(self.dispatched_utterance_ids(), [1, 2])
+
+    def test_backoff_grows_with_consecutive_rate_limits_and_resets_on_success(self):
+        self.fill_queue(live_utterance_ids=[1])
+        self.dispatcher.dispatch(self.bucket)
+
+        self.dispatcher.finish_utterance(self.create_utterance(1), rate_limited=True)
+        self.mock_time.return_value = 1010.0
+        self.dispatcher.finish_utterance(self.create_utterance(1), rate_limited=True)
+        self.assertEqual(self.dispatcher.get_stats(self.bucket)["backoff_seconds_remaining"], TranscriptionDispatcher.BASE_BACKOFF_SECONDS * 2)
+
+        self.mock_time.return_value = 1100.0
+        self.dispatcher.finish_utterance(self.create_utterance(1))
+        self.assertEqual(self.dispatcher.get_stats(self.bucket)["consecutive_rate_limits"], 0)
+
+    def test_batch_request_takes_one_token_and_in_flight_slot(self):
+        with patch.dict("os.environ", {"TRANSCRIPTION_DISPATCHER_BURST_SIZE": "2", "TRANSCRIPTION_DISPATCHER_MAX_IN_FLIGHT": "1"}):
+            self.assertTrue(self.dispatcher.acquire_request(self.bucket, "batch:1"))
+            self.assertEqual(self.dispatcher.get_stats(self.bucket)["tokens"], 1)
+            # The batch fills the only in flight slot
+            self.assertFalse(self.dispatcher.acquire_request(self.bucket, "batch:2"))
+
+            self.fill_queue(live_utterance_ids=[3])
+            self.dispatcher.finish_request(self.bucket, "batch:1")
+
+        self.assertEqual(self.dispatched_utterance_ids(), [3])
+
+    def test_rate_limited_batch_request_puts_the_bucket_into_backoff(self):
+        self.assertTrue(self.dispatcher.acquire_request(self.bucket, "batch:1"))
+        self.dispatcher.finish_request(self.bucket, "batch:1", rate_limited=True)
+
+        stats = self.dispatcher.get_stats(self.bucket)
+        self.assertTrue(stats["backing_off"])
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertFalse(self.dispatcher.acquire_request(self.bucket, "batch:2"))
+
+    def test_enqueue_falls_back_to_sending_the_task_when_redis_fails(self):
+        self.redis.zadd = MagicMock(side_effect=ConnectionError("Redis is down"))
+
+        self.dispatcher.enqueue(1, 1, TranscriptionProviders.DEEPGRAM, TranscriptionDispatcher.LIVE_PRIORITY)
+
+        self.assertEqual(self.dispatched_utterance_ids(), [1])
+
+    @patch.dict("os.environ", {"REDIS_URL": "redis://dispatcher-test:6379/5"})
+    @patch("bots.transcription_dispatcher.redis.from_url")
+    def test_dispatcher_reuses_its_redis_client(self, mock_from_url):
+        self.assertIs(get_transcription_dispatcher(), get_transcription_dispatcher())
+        mock_from_url.assert_called_once()
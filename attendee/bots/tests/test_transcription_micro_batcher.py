@@ -0,0 +1,61 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from bots.bot_controller.transcription_micro_batcher import TranscriptionMicroBatcher
+
+
+def create_utterance(utterance_id, duration_ms=1500):
+    return SimpleNamespace(id=utterance_id, duration_ms=duration_ms)
+
+
+class TestTranscriptionMicroBatcher(unittest.TestCase):
+    def setUp(self):
+        self.dispatch_batch_callback = MagicMock()
+        self.dispatch_utterances_callback = MagicMock()
+        self.batcher = TranscriptionMicroBatcher(
+            max_batch_size=3,
+            max_added_latency_ms=2000,
+            dispatch_batch_callback=self.dispatch_batch_callback,
+            dispatch_utterances_callback=self.dispatch_utterances_callback,
+        )
+
+    def test_full_batch_is_dispatched_right_away(self):
+        self.batcher.add_utterances([create_utterance(1), create_utterance(2)])
+        self.dispatch_batch_callback.assert_not_called()
+
+        self.batcher.add_utterances([create_utterance(3), create_utterance(4)])
+
+        self.dispatch_batch_callback.assert_called_once_with([1, 2, 3])
+        self.assertEqual(self.batcher.pending_utterance_ids, [4])
+
+    def test_long_utterances_are_not_batched(self):
+        self.batcher.add_utterances([create_utterance(1, duration_ms=20000), create_utterance(2)])
+
+        self.dispatch_utterances_callback.assert_called_once_with([1])
+        self.assertEqual(self.batcher.pending_utterance_ids, [2])
+
+    @patch("bots.bot_controller.transcription_micro_batcher.time.monotonic")
+    def test_partial_batch_is_dispatched_after_max_added_latency(self, mock_monotonic):
+        mock_monotonic.return_value = 100.0
+        self.batcher.add_utterances([create_utterance(1)])
+        mock_monotonic.return_value = 101.0
+        self.batcher.add_utterances([create_utterance(2)])
+
+        mock_monotonic.return_value = 101.9
+        self.batcher.flush_due_batches()
+        self.dispatch_batch_callback.assert_not_called()
+
+        # The latency is counted from the oldest utterance in the batch
+        mock_monotonic.return_value = 102.0
+        self.batcher.flush_due_batches()
+        self.dispatch_batch_callback.assert_called_once_with([1, 2])
+
+    def test_batch_of_one_is_dispatched_individually(self):
+        self.batcher.add_utterances([create_utterance(1)])
+
+        self.batcher.flush()
+
+        self.dispatch_batch_callback.assert_not_called()
+        self.dispatch_utterances_callback.assert_called_once_with([1])
+        self.assertEqual(self.batcher.get_metrics(), {"batches_dispatched": 0, "utterances_batched": 0, "utterances_dispatched_individually": 1})
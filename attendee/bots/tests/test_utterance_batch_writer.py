@@ -0,0 +1,129 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from bots.bot_controller.utterance_batch_writer import UtteranceBatchWriter
+from bots.models import AudioChunk, Bot, Organization, Participant, Project, Recording, RecordingStates, RecordingTranscriptionStates, Utterance
+
+
+def make_message(participant_uuid, audio_data=b"\x00\x01" * 1600):
+    return {
+        "participant_uuid": participant_uuid,
+        "participant_user_uuid": None,
+        "participant_full_name": f"Participant {participant_uuid}",
+        "participant_is_the_bot": False,
+        "participant_is_host": False,
+        "audio_data": audio_data,
+        "timestamp_ms": 1000,
+        "sample_rate": 16000,
+    }
+
+
+class UtteranceBatchWriterTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(
+            bot=self.bot,
+            recording_type=1,
+            transcription_type=1,
+            state=RecordingStates.IN_PROGRESS,
+            transcription_state=RecordingTranscriptionStates.NOT_STARTED,
+            transcription_provider=1,
+        )
+        self.on_utterances_created = mock.Mock()
+        self.writers = []
+
+    def tearDown(self):
+        for writer in self.writers:
+            if writer.writer_thread.is_alive():
+                writer.cleanup()
+
+    def create_writer(self, save_utterances=True, max_batch_size=50):
+        # A long flush interval so that the test controls when the batches are written
+        writer = UtteranceBatchWriter(
+            bot=self.bot,
+            save_utterances=save_utterances,
+            on_utterances_created_callback=self.on_utterances_created,
+            flush_interval_seconds=3600,
+            max_batch_size=max_batch_size,
+        )
+        self.writers.append(writer)
+        return writer
+
+    def test_batch_is_written_with_bulk_create(self):
+        writer = self.create_writer()
+        for i in range(10):
+            writer.add_audio_chunk(make_message(f"participant-{i % 2}"), timestamp_ms=1000 + i)
+
+        self.assertEqual(AudioChunk.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            writer.flush()
+
+        self.assertEqual(AudioChunk.objects.filter(recording=self.recording).count(), 10)
+        self.assertEqual(Utterance.objects.filter(recording=self.recording).count(), 10)
+        self.assertEqual(Participant.objects.filter(bot=self.bot).count(), 2)
+        for utterance in Utterance.objects.all():
+            self.assertEqual(utterance.audio_chunk.participant_id, utterance.participant_id)
+            self.assertEqual(utterance.duration_ms, 100)
+
+        # The number of queries must not grow with the number of chunks
+        self.assertLess(len(queries), 20)
+
+        self.on_utterances_created.assert_called_once()
+        self.assertCountEqual([utterance.id for utterance in self.on_utterances_created.call_args.args[0]], list(Utterance.objects.values_list("id", flat=True)))
+
+        self.recording.refresh_from_db()
+        self.assertEqual(self.recording.transcription_state, RecordingTranscriptionStates.IN_PROGRESS)
+
+        metrics = writer.get_metrics()
+        self.assertEqual(metrics["audio_chunks_written"], 10)
+        self.assertEqual(metrics["utterances_written"], 10)
+        self.assertEqual(metrics["batches_written"], 1)
+        self.assertEqual(metrics["pending_audio_chunks"], 0)
+
+    def test_batches_are_capped_at_max_batch_size(self):
+        writer = self.create_writer(max_batch_size=4)
+        for i in range(10):
+            writer.queue.put((make_message("participant-1"), 1000 + i))
+
+        writer.flush()
+
+        self.assertEqual(AudioChunk.objects.count(), 10)
+        self.assertEqual(writer.get_metrics()["batches_written"], 3)
+        self.assertEqual(writer.get_metrics()["largest_batch_size"], 4)
+
+    def test_only_audio_chunks_are_written_when_not_saving_utterances(self):
+        writer = self.create_writer(save_utterances=False)
+        writer.add_audio_chunk(make_message("participant-1"), timestamp_ms=1000)
+
+        writer.flush()
+
+        self.assertEqual(AudioChunk.objects.count(), 1)
+        self.assertEqual(Utterance.objects.count(), 0)
+        self.on_utterances_created.assert_not_called()
+
+    def test_chunks_are_dropped_without_recording_in_progress(self):
+        self.recording.state = RecordingStates.COMPLETE
+        self.recording.save()
+
+        writer = self.create_writer()
+        writer.add_audio_chunk(make_message("participant-1"), timestamp_ms=1000)
+
+        writer.flush()
+
+        self.assertEqual(AudioChunk.objects.count(), 0)
+        self.assertEqual(writer.get_metrics()["audio_chunks_dropped"], 1)
+
+    def test_cleanup_writes_pending_chunks(self):
+        writer = self.create_writer()
+        writer.add_audio_chunk(make_message("participant-1"), timestamp_ms=1000)
+
+        writer.cleanup()
+
+        self.assertFalse(writer.writer_thread.is_alive())
+        self.assertEqual(Utterance.objects.count(), 1)
@@ -0,0 +1,234 @@
+import contextlib
+import json
+import os
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from accounts.models import Organization
+from bots.launch_bot_utils import launch_bot
+from bots.models import Bot, Project
+from bots.warm_pod_pool import WarmPodPool
+
+
+class FakeRedis:
+    """Just enough of the Redis API for the warm pod pool. Keys are ignored for expiry, and values are stored as bytes, like redis-py returns them."""
+
+    def __init__(self):
+        self.store = {}
+
+    @staticmethod
+    def encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def lock(self, name, timeout=None, blocking_timeout=None):
+        return contextlib.nullcontext()
+
+    def set(self, key, value, ex=None):
+        self.store[key] = self.encode(value)
+
+    def exists(self, key):
+        return int(key in self.store)
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def expire(self, key, seconds):
+        pass
+
+    def rpush(self, key, value):
+        self.store.setdefault(key, []).append(self.encode(value))
+
+    def lpop(self, key):
+        values = self.store.get(key, [])
+        return values.pop(0) if values else None
+
+    def blpop(self, keys, timeout=0):
+        for key in keys:
+            value = self.lpop(key)
+            if value is not None:
+                return (key.encode(), value)
+        return None
+
+    def lrem(self, key, count, value):
+        values = self.store.get(key, [])
+        removed = values.count(self.encode(value))
+        self.store[key] = [existing for existing in values if existing != self.encode(value)]
+        return removed
+
+    def llen(self, key):
+        return len(self.store.get(key, []))
+
+    def zadd(self, key, mapping):
+        self.store.setdefault(key, {}).update({self.encode(member): score for member, score in mapping.items()})
+
+    def zrem(self, key, member):
+        self.store.get(key, {}).pop(self.encode(member), None)
+
+    def zcard(self, key):
+        return len(self.store.get(key, {}))
+
+    def zrangebyscore(self, key, min_score, max_score):
+        return [member for member, score in self.store.get(key, {}).items() if score <= max_score]
+
+    def hset(self, key, mapping):
+        self.store.setdefault(key, {}).update({self.encode(field): self.encode(value) for field, value in mapping.items()})
+
+    def hget(self, key, field):
+        return self.store.get(key, {}).get(self.encode(field))
+
+    def hgetall(self, key):
+        return dict(self.store.get(key, {}))
+
+    def hincrby(self, key, field, amount):
+        hash_value = self.store.setdefault(key, {})
+        hash_value[self.encode(field)] = self.encode(int(hash_value.get(self.encode(field), 0)) + amount)
+
+    def hincrbyfloat(self, key, field, amount):
+        hash_value = self.store.setdefault(key, {})
+        hash_value[self.encode(field)] = self.encode(float(hash_value.get(self.encode(field), 0)) + amount)
+
+
+class FakeBotPodCreator:
+    def __init__(self):
+        self.created_pods = []
+        self.deleted_pods = []
+
+    def create_warm_bot_pod(self, pod_name, warm_pod_pool, bot_cpu_request=None):
+        self.created_pods.append(pod_name)
+        return {"name": pod_name, "created": True}
+
+    def delete_bot_pod(self, pod_name):
+        self.deleted_pods.append(pod_name)
+        return {"deleted": True}
+
+
+class TestWarmPodPool(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.warm_pod_pool = WarmPodPool(self.redis)
+        self.pool = WarmPodPool.pool_name("v1", "4")
+
+    def test_claimed_pod_receives_the_bot(self):
+        self.warm_pod_pool.register_idle_pod(self.pool, "bot-pod-warm-1")
+
+        pod_name = self.warm_pod_pool.claim_pod(self.pool)
+        self.warm_pod_pool.send_claim(pod_name, {"bot_id": 7})
+
+        self.assertEqual(pod_name, "bot-pod-warm-1")
+        self.assertEqual(self.warm_pod_pool.wait_for_claim(self.pool, pod_name, max_idle_seconds=60), {"bot_id": 7})
+        self.assertIsNone(self.warm_pod_pool.claim_pod(self.pool))
+
+    def test_pods_that_are_no_longer_alive_are_skipped(self):
+        self.warm_pod_pool.register_idle_pod(self.pool, "bot-pod-warm-1")
+        self.warm_pod_pool.register_idle_pod(self.pool, "bot-pod-warm-2")
+        self.redis.delete(self.warm_pod_pool.alive_key("bot-pod-warm-1"))
+
+        self.assertEqual(self.warm_pod_pool.claim_pod(self.pool), "bot-pod-warm-2")
+
+    def test_unclaimed_pod_leaves_the_pool(self):
+        self.warm_pod_pool.register_idle_pod(self.pool, "bot-pod-warm-1")
+
+        self.assertIsNone(self.warm_pod_pool.wait_for_claim(self.pool, "bot-pod-warm-1", max_idle_seconds=0))
+        self.assertIsNone(self.warm_pod_pool.claim_pod(self.pool))
+
+    def test_pod_claimed_while_leaving_the_pool_still_gets_its_claim(self):
+        self.warm_pod_pool.register_idle_pod(self.pool, "bot-pod-warm-1")
+        pod_name = self.warm_pod_pool.claim_pod(self.pool)
+        self.warm_pod_pool.send_claim(pod_name, {"bot_id": 7})
+
+        self.assertEqual(self.warm_pod_pool.wait_for_claim(self.pool, pod_name, max_idle_seconds=0), {"bot_id": 7})
+
+    @patch.dict(os.environ, {"WARM_POD_POOL_SIZE": "2", "WARM_POD_POOL_MAX_SIZE": "5"})
+    def test_target_size_grows_with_scheduled_bots_up_to_the_max(self):
+        self.assertEqual(self.warm_pod_pool.get_target_size(0), 2)
+        self.assertEqual(self.warm_pod_pool.get_target_size(2), 4)
+        self.assertEqual(self.warm_pod_pool.get_target_size(10), 5)
+
+    def test_replenish_creates_and_retires_pods(self):
+        bot_pod_creator = FakeBotPodCreator()
+        self.warm_pod_pool.replenish(self.pool, "4", 3, bot_pod_creator)
+        self.assertEqual(len(bot_pod_creator.created_pods), 3)
+        self.assertEqual(self.warm_pod_pool.get_stats(self.pool), {"pods": 3, "idle_pods": 0})
+
+        # Pods that are still starting up count towards the target
+        self.warm_pod_pool.replenish(self.pool, "4", 3, bot_pod_creator)
+        self.assertEqual(len(bot_pod_creator.created_pods), 3)
+
+        for pod_name in bot_pod_creator.created_pods:
+            self.warm_pod_pool.register_idle_pod(self.pool, pod_name)
+        self.warm_pod_pool.replenish(self.pool, "4", 1, bot_pod_creator)
+
+        self.assertEqual(self.warm_pod_pool.get_stats(self.pool), {"pods": 1, "idle_pods": 1})
+        retired_pod_name = bot_pod_creator.created_pods[0]
+        self.assertEqual(self.warm_pod_pool.wait_for_claim(self.pool, retired_pod_name, max_idle_seconds=60), {"command": "stop"})
+
+    def test_replenish_removes_pods_that_failed_to_start(self):
+        bot_pod_creator = FakeBotPodCreator()
+        self.redis.zadd(self.warm_pod_pool.pods_key(self.pool), {"bot-pod-warm-stuck": time.time() - WarmPodPool.STARTUP_TIMEOUT_SECONDS - 1})
+
+        self.warm_pod_pool.replenish(self.pool, "4", 1, bot_pod_creator)
+
+        self.assertEqual(bot_pod_creator.deleted_pods, ["bot-pod-warm-stuck"])
+        self.assertEqual(len(bot_pod_creator.created_pods), 1)
+        self.assertEqual(self.warm_pod_pool.get_stats(self.pool)["pods"], 1)
+
+    def test_launch_stats_are_kept_for_each_launch_method(self):
+        with patch("bots.warm_pod_pool.time.time", return_value=1000):
+            self.warm_pod_pool.record_launch(1, WarmPodPool.WARM)
+            self.warm_pod_pool.record_launch(2, WarmPodPool.COLD)
+        with patch("bots.warm_pod_pool.time.time", return_value=1002):
+            self.assertEqual(self.warm_pod_pool.record_bot_started(1), 2)
+        with patch("bots.warm_pod_pool.time.time", return_value=1090):
+            self.assertEqual(self.warm_pod_pool.record_bot_started(2), 90)
+            # A bot is only counted the first time it starts
+            self.assertIsNone(self.warm_pod_pool.record_bot_started(2))
+
+        self.assertEqual(
+            self.warm_pod_pool.get_launch_stats(),
+            {
+                "warm": {"count": 1, "mean_seconds_to_start": 2.0, "max_seconds_to_start": 2.0},
+                "cold": {"count": 1, "mean_seconds_to_start": 90.0, "max_seconds_to_start": 90.0},
+            },
+        )
+
+    def test_redis_failing_does_not_stop_the_launch(self):
+        self.redis.hset = MagicMock(side_effect=ConnectionError("Redis is down"))
+        self.warm_pod_pool.record_launch(1, WarmPodPool.COLD)
+
+
+@patch.dict(os.environ, {"LAUNCH_BOT_METHOD": "kubernetes", "WARM_POD_POOL_ENABLED": "true", "CUBER_RELEASE_VERSION": "v1", "BOT_CPU_REQUEST": "4"})
+class TestLaunchBotInWarmPod(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Organization")
+        project = Project.objects.create(name="Test Project", organization=organization)
+        self.bot = Bot.objects.create(project=project, name="Test Bot", meeting_url="https://example.zoom.us/j/123456789")
+
+        self.redis = FakeRedis()
+        self.warm_pod_pool = WarmPodPool(self.redis)
+        self.pool = WarmPodPool.pool_name("v1", "4")
+        patcher = patch("bots.launch_bot_utils.get_warm_pod_pool", return_value=self.warm_pod_pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bot_is_launched_in_an_idle_warm_pod(self):
+        self.warm_pod_pool.register_idle_pod(self.pool, "bot-pod-warm-1")
+
+        with patch("bots.bot_pod_creator.BotPodCreator") as mock_bot_pod_creator:
+            launch_bot(self.bot)
+
+        mock_bot_pod_creator.assert_not_called()
+        self.bot.refresh_from_db()
+        self.assertEqual(self.bot.k8s_pod_name(), "bot-pod-warm-1")
+        self.assertEqual(json.loads(self.redis.lpop(self.warm_pod_pool.claim_key("bot-pod-warm-1"))), {"bot_id": self.bot.id})
+
+    def test_bot_is_launched_in_a_new_pod_when_the_pool_is_empty(self):
+        with patch("bots.bot_pod_creator.BotPodCreator") as mock_bot_pod_creator:
+            mock_bot_pod_creator.return_value.create_bot_pod.return_value = {"created": True}
+            launch_bot(self.bot)
+
+        mock_bot_pod_creator.return_value.create_bot_pod.assert_called_once_with(bot_id=self.bot.id, bot_name=self.bot.k8s_pod_name(), bot_cpu_request="4", add_webpage_streamer=False)
+        self.assertTrue(self.bot.k8s_pod_name().startswith("bot-pod-"))
+        self.assertEqual(self.redis.hget(self.warm_pod_pool.launch_key(self.bot.id), "launch_method"), b"cold")
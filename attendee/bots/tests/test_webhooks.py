@@ -296,7 +296,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         settings.CELERY_TASK_ALWAYS_EAGER = True
         settings.CELERY_TASK_EAGER_PROPAGATES = True
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("requests.Session.post")
     def test_webhook_delivery_success(self, mock_post):
         """Test successful webhook delivery"""
         mock_post.return_value.status_code = 200
@@ -324,7 +324,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         self.assertEqual(len(attempt.response_body_list), 1)
         self.assertIsNotNone(attempt.succeeded_at)
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("requests.Session.post")
     def test_webhook_delivery_failure(self, mock_post):
         """Test webhook delivery failure and retry"""
         mock_post.return_value.status_code = 500
@@ -355,7 +355,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         self.assertIsNone(attempt.succeeded_at)
         self.assertEqual(attempt.attempt_count, 3)
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("requests.Session.post")
     def test_webhook_delivery_inactive(self, mock_post):
         """Test webhook delivery does not deliver when the subscription is inactive"""
 
@@ -381,7 +381,7 @@ class WebhookDeliveryTest(TransactionTestCase):
         self.assertIsNone(attempt.succeeded_at)
         self.assertEqual(attempt.attempt_count, 0)
 
-    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("requests.Session.post")
     def test_bot_webhook_prioritization(self, mock_post):
         """Test that bot-level webhooks are prioritized over project-level webhooks"""
         from bots.webhook_utils import trigger_webhook
@@ -0,0 +1,309 @@
+import logging
+import os
+import time
+
+import redis
+from redis.exceptions import LockError
+
+from bots.models import TranscriptionProviders
+
+logger = logging.getLogger(__name__)
+
+# One dispatcher per Redis URL, so its connection pool is shared by every call in the process
+_transcription_dispatchers = {}
+
+
+def transcription_dispatcher_enabled():
+    transcription_dispatcher_enabled_env_var_value = os.getenv("TRANSCRIPTION_DISPATCHER_ENABLED", "false")
+    return str(transcription_dispatcher_enabled_env_var_value).lower() == "true"
+
+
+class TranscriptionDispatcher:
+    """
+    Sends utterances to the transcription providers at a rate they can handle.
+
+    Utterances waiting to be transcribed are kept in Redis, in one queue per project and transcription provider
+    (a "bucket"). Each bucket has a token bucket that limits the requests per second, a cap on the number of
+    transcription tasks in flight, and a backoff that stops all dispatching for the bucket as soon as the provider
+    starts returning rate limit errors. Utterances from live meetings are dispatched before those from async transcriptions.
+
+    The state is shared by every process that dispatches utterances, and a Redis lock per bucket keeps them from
+    handing out the same tokens twice.
+    """
+
+    LIVE_PRIORITY = 0
+    ASYNC_PRIORITY = 1
+    # Pending utterances are scored by priority, then by when they were created.
+    # The step is larger than any unix timestamp, so the priority always comes first.
+    PRIORITY_SCORE_STEP = 10**12
+
+    KEY_PREFIX = "transcription_dispatcher"
+
+    DEFAULT_REQUESTS_PER_SECOND = 5
+    DEFAULT_BURST_SIZE = 10
+    DEFAULT_MAX_IN_FLIGHT = 20
+    # A dispatched utterance that hasn't finished after this long is assumed to have been lost, e.g. because its worker died
+    IN_FLIGHT_TIMEOUT_SECONDS = 15 * 60
+    BASE_BACKOFF_SECONDS = 2
+    MAX_BACKOFF_SECONDS = 120
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    # Keys
+
+    @staticmethod
+    def bucket_name(project_id, transcription_provider):
+        return f"{project_id}:{int(transcription_provider)}"
+
+    def buckets_key(self):
+        return f"{self.KEY_PREFIX}:buckets"
+
+    def pending_key(self, bucket):
+        return f"{self.KEY_PREFIX}:pending:{bucket}"
+
+    def in_flight_key(self, bucket):
+        return f"{self.KEY_PREFIX}:in_flight:{bucket}"
+
+    def tokens_key(self, bucket):
+        return f"{self.KEY_PREFIX}:tokens:{bucket}"
+
+    def backoff_key(self, bucket):
+        return f"{self.KEY_PREFIX}:backoff:{bucket}"
+
+    def lock_key(self, bucket):
+        return f"{self.KEY_PREFIX}:lock:{bucket}"
+
+    def wakeup_key(self, bucket):
+        return f"{self.KEY_PREFIX}:wakeup:{bucket}"
+
+    # Limits. These can be set for every provider, or for a single provider, e.g. TRANSCRIPTION_DISPATCHER_DEEPGRAM_MAX_IN_FLIGHT
+
+    def get_limit(self, bucket, name, default):
+        provider_name = TranscriptionProviders(int(bucket.split(":")[1])).name
+        value = os.getenv(f"TRANSCRIPTION_DISPATCHER_{provider_name}_{name}") or os.getenv(f"TRANSCRIPTION_DISPATCHER_{name}")
+        return float(value) if value else default
+
+    def get_requests_per_second(self, bucket):
+        return self.get_limit(bucket, "REQUESTS_PER_SECOND", self.DEFAULT_REQUESTS_PER_SECOND)
+
+    def get_burst_size(self, bucket):
+        return self.get_limit(bucket, "BURST_SIZE", self.DEFAULT_BURST_SIZE)
+
+    def get_max_in_flight(self, bucket):
+        return int(self.get_limit(bucket, "MAX_IN_FLIGHT", self.DEFAULT_MAX_IN_FLIGHT))
+
+    # Queueing
+
+    def enqueue(self, utterance_id, project_id, transcription_provider, priority, created_at=None):
+        bucket = self.bucket_name(project_id, transcription_provider)
+        score = priority * self.PRIORITY_SCORE_STEP + (created_at if created_at is not None else time.time())
+        try:
+            self.redis_client.zadd(self.pending_key(bucket), {utterance_id: score})
+            self.redis_client.sadd(self.buckets_key(), bucket)
+        except Exception as e:
+            # Better to transcribe without rate limiting than not at all
+            logger.warning(f"Error adding utterance {utterance_id} to transcription dispatcher bucket {bucket}, sending it straight to a worker: {e}")
+            self.send_utterance_task(utterance_id)
+            return
+        self.dispatch(bucket)
+
+    def enqueue_utterance(self, utterance):
+        self.enqueue(
+            utterance.id,
+            project_id=utterance.recording.bot.project_id,
+            transcription_provider=utterance.transcription_provider,
+            priority=self.ASYNC_PRIORITY if utterance.async_transcription_id else self.LIVE_PRIORITY,
+            created_at=utterance.created_at.timestamp(),
+        )
+
+    # Dispatching
+
+    def dispatch(self, bucket):
+        """Sends as many pending utterances in the bucket to workers as the limits allow. Returns the ids of the utterances that were sent."""
+        try:
+            with self.redis_client.lock(self.lock_key(bucket), timeout=10, blocking_timeout=2):
+                utterance_ids = self.take_utterances_to_dispatch(bucket, time.time())
+        except LockError:
+            logger.info(f"Could not get the lock for transcription dispatcher bucket {bucket}, another process is dispatching it")
+            return []
+
+        for utterance_id in utterance_ids:
+            self.send_utterance_task(utterance_id)
+        if utterance_ids:
+            logger.info(f"Dispatched {len(utterance_ids)} utterances for transcription dispatcher bucket {bucket}")
+        return utterance_ids
+
+    def take_utterances_to_dispatch(self, bucket, now):
+        pending_key = self.pending_key(bucket)
+        in_flight_key = self.in_flight_key(bucket)
+
+        backoff_until = self.get_backoff_state(bucket)["backoff_until"]
+        if backoff_until and backoff_until > now:
+            if self.redis_client.zcard(pending_key):
+                self.schedule_wakeup(bucket, backoff_until - now)
+            return []
+
+        self.redis_client.zremrangebyscore(in_flight_key, "-inf", now - self.IN_FLIGHT_TIMEOUT_SECONDS)
+        available_slots = self.get_max_in_flight(bucket) - self.redis_client.zcard(in_flight_key)
+        tokens = self.refill_tokens(bucket, now)
+        # When there are no free slots, a finishing utterance will dispatch the next one
+        if available_slots <= 0:
+            return []
+
+        popped = self.redis_client.zpopmin(pending_key, min(available_slots, int(tokens))) if tokens >= 1 else []
+        utterance_ids = [int(member) for member, _ in popped]
+        if utterance_ids:
+            self.redis_client.zadd(in_flight_key, {utterance_id: now for utterance_id in utterance_ids})
+            tokens -= len(utterance_ids)
+            self.redis_client.hset(self.tokens_key(bucket), mapping={"tokens": tokens, "updated_at": now})
+
+        # Out of tokens with utterances still waiting, so check back once the next token is available
+        if tokens < 1 and len(utterance_ids) < available_slots and self.redis_client.zcard(pending_key):
+            self.schedule_wakeup(bucket, (1 - tokens) / self.get_requests_per_second(bucket))
+        return utterance_ids
+
+    def refill_tokens(self, bucket, now):
+        burst_size = self.get_burst_size(bucket)
+        token_state = self.redis_client.hgetall(self.tokens_key(bucket))
+        if not token_state:
+            return burst_size
+        tokens = float(token_state[b"tokens"])
+        elapsed_seconds = max(0.0, now - float(token_state[b"updated_at"]))
+        return min(burst_size, tokens + elapsed_seconds * self.get_requests_per_second(bucket))
+
+    def dispatch_all(self):
+        for bucket in self.get_buckets():
+            self.dispatch(bucket)
+            # Forget about buckets that have nothing left to do, so the set doesn't grow forever
+            if not self.redis_client.zcard(self.pending_key(bucket)) and not self.redis_client.zcard(self.in_flight_key(bucket)):
+                self.redis_client.srem(self.buckets_key(), bucket)
+
+    def finish_utterance(self, utterance, rate_limited=False):
+        """Called when a dispatched utterance's transcription request is done. Rate limited utterances go back in the queue and put the bucket into backoff."""
+        bucket = self.bucket_name(utterance.recording.bot.project_id, utterance.transcription_provider)
+        try:
+            self.redis_client.zrem(self.in_flight_key(bucket), utterance.id)
+            if rate_limited:
+                self.record_rate_limit(bucket, time.time())
+                self.enqueue(
+                    utterance.id,
+                    project_id=utterance.recording.bot.project_id,
+                    transcription_provider=utterance.transcription_provider,
+                    priority=self.ASYNC_PRIORITY if utterance.async_transcription_id else self.LIVE_PRIORITY,
+                    created_at=utterance.created_at.timestamp(),
+                )
+                return
+            self.redis_client.delete(self.backoff_key(bucket))
+        except Exception as e:
+            logger.warning(f"Error finishing utterance {utterance.id} in transcription dispatcher bucket {bucket}: {e}")
+            return
+        self.dispatch(bucket)
+
+    # Requests for several utterances, like a micro-batch, take a single token and in flight slot between them
+
+    def acquire_request(self, bucket, request_id):
+        """Takes a token and an in flight slot for a request that doesn't go through the queue. Returns whether the request can be sent now."""
+        try:
+            with self.redis_client.lock(self.lock_key(bucket), timeout=10, blocking_timeout=2):
+                now = time.time()
+                backoff_until = self.get_backoff_state(bucket)["backoff_until"]
+                if backoff_until and backoff_until > now:
+                    return False
+
+                in_flight_key = self.in_flight_key(bucket)
+                self.redis_client.zremrangebyscore(in_flight_key, "-inf", now - self.IN_FLIGHT_TIMEOUT_SECONDS)
+                tokens = self.refill_tokens(bucket, now)
+                if tokens < 1 or self.redis_client.zcard(in_flight_key) >= self.get_max_in_flight(bucket):
+                    return False
+
+                self.redis_client.zadd(in_flight_key, {request_id: now})
+                self.redis_client.hset(self.tokens_key(bucket), mapping={"tokens": tokens - 1, "updated_at": now})
+                self.redis_client.sadd(self.buckets_key(), bucket)
+                return True
+        except LockError:
+            logger.info(f"Could not get the lock for transcription dispatcher bucket {bucket}, not sending request {request_id} yet")
+            return False
+        except Exception as e:
+            # Better to transcribe without rate limiting than not at all
+            logger.warning(f"Error acquiring a token for request {request_id} in transcription dispatcher bucket {bucket}, sending it anyway: {e}")
+            return True
+
+    def finish_request(self, bucket, request_id, rate_limited=False):
+        """Called when a request taken with acquire_request is done. A rate limited request puts the bucket into backoff, like a rate limited utterance."""
+        try:
+            self.redis_client.zrem(self.in_flight_key(bucket), request_id)
+            if rate_limited:
+                self.record_rate_limit(bucket, time.time())
+            else:
+                self.redis_client.delete(self.backoff_key(bucket))
+        except Exception as e:
+            logger.warning(f"Error finishing request {request_id} in transcription dispatcher bucket {bucket}: {e}")
+            return
+        self.dispatch(bucket)
+
+    # Backoff
+
+    def get_backoff_state(self, bucket):
+        backoff_state = self.redis_client.hgetall(self.backoff_key(bucket))
+        if not backoff_state:
+            return {"consecutive_rate_limits": 0, "backoff_until": None}
+        return {"consecutive_rate_limits": int(backoff_state[b"consecutive_rate_limits"]), "backoff_until": float(backoff_state[b"backoff_until"])}
+
+    def record_rate_limit(self, bucket, now):
+        backoff_state = self.get_backoff_state(bucket)
+        # Requests that were already in flight when the backoff started don't make it any longer
+        if backoff_state["backoff_until"] and backoff_state["backoff_until"] > now:
+            return
+        consecutive_rate_limits = backoff_state["consecutive_rate_limits"] + 1
+        backoff_seconds = min(self.MAX_BACKOFF_SECONDS, self.BASE_BACKOFF_SECONDS * 2 ** (consecutive_rate_limits - 1))
+        self.redis_client.hset(self.backoff_key(bucket), mapping={"consecutive_rate_limits": consecutive_rate_limits, "backoff_until": now + backoff_seconds})
+        # Start from an empty token bucket once the backoff is over
+        self.redis_client.hset(self.tokens_key(bucket), mapping={"tokens": 0, "updated_at": now + backoff_seconds})
+        logger.warning(f"Transcription provider rate limited bucket {bucket} ({consecutive_rate_limits} times in a row), pausing dispatch for {backoff_seconds}s")
+
+    # Celery
+
+    def send_utterance_task(self, utterance_id):
+        from bots.tasks.process_utterance_task import process_utterance
+
+        process_utterance.apply_async(args=[utterance_id], kwargs={"dispatched": True})
+
+    def schedule_wakeup(self, bucket, delay_seconds):
+        # Only one wakeup per bucket at a time, no matter how many processes notice the bucket is waiting
+        countdown = max(1, round(delay_seconds))
+        if not self.redis_client.set(self.wakeup_key(bucket), 1, nx=True, ex=countdown):
+            return
+        from bots.tasks.dispatch_transcriptions_task import dispatch_transcriptions
+
+        dispatch_transcriptions.apply_async(args=[bucket], countdown=countdown)
+
+    # Stats
+
+    def get_buckets(self):
+        return sorted(bucket.decode() if isinstance(bucket, bytes) else bucket for bucket in self.redis_client.smembers(self.buckets_key()))
+
+    def get_stats(self, bucket):
+        now = time.time()
+        pending_key = self.pending_key(bucket)
+        backoff_state = self.get_backoff_state(bucket)
+        live_queue_depth = self.redis_client.zcount(pending_key, "-inf", f"({self.ASYNC_PRIORITY * self.PRIORITY_SCORE_STEP}")
+        return {
+            "queue_depth": self.redis_client.zcard(pending_key),
+            "live_queue_depth": live_queue_depth,
+            "in_flight": self.redis_client.zcount(self.in_flight_key(bucket), now - self.IN_FLIGHT_TIMEOUT_SECONDS, "+inf"),
+            "tokens": round(self.refill_tokens(bucket, now), 2),
+            "backing_off": bool(backoff_state["backoff_until"] and backoff_state["backoff_until"] > now),
+            "backoff_seconds_remaining": round(max(0.0, backoff_state["backoff_until"] - now), 2) if backoff_state["backoff_until"] else 0.0,
+            "consecutive_rate_limits": backoff_state["consecutive_rate_limits"],
+        }
+
+    def get_all_stats(self):
+        return {bucket: self.get_stats(bucket) for bucket in self.get_buckets()}
+
+
+def get_transcription_dispatcher():
+    redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+    if redis_url not in _transcription_dispatchers:
+        _transcription_dispatchers[redis_url] = TranscriptionDispatcher(redis.from_url(redis_url))
+    return _transcription_dispatchers[redis_url]
@@ -0,0 +1,50 @@
+import json
+import os
+from urllib.parse import urlencode
+
+from bots.transcription_providers.streaming_transcriber import WebsocketStreamingTranscriber
+
+
+class AssemblyAIStreamingTranscriber(WebsocketStreamingTranscriber):
+    """Transcribes with AssemblyAI's universal streaming API. Each turn is an interim result until AssemblyAI has formatted it."""
+
+    reusable = True
+
+    def __init__(self, *, api_key, sample_rate, keyterms_prompt=None, speaker_id=None, on_result_callback):
+        super().__init__(speaker_id=speaker_id, sample_rate=sample_rate, on_result_callback=on_result_callback)
+        self.api_key = api_key
+        self.keyterms_prompt = keyterms_prompt
+
+    def get_url(self):
+        base_url = os.getenv("ASSEMBLYAI_STREAMING_URL", "wss://streaming.assemblyai.com/v3/ws")
+        params = {"sample_rate": self.sample_rate, "encoding": "pcm_s16le", "format_turns": "true"}
+        if self.keyterms_prompt:
+            params["keyterms_prompt"] = json.dumps(self.keyterms_prompt)
+        return f"{base_url}?{urlencode(params)}"
+
+    def get_headers(self):
+        return {"Authorization": self.api_key}
+
+    def get_finalize_messages(self):
+        return [{"type": "ForceEndpoint"}]
+
+    def get_close_messages(self):
+        return [{"type": "Terminate"}]
+
+    def handle_message(self, message):
+        if message.get("type") != "Turn":
+            return
+        words = [
+            {
+                "word": word["text"],
+                "start": word["start"] / 1000,
+                "end": word["end"] / 1000,
+                "confidence": word.get("confidence"),
+            }
+            for word in message.get("words", [])
+        ]
+        # With format_turns, a turn that has ended is sent again once it's been punctuated and formatted
+        is_final = bool(message.get("end_of_turn") and message.get("turn_is_formatted"))
+        if message.get("end_of_turn") and not is_final:
+            return
+        self.emit_result(transcript=message.get("transcript", ""), words=words, is_final=is_final)
@@ -1,5 +1,5 @@
 import logging
-import time
+import threading
 
 from deepgram import (
     DeepgramClient,
@@ -8,36 +8,47 @@ from deepgram import (
     LiveTranscriptionEvents,
 )
 
+from bots.transcription_providers.streaming_transcriber import StreamingTranscriber
+
 logger = logging.getLogger(__name__)
 
 
-class DeepgramStreamingTranscriber:
-    def __init__(self, *, deepgram_api_key, interim_results, language, model, sample_rate, metadata, callback, redaction_settings=None):
+class DeepgramStreamingTranscriber(StreamingTranscriber):
+    """Transcribes with Deepgram's live API. The SDK opens the connection synchronously, so it's opened on a background thread, and audio sent in the meantime is held until it's open."""
+
+    def __init__(self, *, deepgram_api_key, interim_results, language, model, sample_rate, metadata, callback, speaker_id=None, on_result_callback=None, redaction_settings=None):
+        super().__init__(speaker_id=speaker_id, sample_rate=sample_rate, on_result_callback=on_result_callback or (lambda speaker_id, result: None))
+        self.lock = threading.Lock()
+        # Audio sent before the connection is open, None once it's open
+        self.pending_audio = []
+        self.alive = True
+        self.closed = False
+
         # Configure the DeepgramClientOptions to enable KeepAlive for maintaining the WebSocket connection (only if necessary to your scenario)
         config = DeepgramClientOptions(options={"keepalive": "true"})
 
-        self.last_send_time = time.time()
-
         # Create a websocket connection using the DEEPGRAM_API_KEY from environment variables
         self.deepgram = DeepgramClient(deepgram_api_key, config)
 
         # Use the listen.live class to create the websocket connection
         self.dg_connection = self.deepgram.listen.websocket.v("1")
 
-        def on_message(self, result, **kwargs):
-            sentence = result.channel.alternatives[0].transcript
-            if len(sentence) == 0:
-                return
-            logger.info(f"Transcription: {sentence}")
+        def on_message(_, result, **kwargs):
+            self.handle_result(result)
 
         self.dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
 
-        def on_error(self, error, **kwargs):
+        def on_error(_, error, **kwargs):
             logger.error(f"Error in Deepgram streaming transcription: {error}")
 
         self.dg_connection.on(LiveTranscriptionEvents.Error, on_error)
 
-        options = LiveOptions(
+        def on_close(_, close, **kwargs):
+            self.alive = False
+
+        self.dg_connection.on(LiveTranscriptionEvents.Close, on_close)
+
+        self.options = LiveOptions(
             model=model,
             smart_format=True,
             language=language,
@@ -49,11 +60,57 @@ class DeepgramStreamingTranscriber:
             redact=redaction_settings,
         )
 
-        self.dg_connection.start(options)
+    def handle_result(self, result):
+        alternative = result.channel.alternatives[0]
+        if len(alternative.transcript) == 0:
+            return
+        words = [
+            {
+                "word": word.word,
+                "punctuated_word": word.punctuated_word or word.word,
+                "start": word.start,
+                "end": word.end,
+                "confidence": word.confidence,
+            }
+            for word in alternative.words or []
+        ]
+        self.emit_result(transcript=alternative.transcript, words=words, is_final=bool(result.is_final), start_seconds=result.start, end_seconds=result.start + result.duration)
+
+    def start(self):
+        threading.Thread(target=self.connect, daemon=True).start()
+
+    def connect(self):
+        try:
+            connected = self.dg_connection.start(self.options)
+        except Exception as e:
+            logger.warning(f"Deepgram streaming transcriber for speaker {self.speaker_id} failed to connect: {e}")
+            connected = False
+        with self.lock:
+            if connected:
+                for data in self.pending_audio:
+                    self.dg_connection.send(data)
+            else:
+                self.alive = False
+            self.pending_audio = None
+            closed = self.closed
+        # The transcriber was closed while the connection was opening
+        if connected and closed:
+            self.dg_connection.finish()
 
-    def send(self, data):
-        self.dg_connection.send(data)
-        self.last_send_time = time.time()
+    def is_alive(self):
+        return self.alive
 
-    def finish(self):
+    def send_audio(self, data):
+        with self.lock:
+            if self.pending_audio is not None:
+                self.pending_audio.append(data)
+                return
+        if self.alive:
+            self.dg_connection.send(data)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.pending_audio is not None:
+                return
         self.dg_connection.finish()
@@ -0,0 +1,60 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+from bots.transcription_providers.streaming_transcriber import WebsocketStreamingTranscriber, resample_pcm
+
+
+class ElevenLabsStreamingTranscriber(WebsocketStreamingTranscriber):
+    """Transcribes with ElevenLabs' realtime speech to text API, which commits a transcript whenever it detects the end of a turn."""
+
+    reusable = True
+    DEFAULT_MODEL_ID = "scribe_v2_realtime"
+    SUPPORTED_SAMPLE_RATES = [8000, 16000, 22050, 24000, 44100, 48000]
+
+    def __init__(self, *, api_key, sample_rate, model_id=None, language_code=None, speaker_id=None, on_result_callback):
+        super().__init__(speaker_id=speaker_id, sample_rate=sample_rate, on_result_callback=on_result_callback)
+        self.api_key = api_key
+        # The batch models can't be used for realtime transcription
+        self.model_id = model_id if model_id and "realtime" in model_id else self.DEFAULT_MODEL_ID
+        self.language_code = language_code
+        self.elevenlabs_sample_rate = sample_rate if sample_rate in self.SUPPORTED_SAMPLE_RATES else 16000
+
+    def get_url(self):
+        params = {
+            "model_id": self.model_id,
+            "audio_format": f"pcm_{self.elevenlabs_sample_rate}",
+            "commit_strategy": "vad",
+            "include_timestamps": "true",
+        }
+        if self.language_code:
+            params["language_code"] = self.language_code
+        return f"wss://api.elevenlabs.io/v1/speech-to-text/realtime?{urlencode(params)}"
+
+    def get_headers(self):
+        return {"xi-api-key": self.api_key}
+
+    def get_audio_message(self, data):
+        audio = resample_pcm(data, self.sample_rate, self.elevenlabs_sample_rate)
+        return json.dumps({"message_type": "input_audio_chunk", "audio_base_64": base64.b64encode(audio).decode("ascii"), "sample_rate": self.elevenlabs_sample_rate, "commit": False})
+
+    def get_finalize_messages(self):
+        return [{"message_type": "input_audio_chunk", "audio_base_64": "", "sample_rate": self.elevenlabs_sample_rate, "commit": True}]
+
+    def handle_message(self, message):
+        message_type = message.get("message_type")
+        if message_type == "partial_transcript":
+            self.emit_result(transcript=message.get("text", "").strip(), words=[], is_final=False)
+        elif message_type == "committed_transcript_with_timestamps":
+            words = [
+                {
+                    "word": word["text"],
+                    "start": word["start"],
+                    "end": word["end"],
+                }
+                for word in message.get("words", [])
+                if word.get("type", "word") == "word"
+            ]
+            self.emit_result(transcript=message.get("text", "").strip(), words=words, is_final=True)
+        elif message_type and message_type.endswith("error"):
+            raise Exception(f"ElevenLabs realtime transcription error: {message}")
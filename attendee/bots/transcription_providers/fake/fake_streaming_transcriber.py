@@ -0,0 +1,33 @@
+from bots.transcription_providers.streaming_transcriber import StreamingTranscriber
+
+
+class FakeStreamingTranscriber(StreamingTranscriber):
+    """A StreamingTranscriber that keeps the audio it's sent in memory, and returns whatever results it's told to. For tests."""
+
+    reusable = True
+
+    def __init__(self, *, speaker_id=None, sample_rate, on_result_callback, reusable=True):
+        super().__init__(speaker_id=speaker_id, sample_rate=sample_rate, on_result_callback=on_result_callback)
+        self.reusable = reusable
+        self.audio = bytearray()
+        self.started = False
+        self.finalize_count = 0
+        self.closed = False
+
+    def start(self):
+        self.started = True
+
+    def is_alive(self):
+        return not self.closed
+
+    def send_audio(self, data):
+        self.audio.extend(data)
+
+    def finalize(self):
+        self.finalize_count += 1
+
+    def close(self):
+        self.closed = True
+
+    def emit_transcript(self, transcript, *, is_final=True, start_seconds=None, end_seconds=None):
+        self.emit_result(transcript=transcript, words=[], is_final=is_final, start_seconds=start_seconds, end_seconds=end_seconds)
@@ -0,0 +1,48 @@
+from bots.http_client_pool import get_http_session
+from bots.transcription_providers.streaming_transcriber import WebsocketStreamingTranscriber
+
+
+class GladiaStreamingTranscriber(WebsocketStreamingTranscriber):
+    """Transcribes with Gladia's live API. A live session is created over HTTP, and the audio is streamed to the websocket url it returns."""
+
+    reusable = True
+
+    def __init__(self, *, api_key, sample_rate, code_switching_languages=None, enable_code_switching=False, speaker_id=None, on_result_callback):
+        super().__init__(speaker_id=speaker_id, sample_rate=sample_rate, on_result_callback=on_result_callback)
+        self.api_key = api_key
+        self.code_switching_languages = code_switching_languages
+        self.enable_code_switching = enable_code_switching
+
+    def get_url(self):
+        session_config = {
+            "encoding": "wav/pcm",
+            "bit_depth": 16,
+            "sample_rate": self.sample_rate,
+            "channels": 1,
+            "messages_config": {"receive_partial_transcripts": True},
+        }
+        if self.enable_code_switching or self.code_switching_languages:
+            session_config["language_config"] = {"languages": self.code_switching_languages or [], "code_switching": self.enable_code_switching}
+
+        response = get_http_session("gladia").post("https://api.gladia.io/v2/live", headers={"x-gladia-key": self.api_key}, json=session_config)
+        response.raise_for_status()
+        return response.json()["url"]
+
+    def get_close_messages(self):
+        return [{"type": "stop_recording"}]
+
+    def handle_message(self, message):
+        if message.get("type") != "transcript":
+            return
+        data = message.get("data", {})
+        utterance = data.get("utterance", {})
+        words = [
+            {
+                "word": word["word"].strip(),
+                "start": word["start"],
+                "end": word["end"],
+                "confidence": word.get("confidence"),
+            }
+            for word in utterance.get("words", [])
+        ]
+        self.emit_result(transcript=utterance.get("text", "").strip(), words=words, is_final=bool(data.get("is_final")), start_seconds=utterance.get("start"), end_seconds=utterance.get("end"))
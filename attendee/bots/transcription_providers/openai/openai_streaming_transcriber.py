@@ -0,0 +1,75 @@
+import base64
+import json
+import os
+
+from bots.transcription_providers.streaming_transcriber import WebsocketStreamingTranscriber, resample_pcm
+
+
+class OpenAIStreamingTranscriber(WebsocketStreamingTranscriber):
+    """
+    Transcribes with a realtime transcription session from OpenAI. OpenAI detects the turns in the audio, sends the text of
+    each one as it's transcribed, and then the completed transcript. The realtime API only accepts 24kHz audio.
+    """
+
+    reusable = True
+    OPENAI_SAMPLE_RATE = 24000
+
+    def __init__(self, *, api_key, sample_rate, model, prompt=None, language=None, speaker_id=None, on_result_callback):
+        super().__init__(speaker_id=speaker_id, sample_rate=sample_rate, on_result_callback=on_result_callback)
+        self.api_key = api_key
+        self.model = model
+        self.prompt = prompt
+        self.language = language
+        # item id -> {"start": seconds, "end": seconds, "transcript": text so far}
+        self.items = {}
+
+    def get_url(self):
+        base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").replace("https://", "wss://", 1)
+        return f"{base_url}/realtime?intent=transcription"
+
+    def get_headers(self):
+        return {"Authorization": f"Bearer {self.api_key}", "OpenAI-Beta": "realtime=v1"}
+
+    def get_start_messages(self):
+        input_audio_transcription = {"model": self.model}
+        if self.prompt:
+            input_audio_transcription["prompt"] = self.prompt
+        if self.language:
+            input_audio_transcription["language"] = self.language
+        return [
+            {
+                "type": "transcription_session.update",
+                "session": {
+                    "input_audio_format": "pcm16",
+                    "input_audio_transcription": input_audio_transcription,
+                    "turn_detection": {"type": "server_vad", "silence_duration_ms": 500},
+                },
+            }
+        ]
+
+    def get_audio_message(self, data):
+        audio = resample_pcm(data, self.sample_rate, self.OPENAI_SAMPLE_RATE)
+        return json.dumps({"type": "input_audio_buffer.append", "audio": base64.b64encode(audio).decode("ascii")})
+
+    def get_finalize_messages(self):
+        return [{"type": "input_audio_buffer.commit"}]
+
+    def handle_message(self, message):
+        message_type = message.get("type")
+        item_id = message.get("item_id")
+        if message_type == "input_audio_buffer.speech_started":
+            self.items[item_id] = {"start": message["audio_start_ms"] / 1000, "end": None, "transcript": ""}
+        elif message_type == "input_audio_buffer.speech_stopped":
+            self.items.setdefault(item_id, {"start": None, "end": None, "transcript": ""})["end"] = message["audio_end_ms"] / 1000
+        elif message_type == "conversation.item.input_audio_transcription.delta":
+            item = self.items.setdefault(item_id, {"start": None, "end": None, "transcript": ""})
+            item["transcript"] += message.get("delta", "")
+            self.emit_result(transcript=item["transcript"].strip(), words=[], is_final=False, start_seconds=item["start"], end_seconds=item["end"])
+        elif message_type == "conversation.item.input_audio_transcription.completed":
+            item = self.items.pop(item_id, {"start": None, "end": None})
+            self.emit_result(transcript=message.get("transcript", "").strip(), words=[], is_final=True, start_seconds=item["start"], end_seconds=item["end"])
+        elif message_type == "error":
+            error = message.get("error", {})
+            # Committing when OpenAI has already committed the audio isn't a problem
+            if error.get("code") != "input_audio_buffer_commit_empty":
+                raise Exception(f"OpenAI realtime transcription error: {error}")
@@ -0,0 +1,330 @@
+import json
+import logging
+import threading
+import time
+from queue import Empty, SimpleQueue
+
+import numpy as np
+from websockets import ConnectionClosed
+from websockets.sync.client import connect
+
+logger = logging.getLogger(__name__)
+
+
+def resample_pcm(audio_bytes, from_sample_rate, to_sample_rate):
+    """Linear resampling of 16-bit mono PCM, for providers that only accept one sample rate."""
+    if from_sample_rate == to_sample_rate:
+        return audio_bytes
+    samples = np.frombuffer(audio_bytes, dtype=np.int16)
+    num_output_samples = int(len(samples) * to_sample_rate / from_sample_rate)
+    if num_output_samples == 0:
+        return b""
+    output_positions = np.arange(num_output_samples) * (from_sample_rate / to_sample_rate)
+    return np.interp(output_positions, np.arange(len(samples)), samples).astype(np.int16).tobytes()
+
+
+class StreamingTranscriber:
+    """
+    Base class for transcribing one speaker's audio in realtime.
+
+    Audio is passed to send(). Whenever the provider has a result, on_result_callback is called with the speaker id and a dict
+    with the transcript, the words (times in seconds, relative to the start of the result), whether the result is final,
+    and the wall clock time and duration of the result in milliseconds. Interim results may be revised by later results,
+    final ones won't be.
+
+    Subclasses implement start(), send_audio(), finalize() and close(), and call emit_result() with times measured in seconds
+    of audio sent on the connection, which is how the providers report them. start() is called on the bot's main loop, so it
+    must not wait for the connection to open, and is_alive() returns False once the connection has failed or closed.
+    Transcribers that have no speaker specific configuration set reusable = True, so that once a speaker stops talking, the
+    connection can be handed to another speaker instead of opening a new one.
+    """
+
+    reusable = False
+
+    def __init__(self, *, speaker_id, sample_rate, on_result_callback):
+        self.speaker_id = speaker_id
+        self.sample_rate = sample_rate
+        self.on_result_callback = on_result_callback
+        self.last_send_time = time.time()
+        self.audio_sent_seconds = 0.0
+        self.last_result_end_seconds = 0.0
+        # (seconds of audio on the connection, speaker id, wall clock time in ms) for where each speaker's audio starts,
+        # so that results which arrive after the connection was handed to another speaker go to the right one
+        self.speaker_segments = []
+        self.speaker_segment_started = False
+
+    def start_speaker_segment(self):
+        self.speaker_segments = self.speaker_segments[-1:] + [(self.audio_sent_seconds, self.speaker_id, int(time.time() * 1000))]
+        self.speaker_segment_started = True
+
+    def send(self, data):
+        if not self.speaker_segment_started:
+            self.start_speaker_segment()
+        self.audio_sent_seconds += len(data) / (self.sample_rate * 2)
+        self.send_audio(data)
+        self.last_send_time = time.time()
+
+    def emit_result(self, *, transcript, words, is_final, start_seconds=None, end_seconds=None):
+        if not transcript:
+            return
+        if not self.speaker_segment_started:
+            self.start_speaker_segment()
+        if start_seconds is None:
+            start_seconds = words[0]["start"] if words else self.last_result_end_seconds
+        if end_seconds is None:
+            end_seconds = words[-1]["end"] if words else self.audio_sent_seconds
+        if is_final:
+            self.last_result_end_seconds = end_seconds
+
+        segment_start_audio_seconds, speaker_id, segment_start_time_ms = self.speaker_segments[-1]
+        if start_seconds < segment_start_audio_seconds and len(self.speaker_segments) > 1:
+            segment_start_audio_seconds, speaker_id, segment_start_time_ms = self.speaker_segments[0]
+        start_seconds = max(start_seconds, segment_start_audio_seconds)
+        end_seconds = max(end_seconds, start_seconds)
+
+        result = {
+            "transcript": transcript,
+            "words": [{**word, "start": word["start"] - start_seconds, "end": word["end"] - start_seconds} for word in words],
+            "is_final": is_final,
+            "timestamp_ms": segment_start_time_ms + round((start_seconds - segment_start_audio_seconds) * 1000),
+            "duration_ms": round((end_seconds - start_seconds) * 1000),
+        }
+        try:
+            self.on_result_callback(speaker_id, result)
+        except Exception as e:
+            logger.exception(f"Error handling streaming transcription result for speaker {speaker_id}: {e}")
+
+    def assign_to_speaker(self, speaker_id):
+        self.speaker_id = speaker_id
+        self.speaker_segment_started = False
+        self.last_send_time = time.time()
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+    def send_audio(self, data):
+        raise NotImplementedError
+
+    def finalize(self):
+        """Asks the provider for final results for the audio sent so far, without closing the connection."""
+        pass
+
+    def close(self):
+        pass
+
+    def finish(self):
+        self.finalize()
+        self.close()
+
+
+class WebsocketStreamingTranscriber(StreamingTranscriber):
+    """
+    A StreamingTranscriber for providers with a websocket API.
+
+    The connection is opened and audio is sent from a background thread, so neither start() nor send() blocks the caller
+    on the network, and messages from the provider are handled on another background thread. Audio sent before the
+    connection is open waits in the send queue. Subclasses provide the url, headers and the messages to send,
+    and turn the provider's messages into results in handle_message().
+    """
+
+    # Audio that waits longer than this to be sent is dropped, to keep the transcript close to realtime
+    MAX_SEND_QUEUE_SIZE = 500
+
+    def __init__(self, *, speaker_id, sample_rate, on_result_callback):
+        super().__init__(speaker_id=speaker_id, sample_rate=sample_rate, on_result_callback=on_result_callback)
+        self.websocket = None
+        self.send_queue = SimpleQueue()
+        self.closed = threading.Event()
+        self.send_thread = None
+        self.recv_thread = None
+
+    def get_url(self):
+        raise NotImplementedError
+
+    def get_headers(self):
+        return {}
+
+    def get_start_messages(self):
+        return []
+
+    def get_audio_message(self, data):
+        return data
+
+    def get_finalize_messages(self):
+        return []
+
+    def get_close_messages(self):
+        return []
+
+    def handle_message(self, message):
+        raise NotImplementedError
+
+    def start(self):
+        self.send_thread = threading.Thread(target=self.run, daemon=True)
+        self.send_thread.start()
+
+    def is_alive(self):
+        return not self.closed.is_set()
+
+    def run(self):
+        try:
+            self.websocket = connect(self.get_url(), additional_headers=self.get_headers(), open_timeout=10)
+            for message in self.get_start_messages():
+                self.websocket.send(json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Streaming transcriber for speaker {self.speaker_id} failed to connect: {e}")
+            self.closed.set()
+            return
+        self.recv_thread = threading.Thread(target=self.recv_loop, daemon=True)
+        self.recv_thread.start()
+        self.send_loop()
+
+    def send_audio(self, data):
+        if self.closed.is_set():
+            return
+        if self.send_queue.qsize() >= self.MAX_SEND_QUEUE_SIZE:
+            logger.warning(f"Streaming transcriber for speaker {self.speaker_id} is falling behind, dropping audio")
+            return
+        self.send_queue.put(self.get_audio_message(data))
+
+    def finalize(self):
+        for message in self.get_finalize_messages():
+            self.send_queue.put(json.dumps(message))
+
+    def close(self):
+        for message in self.get_close_messages():
+            self.send_queue.put(json.dumps(message))
+        # Let the send loop drain the queue, it closes the websocket once it's done
+        self.send_queue.put(None)
+
+    def send_loop(self):
+        while True:
+            try:
+                message = self.send_queue.get(timeout=1)
+            except Empty:
+                if self.closed.is_set():
+                    break
+                continue
+            if message is None:
+                break
+            try:
+                self.websocket.send(message)
+            except Exception as e:
+                logger.info(f"Streaming transcriber for speaker {self.speaker_id} send failed ({e}), stopping")
+                break
+
+        self.closed.set()
+        try:
+            self.websocket.close()
+        except Exception as e:
+            logger.info(f"Error closing streaming transcriber websocket for speaker {self.speaker_id}: {e}")
+
+    def recv_loop(self):
+        while not self.closed.is_set():
+            try:
+                message = self.websocket.recv()
+            except ConnectionClosed:
+                break
+            except Exception as e:
+                logger.info(f"Streaming transcriber for speaker {self.speaker_id} recv failed ({e}), stopping")
+                break
+            try:
+                self.handle_message(json.loads(message))
+            except Exception as e:
+                logger.exception(f"Error handling message from streaming transcription provider for speaker {self.speaker_id}: {e}")
+
+        self.closed.set()
+
+
+class StreamingTranscriberPool:
+    """
+    Keeps track of the streaming transcribers for a meeting.
+
+    Each speaker who is talking has an active transcriber. When a speaker stops talking, a reusable transcriber is finalized
+    and kept open in the idle pool, so the next speaker can start without waiting for a new connection. Transcribers are
+    closed once they've been idle for idle_timeout_seconds, and at most max_active_transcribers are active at once. A
+    transcriber whose connection has died is discarded, and the speaker gets another one.
+    """
+
+    def __init__(self, *, create_transcriber, max_active_transcribers=4, max_idle_transcribers=2, idle_timeout_seconds=30):
+        self.create_transcriber = create_transcriber
+        self.max_active_transcribers = max_active_transcribers
+        self.max_idle_transcribers = max_idle_transcribers
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.active_transcribers = {}
+        self.idle_transcribers = []
+        self.metrics = {"connections_opened": 0, "connections_reused": 0, "connections_reaped": 0, "connections_lost": 0}
+
+    def get(self, speaker_id):
+        return self.active_transcribers.get(speaker_id)
+
+    def acquire(self, speaker_id):
+        transcriber = self.active_transcribers.get(speaker_id)
+        if transcriber and transcriber.is_alive():
+            return transcriber
+        if transcriber:
+            logger.info(f"Streaming transcriber for speaker {speaker_id} has lost its connection, replacing it")
+            self.discard(self.active_transcribers.pop(speaker_id))
+
+        transcriber = None
+        while self.idle_transcribers and transcriber is None:
+            idle_transcriber = self.idle_transcribers.pop()
+            if idle_transcriber.is_alive():
+                transcriber = idle_transcriber
+            else:
+                self.discard(idle_transcriber)
+        if transcriber:
+            transcriber.assign_to_speaker(speaker_id)
+            self.metrics["connections_reused"] += 1
+        else:
+            transcriber = self.create_transcriber(speaker_id)
+            transcriber.start()
+            self.metrics["connections_opened"] += 1
+        self.active_transcribers[speaker_id] = transcriber
+
+        if len(self.active_transcribers) > self.max_active_transcribers:
+            oldest_speaker_id = min(self.active_transcribers, key=lambda active_speaker_id: self.active_transcribers[active_speaker_id].last_send_time)
+            logger.info(f"Too many active streaming transcribers, stopping the one for speaker {oldest_speaker_id}")
+            self.release(oldest_speaker_id)
+        return transcriber
+
+    def discard(self, transcriber):
+        transcriber.close()
+        self.metrics["connections_lost"] += 1
+
+    def release(self, speaker_id):
+        transcriber = self.active_transcribers.pop(speaker_id, None)
+        if transcriber is None:
+            return
+        if transcriber.reusable and len(self.idle_transcribers) < self.max_idle_transcribers:
+            transcriber.finalize()
+            self.idle_transcribers.append(transcriber)
+        else:
+            transcriber.finish()
+
+    def reap_idle_transcribers(self):
+        now = time.time()
+        still_idle_transcribers = []
+        for transcriber in self.idle_transcribers:
+            if not transcriber.is_alive():
+                self.discard(transcriber)
+            elif now - transcriber.last_send_time > self.idle_timeout_seconds:
+                transcriber.close()
+                self.metrics["connections_reaped"] += 1
+            else:
+                still_idle_transcribers.append(transcriber)
+        self.idle_transcribers = still_idle_transcribers
+
+    def close_all(self):
+        for speaker_id in list(self.active_transcribers):
+            transcriber = self.active_transcribers.pop(speaker_id)
+            transcriber.finish()
+        for transcriber in self.idle_transcribers:
+            transcriber.close()
+        self.idle_transcribers = []
+
+    def get_metrics(self):
+        return {**self.metrics, "active": len(self.active_transcribers), "idle": len(self.idle_transcribers)}
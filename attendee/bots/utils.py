@@ -89,6 +89,67 @@ def mp3_to_pcm(mp3_data: bytes, sample_rate: int = 32000, channels: int = 1, sam
     return pcm_data
 
 
+def pcm_to_flac(pcm_data: bytes, sample_rate: int = 32000, channels: int = 1, sample_width: int = 2) -> bytes:
+    """
+    Losslessly compress PCM audio data with FLAC.
+
+    Args:
+        pcm_data (bytes): Raw PCM audio data
+        sample_rate (int): Sample rate in Hz (default: 32000)
+        channels (int): Number of audio channels (default: 1)
+        sample_width (int): Sample width in bytes (default: 2)
+
+    Returns:
+        bytes: FLAC encoded audio data
+    """
+    audio_segment = AudioSegment(data=pcm_data, sample_width=sample_width, frame_rate=sample_rate, channels=channels)
+    buffer = io.BytesIO()
+    audio_segment.export(buffer, format="flac")
+    return buffer.getvalue()
+
+
+def pcm_to_opus(pcm_data: bytes, sample_rate: int = 32000, channels: int = 1, sample_width: int = 2, bitrate: str = "32k") -> bytes:
+    """
+    Compress PCM audio data with Opus in an Ogg container. Opus is lossy, but at speech
+    bitrates it is much smaller than FLAC and still transcribes well.
+
+    Args:
+        pcm_data (bytes): Raw PCM audio data
+        sample_rate (int): Sample rate in Hz (default: 32000)
+        channels (int): Number of audio channels (default: 1)
+        sample_width (int): Sample width in bytes (default: 2)
+        bitrate (str): Opus encoding bitrate (default: "32k")
+
+    Returns:
+        bytes: Ogg/Opus encoded audio data
+    """
+    audio_segment = AudioSegment(data=pcm_data, sample_width=sample_width, frame_rate=sample_rate, channels=channels)
+    buffer = io.BytesIO()
+    audio_segment.export(buffer, format="ogg", codec="libopus", parameters=["-b:a", bitrate])
+    return buffer.getvalue()
+
+
+def compressed_audio_to_pcm(audio_data: bytes, format: str, sample_rate: int = 32000, channels: int = 1, sample_width: int = 2) -> bytes:
+    """
+    Decode FLAC or Ogg/Opus audio data back to PCM.
+
+    Args:
+        audio_data (bytes): Compressed audio data
+        format (str): Container format of the audio data, "flac" or "ogg"
+        sample_rate (int): Desired sample rate in Hz (default: 32000)
+        channels (int): Desired number of audio channels (default: 1)
+        sample_width (int): Desired sample width in bytes (default: 2)
+
+    Returns:
+        bytes: Raw PCM audio data
+    """
+    audio_segment = AudioSegment.from_file(io.BytesIO(audio_data), format=format)
+    audio_segment = audio_segment.set_frame_rate(sample_rate)
+    audio_segment = audio_segment.set_channels(channels)
+    audio_segment = audio_segment.set_sample_width(sample_width)
+    return audio_segment.raw_data
+
+
 def calculate_audio_duration_ms(audio_data: bytes, content_type: str) -> int:
     """
     Calculate the duration of audio data in milliseconds.
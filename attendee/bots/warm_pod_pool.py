@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+import redis
+from redis.exceptions import LockError
+
+logger = logging.getLogger(__name__)
+
+
+def warm_pod_pool_enabled():
+    warm_pod_pool_enabled_env_var_value = os.getenv("WARM_POD_POOL_ENABLED", "false")
+    return str(warm_pod_pool_enabled_env_var_value).lower() == "true"
+
+
+class WarmPodPool:
+    """
+    Keeps idle bot pods running, so a bot launched in Kubernetes can start joining without waiting for a pod to be
+    scheduled, pull its image and start Chrome's dependencies and Django.
+
+    There is a pool for each release and CPU request, since a bot can only run in a pod with the right code and resources.
+    A warm pod registers itself in Redis once it has started up, then waits on its own claim list. Launching a bot pops
+    an idle pod and pushes the bot's id onto that list. Pods refresh a key with a TTL while they wait, so pods that died
+    are skipped, and they exit on their own after a while, so pods from an old release don't linger.
+
+    The scheduler keeps each pool at its target size, which grows with the bots scheduled to join soon.
+    How long bots take to start after being launched is recorded separately for warm and cold launches.
+    """
+
+    KEY_PREFIX = "warm_pod_pool"
+
+    WARM = "warm"
+    COLD = "cold"
+
+    DEFAULT_SIZE = 1
+    DEFAULT_MAX_SIZE = 10
+    DEFAULT_LOOKAHEAD_MINUTES = 15
+    DEFAULT_MAX_IDLE_SECONDS = 2 * 60 * 60
+    # A pod that hasn't registered this long after being created is assumed to have failed to start
+    STARTUP_TIMEOUT_SECONDS = 10 * 60
+    ALIVE_TTL_SECONDS = 60
+    ALIVE_REFRESH_SECONDS = 20
+    LAUNCH_TTL_SECONDS = 60 * 60
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    # Keys
+
+    @staticmethod
+    def pool_name(app_version, cpu_request):
+        return f"{app_version}:{cpu_request}"
+
+    def pods_key(self, pool):
+        return f"{self.KEY_PREFIX}:pods:{pool}"
+
+    def idle_key(self, pool):
+        return f"{self.KEY_PREFIX}:idle:{pool}"
+
+    def lock_key(self, pool):
+        return f"{self.KEY_PREFIX}:lock:{pool}"
+
+    def alive_key(self, pod_name):
+        return f"{self.KEY_PREFIX}:alive:{pod_name}"
+
+    def claim_key(self, pod_name):
+        return f"{self.KEY_PREFIX}:claim:{pod_name}"
+
+    def launch_key(self, bot_id):
+        return f"{self.KEY_PREFIX}:launch:{bot_id}"
+
+    def stats_key(self, launch_method):
+        return f"{self.KEY_PREFIX}:stats:{launch_method}"
+
+    # Sizing
+
+    def get_size(self):
+        return int(os.getenv("WARM_POD_POOL_SIZE", self.DEFAULT_SIZE))
+
+    def get_max_size(self):
+        return int(os.getenv("WARM_POD_POOL_MAX_SIZE", self.DEFAULT_MAX_SIZE))
+
+    def get_lookahead_minutes(self):
+        return int(os.getenv("WARM_POD_POOL_LOOKAHEAD_MINUTES", self.DEFAULT_LOOKAHEAD_MINUTES))
+
+    def get_max_idle_seconds(self):
+        return int(os.getenv("WARM_POD_POOL_MAX_IDLE_SECONDS", self.DEFAULT_MAX_IDLE_SECONDS))
+
+    def get_cpu_requests(self):
+        cpu_requests = os.getenv("WARM_POD_POOL_CPU_REQUESTS") or os.getenv("BOT_CPU_REQUEST", "4") or "4"
+        return [cpu_request.strip() for cpu_request in cpu_requests.split(",") if cpu_request.strip()]
+
+    def get_target_size(self, scheduled_bot_count):
+        # Every bot scheduled to join soon should find a pod waiting, on top of the pods kept for bots launched straight away
+        return min(self.get_size() + scheduled_bot_count, self.get_max_size())
+
+    # Warm pods
+
+    def register_idle_pod(self, pool, pod_name):
+        self.redis_client.set(self.alive_key(pod_name), 1, ex=self.ALIVE_TTL_SECONDS)
+        self.redis_client.rpush(self.idle_key(pool), pod_name)
+        logger.info(f"Warm pod {pod_name} is idle in pool {pool}")
+
+    def wait_for_claim(self, pool, pod_name, max_idle_seconds):
+        """Returns the claim, or None if the pod wasn't claimed within max_idle_seconds and has left the pool."""
+        idle_since = time.monotonic()
+        while time.monotonic() - idle_since < max_idle_seconds:
+            self.redis_client.set(self.alive_key(pod_name), 1, ex=self.ALIVE_TTL_SECONDS)
+            claim = self.pop_claim(pod_name, timeout=self.ALIVE_REFRESH_SECONDS)
+            if claim:
+                return claim
+
+        self.redis_client.delete(self.alive_key(pod_name))
+        if self.redis_client.lrem(self.idle_key(pool), 0, pod_name):
+            self.redis_client.zrem(self.pods_key(pool), pod_name)
+            return None
+        # We were popped from the idle list just now, so a claim is on its way
+        return self.pop_claim(pod_name, timeout=self.ALIVE_TTL_SECONDS)
+
+    def pop_claim(self, pod_name, timeout):
+        popped = self.redis_client.blpop([self.claim_key(pod_name)], timeout=timeout)
+        if not popped:
+            return None
+        return json.loads(popped[1])
+
+    # Launching
+
+    def claim_pod(self, pool):
+        """Takes an idle pod out of the pool. The caller must send it a claim with send_claim."""
+        while True:
+            pod_name = self.redis_client.lpop(self.idle_key(pool))
+            if pod_name is None:
+                return None
+            pod_name = pod_name.decode() if isinstance(pod_name, bytes) else pod_name
+            self.redis_client.zrem(self.pods_key(pool), pod_name)
+            if self.redis_client.exists(self.alive_key(pod_name)):
+                return pod_name
+            logger.info(f"Warm pod {pod_name} in pool {pool} is no longer alive, skipping it")
+
+    def send_claim(self, pod_name, claim):
+        self.redis_client.rpush(self.claim_key(pod_name), json.dumps(claim))
+        # The pod may have died since it was claimed, in which case nothing will read the claim
+        self.redis_client.expire(self.claim_key(pod_name), self.ALIVE_TTL_SECONDS * 2)
+
+    # The launch timings are only for the stats, so Redis failing doesn't stop the bot from launching
+
+    def record_launch(self, bot_id, launch_method):
+        try:
+            self.redis_client.hset(self.launch_key(bot_id), mapping={"launched_at": time.time(), "launch_method": launch_method})
+            self.redis_client.expire(self.launch_key(bot_id), self.LAUNCH_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Failed to record the launch of bot {bot_id}: {e}")
+
+    def record_bot_started(self, bot_id):
+        try:
+            return self.record_seconds_to_start(bot_id)
+        except Exception as e:
+            logger.warning(f"Failed to record the start of bot {bot_id}: {e}")
+            return None
+
+    def record_seconds_to_start(self, bot_id):
+        launch_key = self.launch_key(bot_id)
+        launch = self.redis_client.hgetall(launch_key)
+        if not launch:
+            return None
+        self.redis_client.delete(launch_key)
+
+        seconds_to_start = time.time() - float(launch[b"launched_at"])
+        launch_method = launch[b"launch_method"].decode()
+        stats_key = self.stats_key(launch_method)
+        self.redis_client.hincrby(stats_key, "count", 1)
+        self.redis_client.hincrbyfloat(stats_key, "total_seconds", seconds_to_start)
+        max_seconds = self.redis_client.hget(stats_key, "max_seconds")
+        if max_seconds is None or seconds_to_start > float(max_seconds):
+            self.redis_client.hset(stats_key, mapping={"max_seconds": seconds_to_start})
+        logger.info(f"Bot {bot_id} started {seconds_to_start:.1f} seconds after its {launch_method} launch")
+        return seconds_to_start
+
+    # Replenishing
+
+    def replenish(self, pool, cpu_request, target_size, bot_pod_creator):
+        """Prunes the pods that failed to start, then creates or retires pods until the pool is at its target size."""
+        try:
+            with self.redis_client.lock(self.lock_key(pool), timeout=60, blocking_timeout=2):
+                self.prune_pods_that_failed_to_start(pool, bot_pod_creator)
+
+                pod_count = self.redis_client.zcard(self.pods_key(pool))
+                for _ in range(target_size - pod_count):
+                    pod_name = f"bot-pod-warm-{uuid.uuid4().hex[:12]}"
+                    create_pod_result = bot_pod_creator.create_warm_bot_pod(pod_name=pod_name, warm_pod_pool=pool, bot_cpu_request=cpu_request)
+                    if not create_pod_result.get("created"):
+                        logger.error(f"Failed to create warm pod for pool {pool}: {create_pod_result}")
+                        break
+                    self.redis_client.zadd(self.pods_key(pool), {pod_name: time.time()})
+
+                # Only idle pods are retired, so a pool can be over its target while pods are starting
+                for _ in range(pod_count - target_size):
+                    pod_name = self.claim_pod(pool)
+                    if pod_name is None:
+                        break
+                    self.send_claim(pod_name, {"command": "stop"})
+        except LockError:
+            logger.info(f"Warm pod pool {pool} is being replenished by another process")
+
+    def prune_pods_that_failed_to_start(self, pool, bot_pod_creator):
+        started_before = time.time() - self.STARTUP_TIMEOUT_SECONDS
+        for pod_name in self.redis_client.zrangebyscore(self.pods_key(pool), "-inf", started_before):
+            pod_name = pod_name.decode() if isinstance(pod_name, bytes) else pod_name
+            if self.redis_client.exists(self.alive_key(pod_name)):
+                continue
+            logger.info(f"Warm pod {pod_name} in pool {pool} isn't alive, removing it")
+            self.redis_client.zrem(self.pods_key(pool), pod_name)
+            self.redis_client.lrem(self.idle_key(pool), 0, pod_name)
+            bot_pod_creator.delete_bot_pod(pod_name)
+
+    # Stats
+
+    def get_stats(self, pool):
+        return {
+            "pods": self.redis_client.zcard(self.pods_key(pool)),
+            "idle_pods": self.redis_client.llen(self.idle_key(pool)),
+        }
+
+    def get_launch_stats(self):
+        launch_stats = {}
+        for launch_method in [self.WARM, self.COLD]:
+            stats = self.redis_client.hgetall(self.stats_key(launch_method))
+            count = int(stats.get(b"count", 0))
+            launch_stats[launch_method] = {
+                "count": count,
+                "mean_seconds_to_start": round(float(stats[b"total_seconds"]) / count, 1) if count else None,
+                "max_seconds_to_start": round(float(stats[b"max_seconds"]), 1) if count else None,
+            }
+        return launch_stats
+
+
+def get_app_version():
+    return os.getenv("CUBER_RELEASE_VERSION", "unknown")
+
+
+def get_warm_pod_pool():
+    redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+    return WarmPodPool(redis.from_url(redis_url))
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class AudioFrameConverter:
+    """
+    Converts the float32 audio frames sent by the browser into 16-bit PCM.
+
+    The intermediate buffers are reused between frames, so the only allocation per frame
+    is the bytes object that is handed to the audio callbacks. Samples outside of [-1.0, 1.0)
+    are clipped instead of wrapping around. The normalized RMS of the frame is computed
+    in the same pass, so that callers don't need to parse the PCM again for silence detection.
+    """
+
+    def __init__(self, initial_capacity=4096):
+        self.scaled_samples = np.empty(initial_capacity, dtype=np.float32)
+        self.pcm_samples = np.empty(initial_capacity, dtype=np.int16)
+
+    def ensure_capacity(self, num_samples):
+        if num_samples <= self.scaled_samples.size:
+            return
+        capacity = max(num_samples, self.scaled_samples.size * 2)
+        self.scaled_samples = np.empty(capacity, dtype=np.float32)
+        self.pcm_samples = np.empty(capacity, dtype=np.int16)
+
+    def convert(self, frame):
+        """
+        Converts a buffer of float32 samples to 16-bit PCM.
+
+        Returns a tuple of (pcm_bytes, normalized_rms). normalized_rms is 0.0 exactly
+        when every sample in the PCM is zero.
+        """
+        samples = np.frombuffer(frame, dtype=np.float32)
+        num_samples = samples.size
+        if num_samples == 0:
+            return b"", 0.0
+
+        self.ensure_capacity(num_samples)
+        scaled_samples = self.scaled_samples[:num_samples]
+        pcm_samples = self.pcm_samples[:num_samples]
+
+        np.multiply(samples, 32768.0, out=scaled_samples)
+        np.clip(scaled_samples, -32768.0, 32767.0, out=scaled_samples)
+        # Truncate like astype(np.int16) does, so the RMS below is computed on exactly the PCM values
+        np.trunc(scaled_samples, out=scaled_samples)
+        np.copyto(pcm_samples, scaled_samples, casting="unsafe")
+
+        normalized_rms = float(np.sqrt(np.dot(scaled_samples, scaled_samples) / num_samples)) / 32768.0
+        return pcm_samples.tobytes(), normalized_rms
@@ -18,6 +18,7 @@ from bots.bot_adapter import BotAdapter
 from bots.models import ParticipantEventTypes, RecordingViews
 from bots.utils import half_ceil, scale_i420
 
+from .audio_frame_converter import AudioFrameConverter
 from .debug_screen_recorder import DebugScreenRecorder
 from .ui_methods import UiCouldNotJoinMeetingWaitingForHostException, UiCouldNotJoinMeetingWaitingRoomTimeoutException, UiIncorrectPasswordException, UiLoginAttemptFailedException, UiLoginRequiredException, UiMeetingNotFoundException, UiRequestToJoinDeniedException, UiRetryableException, UiRetryableExpectedException
 
@@ -25,6 +26,8 @@ logger = logging.getLogger(__name__)
 
 
 class WebBotAdapter(BotAdapter):
+    WEBSOCKET_MESSAGE_TYPE_NAMES = {1: "json", 2: "video", 3: "audio", 4: "encoded_mp4_chunk", 5: "per_participant_audio"}
+
     def __init__(
         self,
         *,
@@ -49,6 +52,7 @@ class WebBotAdapter(BotAdapter):
         webpage_streamer_service_hostname: str,
         record_chat_messages_when_paused: bool,
         disable_incoming_video: bool,
+        record_websocket_message_callback=None,
     ):
         self.display_name = display_name
         self.send_message_callback = send_message_callback
@@ -65,6 +69,7 @@ class WebBotAdapter(BotAdapter):
         self.recording_view = recording_view
         self.record_chat_messages_when_paused = record_chat_messages_when_paused
         self.disable_incoming_video = disable_incoming_video
+        self.record_websocket_message_callback = record_websocket_message_callback
         self.meeting_url = meeting_url
 
         self.video_frame_size = video_frame_size
@@ -108,6 +113,9 @@ class WebBotAdapter(BotAdapter):
 
         self.webpage_streamer_keepalive_task = None
 
+        self.mixed_audio_frame_converter = AudioFrameConverter()
+        self.per_participant_audio_frame_converter = AudioFrameConverter()
+
     def pause_recording(self):
         self.recording_paused = True
 
@@ -190,18 +198,15 @@ class WebBotAdapter(BotAdapter):
 
         self.last_media_message_processed_time = time.time()
         if len(message) > 12:
-            # Convert the float32 audio data to numpy array
-            audio_data = np.frombuffer(message[4:], dtype=np.float32)
-
-            # Convert float32 to PCM 16-bit by multiplying by 32768.0
-            audio_data = (audio_data * 32768.0).astype(np.int16)
+            # Convert the float32 audio data to PCM 16-bit
+            audio_data, normalized_rms = self.mixed_audio_frame_converter.convert(memoryview(message)[4:])
 
             # Only mark last_audio_message_processed_time if the audio data has at least one non-zero value
-            if np.any(audio_data):
+            if normalized_rms > 0:
                 self.last_audio_message_processed_time = time.time()
 
             if (self.wants_any_video_frames_callback is None or self.wants_any_video_frames_callback()) and self.send_frames:
-                self.add_mixed_audio_chunk_callback(chunk=audio_data.tobytes())
+                self.add_mixed_audio_chunk_callback(chunk=audio_data)
 
     def process_per_participant_audio_frame(self, message):
         if self.recording_paused:
@@ -213,13 +218,10 @@ class WebBotAdapter(BotAdapter):
             participant_id_length = int.from_bytes(message[4:5], byteorder="little")
             participant_id = message[5 : 5 + participant_id_length].decode("utf-8")
 
-            # Convert the float32 audio data to numpy array
-            audio_data = np.frombuffer(message[(5 + participant_id_length) :], dtype=np.float32)
+            # Convert the float32 audio data to PCM 16-bit
+            audio_data, normalized_rms = self.per_participant_audio_frame_converter.convert(memoryview(message)[(5 + participant_id_length) :])
 
-            # Convert float32 to PCM 16-bit by multiplying by 32768.0
-            audio_data = (audio_data * 32768.0).astype(np.int16)
-
-            self.add_audio_chunk_callback(participant_id, datetime.datetime.utcnow(), audio_data.tobytes())
+            self.add_audio_chunk_callback(participant_id, datetime.datetime.utcnow(), audio_data, normalized_rms=normalized_rms)
 
     def update_only_one_participant_in_meeting_at(self):
         if not self.joined_at:
@@ -271,6 +273,9 @@ class WebBotAdapter(BotAdapter):
                 # Get first 4 bytes as message type
                 message_type = int.from_bytes(message[:4], byteorder="little")
 
+                if self.record_websocket_message_callback:
+                    self.record_websocket_message_callback(self.WEBSOCKET_MESSAGE_TYPE_NAMES.get(message_type, "unknown"), len(message))
+
                 if message_type == 1:  # JSON
                     json_data = json.loads(message[4:].decode("utf-8"))
                     logger.info("Received JSON message: %s", json_data)
@@ -3,10 +3,41 @@ import hashlib
 import hmac
 import json
 import logging
+import os
+import time
 import uuid
 
+import redis
+
+from bots.bot_event_stream import bot_event_stream_enabled, publish_bot_event
+
 logger = logging.getLogger(__name__)
 
+# How long a worker process uses a project's webhook secret before looking it up again
+WEBHOOK_SECRET_CACHE_TTL_SECONDS = 60
+
+_webhook_secret_cache = {}
+
+# One client per Redis URL, so every webhook in the process shares its connection pool
+_redis_clients = {}
+
+
+def webhook_delivery_worker_enabled():
+    return str(os.getenv("WEBHOOK_DELIVERY_WORKER_ENABLED", "false")).lower() == "true"
+
+
+def get_webhook_delivery_batch_window_seconds():
+    return int(os.getenv("WEBHOOK_DELIVERY_BATCH_WINDOW_SECONDS", 1))
+
+
+def get_webhook_delivery_max_batch_size():
+    return int(os.getenv("WEBHOOK_DELIVERY_MAX_BATCH_SIZE", 50))
+
+
+def get_webhook_delivery_claim_timeout_seconds():
+    # Longer than a delivery task can run for, including its retry backoff
+    return int(os.getenv("WEBHOOK_DELIVERY_CLAIM_TIMEOUT_SECONDS", 900))
+
 
 def trigger_webhook(webhook_trigger_type, bot=None, calendar=None, payload=None):
     """
@@ -36,26 +67,109 @@ def trigger_webhook(webhook_trigger_type, bot=None, calendar=None, payload=None)
             is_active=True,
         )
 
-    delivery_attempts = []
-    for subscription in subscriptions:
-        # Create a webhook delivery attempt record
-        delivery_attempt = WebhookDeliveryAttempt.objects.create(
-            webhook_subscription=subscription,
-            webhook_trigger_type=webhook_trigger_type,
-            idempotency_key=uuid.uuid4(),
-            bot=bot,
-            calendar=calendar,
-            payload=payload,
-        )
-        delivery_attempts.append(delivery_attempt)
-
+    delivery_attempts = WebhookDeliveryAttempt.objects.bulk_create(
+        [
+            WebhookDeliveryAttempt(
+                webhook_subscription=subscription,
+                webhook_trigger_type=webhook_trigger_type,
+                idempotency_key=uuid.uuid4(),
+                bot=bot,
+                calendar=calendar,
+                payload=payload,
+            )
+            for subscription in subscriptions
+        ]
+    )
+
+    if bot and bot_event_stream_enabled():
+        publish_bot_event(webhook_trigger_type, bot, payload)
+
+    if webhook_delivery_worker_enabled():
+        for delivery_attempt in delivery_attempts:
+            schedule_webhook_delivery(delivery_attempt.webhook_subscription_id)
+    else:
         from bots.tasks.deliver_webhook_task import deliver_webhook
 
-        deliver_webhook.delay(delivery_attempt.id)
+        for delivery_attempt in delivery_attempts:
+            deliver_webhook.delay(delivery_attempt.id)
 
     return len(delivery_attempts)
 
 
+def get_redis_client():
+    redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+    if redis_url not in _redis_clients:
+        _redis_clients[redis_url] = redis.from_url(redis_url)
+    return _redis_clients[redis_url]
+
+
+def webhook_delivery_scheduled_key(subscription_id):
+    return f"webhook_delivery:scheduled:{subscription_id}"
+
+
+def schedule_webhook_delivery(subscription_id, redis_client=None):
+    """
+    Schedules delivery of a subscription's pending webhooks, after a short window so that the events that happen in the
+    meantime go out with them. Only one delivery is scheduled per subscription at a time.
+    """
+    from bots.tasks.deliver_pending_webhooks_task import deliver_pending_webhooks
+
+    countdown = get_webhook_delivery_batch_window_seconds()
+    try:
+        redis_client = redis_client or get_redis_client()
+        # The key outlives the countdown, and is deleted by the task before it picks up the pending webhooks
+        if not redis_client.set(webhook_delivery_scheduled_key(subscription_id), 1, nx=True, ex=countdown + 60):
+            return
+    except redis.RedisError as e:
+        logger.warning(f"Could not check for a scheduled webhook delivery for subscription {subscription_id}, scheduling one anyway: {e}")
+
+    deliver_pending_webhooks.apply_async(args=[subscription_id], countdown=countdown)
+
+
+def get_webhook_secret(project_id):
+    """Returns the project's newest webhook secret, cached for WEBHOOK_SECRET_CACHE_TTL_SECONDS."""
+    from bots.models import WebhookSecret
+
+    cached_secret = _webhook_secret_cache.get(project_id)
+    if cached_secret and time.monotonic() - cached_secret[1] < WEBHOOK_SECRET_CACHE_TTL_SECONDS:
+        return cached_secret[0]
+
+    active_secret = WebhookSecret.objects.filter(project_id=project_id).order_by("-created_at").first()
+    secret = active_secret.get_secret() if active_secret else None
+    _webhook_secret_cache[project_id] = (secret, time.monotonic())
+    return secret
+
+
+def build_webhook_data(delivery):
+    """Builds the body of the webhook for a delivery attempt."""
+    from bots.models import WebhookTriggerTypes
+
+    related_object_specific_webhook_data = {}
+
+    if delivery.bot:
+        related_object_specific_webhook_data["bot_id"] = delivery.bot.object_id
+        related_object_specific_webhook_data["bot_metadata"] = delivery.bot.metadata
+    elif delivery.calendar:
+        related_object_specific_webhook_data["calendar_id"] = delivery.calendar.object_id
+        related_object_specific_webhook_data["calendar_deduplication_key"] = delivery.calendar.deduplication_key
+        related_object_specific_webhook_data["calendar_metadata"] = delivery.calendar.metadata
+
+    return {
+        "idempotency_key": str(delivery.idempotency_key),
+        **related_object_specific_webhook_data,
+        "trigger": WebhookTriggerTypes.trigger_type_to_api_code(delivery.webhook_trigger_type),
+        "data": delivery.payload,
+    }
+
+
+def calculate_latency_percentiles(latencies_ms, percentiles=(50, 95, 99)):
+    """Nearest-rank percentiles of a list of latencies, in milliseconds."""
+    if not latencies_ms:
+        return {f"p{percentile}": None for percentile in percentiles}
+    sorted_latencies = sorted(latencies_ms)
+    return {f"p{percentile}": sorted_latencies[max(0, -(-percentile * len(sorted_latencies) // 100) - 1)] for percentile in percentiles}
+
+
 def sign_payload(payload, secret):
     """
     Sign a webhook payload using HMAC-SHA256. Returns a base64-encoded HMAC-SHA256 signature